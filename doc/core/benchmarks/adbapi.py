@@ -0,0 +1,72 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark the number of rows per second L{adbapi.ConnectionPool} can insert
+into an SQLite database with L{adbapi.ConnectionPool.runOperation}, each in
+its own transaction and gathered in batches with C{cp_batch_interval}.
+
+All the inserts are outstanding at once, as they would be for a stream of
+rows arriving faster than they are written.  The number of interactions run
+and the mean time they waited for a connection, from
+L{adbapi.ConnectionPool.stats}, are reported as well.
+
+Usage: python adbapi.py [rows]
+"""
+
+import sys, os, time, tempfile
+
+from twisted.internet import reactor, defer
+from twisted.enterprise import adbapi
+
+
+@defer.inlineCallbacks
+def timeInserts(path, rows, **kw):
+    pool = adbapi.ConnectionPool('sqlite3', path, check_same_thread=False,
+                                 cp_min=1, cp_max=1, **kw)
+    pool.start()
+    yield pool.runOperation('create table ingest (x integer, y text)')
+    before = time.time()
+    yield defer.gatherResults([
+        pool.runOperation('insert into ingest values (?, ?)', (i, str(i)))
+        for i in xrange(rows)])
+    elapsed = time.time() - before
+    stats = pool.stats()
+    yield pool.runOperation('drop table ingest')
+    pool.close()
+    defer.returnValue((rows / elapsed, stats))
+
+
+
+@defer.inlineCallbacks
+def benchmark(rows):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'ingest.db')
+    try:
+        for name, kw in [('one transaction per row', {}),
+                         ('batched', {'cp_batch_interval': 0.01,
+                                      'cp_statement_cache': 10})]:
+            rate, stats = yield timeInserts(path, rows, **kw)
+            print ('%-24s %10.1f rows/sec, %5d interactions, '
+                   '%8.2f ms mean wait' % (
+                    name + ':', rate, stats.completed,
+                    stats.acquireTimes.total / stats.completed * 1000))
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rmdir(directory)
+
+
+
+def main(args):
+    rows = 5000
+    if args:
+        rows = int(args[0])
+    d = benchmark(rows)
+    d.addErrback(lambda reason: reason.printTraceback())
+    d.addBoth(lambda ignored: reactor.stop())
+    reactor.run()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
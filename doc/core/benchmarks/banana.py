@@ -1,10 +1,42 @@
 #!/usr/bin/python
 
 from timer import timeit
-from twisted.spread.banana import b1282int
+from twisted.spread.banana import b1282int, Banana
+from twisted.test.proto_helpers import StringTransport
 
 ITERATIONS = 100000
 
 for length in (1, 5, 10, 50, 100):
     elapsed = timeit(b1282int, ITERATIONS, "\xff" * length)
     print "b1282int %3d byte string: %10d cps" % (length, ITERATIONS / elapsed)
+
+
+# Encode and decode a message shaped like a large jellied pb.Copyable: a
+# long list of small lists of short strings and integers.
+MESSAGE = [["attribute", "value %d" % (i,), i, [i * 2, -i]]
+           for i in xrange(20000)]
+CHUNK_SIZE = 65536
+ROUNDS = 5
+
+def encode(proto):
+    proto.transport.clear()
+    proto.sendEncoded(MESSAGE)
+
+def decode(proto, chunks):
+    for chunk in chunks:
+        proto.dataReceived(chunk)
+
+proto = Banana()
+proto.makeConnection(StringTransport())
+proto._selectDialect("none")
+proto.expressionReceived = lambda expression: None
+
+elapsed = timeit(encode, ROUNDS, proto)
+data = proto.transport.value()
+print "encode %d byte message: %10.1f bytes/sec" % (
+    len(data), len(data) * ROUNDS / elapsed)
+
+chunks = [data[i:i + CHUNK_SIZE] for i in xrange(0, len(data), CHUNK_SIZE)]
+elapsed = timeit(decode, ROUNDS, proto, chunks)
+print "decode %d byte message: %10.1f bytes/sec" % (
+    len(data), len(data) * ROUNDS / elapsed)
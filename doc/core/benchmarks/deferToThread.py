@@ -0,0 +1,67 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark the number of L{threads.deferToThread} round-trips per second: a
+trivial function is run in the reactor's threadpool and its result is
+delivered back to the reactor thread through a L{Deferred}.
+
+A fixed number of calls are kept outstanding, so the threadpool's threads
+are returning results while the reactor is processing earlier ones.  The
+number of times the reactor's waker was signalled is reported as well.
+
+Usage: python deferToThread.py [round-trips] [outstanding calls]
+"""
+
+import sys, time
+
+from twisted.internet import reactor, threads
+
+
+def benchmark(roundTrips, outstanding):
+    state = {'started': 0, 'finished': 0, 'wakeUps': 0}
+
+    waker = reactor.waker
+    wakeUp = waker.wakeUp
+    def countingWakeUp():
+        state['wakeUps'] += 1
+        wakeUp()
+    waker.wakeUp = countingWakeUp
+
+    def start():
+        state['started'] += 1
+        threads.deferToThread(int).addCallback(finished)
+
+    def finished(result):
+        state['finished'] += 1
+        if state['started'] < roundTrips:
+            start()
+        elif state['finished'] == roundTrips:
+            reactor.stop()
+
+    def run():
+        state['before'] = time.time()
+        for i in xrange(min(outstanding, roundTrips)):
+            start()
+
+    reactor.suggestThreadPoolSize(4)
+    reactor.callWhenRunning(run)
+    reactor.run()
+    elapsed = time.time() - state['before']
+    print 'deferToThread: %10.1f round-trips/sec, %d wakeups' % (
+        roundTrips / elapsed, state['wakeUps'])
+
+
+
+def main(args):
+    roundTrips = 50000
+    outstanding = 100
+    if args:
+        roundTrips = int(args[0])
+    if args[1:]:
+        outstanding = int(args[1])
+    benchmark(roundTrips, outstanding)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
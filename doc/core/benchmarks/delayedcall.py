@@ -0,0 +1,87 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks for rescheduling and cancelling L{DelayedCall}s held by a
+L{ReactorBase}.
+
+Each benchmark schedules a large number of timed calls and then measures
+the cost of resetting or cancelling a sample of them.  The indexed heap used
+by L{ReactorBase} is compared against the linear search the heap once
+needed in order to locate a call, which L{LinearSearchReactor} reintroduces.
+"""
+
+import random, time
+
+from twisted.internet.base import ReactorBase
+
+
+class BenchmarkReactor(ReactorBase):
+    """
+    A reactor with no I/O and a clock which never moves.
+    """
+    def installWaker(self):
+        pass
+
+
+    def seconds(self):
+        return 0.0
+
+
+
+class LinearSearchReactor(BenchmarkReactor):
+    """
+    A reactor which pays for a linear search of the heap on every reschedule
+    to an earlier time and which leaves cancelled calls in the heap, as
+    L{ReactorBase} once did.
+    """
+    def _moveCallLaterSooner(self, call):
+        self._pendingTimedCalls.index(call)
+        BenchmarkReactor._moveCallLaterSooner(self, call)
+
+
+    def _cancelCallLater(self, call):
+        pass
+
+
+
+def populate(reactorType, timers):
+    """
+    Create a reactor of type C{reactorType} with C{timers} pending calls.
+    """
+    reactor = reactorType()
+    noop = lambda: None
+    for i in xrange(timers):
+        reactor.callLater(random.uniform(1000, 2000), noop)
+    reactor._insertNewDelayedCalls()
+    return reactor
+
+
+def benchmark(reactorType, timers, operations):
+    reactor = populate(reactorType, timers)
+    sample = random.sample(reactor._pendingTimedCalls, operations * 2)
+
+    before = time.clock()
+    for call in sample[:operations]:
+        call.reset(random.uniform(0, 1000))
+    resetTime = time.clock() - before
+
+    before = time.clock()
+    for call in sample[operations:]:
+        call.cancel()
+    cancelTime = time.clock() - before
+
+    print '%-20s timers: %8d' % (reactorType.__name__, timers),
+    print 'reset: %8.2fus' % (resetTime / operations * 1e6,),
+    print 'cancel: %8.2fus' % (cancelTime / operations * 1e6,)
+
+
+
+def main():
+    for timers in 10000, 100000, 1000000:
+        benchmark(BenchmarkReactor, timers, 1000)
+        benchmark(LinearSearchReactor, timers, 20)
+
+
+if __name__ == '__main__':
+    main()
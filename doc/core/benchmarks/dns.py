@@ -0,0 +1,69 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark the number of DNS messages per second L{dns.Message} can encode
+and decode.
+
+The message is a typical response from an authoritative server: one query,
+three I{A} answers, two I{NS} records in the authority section and the
+addresses of the name servers in the additional section, with the names
+compressed against each other.
+
+Usage: python dns.py [messages per run]
+"""
+
+import sys, time
+
+from twisted.names import dns
+
+
+def response():
+    """
+    Build the response to encode and decode.
+    """
+    m = dns.Message(id=1234, answer=1, auth=1)
+    m.addQuery('www.example.com', dns.A)
+    for address in '10.0.0.1', '10.0.0.2', '10.0.0.3':
+        m.answers.append(dns.RRHeader(
+            'www.example.com', dns.A, dns.IN, 3600,
+            dns.Record_A(address, 3600), auth=True))
+    for ns in 'ns1.example.com', 'ns2.example.com':
+        m.authority.append(dns.RRHeader(
+            'example.com', dns.NS, dns.IN, 3600,
+            dns.Record_NS(ns, 3600), auth=True))
+    for ns, address in [('ns1.example.com', '10.0.1.1'),
+                        ('ns2.example.com', '10.0.1.2')]:
+        m.additional.append(dns.RRHeader(
+            ns, dns.A, dns.IN, 3600, dns.Record_A(address, 3600), auth=True))
+    return m
+
+
+
+def benchmark(messages):
+    message = response()
+    before = time.time()
+    for i in xrange(messages):
+        data = message.toStr()
+    elapsed = time.time() - before
+    print 'encode %d byte message: %10.1f messages/sec' % (
+        len(data), messages / elapsed)
+
+    before = time.time()
+    for i in xrange(messages):
+        dns.Message().fromStr(data)
+    elapsed = time.time() - before
+    print 'decode %d byte message: %10.1f messages/sec' % (
+        len(data), messages / elapsed)
+
+
+
+def main(args):
+    messages = 20000
+    if args:
+        messages = int(args[0])
+    benchmark(messages)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,130 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark the number of messages per second L{LineReceiver},
+L{LineOnlyReceiver}, L{Int32StringReceiver} and L{NetstringReceiver} can
+split out of large chunks of data, delivering them one at a time or, for
+those which support it, in batches.
+
+Each chunk is about a megabyte of 20 byte messages, delimited or prefixed as
+each protocol requires, and is delivered to the protocol with a single call
+to C{dataReceived}.  The chunk size is chosen so it does not end on a message
+boundary, so the protocols also have to carry a partial message over to the
+next chunk.
+
+Usage: python framing.py [chunk size [chunks per run]]
+"""
+
+import sys, time, struct
+
+from twisted.test.proto_helpers import StringTransport
+from twisted.protocols.basic import (
+    LineReceiver, LineOnlyReceiver, Int32StringReceiver, NetstringReceiver)
+
+# Each of these is 20 bytes long, including its framing.
+LINE = 'x' * 18 + '\r\n'
+INT32 = struct.pack('!I', 16) + 'x' * 16
+NETSTRING = '16:' + 'x' * 16 + ','
+
+
+
+class CountingLineReceiver(LineReceiver):
+    """
+    A L{LineReceiver} which counts the lines it receives.
+    """
+    count = 0
+
+    def lineReceived(self, line):
+        self.count += 1
+
+
+
+class CountingLineOnlyReceiver(LineOnlyReceiver):
+    """
+    A L{LineOnlyReceiver} which counts the lines it receives.
+    """
+    count = 0
+
+    def lineReceived(self, line):
+        self.count += 1
+
+
+
+class BatchingLineOnlyReceiver(LineOnlyReceiver):
+    """
+    A L{LineOnlyReceiver} which counts the lines it receives in batches.
+    """
+    count = 0
+
+    def linesReceived(self, lines):
+        self.count += len(lines)
+
+
+
+class CountingInt32Receiver(Int32StringReceiver):
+    """
+    An L{Int32StringReceiver} which counts the strings it receives.
+    """
+    count = 0
+
+    def stringReceived(self, string):
+        self.count += 1
+
+
+
+class BatchingInt32Receiver(Int32StringReceiver):
+    """
+    An L{Int32StringReceiver} which counts the strings it receives in
+    batches.
+    """
+    count = 0
+
+    def stringsReceived(self, strings):
+        self.count += len(strings)
+
+
+
+class CountingNetstringReceiver(NetstringReceiver):
+    """
+    A L{NetstringReceiver} which counts the strings it receives.
+    """
+    count = 0
+
+    def stringReceived(self, string):
+        self.count += 1
+
+
+
+def benchmark(protocolType, message, chunkSize, chunks):
+    stream = message * (chunkSize * chunks / len(message) + 1)
+    proto = protocolType()
+    proto.makeConnection(StringTransport())
+    before = time.time()
+    for i in xrange(chunks):
+        proto.dataReceived(stream[i * chunkSize:(i + 1) * chunkSize])
+    elapsed = time.time() - before
+    print '%-27s %d byte messages' % (protocolType.__name__, len(message)),
+    print 'messages/sec: %12.1f' % (proto.count / elapsed,)
+
+
+
+def main(args):
+    chunkSize = 2 ** 20 + 7
+    chunks = 10
+    if args:
+        chunkSize = int(args[0])
+    if args[1:]:
+        chunks = int(args[1])
+    for protocolType, message in [
+        (CountingLineReceiver, LINE),
+        (CountingLineOnlyReceiver, LINE),
+        (BatchingLineOnlyReceiver, LINE),
+        (CountingInt32Receiver, INT32),
+        (BatchingInt32Receiver, INT32),
+        (CountingNetstringReceiver, NETSTRING)]:
+        benchmark(protocolType, message, chunkSize, chunks)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
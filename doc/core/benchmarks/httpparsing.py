@@ -0,0 +1,96 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark the number of requests per second L{HTTPChannel} and
+L{SinglePassHTTPChannel} can parse and respond to.
+
+Requests with a set of headers like those a browser sends are delivered to a
+channel connected to an in-memory transport, either one request per segment
+or pipelined several to a segment.  Each request is answered with a short,
+fixed response as soon as it has been received, so the measurement is
+dominated by parsing and by the response headers the channel writes.
+
+Usage: python httpparsing.py [requests per run]
+"""
+
+import sys, time
+
+from twisted.test.proto_helpers import StringTransport
+from twisted.web.http import Request, HTTPChannel, SinglePassHTTPChannel
+
+REQUEST = (
+    'GET /some/resource?with=arguments HTTP/1.1\r\n'
+    'Host: www.example.com\r\n'
+    'User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:10.0) Gecko/20100101\r\n'
+    'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8\r\n'
+    'Accept-Language: en-us,en;q=0.5\r\n'
+    'Accept-Encoding: gzip, deflate\r\n'
+    'Accept-Charset: ISO-8859-1,utf-8;q=0.7,*;q=0.7\r\n'
+    'Connection: keep-alive\r\n'
+    'Referer: http://www.example.com/some/other/resource\r\n'
+    'Cookie: session=0123456789abcdef; preference=value\r\n'
+    'Cache-Control: max-age=0\r\n'
+    '\r\n')
+
+POST = (
+    'POST /form HTTP/1.1\r\n'
+    'Host: www.example.com\r\n'
+    'Content-Type: application/octet-stream\r\n'
+    'Content-Length: 4096\r\n'
+    '\r\n' + 'x' * 4096)
+
+
+
+class Respond(Request):
+    """
+    A request which sends a short response as soon as it is received.
+    """
+    def process(self):
+        self.setHeader('content-length', '2')
+        self.write('ok')
+        self.finish()
+
+
+
+class DiscardingTransport(StringTransport):
+    """
+    A transport which throws away everything written to it.
+    """
+    def write(self, data):
+        pass
+
+
+    def writeSequence(self, data):
+        pass
+
+
+
+def benchmark(channelType, request, requests, pipelined):
+    channel = channelType()
+    channel.requestFactory = Respond
+    channel.makeConnection(DiscardingTransport())
+    segment = request * pipelined
+    before = time.time()
+    for i in xrange(requests / pipelined):
+        channel.dataReceived(segment)
+    elapsed = time.time() - before
+    channel.connectionLost(None)
+    print '%-22s %-4s pipelined: %3d' % (
+        channelType.__name__, request.split()[0], pipelined),
+    print 'requests/sec: %10.1f' % (requests / elapsed,)
+
+
+
+def main(args):
+    requests = 20000
+    if args:
+        requests = int(args[0])
+    for request in REQUEST, POST:
+        for pipelined in 1, 10:
+            for channelType in HTTPChannel, SinglePassHTTPChannel:
+                benchmark(channelType, request, requests, pipelined)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,68 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark the number of small L{pb.Copyable} instances per second which can
+be jellied and unjellied.
+
+A list of instances is jellied with a L{pb.Broker} as the invoker, the way
+PB does it when one is passed to or returned from a remote method, and the
+result is unjellied into L{pb.RemoteCopy} instances.  Each instance has a
+few attributes, so the measurement is dominated by the per-instance work
+rather than by the attributes' values.
+
+Usage: python jelly.py [instances]
+"""
+
+import sys, time
+
+from twisted.spread import pb
+
+
+
+class Point(pb.Copyable):
+    """
+    A small copyable object.
+    """
+    def __init__(self, x, y, label):
+        self.x = x
+        self.y = y
+        self.label = label
+
+
+
+class RemotePoint(pb.RemoteCopy):
+    """
+    The copy of a L{Point} on the receiving side.
+    """
+
+pb.setUnjellyableForClass(Point, RemotePoint)
+
+
+
+def benchmark(instances):
+    broker = pb.Broker()
+    points = [Point(i, -i, 'point') for i in xrange(instances)]
+
+    before = time.time()
+    sexp = broker.serialize(points)
+    elapsed = time.time() - before
+    print 'jelly:   %10.1f instances/sec' % (instances / elapsed,)
+
+    before = time.time()
+    copies = broker.unserialize(sexp)
+    elapsed = time.time() - before
+    print 'unjelly: %10.1f instances/sec' % (instances / elapsed,)
+    assert copies[-1].x == instances - 1
+
+
+
+def main(args):
+    instances = 100000
+    if args:
+        instances = int(args[0])
+    benchmark(instances)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
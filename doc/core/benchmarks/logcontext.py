@@ -0,0 +1,99 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark the number of I/O events per second dispatched by the select, poll
+and epoll reactors, with and without C{lazyLogContext}.
+
+Each run registers a number of pipes whose read ends always have data
+waiting.  The readers never consume it, so every iteration of the reactor
+dispatches one event per pipe and the measurement is dominated by the
+reactor's own per-event overhead.
+
+Usage: python logcontext.py [number of pipes [iterations]]
+"""
+
+import os, sys, time
+
+from twisted.internet import selectreactor, pollreactor
+try:
+    from twisted.internet import epollreactor
+except ImportError:
+    epollreactor = None
+
+
+
+class Reader(object):
+    """
+    A reader which counts how often it is told to read and leaves the data
+    where it is.
+    """
+    def __init__(self, fd):
+        self.fd = fd
+        self.reads = 0
+
+
+    def fileno(self):
+        return self.fd
+
+
+    def logPrefix(self):
+        return 'Reader'
+
+
+    def doRead(self):
+        self.reads += 1
+
+
+    def connectionLost(self, reason):
+        pass
+
+
+
+def benchmark(reactorType, lazy, pipes, iterations):
+    reactor = reactorType()
+    reactor.lazyLogContext = lazy
+    readers = []
+    fds = []
+    for i in range(pipes):
+        r, w = os.pipe()
+        os.write(w, 'x')
+        fds.extend((r, w))
+        reader = Reader(r)
+        readers.append(reader)
+        reactor.addReader(reader)
+
+    try:
+        before = time.time()
+        for i in xrange(iterations):
+            reactor.doIteration(0)
+        elapsed = time.time() - before
+    finally:
+        for reader in readers:
+            reactor.removeReader(reader)
+        for fd in fds:
+            os.close(fd)
+
+    events = sum([reader.reads for reader in readers])
+    print '%-15s lazyLogContext: %-5s' % (reactorType.__name__, lazy),
+    print 'events/sec: %12.1f' % (events / elapsed,)
+
+
+
+def main(args):
+    pipes = 100
+    iterations = 2000
+    if args:
+        pipes = int(args[0])
+    if args[1:]:
+        iterations = int(args[1])
+    reactorTypes = [selectreactor.SelectReactor, pollreactor.PollReactor]
+    if epollreactor is not None:
+        reactorTypes.append(epollreactor.EPollReactor)
+    for reactorType in reactorTypes:
+        for lazy in False, True:
+            benchmark(reactorType, lazy, pipes, iterations)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
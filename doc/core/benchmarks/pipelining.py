@@ -0,0 +1,126 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark the number of pipelined HTTP requests per second served by
+L{twisted.web.server.Site} for a resource whose responses are produced
+asynchronously.
+
+A load generator opens a number of persistent connections and keeps a fixed
+number of I{GET} requests in flight on each, sending another as each response
+arrives.  The resource finishes each response after a short delay, as a
+resource backed by a L{Deferred} would.  Since pipelined requests are
+processed concurrently, throughput grows with the pipeline depth until it
+reaches the server's C{maxPipelineDepth}.
+
+Usage: python pipelining.py [seconds per run [render delay in seconds]]
+"""
+
+import sys, time
+
+from twisted.internet import reactor, protocol
+from twisted.web import server, resource
+
+CONNECTIONS = 10
+MAX_PIPELINE_DEPTH = 16
+
+REQUEST = 'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n'
+STATUS = 'HTTP/1.1 200 OK'
+
+
+
+class Delayed(resource.Resource):
+    """
+    A resource which responds after C{delay} seconds.
+    """
+    isLeaf = True
+
+    def __init__(self, delay):
+        resource.Resource.__init__(self)
+        self.delay = delay
+
+
+    def render_GET(self, request):
+        def respond():
+            request.write('x' * 64)
+            request.finish()
+        call = reactor.callLater(self.delay, respond)
+        # The load generator disconnects with requests still outstanding.
+        request.notifyFinish().addErrback(lambda reason: call.cancel())
+        return server.NOT_DONE_YET
+
+
+
+class PipeliningClient(protocol.Protocol):
+    """
+    Keep C{factory.depth} requests in flight, counting responses.
+    """
+    buffer = ''
+
+    def connectionMade(self):
+        self.transport.write(REQUEST * self.factory.depth)
+
+
+    def dataReceived(self, data):
+        # Only the status line of each response needs to be recognized.
+        # Keep enough of the tail to find one split across reads.
+        data = self.buffer + data
+        responses = data.count(STATUS)
+        self.buffer = data[-len(STATUS):]
+        if self.buffer.startswith(STATUS):
+            self.buffer = ''
+        if responses:
+            self.factory.responses += responses
+            self.transport.write(REQUEST * responses)
+
+
+
+class PipeliningFactory(protocol.ClientFactory):
+    protocol = PipeliningClient
+    responses = 0
+
+    def __init__(self, depth):
+        self.depth = depth
+
+
+
+def benchmark(port, depth, duration):
+    factory = PipeliningFactory(depth)
+    connectors = [
+        reactor.connectTCP('127.0.0.1', port.getHost().port, factory)
+        for i in range(CONNECTIONS)]
+    # Let the connections get established before measuring.
+    start = time.time() + 0.5
+    end = start + duration
+    while time.time() < start:
+        reactor.iterate(0.01)
+    before = factory.responses
+    while time.time() < end:
+        reactor.iterate(0.01)
+    count = factory.responses - before
+    for connector in connectors:
+        connector.disconnect()
+    for i in range(10):
+        reactor.iterate(0.01)
+    print 'pipeline depth: %3d' % (depth,),
+    print 'requests/sec: %10.1f' % (count / float(duration),)
+
+
+
+def main(args):
+    duration = 5
+    delay = 0.01
+    if args:
+        duration = float(args[0])
+    if args[1:]:
+        delay = float(args[1])
+    site = server.Site(Delayed(delay))
+    site.maxPipelineDepth = MAX_PIPELINE_DEPTH
+    port = reactor.listenTCP(0, site, interface='127.0.0.1')
+    for depth in 1, 2, 4, 8, 16:
+        benchmark(port, depth, duration)
+    port.stopListening()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
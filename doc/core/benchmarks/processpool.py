@@ -0,0 +1,64 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark running a CPU-bound function with L{threads.deferToThread} and
+with L{processpool.deferToProcessPool}.
+
+The function, C{sum(xrange(n))}, is called a number of times with all the
+calls outstanding at once, and the number of calls per second is reported.
+Threads cannot run it in parallel because of the global interpreter lock;
+worker processes can, one per processor.
+
+Usage: python processpool.py [calls] [n]
+"""
+
+import sys, time
+
+from twisted.python import log
+from twisted.internet import reactor, defer, threads, processpool
+
+
+def timeCalls(name, calls, deferToWorker):
+    before = time.time()
+    d = defer.gatherResults([deferToWorker() for i in xrange(calls)])
+    def finished(results):
+        elapsed = time.time() - before
+        print '%-18s %10.1f calls/sec' % (name, calls / elapsed)
+    return d.addCallback(finished)
+
+
+
+@defer.inlineCallbacks
+def benchmark(calls, n):
+    yield timeCalls('deferToThread', calls,
+                    lambda: threads.deferToThread(sum, xrange(n)))
+
+    pool = processpool.ProcessPool()
+    pool.start()
+    # Start the worker processes before timing.
+    yield defer.gatherResults([
+        processpool.deferToProcessPool(pool, sum, xrange(0))
+        for i in xrange(pool.maxProcesses)])
+    yield timeCalls(
+        'deferToProcessPool', calls,
+        lambda: processpool.deferToProcessPool(pool, sum, xrange(n)))
+    yield pool.stop()
+
+
+
+def main(args):
+    calls = 200
+    n = 200000
+    if args:
+        calls = int(args[0])
+    if args[1:]:
+        n = int(args[1])
+    d = benchmark(calls, n)
+    d.addErrback(log.err)
+    d.addBoth(lambda ignored: reactor.stop())
+    reactor.run()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
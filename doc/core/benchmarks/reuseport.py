@@ -0,0 +1,114 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark the number of TCP connections per second served by one to N
+processes which all listen on the same port with C{SO_REUSEPORT}.
+
+Each server process runs a reactor listening with C{reusePort} set, the way
+each worker started by C{twistd --workers} does.  Every connection is answered
+with a short response and closed.  Client processes using blocking sockets
+open connections as quickly as they can for a fixed period.
+
+Usage: python reuseport.py [maximum number of servers [seconds per run]]
+"""
+
+import os, sys, time, socket, signal, subprocess, multiprocessing
+
+PORT = 18765
+CLIENTS = 8
+
+
+
+def server(port):
+    """
+    Serve connections on C{port} until killed.
+    """
+    from twisted.internet import protocol, reactor
+
+    class Respond(protocol.Protocol):
+        def connectionMade(self):
+            self.transport.write('x' * 64)
+            self.transport.loseConnection()
+
+    factory = protocol.ServerFactory()
+    factory.protocol = Respond
+    reactor.listenTCP(port, factory, interface='127.0.0.1', reusePort=True)
+    reactor.run()
+
+
+
+def client((port, duration)):
+    """
+    Open connections to C{port} for C{duration} seconds and return how many
+    were served.
+    """
+    count = 0
+    end = time.time() + duration
+    while time.time() < end:
+        s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, '\x01\0\0\0\0\0\0\0')
+        try:
+            s.connect(('127.0.0.1', port))
+            while s.recv(4096):
+                pass
+        except socket.error:
+            pass
+        else:
+            count += 1
+        s.close()
+    return count
+
+
+
+def waitForServer(port):
+    while True:
+        s = socket.socket()
+        try:
+            s.connect(('127.0.0.1', port))
+        except socket.error:
+            time.sleep(0.1)
+        else:
+            s.close()
+            return
+
+
+
+def benchmark(servers, duration):
+    processes = [
+        subprocess.Popen([sys.executable, __file__, 'server', str(PORT)])
+        for i in range(servers)]
+    try:
+        waitForServer(PORT)
+        # Give the last of the servers time to start listening as well.
+        time.sleep(1)
+        pool = multiprocessing.Pool(CLIENTS)
+        try:
+            counts = pool.map(client, [(PORT, duration)] * CLIENTS)
+        finally:
+            pool.terminate()
+    finally:
+        for process in processes:
+            os.kill(process.pid, signal.SIGTERM)
+            process.wait()
+    print 'servers: %3d' % (servers,),
+    print 'connections/sec: %10.1f' % (sum(counts) / float(duration),)
+
+
+
+def main(args):
+    if args[:1] == ['server']:
+        server(int(args[1]))
+        return
+    maximum = multiprocessing.cpu_count()
+    duration = 5
+    if args:
+        maximum = int(args[0])
+    if args[1:]:
+        duration = float(args[1])
+    for servers in range(1, maximum + 1):
+        benchmark(servers, duration)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
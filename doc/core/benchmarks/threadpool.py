@@ -0,0 +1,73 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark L{threadpool.ThreadPool} against L{threadpool.AdaptiveThreadPool}
+on a burst of short tasks and on a burst of tasks which block briefly.
+
+For each pool and workload, the number of tasks per second, the number of
+threads the pool started and, for the adaptive pool, the mean time tasks
+waited for a thread are reported.
+
+Usage: python threadpool.py [tasks]
+"""
+
+import sys, time, threading
+
+from twisted.python import threadpool
+
+
+def short():
+    pass
+
+
+def blocking():
+    time.sleep(0.001)
+
+
+def run(pool, tasks, function):
+    done = threading.Event()
+    finished = [0]
+    lock = threading.Lock()
+    def onResult(success, result):
+        lock.acquire()
+        finished[0] += 1
+        if finished[0] == tasks:
+            done.set()
+        lock.release()
+
+    pool.start()
+    before = time.time()
+    for i in xrange(tasks):
+        pool.callInThreadWithCallback(onResult, function)
+    done.wait()
+    elapsed = time.time() - before
+    started = pool.workers
+    pool.stop()
+    return tasks / elapsed, started
+
+
+def benchmark(tasks):
+    for function, count in [(short, tasks), (blocking, tasks // 10)]:
+        for poolClass in threadpool.ThreadPool, threadpool.AdaptiveThreadPool:
+            pool = poolClass(0, 20)
+            rate, started = run(pool, count, function)
+            line = '%-18s %-8s %10.1f tasks/sec, %2d threads' % (
+                poolClass.__name__, function.__name__, rate, started)
+            if poolClass is threadpool.AdaptiveThreadPool:
+                stats = pool.stats()
+                line += ', %.2f ms mean wait' % (
+                    stats.waitTimes.total / stats.completed * 1000,)
+            print line
+
+
+
+def main(args):
+    tasks = 50000
+    if args:
+        tasks = int(args[0])
+    benchmark(tasks)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
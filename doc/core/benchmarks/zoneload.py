@@ -0,0 +1,77 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmark how long L{BindAuthority} takes to load a large reverse zone and
+how many queries per second it can then answer from it.
+
+The zone is written to a temporary file as a I{SOA} record, two I{NS}
+records and one I{PTR} record for each address in a number of /24
+networks.  Queries are made for I{PTR} records which exist.
+
+Usage: python zoneload.py [number of /24 networks]
+"""
+
+import sys, os, time, tempfile
+
+from twisted.names import authority
+
+ORIGIN = '10.in-addr.arpa'
+
+
+def writeZone(path, networks):
+    f = open(path, 'w')
+    f.write('$TTL 1D\n')
+    f.write('@ IN SOA ns1.example.com. hostmaster.example.com. (\n')
+    f.write('    2010010101 ; serial\n')
+    f.write('    3H 15M 1W 1D )\n')
+    f.write('  IN NS ns1.example.com.\n')
+    f.write('  IN NS ns2.example.com.\n')
+    for network in xrange(networks):
+        for host in xrange(256):
+            f.write('%d.%d.%d.%s. IN PTR host-%d-%d-%d.example.com.\n' % (
+                host, network % 256, network // 256, ORIGIN,
+                network // 256, network % 256, host))
+    f.close()
+
+
+
+def benchmark(networks):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, ORIGIN)
+    try:
+        writeZone(path, networks)
+        records = networks * 256
+
+        before = time.time()
+        zone = authority.BindAuthority(path)
+        elapsed = time.time() - before
+        print 'load %d records: %8.2f seconds, %10.1f records/sec' % (
+            records, elapsed, records / elapsed)
+
+        names = ['%d.%d.%d.%s' % (host, network % 256, network // 256,
+                                  ORIGIN)
+                 for network in xrange(networks)
+                 for host in xrange(0, 256, 7)]
+        before = time.time()
+        for name in names:
+            zone.lookupPointer(name)
+        elapsed = time.time() - before
+        print 'lookup:                             %10.1f queries/sec' % (
+            len(names) / elapsed,)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rmdir(directory)
+
+
+
+def main(args):
+    networks = 100
+    if args:
+        networks = int(args[0])
+    benchmark(networks)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -6,10 +6,11 @@
 An asynchronous mapping to U{DB-API 2.0<http://www.python.org/topics/database/DatabaseAPI-2.0.html>}.
 """
 
-import sys
+import sys, time
 
-from twisted.internet import threads
+from twisted.internet import threads, defer, task
 from twisted.python import reflect, log
+from twisted.python.threadpool import TimeHistogram
 from twisted.python.deprecate import deprecated
 from twisted.python.versions import Version
 
@@ -23,6 +24,63 @@ class ConnectionLost(Exception):
 
 
 
+class ConnectionPoolOverloaded(Exception):
+    """
+    This exception means that an interaction was not run because as many as
+    the pool allows are already waiting for a connection.  Client code may
+    try again later.
+    """
+
+
+
+class ConnectionPoolStats(object):
+    """
+    A snapshot of the state and history of a L{ConnectionPool}.
+
+    @ivar connections: The number of open connections.
+    @ivar busy: The number of connections in use by an interaction.
+    @ivar waiting: The number of interactions waiting for a connection.
+    @ivar maxWaiting: The greatest number of interactions which have been
+        waiting for a connection at once.
+    @ivar completed: The number of interactions which have run.
+    @ivar rejected: The number of interactions which were not run because
+        too many were waiting, and failed with L{ConnectionPoolOverloaded}.
+    @ivar opened: The number of connections which have been opened.
+    @ivar recycled: The number of connections which have been closed and
+        replaced for being older than C{cp_max_age} or used C{cp_max_uses}
+        times.
+
+    @ivar acquireTimes: The times interactions waited for a connection.
+    @type acquireTimes: L{TimeHistogram}
+    @ivar checkoutTimes: The times interactions held their connection.
+    @type checkoutTimes: L{TimeHistogram}
+    """
+    def __init__(self):
+        self.connections = self.busy = self.waiting = self.maxWaiting = 0
+        self.completed = self.rejected = self.opened = self.recycled = 0
+        self.acquireTimes = TimeHistogram()
+        self.checkoutTimes = TimeHistogram()
+
+
+    def copy(self):
+        """
+        Return a copy of these statistics.
+        """
+        other = ConnectionPoolStats()
+        other.__dict__.update(self.__dict__)
+        other.acquireTimes = self.acquireTimes.copy()
+        other.checkoutTimes = self.checkoutTimes.copy()
+        return other
+
+
+    def __repr__(self):
+        return ('<ConnectionPoolStats connections=%d busy=%d waiting=%d '
+                'maxWaiting=%d completed=%d rejected=%d>' % (
+                    self.connections, self.busy, self.waiting,
+                    self.maxWaiting, self.completed, self.rejected))
+
+
+
 class Connection(object):
     """
     A wrapper for a DB-API connection instance.
@@ -54,6 +112,10 @@ class Connection(object):
 
         try:
             self._connection.rollback()
+            if self._pool.check_interval is not None:
+                # The pool checks the connection in the background.
+                self._pool._unverified.add(self._pool.threadID())
+                return
             curs = self._connection.cursor()
             curs.execute(self._pool.good_sql)
             curs.close()
@@ -125,6 +187,90 @@ class Transaction:
         return getattr(self._cursor, name)
 
 
+
+class _StatementCache(object):
+    """
+    The cursors of a database connection, each kept for executing one SQL
+    statement.
+
+    DB-API 2.0 allows a module to optimize executing the same operation
+    again on a cursor, so reusing a cursor for its statement lets modules
+    which can avoid preparing the statement each time it is executed.
+
+    @ivar connection: The DB-API connection the cursors belong to.
+    @ivar size: The greatest number of cursors kept; the least recently used
+        is closed to make room for another.
+    @ivar _cursors: A C{dict} mapping statements to their cursors.
+    @ivar _order: The statements in C{_cursors}, least recently used first.
+    """
+
+    def __init__(self, connection, size):
+        self.connection = connection
+        self.size = size
+        self._cursors = {}
+        self._order = []
+
+
+    def cursor(self, sql):
+        """
+        Return the cursor for C{sql}, opening one if there is none.
+        """
+        cursor = self._cursors.get(sql)
+        if cursor is None:
+            if len(self._order) >= self.size:
+                self._close(self._cursors.pop(self._order.pop(0)))
+            cursor = self._cursors[sql] = self.connection.cursor()
+        elif self._order[-1] == sql:
+            return cursor
+        else:
+            self._order.remove(sql)
+        self._order.append(sql)
+        return cursor
+
+
+    def clear(self):
+        """
+        Close all the cursors.
+        """
+        for cursor in self._cursors.values():
+            self._close(cursor)
+        self._cursors.clear()
+        del self._order[:]
+
+
+    def _close(self, cursor):
+        try:
+            cursor.close()
+        except:
+            log.err(None, "Cursor close failed")
+
+
+
+def _groupOperations(operations):
+    """
+    Group the operations of a batch for L{ConnectionPool._runBatch}.
+
+    @param operations: A C{list} of C{(sql,)} or C{(sql, params)} tuples, as
+        passed to L{ConnectionPool.runOperation}.
+
+    @return: A C{list} of C{(sql, paramsList)} tuples, in the order of the
+        operations, where each C{paramsList} holds the parameters of
+        consecutive operations with the same statement, to be executed with
+        C{executemany}, or is C{None} for an operation without parameters.
+    """
+    groups = []
+    for operation in operations:
+        sql = operation[0]
+        if len(operation) == 1:
+            groups.append((sql, None))
+        elif groups and groups[-1][0] == sql and groups[-1][1] is not None:
+            groups[-1][1].append(operation[1])
+        else:
+            groups.append((sql, [operation[1]]))
+    return groups
+
+
+
 class ConnectionPool:
     """
     Represent a pool of connections to a DB-API 2.0 compliant database.
@@ -141,11 +287,32 @@ class ConnectionPool:
         reactor stops.
 
     @ivar _reactor: The reactor which will be used to schedule startup and
-        shutdown events.
-    @type _reactor: L{IReactorCore} provider
+        shutdown events, batches and connection checks.
+    @type _reactor: L{IReactorCore} and L{IReactorTime} provider
+
+    @ivar _batch: The C{(args, deferred)} tuples of the operations waiting
+        to be run in the next batch.
+    @ivar _batchCall: C{None} or the delayed call which runs the next batch.
+    @ivar _statements: A C{dict} mapping thread IDs to the
+        L{_StatementCache} of their connection.
+    @ivar _active: The IDs of the threads whose connection has been used
+        since the last connection check.
+    @ivar _unverified: The IDs of the threads whose connection was rolled
+        back and not checked since.
+    @ivar _checkCall: C{None} or the L{task.LoopingCall} which checks the
+        connections.
+    @ivar _lifetimes: A C{dict} mapping thread IDs to a C{[opened, uses]}
+        list for their connection: the time it was opened and the number of
+        interactions which have used it.
+    @ivar _stats: The L{ConnectionPoolStats} of the pool, but for the
+        C{connections} count.
+    @ivar _statsLock: The lock which must be held to change C{_stats}, which
+        threadpool threads and the reactor thread both change.
     """
 
-    CP_ARGS = "min max name noisy openfun reconnect good_sql".split()
+    CP_ARGS = ("min max name noisy openfun reconnect good_sql batch_interval "
+               "batch_size statement_cache check_interval max_waiting max_age "
+               "max_uses").split()
 
     noisy = False # if true, generate informational log messages
     min = 3 # minimum number of connections in pool
@@ -154,6 +321,13 @@ class ConnectionPool:
     openfun = None # A function to call on new connections
     reconnect = False # reconnect when connections fail
     good_sql = 'select 1' # a query which should always succeed
+    batch_interval = None # seconds to gather operations in a batch
+    batch_size = 100 # maximum number of operations in a batch
+    statement_cache = 0 # number of statements to cache per connection
+    check_interval = None # seconds between background connection checks
+    max_waiting = None # maximum number of interactions waiting
+    max_age = None # seconds after which a connection is replaced
+    max_uses = None # interactions after which a connection is replaced
 
     running = False # true when the pool is operating
     connectionFactory = Connection
@@ -162,6 +336,9 @@ class ConnectionPool:
     # Initialize this to None so it's available in close() even if start()
     # never runs.
     shutdownID = None
+    _batchCall = None
+    _checkCall = None
+    _time = staticmethod(time.time)
 
     def __init__(self, dbapiName, *connargs, **connkw):
         """Create a new ConnectionPool.
@@ -194,6 +371,38 @@ class ConnectionPool:
         @param cp_good_sql: an sql query which should always succeed and change
                             no state (default 'select 1')
 
+        @param cp_batch_interval: if not C{None}, gather the operations
+            passed to L{runOperation} for this many seconds and run them in
+            one transaction (default C{None}).
+
+        @param cp_batch_size: run a batch as soon as it holds this many
+            operations (default 100).
+
+        @param cp_statement_cache: the number of statements for which each
+            connection keeps a cursor to reuse in L{runQuery},
+            L{runOperation} and batches (default 0, which disables it).
+
+        @param cp_check_interval: if not C{None} and C{cp_reconnect} is
+            set, check connections with C{cp_good_sql} every this many
+            seconds in the background, rather than after each rollback.
+            Connections which have been rolled back or not used since the
+            last check are checked (default C{None}).
+
+        @param cp_max_waiting: if not C{None}, the greatest number of
+            interactions which may wait for a connection.  Once that many
+            are waiting, further ones fail at once with
+            L{ConnectionPoolOverloaded} rather than add to the delay of
+            those after them.  Operations waiting for a batch count
+            towards this limit (default C{None}).
+
+        @param cp_max_age: if not C{None}, close and replace connections
+            which have been open for this many seconds, when they are next
+            used (default C{None}).
+
+        @param cp_max_uses: if not C{None}, close and replace connections
+            which have been used by this many interactions (default
+            C{None}).
+
         @param cp_reactor: use this reactor instead of the global reactor
             (added in Twisted 10.2).
         @type cp_reactor: L{IReactorCore} provider
@@ -226,12 +435,19 @@ class ConnectionPool:
         self.max = max(self.min, self.max)
 
         self.connections = {}  # all connections, hashed on thread id
+        self._statements = {}
+        self._active = set()
+        self._unverified = set()
+        self._batch = []
+        self._lifetimes = {}
+        self._stats = ConnectionPoolStats()
 
         # these are optional so import them here
         from twisted.python import threadpool
         import thread
 
         self.threadID = thread.get_ident
+        self._statsLock = thread.allocate_lock()
         self.threadpool = threadpool.ThreadPool(self.min, self.max)
         self.startID = self._reactor.callWhenRunning(self._start)
 
@@ -253,6 +469,10 @@ class ConnectionPool:
             self.shutdownID = self._reactor.addSystemEventTrigger(
                 'during', 'shutdown', self.finalClose)
             self.running = True
+            if self.reconnect and self.check_interval is not None:
+                self._checkCall = task.LoopingCall(self._checkConnections)
+                self._checkCall.clock = self._reactor
+                self._checkCall.start(self.check_interval, now=False)
 
 
     def runWithConnection(self, func, *args, **kw):
@@ -276,10 +496,7 @@ class ConnectionPool:
         @return: a Deferred which will fire the return value of
             C{func(Transaction(...), *args, **kw)}, or a Failure.
         """
-        from twisted.internet import reactor
-        return threads.deferToThreadPool(reactor, self.threadpool,
-                                         self._runWithConnection,
-                                         func, *args, **kw)
+        return self._deferToThread(self._runWithConnection, func, *args, **kw)
 
 
     def _runWithConnection(self, func, *args, **kw):
@@ -326,10 +543,94 @@ class ConnectionPool:
         @return: a Deferred which will fire the return value of
             'interaction(Transaction(...), *args, **kw)', or a Failure.
         """
+        return self._deferToThread(self._runInteraction,
+                                   interaction, *args, **kw)
+
+
+    def _deferToThread(self, f, *args, **kw):
+        """
+        Call C{f} in a threadpool thread, timing how long it waits and runs
+        for the pool's statistics, unless C{max_waiting} calls are already
+        waiting.
+
+        @return: a Deferred which will fire the return value of C{f}, or a
+            Failure, which is a L{ConnectionPoolOverloaded} if C{f} was not
+            called.
+        """
+        stats = self._stats
+        self._statsLock.acquire()
+        try:
+            overloaded = self._checkWaiting(0)
+            if overloaded is not None:
+                return overloaded
+            stats.waiting += 1
+            if stats.waiting > stats.maxWaiting:
+                stats.maxWaiting = stats.waiting
+        finally:
+            self._statsLock.release()
         from twisted.internet import reactor
         return threads.deferToThreadPool(reactor, self.threadpool,
-                                         self._runInteraction,
-                                         interaction, *args, **kw)
+                                         self._timed, self._time(),
+                                         f, *args, **kw)
+
+
+    def _checkWaiting(self, pending):
+        """
+        Check that fewer than C{max_waiting} interactions, counting
+        C{pending} more, are waiting for a connection.  Must be called with
+        C{_statsLock} held.
+
+        @return: C{None}, or, counting it as rejected, a Deferred which has
+            failed with L{ConnectionPoolOverloaded}.
+        """
+        stats = self._stats
+        waiting = stats.waiting + pending
+        if self.max_waiting is not None and waiting >= self.max_waiting:
+            stats.rejected += 1
+            return defer.fail(ConnectionPoolOverloaded(
+                "%d interactions are waiting for a connection" % (waiting,)))
+        return None
+
+
+    def _timed(self, queued, f, *args, **kw):
+        """
+        Call C{f} and count the time since C{queued} and the time it took in
+        the pool's statistics.
+        """
+        stats = self._stats
+        started = self._time()
+        self._statsLock.acquire()
+        stats.waiting -= 1
+        stats.busy += 1
+        self._statsLock.release()
+        try:
+            return f(*args, **kw)
+        finally:
+            finished = self._time()
+            waited = started - queued
+            ran = finished - started
+            self._statsLock.acquire()
+            stats.busy -= 1
+            stats.completed += 1
+            stats.acquireTimes.add(waited)
+            stats.checkoutTimes.add(ran)
+            self._statsLock.release()
+
+
+    def stats(self):
+        """
+        Return the state of the pool and the counts of the interactions it
+        has run.
+
+        @rtype: L{ConnectionPoolStats}
+        """
+        self._statsLock.acquire()
+        try:
+            result = self._stats.copy()
+        finally:
+            self._statsLock.release()
+        result.connections = len(self.connections)
+        return result
 
 
     def runQuery(self, *args, **kw):
@@ -349,6 +650,9 @@ class ConnectionPool:
         @return: a Deferred which will fire the return value of a DB-API
         cursor's 'fetchall' method, or a Failure.
         """
+        if self.statement_cache:
+            return self.runWithConnection(self._runStatement, True,
+                                          *args, **kw)
         return self.runInteraction(self._runQuery, *args, **kw)
 
 
@@ -366,11 +670,83 @@ class ConnectionPool:
         The args and kw arguments will be passed to the DB-API cursor's
         'execute' method.
 
+        If C{cp_batch_interval} is set, operations without keyword arguments
+        are gathered and run in one transaction, consecutive operations with
+        the same statement in one call to the DB-API cursor's
+        'executemany' method.  If the batch fails, its operations are run
+        again one at a time, so only those which fail by themselves return
+        a Failure.  If the pool has been closed by then, they all return the
+        batch's Failure.
+
+        Batched operations are not ordered with other calls: an operation
+        may run after a C{runQuery} or C{runInteraction} made later on the
+        same pool, so such a query may not see its effects.  Wait for the
+        operation's Deferred before relying on them.
+
         return: a Deferred which will fire None or a Failure.
         """
+        if self.batch_interval is not None and not kw:
+            return self._batchOperation(args)
+        if self.statement_cache:
+            return self.runWithConnection(self._runStatement, False,
+                                          *args, **kw)
         return self.runInteraction(self._runOperation, *args, **kw)
 
 
+    def _batchOperation(self, args):
+        """
+        Add an operation to the next batch, unless C{max_waiting}
+        interactions and operations are already waiting.
+        """
+        self._statsLock.acquire()
+        try:
+            overloaded = self._checkWaiting(len(self._batch))
+        finally:
+            self._statsLock.release()
+        if overloaded is not None:
+            return overloaded
+        d = defer.Deferred()
+        self._batch.append((args, d))
+        if len(self._batch) >= self.batch_size:
+            self._runBatchNow()
+        elif self._batchCall is None:
+            self._batchCall = self._reactor.callLater(
+                self.batch_interval, self._runBatchNow)
+        return d
+
+
+    def _runBatchNow(self):
+        """
+        Run the operations gathered for the next batch in one transaction.
+        """
+        if self._batchCall is not None:
+            if self._batchCall.active():
+                self._batchCall.cancel()
+            self._batchCall = None
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+
+        def cbBatch(ignored):
+            for args, d in batch:
+                d.callback(None)
+
+        def ebBatch(reason):
+            if (len(batch) == 1 or reason.check(ConnectionPoolOverloaded) or
+                not self.running):
+                # Running the operations again would not help, or, once the
+                # pool is closed, never finish.
+                for args, d in batch:
+                    d.errback(reason)
+                return
+            for args, d in batch:
+                self.runInteraction(self._runOperation, *args).chainDeferred(d)
+
+        d = self.runWithConnection(
+            self._runBatch, _groupOperations([args for args, d in batch]))
+        d.addCallbacks(cbBatch, ebBatch)
+
+
     def close(self):
         """
         Close all pool connections and shutdown the pool.
@@ -387,11 +763,19 @@ class ConnectionPool:
         """This should only be called by the shutdown trigger."""
 
         self.shutdownID = None
+        if self._checkCall is not None:
+            self._checkCall.stop()
+            self._checkCall = None
+        self._runBatchNow()
         self.threadpool.stop()
         self.running = False
+        for cache in self._statements.values():
+            cache.clear()
+        self._statements.clear()
         for conn in self.connections.values():
             self._close(conn)
         self.connections.clear()
+        self._lifetimes.clear()
 
     def connect(self):
         """Return a database connection when one becomes available.
@@ -406,6 +790,12 @@ class ConnectionPool:
 
         tid = self.threadID()
         conn = self.connections.get(tid)
+        if conn is not None and self._expired(tid):
+            if self.noisy:
+                log.msg('adbapi recycling connection: %s' % (self.dbapiName,))
+            self.disconnect(conn)
+            conn = None
+            self._count('recycled')
         if conn is None:
             if self.noisy:
                 log.msg('adbapi connecting: %s %s%s' % (self.dbapiName,
@@ -415,8 +805,33 @@ class ConnectionPool:
             if self.openfun != None:
                 self.openfun(conn)
             self.connections[tid] = conn
+            self._lifetimes[tid] = [self._time(), 0]
+            self._count('opened')
+        self._lifetimes[tid][1] += 1
+        self._active.add(tid)
         return conn
 
+
+    def _expired(self, tid):
+        """
+        Return C{True} if the connection of the thread C{tid} is older than
+        C{max_age} or has been used C{max_uses} times.
+        """
+        opened, uses = self._lifetimes[tid]
+        return ((self.max_uses is not None and uses >= self.max_uses) or
+                (self.max_age is not None and
+                 self._time() - opened >= self.max_age))
+
+
+    def _count(self, name):
+        """
+        Add one to the count C{name} of the pool's statistics.
+        """
+        self._statsLock.acquire()
+        setattr(self._stats, name, getattr(self._stats, name) + 1)
+        self._statsLock.release()
+
+
     def disconnect(self, conn):
         """Disconnect a database connection associated with this pool.
 
@@ -428,6 +843,11 @@ class ConnectionPool:
         if conn is not self.connections.get(tid):
             raise Exception("wrong connection for thread")
         if conn is not None:
+            cache = self._statements.pop(tid, None)
+            if cache is not None:
+                cache.clear()
+            self._unverified.discard(tid)
+            self._lifetimes.pop(tid, None)
             self._close(conn)
             del self.connections[tid]
 
@@ -465,6 +885,86 @@ class ConnectionPool:
     def _runOperation(self, trans, *args, **kw):
         trans.execute(*args, **kw)
 
+
+    def _statementCursor(self, conn, sql):
+        """
+        Return the cursor to execute C{sql} with on the connection of the
+        current thread, from its L{_StatementCache}.
+
+        @param conn: The L{Connection} of the current thread.
+        """
+        tid = self.threadID()
+        cache = self._statements.get(tid)
+        if cache is None or cache.connection is not conn._connection:
+            cache = _StatementCache(conn._connection, self.statement_cache)
+            self._statements[tid] = cache
+        return cache.cursor(sql)
+
+
+    def _runStatement(self, conn, fetch, sql, *args, **kw):
+        cursor = self._statementCursor(conn, sql)
+        cursor.execute(sql, *args, **kw)
+        if fetch:
+            return cursor.fetchall()
+
+
+    def _runBatch(self, conn, groups):
+        """
+        Execute the operations of a batch, grouped by L{_groupOperations}.
+        """
+        cursor = None
+        try:
+            for sql, paramsList in groups:
+                if self.statement_cache:
+                    cursor = self._statementCursor(conn, sql)
+                elif cursor is None:
+                    cursor = conn.cursor()
+                if paramsList is None:
+                    cursor.execute(sql)
+                else:
+                    cursor.executemany(sql, paramsList)
+        finally:
+            if cursor is not None and not self.statement_cache:
+                cursor.close()
+
+
+    def _checkConnections(self):
+        """
+        Check the connections in the threadpool's threads.  There is no way
+        to run a function in a particular thread, so as many checks are
+        started as there are connections.
+        """
+        for i in xrange(len(self.connections)):
+            self.threadpool.callInThread(self._checkConnection)
+
+
+    def _checkConnection(self):
+        """
+        Check the connection of the current thread with C{good_sql}, unless
+        it has been used since the last check without being rolled back.
+        If the check fails, disconnect it, to reconnect when it is next
+        needed.
+        """
+        tid = self.threadID()
+        conn = self.connections.get(tid)
+        if conn is None:
+            return
+        if tid in self._active and tid not in self._unverified:
+            self._active.discard(tid)
+            return
+        self._active.discard(tid)
+        self._unverified.discard(tid)
+        try:
+            curs = conn.cursor()
+            curs.execute(self.good_sql)
+            curs.close()
+            conn.commit()
+        except:
+            log.err(None, "Connection check failed")
+            if self.noisy:
+                log.msg("Connection lost.")
+            self.disconnect(conn)
+
     def __getstate__(self):
         return {'dbapiName': self.dbapiName,
                 'min': self.min,
@@ -472,6 +972,13 @@ class ConnectionPool:
                 'noisy': self.noisy,
                 'reconnect': self.reconnect,
                 'good_sql': self.good_sql,
+                'batch_interval': self.batch_interval,
+                'batch_size': self.batch_size,
+                'statement_cache': self.statement_cache,
+                'check_interval': self.check_interval,
+                'max_waiting': self.max_waiting,
+                'max_age': self.max_age,
+                'max_uses': self.max_uses,
                 'connargs': self.connargs,
                 'connkw': self.connkw}
 
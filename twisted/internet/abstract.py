@@ -113,12 +113,19 @@ class FileDescriptor(_ConsumerMixin):
     This is an abstract superclass of all objects which may be notified when
     they are readable or writable; e.g. they have a file-descriptor that is
     valid to be passed to select(2).
+
+    @ivar _vectorWrites: A flag indicating whether L{doWrite} should hand
+        buffered chunks to L{writeSomeDataVector} as they are, rather than
+        joining them into one string for L{writeSomeData}.  Subclasses which
+        implement L{writeSomeDataVector} set this.
+    @type _vectorWrites: C{bool}
     """
     connected = 0
     disconnected = 0
     disconnecting = 0
     _writeDisconnecting = False
     _writeDisconnected = False
+    _vectorWrites = False
     dataBuffer = ""
     offset = 0
 
@@ -174,6 +181,21 @@ class FileDescriptor(_ConsumerMixin):
                                   reflect.qual(self.__class__))
 
 
+    def writeSomeDataVector(self, vector):
+        """
+        Write as much as possible of the given sequence of strings,
+        immediately, as though they had been joined together.
+
+        This is only called if C{_vectorWrites} is true.  Its result is
+        interpreted in the same way as the result of L{writeSomeData}.
+
+        @type vector: C{list} of C{str} or C{buffer}
+        """
+        raise NotImplementedError(
+            "%s does not implement writeSomeDataVector" %
+            reflect.qual(self.__class__))
+
+
     def doRead(self):
         """Called when data is avaliable for reading.
 
@@ -193,19 +215,24 @@ class FileDescriptor(_ConsumerMixin):
         indicates no write was done, and a result of None indicates that a
         write was done.
         """
-        if len(self.dataBuffer) - self.offset < self.SEND_LIMIT:
-            # If there is currently less than SEND_LIMIT bytes left to send
-            # in the string, extend it with the array data.
-            self.dataBuffer = buffer(self.dataBuffer, self.offset) + "".join(self._tempDataBuffer)
-            self.offset = 0
-            self._tempDataBuffer = []
-            self._tempDataLen = 0
-
-        # Send as much data as you can.
-        if self.offset:
-            l = self.writeSomeData(buffer(self.dataBuffer, self.offset))
+        vectored = self._vectorWrites and self._tempDataBuffer
+        if vectored:
+            # Send straight from the queued chunks, without copying them.
+            l = self.writeSomeDataVector(self._getWriteVector())
         else:
-            l = self.writeSomeData(self.dataBuffer)
+            if len(self.dataBuffer) - self.offset < self.SEND_LIMIT:
+                # If there is currently less than SEND_LIMIT bytes left to
+                # send in the string, extend it with the array data.
+                self.dataBuffer = buffer(self.dataBuffer, self.offset) + "".join(self._tempDataBuffer)
+                self.offset = 0
+                self._tempDataBuffer = []
+                self._tempDataLen = 0
+
+            # Send as much data as you can.
+            if self.offset:
+                l = self.writeSomeData(buffer(self.dataBuffer, self.offset))
+            else:
+                l = self.writeSomeData(self.dataBuffer)
 
         # There is no writeSomeData implementation in Twisted which returns
         # 0, but the documentation for writeSomeData used to claim negative
@@ -213,11 +240,14 @@ class FileDescriptor(_ConsumerMixin):
         # although it may be worth deprecating and removing at some point.
         if l < 0 or isinstance(l, Exception):
             return l
-        if l == 0 and self.dataBuffer:
+        if l == 0 and (self.dataBuffer or self._tempDataBuffer):
             result = 0
         else:
             result = None
-        self.offset += l
+        if vectored:
+            self._consumeWriteVector(l)
+        else:
+            self.offset += l
         # If there is nothing left to send,
         if self.offset == len(self.dataBuffer) and not self._tempDataLen:
             self.dataBuffer = ""
@@ -241,6 +271,60 @@ class FileDescriptor(_ConsumerMixin):
                 return result
         return result
 
+
+
+    def _getWriteVector(self):
+        """
+        Collect the unsent part of C{dataBuffer} followed by as many chunks
+        from C{_tempDataBuffer} as fit in C{SEND_LIMIT} bytes.
+
+        @rtype: C{list} of C{str} or C{buffer}
+        """
+        vector = []
+        size = len(self.dataBuffer) - self.offset
+        if size:
+            if self.offset:
+                vector.append(buffer(self.dataBuffer, self.offset))
+            else:
+                vector.append(self.dataBuffer)
+        for chunk in self._tempDataBuffer:
+            if size >= self.SEND_LIMIT:
+                break
+            vector.append(chunk)
+            size += len(chunk)
+        return vector
+
+
+    def _consumeWriteVector(self, written):
+        """
+        Discard the first C{written} bytes of the vector returned by
+        L{_getWriteVector}.  A chunk which was only partly written becomes
+        the new C{dataBuffer}, with C{offset} pointing at its unsent part.
+
+        @type written: C{int}
+        """
+        remaining = len(self.dataBuffer) - self.offset
+        if written < remaining:
+            self.offset += written
+            return
+        written -= remaining
+        self.dataBuffer = ""
+        self.offset = 0
+        chunks = self._tempDataBuffer
+        consumed = 0
+        while written:
+            chunk = chunks[consumed]
+            size = len(chunk)
+            consumed += 1
+            self._tempDataLen -= size
+            if written < size:
+                self.dataBuffer = chunk
+                self.offset = written
+                break
+            written -= size
+        del chunks[:consumed]
+
+
     def _postLoseConnection(self):
         """Called after a loseConnection(), when all data has been written.
 
@@ -288,13 +372,13 @@ class FileDescriptor(_ConsumerMixin):
     def writeSequence(self, iovec):
         """Reliably write a sequence of data.
 
-        Currently, this is a convenience method roughly equivalent to::
+        This is roughly equivalent to::
 
             for chunk in iovec:
                 fd.write(chunk)
 
-        It may have a more efficient implementation at a later time or in a
-        different reactor.
+        If this descriptor supports vectored writes, the chunks are passed to
+        the operating system as they are, without being joined together.
 
         As with the C{write()} method, if a buffer size limit is reached and a
         streaming producer is registered, it will be paused until the buffered
@@ -11,7 +11,6 @@ from zope.interface import implements, classImplements
 
 import sys
 import warnings
-from heapq import heappush, heappop, heapify
 
 import traceback
 
@@ -38,6 +37,9 @@ class DelayedCall(styles.Ephemeral):
     # an exception occurs while the function is being run
     debug = False
     _str = None
+    # The position of this call in its reactor's heap of pending timed calls,
+    # or None if it is not in that heap.  Maintained by ReactorBase.
+    _heapIndex = None
 
     def __init__(self, time, func, args, kw, cancel, reset,
                  seconds=runtimeSeconds):
@@ -206,6 +208,93 @@ class DelayedCall(styles.Ephemeral):
 
 
 
+def _siftUp(heap, pos):
+    """
+    Move the L{DelayedCall} at C{pos} in C{heap} towards the root until its
+    parent is due no later than it is, updating the C{_heapIndex} of every
+    call which is moved.
+
+    @type heap: C{list} of L{DelayedCall}
+    @param heap: A binary min-heap ordered by L{DelayedCall.time}.
+
+    @type pos: C{int}
+    @param pos: The index of the call to move.
+    """
+    elt = heap[pos]
+    while pos > 0:
+        parentPos = (pos - 1) >> 1
+        parent = heap[parentPos]
+        if parent.time <= elt.time:
+            break
+        heap[pos] = parent
+        parent._heapIndex = pos
+        pos = parentPos
+    heap[pos] = elt
+    elt._heapIndex = pos
+
+
+
+def _siftDown(heap, pos):
+    """
+    Move the L{DelayedCall} at C{pos} in C{heap} away from the root until
+    neither of its children is due before it is, updating the C{_heapIndex}
+    of every call which is moved.
+
+    @type heap: C{list} of L{DelayedCall}
+    @param heap: A binary min-heap ordered by L{DelayedCall.time}.
+
+    @type pos: C{int}
+    @param pos: The index of the call to move.
+    """
+    size = len(heap)
+    elt = heap[pos]
+    childPos = 2 * pos + 1
+    while childPos < size:
+        rightPos = childPos + 1
+        if rightPos < size and heap[rightPos].time < heap[childPos].time:
+            childPos = rightPos
+        child = heap[childPos]
+        if elt.time <= child.time:
+            break
+        heap[pos] = child
+        child._heapIndex = pos
+        pos = childPos
+        childPos = 2 * pos + 1
+    heap[pos] = elt
+    elt._heapIndex = pos
+
+
+
+def _heapPush(heap, call):
+    """
+    Add C{call} to C{heap}, recording its position in C{call._heapIndex}.
+    """
+    heap.append(call)
+    _siftUp(heap, len(heap) - 1)
+
+
+
+def _heapRemove(heap, pos):
+    """
+    Remove the L{DelayedCall} at C{pos} from C{heap} in logarithmic time and
+    reset its C{_heapIndex} to C{None}.
+
+    @return: The removed call.
+    """
+    call = heap[pos]
+    last = heap.pop()
+    if last is not call:
+        heap[pos] = last
+        last._heapIndex = pos
+        if pos > 0 and last.time < heap[(pos - 1) >> 1].time:
+            _siftUp(heap, pos)
+        else:
+            _siftDown(heap, pos)
+    call._heapIndex = None
+    return call
+
+
+
 class ThreadedResolver(object):
     """
     L{ThreadedResolver} uses a reactor, a threadpool, and
@@ -452,12 +541,20 @@ class ReactorBase(object):
         an explicit state machine.
 
     @ivar running: See L{IReactorCore.running}
+
+    @type _wakeUpPending: C{bool}
+    @ivar _wakeUpPending: A flag which is true from the time a call to
+        C{callFromThread} wakes the reactor up until the next time
+        C{runUntilCurrent} looks at C{threadCallQueue}.  Calls made in the
+        meantime are run by that pass, so they need not wake the reactor up
+        as well.
     """
     implements(IReactorCore, IReactorTime, IReactorPluggableResolver)
 
     _stopped = True
     installed = False
     usingThreads = False
+    _wakeUpPending = False
     resolver = BlockingResolver()
 
     __name__ = "twisted.internet.reactor"
@@ -467,7 +564,6 @@ class ReactorBase(object):
         self._eventTriggers = {}
         self._pendingTimedCalls = []
         self._newTimedCalls = []
-        self._cancellations = 0
         self.running = False
         self._started = False
         self._justStopped = False
@@ -703,27 +799,23 @@ class ReactorBase(object):
         return tple
 
     def _moveCallLaterSooner(self, tple):
-        # Linear time find: slow.
-        heap = self._pendingTimedCalls
-        try:
-            pos = heap.index(tple)
-
-            # Move elt up the heap until it rests at the right place.
-            elt = heap[pos]
-            while pos != 0:
-                parent = (pos-1) // 2
-                if heap[parent] <= elt:
-                    break
-                # move parent down
-                heap[pos] = heap[parent]
-                pos = parent
-            heap[pos] = elt
-        except ValueError:
-            # element was not found in heap - oh well...
-            pass
+        """
+        Restore the heap invariant for C{tple}, whose C{time} has just been
+        decreased.  Calls which have not yet been inserted into the heap are
+        left alone; they will be placed correctly by
+        L{_insertNewDelayedCalls}.
+        """
+        if tple._heapIndex is not None:
+            _siftUp(self._pendingTimedCalls, tple._heapIndex)
 
     def _cancelCallLater(self, tple):
-        self._cancellations+=1
+        """
+        Remove C{tple} from the heap of pending calls.  Calls which have not
+        yet been inserted into the heap are discarded by
+        L{_insertNewDelayedCalls} instead.
+        """
+        if tple._heapIndex is not None:
+            _heapRemove(self._pendingTimedCalls, tple._heapIndex)
 
 
     def getDelayedCalls(self):
@@ -734,12 +826,11 @@ class ReactorBase(object):
         return [x for x in (self._pendingTimedCalls + self._newTimedCalls) if not x.cancelled]
 
     def _insertNewDelayedCalls(self):
+        heap = self._pendingTimedCalls
         for call in self._newTimedCalls:
-            if call.cancelled:
-                self._cancellations-=1
-            else:
+            if not call.cancelled:
                 call.activate_delay()
-                heappush(self._pendingTimedCalls, call)
+                _heapPush(heap, call)
         self._newTimedCalls = []
 
     def timeout(self):
@@ -755,6 +846,10 @@ class ReactorBase(object):
     def runUntilCurrent(self):
         """Run all pending timed calls.
         """
+        # Clear the flag before looking at the queue: a call queued after
+        # this wakes the reactor up again, and one queued before it is run
+        # now.
+        self._wakeUpPending = False
         if self.threadCallQueue:
             # Keep track of how many calls we actually make, as we're
             # making them, in case another call is added to the queue
@@ -777,17 +872,16 @@ class ReactorBase(object):
         self._insertNewDelayedCalls()
 
         now = self.seconds()
-        while self._pendingTimedCalls and (self._pendingTimedCalls[0].time <= now):
-            call = heappop(self._pendingTimedCalls)
-            if call.cancelled:
-                self._cancellations-=1
-                continue
-
+        heap = self._pendingTimedCalls
+        while heap and (heap[0].time <= now):
+            call = heap[0]
             if call.delayed_time > 0:
                 call.activate_delay()
-                heappush(self._pendingTimedCalls, call)
+                _siftDown(heap, 0)
                 continue
 
+            _heapRemove(heap, 0)
+
             try:
                 call.called = 1
                 call.func(*call.args, **call.kw)
@@ -803,13 +897,6 @@ class ReactorBase(object):
                     log.msg(e)
 
 
-        if (self._cancellations > 50 and
-             self._cancellations > len(self._pendingTimedCalls) >> 1):
-            self._cancellations = 0
-            self._pendingTimedCalls = [x for x in self._pendingTimedCalls
-                                       if not x.cancelled]
-            heapify(self._pendingTimedCalls)
-
         if self._justStopped:
             self._justStopped = False
             self.fireSystemEvent("shutdown")
@@ -896,6 +983,12 @@ class ReactorBase(object):
     # IReactorThreads
     if platform.supportsThreads():
         threadpool = None
+        # The callable which creates the threadpool, given the minimum and
+        # maximum number of threads and a name, or None for
+        # twisted.python.threadpool.ThreadPool.  Set it before the
+        # threadpool is first used to use another implementation, such as
+        # twisted.python.threadpool.AdaptiveThreadPool.
+        threadpoolFactory = None
         # ID of the trigger starting the threadpool
         _threadpoolStartupID = None
         # ID of the trigger stopping the threadpool
@@ -914,15 +1007,20 @@ class ReactorBase(object):
             # this is probably a bug in Jython, but until fixed this code
             # won't work in Jython.
             self.threadCallQueue.append((f, args, kw))
-            self.wakeUp()
+            # Only the first call queued since the reactor last looked at the
+            # queue needs to wake it up.
+            if not self._wakeUpPending:
+                self._wakeUpPending = True
+                self.wakeUp()
 
         def _initThreadPool(self):
             """
             Create the threadpool accessible with callFromThread.
             """
-            from twisted.python import threadpool
-            self.threadpool = threadpool.ThreadPool(
-                0, 10, 'twisted.internet.reactor')
+            factory = self.threadpoolFactory
+            if factory is None:
+                from twisted.python.threadpool import ThreadPool as factory
+            self.threadpool = factory(0, 10, 'twisted.internet.reactor')
             self._threadpoolStartupID = self.callWhenRunning(
                 self.threadpool.start)
             self.threadpoolShutdownID = self.addSystemEventTrigger(
@@ -159,32 +159,45 @@ class TCP4ServerEndpoint(object):
 
     @type _interface: str
     @ivar _interface: the hostname to bind to, defaults to '' (all)
+
+    @type _reusePort: bool
+    @ivar _reusePort: whether other processes may listen on the same port
     """
     implements(interfaces.IStreamServerEndpoint)
 
-    def __init__(self, reactor, port, backlog=50, interface=''):
+    def __init__(self, reactor, port, backlog=50, interface='',
+                 reusePort=False):
         """
         @param reactor: An L{IReactorTCP} provider.
         @param port: The port number used listening
         @param backlog: size of the listen queue
         @param interface: the hostname to bind to, defaults to '' (all)
+        @param reusePort: if true, listen with C{SO_REUSEPORT} so that several
+            processes can share the port; the reactor's C{listenTCP} must
+            accept a C{reusePort} argument
         """
         self._reactor = reactor
         self._port = port
         self._listenArgs = dict(backlog=50, interface='')
         self._backlog = backlog
         self._interface = interface
+        self._reusePort = reusePort
 
 
     def listen(self, protocolFactory):
         """
         Implement L{IStreamServerEndpoint.listen} to listen on a TCP socket
         """
+        kw = {}
+        if self._reusePort:
+            # Only passed when asked for, since not every reactor supports it.
+            kw['reusePort'] = True
         return defer.execute(self._reactor.listenTCP,
                              self._port,
                              protocolFactory,
                              backlog=self._backlog,
-                             interface=self._interface)
+                             interface=self._interface,
+                             **kw)
 
 
 
@@ -473,7 +486,7 @@ class UNIXClientEndpoint(object):
 
 
 
-def _parseTCP(factory, port, interface="", backlog=50):
+def _parseTCP(factory, port, interface="", backlog=50, reusePort=False):
     """
     Internal parser function for L{_parseServer} to convert the string
     arguments for a TCP(IPv4) stream endpoint into the structured arguments.
@@ -491,12 +504,18 @@ def _parseTCP(factory, port, interface="", backlog=50):
     @param backlog: the length of the listen queue
     @type backlog: C{str}
 
+    @param reusePort: A string '0' or '1', mapping to False and True; whether
+        to listen with C{SO_REUSEPORT}.
+    @type reusePort: C{str}
+
     @return: a 2-tuple of (args, kwargs), describing  the parameters to
         L{IReactorTCP.listenTCP} (or, modulo argument 2, the factory, arguments
         to L{TCP4ServerEndpoint}.
     """
-    return (int(port), factory), {'interface': interface,
-                                  'backlog': int(backlog)}
+    kw = {'interface': interface, 'backlog': int(backlog)}
+    if reusePort and int(reusePort):
+        kw['reusePort'] = True
+    return (int(port), factory), kw
 
 
 
@@ -747,6 +766,12 @@ def serverFromString(reactor, description):
 
         serverFromString(reactor, "tcp:80:interface=127.0.0.1")
 
+    Several processes can share one TCP port, with the kernel balancing
+    incoming connections between them, if each of them listens with
+    C{SO_REUSEPORT}, which is requested with the C{reusePort} argument::
+
+        serverFromString(reactor, "tcp:80:reusePort=1")
+
     SSL server endpoints may be specified with the 'ssl' prefix, and the
     private key and certificate files may be specified by the C{privateKey} and
     C{certKey} arguments::
@@ -18,7 +18,6 @@ from zope.interface import implements
 from twisted.internet.interfaces import IReactorFDSet
 
 from twisted.python import _epoll
-from twisted.python import log
 from twisted.internet import posixbase, error
 from twisted.internet.main import CONNECTION_DONE, CONNECTION_LOST
 
@@ -29,6 +28,14 @@ class EPollReactor(posixbase.PosixReactorBase):
     """
     A reactor that uses epoll(4).
 
+    A descriptor which stops being interested in one kind of event while
+    still being interested in the other is left registered for both until
+    the next poll, when the stale interest is dropped with one C{epoll_ctl}
+    call.  This only saves calls when a descriptor stops and starts reading
+    or writing again within a single iteration.  A writer which the reactor
+    polls between starting and stopping writing, as it usually does, still
+    costs two calls each time.
+
     @ivar _poller: A L{poll} which will be used to check for I/O
         readiness.
 
@@ -49,13 +56,37 @@ class EPollReactor(posixbase.PosixReactorBase):
         registered with C{_poller} for write readiness notifications which will
         be dispatched to the corresponding L{FileDescriptor} instances in
         C{_selectables}.
+
+    @ivar _masks: A dictionary mapping integer file descriptors to the event
+        mask they are registered with in C{_poller}.  Between polls, this may
+        include events which no longer have a corresponding entry in
+        C{_reads} or C{_writes}.
+
+    @ivar _stale: A dictionary mapping integer file descriptors to arbitrary
+        values (this is essentially a set).  Keys in this dictionary may be
+        registered with C{_poller} for events they no longer want, which will
+        be dropped before the next poll.
+
+    @ivar maxEvents: The largest number of events to retrieve from
+        C{_poller} with each call to C{doPoll}, or C{None} to retrieve as many
+        as there are registered descriptors.
+
+    @ivar controlCalls: The total number of C{epoll_ctl} calls made.
+
+    @ivar lastIterationControlCalls: The number of C{epoll_ctl} calls made
+        between the last two calls to C{doPoll}.
     """
     implements(IReactorFDSet)
 
-    def __init__(self):
+    controlCalls = 0
+    lastIterationControlCalls = 0
+
+    def __init__(self, maxEvents=None):
         """
         Initialize epoll object, file descriptor tracking dictionaries, and the
         base class.
+
+        @param maxEvents: The value for C{maxEvents}.
         """
         # Create the poller we're going to use.  The 1024 here is just a hint
         # to the kernel, it is not a hard maximum.
@@ -63,32 +94,49 @@ class EPollReactor(posixbase.PosixReactorBase):
         self._reads = {}
         self._writes = {}
         self._selectables = {}
+        self._masks = {}
+        self._stale = {}
+        self.maxEvents = maxEvents
+        self._controlCallsAtLastPoll = 0
         posixbase.PosixReactorBase.__init__(self)
 
 
+    def _control(self, cmd, fd, flags):
+        """
+        Call C{epoll_ctl} and count the call.
+        """
+        # epoll_ctl can raise all kinds of IOErrors, and every one
+        # indicates a bug either in the reactor or application-code.
+        # Let them all through so someone sees a traceback and fixes
+        # something.
+        self._poller._control(cmd, fd, flags)
+        self.controlCalls += 1
+
+
     def _add(self, xer, primary, other, selectables, event, antievent):
         """
         Private method for adding a descriptor from the event loop.
 
         It takes care of adding it if  new or modifying it if already added
-        for another state (read -> read/write for example).
+        for another state (read -> read/write for example).  Nothing needs to
+        be done if it is still registered for C{event} from before.
         """
         fd = xer.fileno()
         if fd not in primary:
-            cmd = _epoll.CTL_ADD
-            flags = event
-            if fd in other:
-                flags |= antievent
-                cmd = _epoll.CTL_MOD
-            # epoll_ctl can raise all kinds of IOErrors, and every one
-            # indicates a bug either in the reactor or application-code.
-            # Let them all through so someone sees a traceback and fixes
-            # something.  We'll do the same thing for every other call to
-            # this method in this file.
-            self._poller._control(cmd, fd, flags)
+            mask = self._masks.get(fd, 0)
+            if not mask & event:
+                flags = event
+                if fd in other:
+                    flags |= antievent
+                if mask:
+                    self._control(_epoll.CTL_MOD, fd, flags)
+                else:
+                    self._control(_epoll.CTL_ADD, fd, flags)
+                mask = flags
 
             # Update our own tracking state *only* after the epoll call has
             # succeeded.  Otherwise we may get out of sync.
+            self._masks[fd] = mask
             primary[fd] = 1
             selectables[fd] = xer
 
@@ -112,7 +160,9 @@ class EPollReactor(posixbase.PosixReactorBase):
         Private method for removing a descriptor from the event loop.
 
         It does the inverse job of _add, and also add a check in case of the fd
-        has gone away.
+        has gone away.  A descriptor still wanted for C{antievent} is left
+        registered for C{event} until the next poll, so that adding it back
+        before then costs nothing; see L{_dropStaleEvents}.
         """
         fd = xer.fileno()
         if fd == -1:
@@ -122,16 +172,15 @@ class EPollReactor(posixbase.PosixReactorBase):
             else:
                 return
         if fd in primary:
-            cmd = _epoll.CTL_DEL
-            flags = event
-            if fd in other:
-                flags = antievent
-                cmd = _epoll.CTL_MOD
-            else:
+            if fd not in other:
+                # See comment above _control call in _add.
+                self._control(_epoll.CTL_DEL, fd, event)
                 del selectables[fd]
+                del self._masks[fd]
+                self._stale.pop(fd, None)
+            else:
+                self._stale[fd] = 1
             del primary[fd]
-            # See comment above _control call in _add.
-            self._poller._control(cmd, fd, flags)
 
 
     def removeReader(self, reader):
@@ -164,20 +213,48 @@ class EPollReactor(posixbase.PosixReactorBase):
         return [self._selectables[fd] for fd in self._writes]
 
 
+    def _dropStaleEvents(self):
+        """
+        Stop the descriptors in C{_stale} being registered for events they no
+        longer want, so that the next poll does not report them.
+        """
+        for fd in self._stale:
+            wanted = 0
+            if fd in self._reads:
+                wanted |= _epoll.IN
+            if fd in self._writes:
+                wanted |= _epoll.OUT
+            if self._masks[fd] != wanted:
+                self._control(_epoll.CTL_MOD, fd, wanted)
+                self._masks[fd] = wanted
+        self._stale.clear()
+
+
     def doPoll(self, timeout):
         """
         Poll the poller for new events.
         """
+        if self._stale:
+            self._dropStaleEvents()
+        self.lastIterationControlCalls = (
+            self.controlCalls - self._controlCallsAtLastPoll)
+        self._controlCallsAtLastPoll = self.controlCalls
+
         if timeout is None:
             timeout = 1
         timeout = int(timeout * 1000) # convert seconds to milliseconds
 
+        # Limit the number of events to the number of io objects we're
+        # currently tracking (because that's maybe a good heuristic), unless
+        # a smaller batch was asked for.
+        maxEvents = len(self._selectables)
+        if self.maxEvents is not None:
+            maxEvents = min(maxEvents, self.maxEvents)
+
         try:
-            # Limit the number of events to the number of io objects we're
-            # currently tracking (because that's maybe a good heuristic) and
-            # the amount of time we block to the value specified by our
+            # Limit the amount of time we block to the value specified by our
             # caller.
-            l = self._poller.wait(len(self._selectables), timeout)
+            l = self._poller.wait(maxEvents, timeout)
         except IOError, err:
             if err.errno == errno.EINTR:
                 return
@@ -188,13 +265,14 @@ class EPollReactor(posixbase.PosixReactorBase):
             raise
 
         _drdw = self._doReadOrWrite
+        _logrun = self._getEventDispatcher()
         for fd, event in l:
             try:
                 selectable = self._selectables[fd]
             except KeyError:
                 pass
             else:
-                log.callWithLogger(selectable, _drdw, selectable, fd, event)
+                _logrun(selectable, _drdw, selectable, fd, event)
 
     doIteration = doPoll
 
@@ -224,7 +302,7 @@ class EPollReactor(posixbase.PosixReactorBase):
                           'Filedescriptor went away')
                     inRead = False
             except:
-                log.err()
+                self._logDispatchError(selectable)
                 why = sys.exc_info()[1]
         if why:
             self._disconnectSelectable(selectable, why, inRead)
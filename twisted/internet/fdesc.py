@@ -14,6 +14,16 @@ try:
 except ImportError:
     fcntl = None
 
+try:
+    from twisted.python._writev import writev as _writev
+except ImportError:
+    _writev = None
+
+try:
+    from twisted.python._sendfile import sendfile as _sendfile
+except ImportError:
+    _sendfile = None
+
 # twisted imports
 from twisted.internet.main import CONNECTION_LOST, CONNECTION_DONE
 from twisted.python.runtime import platformType
@@ -115,4 +125,36 @@ def writeToFD(fd, data):
         return CONNECTION_LOST
 
 
-__all__ = ["setNonBlocking", "setBlocking", "readFromFD", "writeToFD"]
+
+def writevToFD(fd, vector):
+    """
+    Write a sequence of strings to a file descriptor with a single system
+    call, without first joining them together.
+
+    Returns same thing FileDescriptor.writeSomeData would.  As with a
+    short write of a single string, only a prefix of the concatenation of
+    C{vector} may be written.
+
+    This is only available if L{canWriteVector} is true.
+
+    @type fd: C{int}
+    @param fd: non-blocking file descriptor to be written to.
+    @type vector: C{list} of C{str} or C{buffer}
+    @param vector: bytes to write to fd.
+
+    @return: number of bytes written, or CONNECTION_LOST.
+    """
+    try:
+        return _writev(fd, vector)
+    except (OSError, IOError), io:
+        if io.errno in (errno.EAGAIN, errno.EINTR):
+            return 0
+        return CONNECTION_LOST
+
+
+canWriteVector = _writev is not None
+canSendFile = _sendfile is not None
+
+
+__all__ = ["setNonBlocking", "setBlocking", "readFromFD", "writeToFD",
+           "writevToFD", "canWriteVector", "canSendFile"]
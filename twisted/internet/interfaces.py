@@ -1493,6 +1493,34 @@ class ITCPTransport(ITransport):
         """
 
 
+class ISendFileTransport(ITransport):
+    """
+    A transport which can send the contents of a file without reading them
+    into memory first.
+    """
+
+    def sendFile(fileObject, offset, count):
+        """
+        Send C{count} bytes of C{fileObject}, starting at C{offset}, after
+        any data which has already been written to this transport.
+
+        The file position of C{fileObject} is not used or changed.  No
+        other producer may be registered with this transport until the
+        transfer is complete, and nothing should be written to it until
+        then.
+
+        @param fileObject: A file object with a C{fileno} method, open for
+            reading.
+        @type offset: C{int}
+        @type count: C{int}
+
+        @return: A L{Deferred} which fires with C{None} once all C{count}
+            bytes have been sent, or fails if the connection is lost first,
+            or if the end of the file is reached first.
+        """
+
+
+
 class ITLSTransport(ITCPTransport):
     """
     A TCP transport that supports switching to TLS midstream.
@@ -67,7 +67,7 @@ from kqsyscall import kqueue, kevent
 
 from twisted.internet.interfaces import IReactorFDSet
 
-from twisted.python import log, failure
+from twisted.python import failure
 from twisted.internet import main, posixbase
 
 
@@ -182,6 +182,7 @@ class KQueueReactor(posixbase.PosixReactorBase):
             else:
                 raise
         _drdw = self._doWriteOrRead
+        _logrun = self._getEventDispatcher()
         for event in l:
             why = None
             fd, filter = event.ident, event.filter
@@ -191,7 +192,7 @@ class KQueueReactor(posixbase.PosixReactorBase):
                 # Handles the infrequent case where one selectable's
                 # handler disconnects another.
                 continue
-            log.callWithLogger(selectable, _drdw, selectable, fd, filter)
+            _logrun(selectable, _drdw, selectable, fd, filter)
 
     def _doWriteOrRead(self, selectable, fd, filter):
         try:
@@ -203,7 +204,7 @@ class KQueueReactor(posixbase.PosixReactorBase):
                 why = main.CONNECTION_LOST
         except:
             why = sys.exc_info()[1]
-            log.deferr()
+            self._logDispatchError(selectable)
 
         if why:
             self.removeReader(selectable)
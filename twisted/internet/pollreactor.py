@@ -20,7 +20,6 @@ from select import POLLIN, POLLOUT, POLLHUP, POLLERR, POLLNVAL
 from zope.interface import implements
 
 # Twisted imports
-from twisted.python import log
 from twisted.internet import main, posixbase, error
 from twisted.internet.interfaces import IReactorFDSet
 
@@ -155,6 +154,7 @@ class PollReactor(posixbase.PosixReactorBase):
             else:
                 raise
         _drdw = self._doReadOrWrite
+        _logrun = self._getEventDispatcher()
         for fd, event in l:
             try:
                 selectable = self._selectables[fd]
@@ -162,7 +162,7 @@ class PollReactor(posixbase.PosixReactorBase):
                 # Handles the infrequent case where one selectable's
                 # handler disconnects another.
                 continue
-            log.callWithLogger(selectable, _drdw, selectable, fd, event)
+            _logrun(selectable, _drdw, selectable, fd, event)
 
     doIteration = doPoll
 
@@ -187,7 +187,7 @@ class PollReactor(posixbase.PosixReactorBase):
                     why = error.ConnectionFdescWentAway('Filedescriptor went away')
                     inRead = False
             except:
-                log.deferr()
+                self._logDispatchError(selectable)
                 why = sys.exc_info()[1]
         if why:
             self._disconnectSelectable(selectable, why, inRead)
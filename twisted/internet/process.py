@@ -169,6 +169,19 @@ class ProcessWriter(abstract.FileDescriptor):
             self.startReading()
         return rv
 
+
+    _vectorWrites = fdesc.canWriteVector
+
+    def writeSomeDataVector(self, vector):
+        """
+        Write some data to the open process, without joining C{vector}.
+        """
+        rv = fdesc.writevToFD(self.fd, vector)
+        if self.enableReadHack and rv == sum(map(len, vector)):
+            # See writeSomeData.
+            self.startReading()
+        return rv
+
     def write(self, data):
         self.stopReading()
         abstract.FileDescriptor.write(self, data)
@@ -1064,3 +1077,12 @@ class PTYProcess(abstract.FileDescriptor, _BaseProcess):
         Write some data to the open process.
         """
         return fdesc.writeToFD(self.fd, data)
+
+
+    _vectorWrites = fdesc.canWriteVector
+
+    def writeSomeDataVector(self, vector):
+        """
+        Write some data to the open process, without joining C{vector}.
+        """
+        return fdesc.writevToFD(self.fd, vector)
@@ -0,0 +1,549 @@
+# -*- test-case-name: twisted.test.test_processpool -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+A pool of worker processes to run functions in, for CPU-bound work which a
+thread would not take off the reactor because of the global interpreter
+lock.
+
+Functions, their arguments and their results are pickled and passed to and
+from the worker processes with AMP over the processes' standard input and
+output.  The functions must therefore be importable by name in the worker
+processes, which are started with the same C{sys.path} as the pool's
+process, and the arguments and results must be picklable.  Functions
+defined in a script run as C{__main__} cannot be used.
+"""
+
+import os, sys, cPickle
+from collections import deque
+
+from zope.interface import implements
+
+from twisted.python import log, failure
+from twisted.internet import defer, interfaces, protocol
+from twisted.protocols import amp
+
+
+
+class WorkerCrashed(Exception):
+    """
+    The worker process running a task exited before the task was done, or
+    a worker process could not be started.
+    """
+
+
+
+class ProcessPoolStopped(Exception):
+    """
+    A task was given to a L{ProcessPool} which has been stopped.
+    """
+
+
+
+class _Chunked(amp.Argument):
+    """
+    An AMP argument holding a string of any length.  An AMP value may be at
+    most 65535 bytes long, so the string is split across as many keys as it
+    needs: C{name} holds the number of chunks, and C{name-0}, C{name-1} and
+    so on hold the chunks.
+    """
+    chunkSize = 0xffff
+
+    def toBox(self, name, strings, objects, proto):
+        data = self.retrieve(objects, name, proto)
+        chunks = [data[i:i + self.chunkSize]
+                  for i in xrange(0, len(data), self.chunkSize)]
+        strings[name] = str(len(chunks))
+        for i, chunk in enumerate(chunks):
+            strings['%s-%d' % (name, i)] = chunk
+
+
+    def fromBox(self, name, strings, objects, proto):
+        count = int(strings.pop(name))
+        objects[name] = ''.join([strings.pop('%s-%d' % (name, i))
+                                 for i in xrange(count)])
+
+
+
+class _Warmup(amp.Command):
+    """
+    Call a function in a worker process before it is given any task.
+    """
+    arguments = [('function', _Chunked())]
+    response = []
+
+
+
+class _Run(amp.Command):
+    """
+    Run a task in a worker process.  The task is a pickled C{(function,
+    args, kwargs)} tuple, and the result a pickled C{(success, result)}
+    tuple, where C{result} is the function's return value if C{success} is
+    true and a L{failure.Failure} otherwise.
+    """
+    arguments = [('task', _Chunked())]
+    response = [('result', _Chunked())]
+
+
+
+def _dumps(obj):
+    return cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
+
+
+
+def _dumpFailure():
+    """
+    Pickle the current exception as a L{failure.Failure}.  If the exception
+    cannot be pickled, pickle a L{failure.Failure} of a L{RuntimeError}
+    describing it instead.
+    """
+    f = failure.Failure()
+    f.cleanFailure()
+    try:
+        return _dumps((False, f))
+    except:
+        f = failure.Failure(RuntimeError(
+            "Unpicklable exception in worker process:\n" + f.getTraceback()))
+        f.cleanFailure()
+        return _dumps((False, f))
+
+
+
+class _Worker(amp.AMP):
+    """
+    The protocol of a worker process, which runs the functions its pool
+    sends it, one at a time.
+    """
+    def warmup(self, function):
+        cPickle.loads(function)()
+        return {}
+    _Warmup.responder(warmup)
+
+
+    def run(self, task):
+        try:
+            function, args, kwargs = cPickle.loads(task)
+            result = _dumps((True, function(*args, **kwargs)))
+        except:
+            result = _dumpFailure()
+        return {'result': result}
+    _Run.responder(run)
+
+
+    def connectionLost(self, reason):
+        amp.AMP.connectionLost(self, reason)
+        from twisted.internet import reactor
+        reactor.stop()
+
+
+
+def _workerMain():
+    """
+    Run a worker process, talking to its pool over standard input and
+    standard output.
+    """
+    from twisted.internet import reactor, stdio
+    stdio.StandardIO(_Worker())
+    # Output from the functions run must not get mixed into the AMP stream.
+    sys.stdout = sys.stderr
+    reactor.run()
+
+
+
+class _ProcessAddress(object):
+    """
+    The address of a worker process.
+    """
+    implements(interfaces.IAddress)
+
+
+
+class _WorkerTransport(object):
+    """
+    The transport of the pool's AMP connection to a worker process, which
+    writes to the process's standard input.
+    """
+    def __init__(self, process):
+        self._process = process
+
+
+    def write(self, data):
+        self._process.write(data)
+
+
+    def writeSequence(self, data):
+        self._process.write(''.join(data))
+
+
+    def loseConnection(self):
+        self._process.closeStdin()
+
+
+    def getPeer(self):
+        return _ProcessAddress()
+
+
+    def getHost(self):
+        return _ProcessAddress()
+
+
+
+class _WorkerProtocol(protocol.ProcessProtocol):
+    """
+    The pool's end of a worker process.
+
+    @ivar pool: The L{ProcessPool} the process belongs to.
+    @ivar amp: The AMP connection to the process.
+    @ivar ready: C{True} once the process can be given tasks.
+    @ivar running: C{True} until the process has ended.
+    @ivar retiring: C{True} once the process has been asked to exit.
+    @ivar tasksRun: The number of tasks the process has run.
+    @ivar ended: A L{Deferred} which fires when the process has ended.
+    """
+    ready = False
+    running = True
+    retiring = False
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.amp = amp.AMP()
+        self.tasksRun = 0
+        self.ended = defer.Deferred()
+
+
+    def connectionMade(self):
+        self.amp.makeConnection(_WorkerTransport(self.transport))
+        self.pool._workerStarted(self)
+
+
+    def outReceived(self, data):
+        self.amp.dataReceived(data)
+
+
+    def errReceived(self, data):
+        log.msg("Worker process %s: %s" % (self.transport.pid, data.rstrip()))
+
+
+    def processEnded(self, reason):
+        self.running = False
+        self.amp.connectionLost(reason)
+        self.pool._workerEnded(self, reason)
+        self.ended.callback(None)
+
+
+    def retire(self):
+        """
+        Ask the process to exit, by closing its standard input.
+        """
+        self.retiring = True
+        self.transport.closeStdin()
+
+
+
+def _cpuCount():
+    """
+    Return the number of processors, or 1 if it cannot be found.
+    """
+    try:
+        return max(1, os.sysconf('SC_NPROCESSORS_ONLN'))
+    except (AttributeError, ValueError, OSError):
+        return 1
+
+
+
+class ProcessPool(object):
+    """
+    A pool of worker processes to run functions in.
+
+    Tasks are queued until a worker process is free to run them.  Worker
+    processes are started as they are needed, up to C{maxProcesses}, and
+    C{minProcesses} of them are kept running.  A worker process is replaced
+    after it has run C{maxTasksPerProcess} tasks, and when it exits
+    unexpectedly; the task it was running, if any, fails with
+    L{WorkerCrashed}.
+
+    @ivar minProcesses: The number of worker processes kept running.
+    @ivar maxProcesses: The greatest number of worker processes.
+    @ivar maxTasksPerProcess: The number of tasks a worker process runs
+        before it is replaced, or C{None} for no limit.
+    @ivar warmup: A function called in each worker process before it is
+        given any task, such as one which imports modules or loads
+        templates, or C{None}.  It must be importable by name.
+    @ivar started: C{True} while the pool is running.
+    @ivar stopped: C{True} once the pool has been stopped, until it is
+        started again.
+
+    @ivar _reactor: A provider of L{interfaces.IReactorProcess} used to
+        start the worker processes.
+    @ivar _workers: The L{_WorkerProtocol}s of the running worker processes.
+    @ivar _idle: The L{_WorkerProtocol}s of the worker processes which are
+        ready and not running a task.
+    @ivar _queue: The C{(deferred, function, args, kwargs)} tuples of the
+        tasks waiting for a worker process.
+    @ivar _shutdownTrigger: The ID of the reactor's shutdown trigger which
+        stops the pool.
+    @ivar _startFailed: C{True} if the last worker process started exited
+        before it was ready, in which case no more are started to keep
+        C{minProcesses} running until a task is queued.
+    """
+    started = False
+    stopped = False
+    _shutdownTrigger = None
+    _startFailed = False
+
+    def __init__(self, minProcesses=0, maxProcesses=None,
+                 maxTasksPerProcess=None, warmup=None, reactor=None):
+        """
+        @param maxProcesses: See L{maxProcesses}.  C{None} means the number
+            of processors.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        if maxProcesses is None:
+            maxProcesses = max(minProcesses, _cpuCount())
+        assert 0 <= minProcesses <= maxProcesses, \
+            'minimum is negative or greater than maximum'
+        assert maxProcesses > 0, 'maximum is not positive'
+        self.minProcesses = minProcesses
+        self.maxProcesses = maxProcesses
+        self.maxTasksPerProcess = maxTasksPerProcess
+        self.warmup = warmup
+        self._workers = []
+        self._idle = []
+        self._queue = deque()
+
+
+    def start(self):
+        """
+        Start the pool, and the minimum number of worker processes.  The pool
+        is stopped when the reactor shuts down.
+        """
+        if self.started:
+            return
+        self.started = True
+        self.stopped = False
+        self._shutdownTrigger = self._reactor.addSystemEventTrigger(
+            'before', 'shutdown', self.stop)
+        self._dispatch()
+
+
+    def stop(self):
+        """
+        Stop the pool once the tasks which have been queued have run.  If no
+        worker process is left to run them, they fail with
+        L{ProcessPoolStopped}.
+
+        @return: A L{Deferred} which fires when all the worker processes have
+            exited.
+        """
+        self.started = False
+        self.stopped = True
+        if self._shutdownTrigger is not None:
+            try:
+                self._reactor.removeSystemEventTrigger(self._shutdownTrigger)
+            except ValueError:
+                pass
+            self._shutdownTrigger = None
+        self._dispatch()
+        return defer.DeferredList([worker.ended for worker in self._workers])
+
+
+    def callInProcess(self, function, *args, **kwargs):
+        """
+        Call C{function} with C{args} and C{kwargs} in a worker process.
+
+        @return: A L{Deferred} which fires with the result of the function,
+            or fails with the exception it raised, or with L{WorkerCrashed}
+            if the worker process exited while running it, or with
+            L{ProcessPoolStopped} if the pool has been stopped.
+        """
+        if self.stopped:
+            return defer.fail(ProcessPoolStopped(
+                    "The process pool has been stopped"))
+        d = defer.Deferred()
+        self._startFailed = False
+        self._queue.append((d, function, args, kwargs))
+        self._dispatch()
+        return d
+
+
+    def _dispatch(self):
+        """
+        Give queued tasks to idle worker processes, then start or stop worker
+        processes as needed.
+        """
+        while self._queue and self._idle:
+            worker = self._idle.pop()
+            d, function, args, kwargs = self._queue.popleft()
+            self._run(worker, d, function, args, kwargs)
+
+        if self.started:
+            # Starting a worker process may make it ready, and dispatch,
+            # before _spawn returns, so count the worker processes afresh
+            # each time.
+            while self._moreWorkersWanted():
+                self._spawn()
+        elif not self._queue:
+            while self._idle:
+                self._idle.pop().retire()
+        elif self.stopped and not [w for w in self._workers
+                                   if not w.retiring]:
+            queue, self._queue = self._queue, deque()
+            for d, function, args, kwargs in queue:
+                d.errback(failure.Failure(ProcessPoolStopped(
+                    "The process pool was stopped before the task ran")))
+
+
+    def _moreWorkersWanted(self):
+        """
+        Return C{True} if another worker process is needed to run the queued
+        tasks or to keep C{minProcesses} running.
+        """
+        workers = [w for w in self._workers if not w.retiring]
+        wanted = len([w for w in workers if w.ready]) + len(self._queue)
+        if not self._startFailed:
+            wanted = max(self.minProcesses, wanted)
+        return len(workers) < min(wanted, self.maxProcesses)
+
+
+    def _spawn(self):
+        """
+        Start a worker process.
+        """
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        worker = _WorkerProtocol(self)
+        self._workers.append(worker)
+        self._reactor.spawnProcess(
+            worker, sys.executable,
+            [sys.executable, '-c',
+             'from twisted.internet.processpool import _workerMain; '
+             '_workerMain()'],
+            env=env)
+
+
+    def _workerStarted(self, worker):
+        """
+        Called when the worker process C{worker} has started: warm it up if
+        there is a warmup function, then make it available for tasks.
+        """
+        if self.warmup is None:
+            self._workerReady(worker)
+        else:
+            d = worker.amp.callRemote(_Warmup, function=_dumps(self.warmup))
+            d.addCallbacks(lambda ignored: self._workerReady(worker),
+                           self._ebWarmup, errbackArgs=(worker,))
+
+
+    def _ebWarmup(self, reason, worker):
+        log.err(reason, "Warming up worker process failed")
+        if worker.running:
+            worker.retire()
+
+
+    def _workerReady(self, worker):
+        if not worker.running:
+            return
+        worker.ready = True
+        self._startFailed = False
+        self._idle.append(worker)
+        self._dispatch()
+
+
+    def _workerEnded(self, worker, reason):
+        """
+        Called when the worker process C{worker} has exited.
+        """
+        self._workers.remove(worker)
+        if worker in self._idle:
+            self._idle.remove(worker)
+        if not worker.retiring:
+            log.msg("Worker process exited unexpectedly: %s" % (
+                reason.getErrorMessage(),))
+        if not worker.ready:
+            # The process never became ready.  Rather than start more which
+            # may fail the same way, fail the tasks which no other worker
+            # process can run.
+            self._startFailed = True
+            if not [w for w in self._workers if w.ready and not w.retiring]:
+                queue, self._queue = self._queue, deque()
+                for d, function, args, kwargs in queue:
+                    d.errback(failure.Failure(WorkerCrashed(
+                        "A worker process could not be started")))
+        self._dispatch()
+
+
+    def _run(self, worker, d, function, args, kwargs):
+        """
+        Run a task in the worker process C{worker}.
+        """
+        try:
+            task = _dumps((function, args, kwargs))
+        except:
+            self._idle.append(worker)
+            d.errback()
+            return
+        r = worker.amp.callRemote(_Run, task=task)
+        r.addCallbacks(self._cbRun, self._ebRun,
+                       callbackArgs=(worker, d), errbackArgs=(worker, d))
+
+
+    def _taskDone(self, worker):
+        """
+        Make C{worker} available for another task, or replace it if it has
+        run as many as it may.
+        """
+        worker.tasksRun += 1
+        if (self.maxTasksPerProcess is not None and
+            worker.tasksRun >= self.maxTasksPerProcess):
+            worker.retire()
+        else:
+            self._idle.append(worker)
+        self._dispatch()
+
+
+    def _cbRun(self, response, worker, d):
+        self._taskDone(worker)
+        try:
+            success, result = cPickle.loads(response['result'])
+        except:
+            d.errback()
+            return
+        if success:
+            d.callback(result)
+        else:
+            d.errback(result)
+
+
+    def _ebRun(self, reason, worker, d):
+        if worker.running:
+            # The worker could not answer, but is still there.
+            self._taskDone(worker)
+            d.errback(reason)
+        else:
+            d.errback(failure.Failure(WorkerCrashed(
+                "Worker process exited while running a task: %s" % (
+                    reason.getErrorMessage(),))))
+
+
+
+def deferToProcessPool(pool, f, *args, **kwargs):
+    """
+    Call the function C{f} in a worker process of C{pool} and return the
+    result as a L{Deferred}.
+
+    This is the process equivalent of
+    L{twisted.internet.threads.deferToThreadPool}, for CPU-bound functions.
+
+    @param pool: A started L{ProcessPool}.
+    @param f: The function to call, which must be importable by name.
+    @param *args: positional arguments to pass to f.
+    @param **kwargs: keyword arguments to pass to f.
+
+    @return: A L{Deferred} which fires with the result of f, or fails with
+        the exception f raised, or with L{WorkerCrashed} if the worker
+        process exited while running it.
+    """
+    return pool.callInProcess(f, *args, **kwargs)
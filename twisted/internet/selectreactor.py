@@ -128,7 +128,7 @@ class SelectReactor(posixbase.PosixReactorBase):
                     # OK, I really don't know what's going on.  Blow up.
                     raise
         _drdw = self._doReadOrWrite
-        _logrun = log.callWithLogger
+        _logrun = self._getEventDispatcher()
         for selectables, method, fdset in ((r, "doRead", self._reads),
                                            (w,"doWrite", self._writes)):
             for selectable in selectables:
@@ -151,7 +151,7 @@ class SelectReactor(posixbase.PosixReactorBase):
                 why = _NO_FILEDESC
         except:
             why = sys.exc_info()[1]
-            log.err()
+            self._logDispatchError(selectable)
         if why:
             self._disconnectSelectable(selectable, why, method=="doRead")
 
@@ -10,11 +10,11 @@ Scheduling utility methods and classes.
 
 __metaclass__ = type
 
-import time
+import time, math
 
 from zope.interface import implements
 
-from twisted.python import reflect
+from twisted.python import reflect, log
 from twisted.python.failure import Failure
 
 from twisted.internet import base, defer
@@ -722,6 +722,197 @@ class Clock:
 
 
 
+class CoarseClock:
+    """
+    Provide an implementation of L{IReactorTime.callLater} which trades
+    precision for very cheap rescheduling, intended for idle timeouts.
+
+    Calls are grouped into buckets C{resolution} seconds wide, and a single
+    timed call on the underlying clock runs each bucket as it comes due.
+    Rescheduling a call to a later time (as L{IDelayedCall.reset} typically
+    does for an idle timeout each time data arrives) only updates the call;
+    it is moved to its new bucket when its old one comes due.  Rescheduling
+    a call to an earlier time or cancelling it is a dictionary update.  No
+    call runs early, but any call may run up to C{resolution} seconds late.
+
+    @ivar clock: The L{IReactorTime} provider used to run buckets.
+
+    @type resolution: C{float}
+    @ivar resolution: The width of each bucket, in seconds.
+
+    @type _buckets: C{dict}
+    @ivar _buckets: A mapping from bucket number to a C{set} of the
+        L{base.DelayedCall}s in that bucket.  Bucket C{n} runs at time
+        C{n * resolution}.
+
+    @type _slots: C{dict}
+    @ivar _slots: A mapping from each pending L{base.DelayedCall} to the
+        number of the bucket it is in.
+
+    @type _lastSlot: C{int}
+    @ivar _lastSlot: The number of the most recent bucket which has been run.
+        Every pending call is in a later bucket than this.
+
+    @ivar _tickCall: The L{IDelayedCall} from C{clock} which will run the
+        next bucket, or C{None} if there are no pending calls.
+    """
+    implements(IReactorTime)
+
+    _tickCall = None
+
+    def __init__(self, clock=None, resolution=1.0):
+        """
+        @param clock: The L{IReactorTime} provider to use to run buckets.  If
+            C{None}, the global reactor is used.
+
+        @param resolution: The width of each bucket, in seconds.
+        """
+        if clock is None:
+            from twisted.internet import reactor as clock
+        if resolution <= 0:
+            raise ValueError("resolution must be > 0")
+        self.clock = clock
+        self.resolution = resolution
+        self._buckets = {}
+        self._slots = {}
+        self._lastSlot = self._currentSlot()
+
+
+    def _currentSlot(self):
+        """
+        Return the number of the most recent bucket which is due.
+        """
+        return int(math.floor(self.clock.seconds() / self.resolution))
+
+
+    def seconds(self):
+        """
+        See L{twisted.internet.interfaces.IReactorTime.seconds}.
+        """
+        return self.clock.seconds()
+
+
+    def callLater(self, when, what, *a, **kw):
+        """
+        See L{twisted.internet.interfaces.IReactorTime.callLater}.
+        """
+        dc = base.DelayedCall(self.seconds() + when,
+                              what, a, kw,
+                              self._cancelCall,
+                              self._moveCallSooner,
+                              self.seconds)
+        self._addCall(dc)
+        return dc
+
+
+    def getDelayedCalls(self):
+        """
+        See L{twisted.internet.interfaces.IReactorTime.getDelayedCalls}.
+        """
+        return self._slots.keys()
+
+
+    def _addCall(self, call):
+        """
+        Put C{call} into the bucket which will run at or just after
+        C{call.time}, and make sure a bucket will be run.
+        """
+        if not self._slots:
+            # Buckets were not being run while there were no calls; skip
+            # the ones which have gone by in the meantime.
+            self._lastSlot = max(self._lastSlot, self._currentSlot() - 1)
+        slot = max(int(math.ceil(call.time / self.resolution)),
+                   self._lastSlot + 1)
+        self._slots[call] = slot
+        bucket = self._buckets.get(slot)
+        if bucket is None:
+            bucket = self._buckets[slot] = set()
+        bucket.add(call)
+        if self._tickCall is None:
+            self._scheduleTick()
+
+
+    def _removeCall(self, call):
+        """
+        Take C{call} out of the bucket it is in.
+        """
+        slot = self._slots.pop(call)
+        bucket = self._buckets.get(slot)
+        # The bucket is already gone if it is being run right now.
+        if bucket is not None:
+            bucket.discard(call)
+            if not bucket:
+                del self._buckets[slot]
+
+
+    def _cancelCall(self, call):
+        """
+        Forget about C{call}, which is being cancelled.  Stop running buckets
+        if it was the last pending call.
+        """
+        self._removeCall(call)
+        if not self._slots and self._tickCall is not None:
+            self._tickCall.cancel()
+            self._tickCall = None
+
+
+    def _moveCallSooner(self, call):
+        """
+        Move C{call}, which has just been rescheduled to an earlier time, to
+        the corresponding bucket.
+        """
+        self._removeCall(call)
+        self._addCall(call)
+
+
+    def _scheduleTick(self):
+        """
+        Arrange for L{_tick} to be called when the next bucket is due.
+        """
+        nextTime = (self._lastSlot + 1) * self.resolution
+        self._tickCall = self.clock.callLater(
+            max(0, nextTime - self.seconds()), self._tick)
+
+
+    def _tick(self):
+        """
+        Run all calls in buckets which are now due, moving those which have
+        been rescheduled to a later time into later buckets.
+        """
+        self._tickCall = None
+        now = self.seconds()
+        currentSlot = self._currentSlot()
+        if currentSlot - self._lastSlot > len(self._buckets):
+            due = sorted([slot for slot in self._buckets
+                          if slot <= currentSlot])
+        else:
+            due = xrange(self._lastSlot + 1, currentSlot + 1)
+        self._lastSlot = currentSlot
+
+        for slot in due:
+            bucket = self._buckets.pop(slot, None)
+            if bucket is None:
+                continue
+            for call in sorted(bucket, key=lambda call: call.getTime()):
+                if call not in self._slots:
+                    # Cancelled by an earlier call in this bucket.
+                    continue
+                del self._slots[call]
+                if call.getTime() > now:
+                    call.activate_delay()
+                    self._addCall(call)
+                    continue
+                call.called = 1
+                try:
+                    call.func(*call.args, **call.kw)
+                except:
+                    log.err(None, "Unhandled error in CoarseClock call")
+
+        if self._slots and self._tickCall is None:
+            self._scheduleTick()
+
+
+
 def deferLater(clock, delay, callable, *args, **kw):
     """
     Call the given function after a certain period of time has passed.
@@ -756,7 +947,7 @@ def deferLater(clock, delay, callable, *args, **kw):
 __all__ = [
     'LoopingCall',
 
-    'Clock',
+    'Clock', 'CoarseClock',
 
     'SchedulerStopped', 'Cooperator', 'coiterate',
 
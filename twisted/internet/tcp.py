@@ -18,7 +18,8 @@ import socket
 import sys
 import operator
 
-from zope.interface import implements, classImplements
+from zope.interface import implements, implementedBy, classImplements
+from zope.interface import classImplementsOnly
 
 try:
     from OpenSSL import SSL
@@ -68,7 +69,11 @@ else:
 
     from os import strerror
 
-from errno import errorcode
+from errno import errorcode, ENOPROTOOPT
+
+# Not every platform (or every version of the socket module) knows about
+# SO_REUSEPORT.
+_SO_REUSEPORT = getattr(socket, 'SO_REUSEPORT', None)
 
 # Twisted Imports
 from twisted.internet import base, address, fdesc
@@ -76,7 +81,7 @@ from twisted.internet.task import deferLater
 from twisted.python import log, failure, reflect
 from twisted.python.util import unsignedID
 from twisted.internet.error import CannotListenError
-from twisted.internet import abstract, main, interfaces, error
+from twisted.internet import abstract, main, interfaces, error, defer
 
 
 
@@ -103,6 +108,8 @@ class _SocketCloser(object):
 
 class _TLSMixin:
     _socketShutdownMethod = 'sock_shutdown'
+    # Everything written must go through the SSL connection object.
+    _vectorWrites = False
 
     writeBlockedOnRead = 0
     readBlockedOnWrite = 0
@@ -358,11 +365,98 @@ def _getTLSClass(klass, _existing={}):
     if klass not in _existing:
         class TLSConnection(_TLSMixin, klass):
             implements(interfaces.ISSLTransport)
+        # Everything sent over a TLS connection has to be encrypted first.
+        classImplementsOnly(TLSConnection, *[
+                iface for iface in implementedBy(TLSConnection)
+                if iface is not interfaces.ISendFileTransport])
         _existing[klass] = TLSConnection
     return _existing[klass]
 
 
 
+class _SendFileProducer(object):
+    """
+    Send part of a file over a connection with C{sendfile(2)}.
+
+    This is registered as a pull producer with the connection, so that it is
+    asked to send more each time the connection's write buffer is empty and
+    the socket is writeable.  It sends directly from the file to the socket
+    rather than writing to the connection.
+
+    @ivar connection: The L{Connection} to send the file over.
+    @ivar fileno: The file descriptor of the file to send.
+    @ivar offset: The offset in the file of the next byte to send.
+    @ivar remaining: The number of bytes still to be sent.
+    @ivar deferred: The L{Deferred} returned by L{Connection.sendFile}.
+    """
+    implements(interfaces.IPullProducer)
+
+    def __init__(self, connection, fileno, offset, count):
+        self.connection = connection
+        self.fileno = fileno
+        self.offset = offset
+        self.remaining = count
+        self.deferred = defer.Deferred()
+
+
+    def resumeProducing(self):
+        """
+        Send as much of the file as the socket will take right now.
+        """
+        connection = self.connection
+        if connection.dataBuffer or connection._tempDataBuffer:
+            # Data written before the file has to go first; the connection
+            # will ask again once it has been sent.
+            return
+        while self.remaining:
+            try:
+                sent = fdesc._sendfile(
+                    connection.socket.fileno(), self.fileno, self.offset,
+                    min(self.remaining, connection.SEND_LIMIT))
+            except (OSError, IOError), e:
+                if e.errno == EINTR:
+                    continue
+                elif e.errno in (EWOULDBLOCK, ENOBUFS):
+                    break
+                self._finished(failure.Failure())
+                connection.loseConnection()
+                return
+            if sent == 0:
+                self._finished(failure.Failure(error.ConnectionLost(
+                            "End of file reached before %d more bytes "
+                            "could be sent." % (self.remaining,))))
+                connection.loseConnection()
+                return
+            self.offset += sent
+            self.remaining -= sent
+        if self.remaining:
+            # Wait for the socket to be writeable again.
+            connection.startWriting()
+        else:
+            self._finished(None)
+
+
+    def stopProducing(self):
+        """
+        The connection was lost before the whole file could be sent.
+        """
+        self.connection = None
+        self.deferred.errback(error.ConnectionLost())
+
+
+    def _finished(self, result):
+        """
+        Stop sending and fire C{self.deferred} with C{result}.
+        """
+        connection, self.connection = self.connection, None
+        connection.unregisterProducer()
+        if isinstance(result, failure.Failure):
+            self.deferred.errback(result)
+        else:
+            self.deferred.callback(result)
+
+
+
 class Connection(abstract.FileDescriptor, _SocketCloser):
     """
     Superclass of all socket-based FileDescriptors.
@@ -491,6 +585,30 @@ class Connection(abstract.FileDescriptor, _SocketCloser):
                 return main.CONNECTION_LOST
 
 
+    _vectorWrites = fdesc.canWriteVector
+
+    def writeSomeDataVector(self, vector):
+        """
+        Write as much as possible of the given sequence of strings to this
+        TCP connection with a single system call, without joining them.
+
+        The result is interpreted in the same way as the result of
+        L{writeSomeData}.
+        """
+        return fdesc.writevToFD(self.socket.fileno(), vector)
+
+
+    def sendFile(self, fileObject, offset, count):
+        """
+        See L{interfaces.ISendFileTransport.sendFile}.
+
+        This is only available if L{fdesc.canSendFile} is true.
+        """
+        producer = _SendFileProducer(self, fileObject.fileno(), offset, count)
+        self.registerProducer(producer, False)
+        return producer.deferred
+
+
     def _closeWriteConnection(self):
         try:
             getattr(self.socket, self._socketShutdownMethod)(1)
@@ -551,6 +669,9 @@ class Connection(abstract.FileDescriptor, _SocketCloser):
 if SSL:
     classImplements(Connection, interfaces.ITLSTransport)
 
+if fdesc.canSendFile:
+    classImplements(Connection, interfaces.ISendFileTransport)
+
 class BaseClient(Connection):
     """A base class for client TCP (and similiar) sockets.
     """
@@ -815,6 +936,11 @@ class Port(base.BasePort, _SocketCloser):
     @ivar connected: flag set once the listen has successfully been called on
         the socket.
     @type connected: C{bool}
+
+    @ivar reusePort: flag indicating that C{SO_REUSEPORT} should be set on the
+        socket, so that several processes can listen on the same address and
+        port and have the kernel balance incoming connections between them.
+    @type reusePort: C{bool}
     """
 
     implements(interfaces.IListeningPort)
@@ -826,12 +952,14 @@ class Port(base.BasePort, _SocketCloser):
     sessionno = 0
     interface = ''
     backlog = 50
+    reusePort = False
 
     # Actual port number being listened on, only set to a non-None
     # value when we are actually listening.
     _realPortNumber = None
 
-    def __init__(self, port, factory, backlog=50, interface='', reactor=None):
+    def __init__(self, port, factory, backlog=50, interface='', reactor=None,
+                 reusePort=False):
         """Initialize with a numeric port to listen on.
         """
         base.BasePort.__init__(self, reactor=reactor)
@@ -839,6 +967,7 @@ class Port(base.BasePort, _SocketCloser):
         self.factory = factory
         self.backlog = backlog
         self.interface = interface
+        self.reusePort = reusePort
 
     def __repr__(self):
         if self._realPortNumber is not None:
@@ -851,6 +980,13 @@ class Port(base.BasePort, _SocketCloser):
         s = base.BasePort.createInternetSocket(self)
         if platformType == "posix" and sys.platform != "cygwin":
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reusePort:
+            if _SO_REUSEPORT is None:
+                s.close()
+                raise socket.error(
+                    ENOPROTOOPT, "SO_REUSEPORT is not supported on this "
+                    "platform")
+            s.setsockopt(socket.SOL_SOCKET, _SO_REUSEPORT, 1)
         return s
 
 
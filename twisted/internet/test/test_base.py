@@ -14,7 +14,7 @@ from twisted.python.threadpool import ThreadPool
 from twisted.python.util import setIDFunction
 from twisted.internet.interfaces import IReactorTime, IReactorThreads
 from twisted.internet.error import DNSLookupError
-from twisted.internet.base import ThreadedResolver, DelayedCall
+from twisted.internet.base import ThreadedResolver, DelayedCall, ReactorBase
 from twisted.internet.task import Clock
 from twisted.trial.unittest import TestCase
 
@@ -270,3 +270,182 @@ class DelayedCallTests(TestCase):
         self.assertTrue(self.zero != self.one)
         self.assertFalse(self.zero != self.zero)
         self.assertFalse(self.one != self.one)
+
+
+
+class TimedCallReactor(ReactorBase):
+    """
+    A L{ReactorBase} with a settable clock and no I/O, suitable for
+    exercising the timed call machinery directly.
+
+    @ivar now: The value returned by L{seconds}.
+    """
+    now = 0.0
+
+    def installWaker(self):
+        pass
+
+
+    def seconds(self):
+        return self.now
+
+
+
+class WakeUpCountingReactor(TimedCallReactor):
+    """
+    A L{TimedCallReactor} which counts the times it is woken up.
+
+    @ivar wakeUps: The number of calls to L{wakeUp}.
+    """
+    wakeUps = 0
+
+    def wakeUp(self):
+        self.wakeUps += 1
+
+
+
+class CallFromThreadWakeUpTests(TestCase):
+    """
+    Tests for the coalescing of the wake ups made by
+    L{ReactorBase.callFromThread}.
+    """
+    def setUp(self):
+        self.reactor = WakeUpCountingReactor()
+        self.called = []
+
+
+    def test_wakeUpOnce(self):
+        """
+        Only the first of several calls queued before the reactor runs them
+        wakes the reactor up, and they are all run by the next
+        C{runUntilCurrent}.
+        """
+        for i in range(3):
+            self.reactor.callFromThread(self.called.append, i)
+        self.assertEquals(self.reactor.wakeUps, 1)
+        self.reactor.runUntilCurrent()
+        self.assertEquals(self.called, [0, 1, 2])
+
+        self.reactor.callFromThread(self.called.append, 3)
+        self.assertEquals(self.reactor.wakeUps, 2)
+
+
+    def test_queuedWhileRunning(self):
+        """
+        A call queued while the reactor is running the queued calls wakes it
+        up again, and is run by the next C{runUntilCurrent}.
+        """
+        def queueAnother():
+            self.reactor.callFromThread(self.called.append, 'later')
+        self.reactor.callFromThread(queueAnother)
+        self.reactor.runUntilCurrent()
+        self.assertEquals(self.called, [])
+        self.assertTrue(self.reactor.wakeUps >= 2)
+        self.reactor.runUntilCurrent()
+        self.assertEquals(self.called, ['later'])
+
+
+
+class TimedCallHeapTests(TestCase):
+    """
+    Tests for the heap of pending timed calls maintained by L{ReactorBase}.
+    """
+    def setUp(self):
+        self.reactor = TimedCallReactor()
+
+
+    def _schedule(self, delays):
+        """
+        Schedule one call for each delay in C{delays}, each of which records
+        its own delay in C{self.called}, and move them into the heap.
+
+        @return: A C{list} of the L{DelayedCall}s, in the order of C{delays}.
+        """
+        self.called = []
+        calls = [self.reactor.callLater(delay, self.called.append, delay)
+                 for delay in delays]
+        self.reactor._insertNewDelayedCalls()
+        return calls
+
+
+    def assertHeapConsistent(self):
+        """
+        Assert that every call in the heap knows its own position and that
+        the heap is ordered by scheduled time.
+        """
+        heap = self.reactor._pendingTimedCalls
+        for pos, call in enumerate(heap):
+            self.assertEquals(call._heapIndex, pos)
+            if pos:
+                self.assertTrue(heap[(pos - 1) // 2].time <= call.time)
+
+
+    def test_cancelRemovesFromHeap(self):
+        """
+        Cancelling a L{DelayedCall} which is in the heap removes it
+        immediately rather than leaving it for L{ReactorBase.runUntilCurrent}
+        to discard.
+        """
+        calls = self._schedule([5, 1, 4, 2, 3])
+        calls[2].cancel()
+        self.assertNotIn(calls[2], self.reactor._pendingTimedCalls)
+        self.assertIdentical(calls[2]._heapIndex, None)
+        self.assertEquals(len(self.reactor._pendingTimedCalls), 4)
+        self.assertHeapConsistent()
+
+
+    def test_cancelBeforeInsertion(self):
+        """
+        A L{DelayedCall} cancelled before it has been moved into the heap is
+        never added to it.
+        """
+        call = self.reactor.callLater(1, lambda: None)
+        call.cancel()
+        self.reactor._insertNewDelayedCalls()
+        self.assertEquals(self.reactor._pendingTimedCalls, [])
+
+
+    def test_resetSooner(self):
+        """
+        Resetting a L{DelayedCall} to an earlier time moves it to the
+        appropriate position in the heap.
+        """
+        calls = self._schedule([5, 1, 4, 2, 3])
+        calls[0].reset(0.5)
+        self.assertIdentical(self.reactor._pendingTimedCalls[0], calls[0])
+        self.assertHeapConsistent()
+
+
+    def test_delayNegative(self):
+        """
+        Delaying a L{DelayedCall} by a negative amount moves it to the
+        appropriate position in the heap.
+        """
+        calls = self._schedule([5, 1, 4, 2, 3])
+        calls[2].delay(-3.5)
+        self.assertIdentical(self.reactor._pendingTimedCalls[0], calls[2])
+        self.assertHeapConsistent()
+
+
+    def test_runInOrder(self):
+        """
+        L{ReactorBase.runUntilCurrent} runs every due call in the order of
+        its scheduled time, taking cancellations, resets and delays into
+        account, and leaves the remaining calls in a consistent heap.
+        """
+        delays = range(20)
+        calls = self._schedule(delays)
+        calls[3].cancel()
+        calls[17].reset(0.5)
+        calls[4].delay(20)
+        calls[10].reset(30)
+        calls[12].delay(-11.75)
+        self.reactor.now = 15
+        self.reactor.runUntilCurrent()
+        self.assertEquals(
+            self.called, [0, 12, 17, 1, 2, 5, 6, 7, 8, 9, 11, 13, 14, 15])
+        self.assertHeapConsistent()
+        self.reactor.now = 100
+        self.reactor.runUntilCurrent()
+        self.assertEquals(self.called[14:], [16, 18, 19, 4, 10])
+        self.assertEquals(self.reactor._pendingTimedCalls, [])
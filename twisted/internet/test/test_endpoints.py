@@ -936,6 +936,36 @@ class ServerStringTests(unittest.TestCase):
         self.assertEquals(server._port, 1234)
         self.assertEquals(server._backlog, 12)
         self.assertEquals(server._interface, "10.0.0.1")
+        self.assertEquals(server._reusePort, False)
+
+
+    def test_tcpReusePort(self):
+        """
+        The C{reusePort} argument of a TCP strports description is converted
+        to a boolean and passed on to L{TCP4ServerEndpoint}, which passes it on
+        to L{IReactorTCP.listenTCP}.
+        """
+        listenCalls = []
+        class ReusePortReactor(object):
+            def listenTCP(self, *args, **kwargs):
+                listenCalls.append((args, kwargs))
+
+        factory = object()
+        server = endpoints.serverFromString(
+            ReusePortReactor(), "tcp:1234:reusePort=1")
+        self.assertEquals(server._reusePort, True)
+        server.listen(factory)
+        self.assertEquals(
+            listenCalls,
+            [((1234, factory),
+              {'backlog': 50, 'interface': '', 'reusePort': True})])
+
+        server = endpoints.serverFromString(
+            ReusePortReactor(), "tcp:1234:reusePort=0")
+        self.assertEquals(server._reusePort, False)
+        server.listen(factory)
+        self.assertEquals(
+            listenCalls[1], ((1234, factory), {'backlog': 50, 'interface': ''}))
 
 
     def test_ssl(self):
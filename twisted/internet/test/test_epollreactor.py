@@ -0,0 +1,211 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.internet.epollreactor}.
+"""
+
+import socket
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.abstract import FileDescriptor
+
+try:
+    from twisted.internet import epollreactor
+except ImportError:
+    epollreactor = None
+
+
+
+class RecordingDescriptor(FileDescriptor):
+    """
+    A descriptor for one end of a socket pair which records the events
+    dispatched to it.
+    """
+    def __init__(self, reactor, skt):
+        FileDescriptor.__init__(self, reactor)
+        self.socket = skt
+        self.events = []
+
+
+    def fileno(self):
+        return self.socket.fileno()
+
+
+    def doRead(self):
+        self.events.append('read')
+        self.socket.recv(1024)
+
+
+    def doWrite(self):
+        self.events.append('write')
+
+
+
+class FakePoller(object):
+    """
+    A poller which records the arguments it is waited with.
+    """
+    def __init__(self):
+        self.waits = []
+
+
+    def wait(self, maxEvents, timeout):
+        self.waits.append(maxEvents)
+        return []
+
+
+
+class RecordingPoller(object):
+    """
+    A wrapper around a real poller which records the events it reports.
+    """
+    def __init__(self, poller):
+        self.poller = poller
+        self.reported = []
+
+
+    def _control(self, cmd, fd, flags):
+        return self.poller._control(cmd, fd, flags)
+
+
+    def wait(self, maxEvents, timeout):
+        events = self.poller.wait(maxEvents, timeout)
+        self.reported.extend(events)
+        return events
+
+
+
+class EPollReactorTests(TestCase):
+    """
+    Tests for L{epollreactor.EPollReactor}.
+    """
+    if epollreactor is None:
+        skip = "epoll is not supported on this platform"
+
+    def setUp(self):
+        client, server = socket.socketpair()
+        self.addCleanup(client.close)
+        self.addCleanup(server.close)
+        self.reactor = epollreactor.EPollReactor()
+        self.addCleanup(self._cleanUpReactor)
+        self.descriptor = RecordingDescriptor(self.reactor, client)
+        self.peer = server
+
+
+    def _cleanUpReactor(self):
+        """
+        Unregister every descriptor and close the reactor's waker.
+        """
+        self.reactor.removeAll()
+        for reader in self.reactor._internalReaders:
+            self.reactor.removeReader(reader)
+            reader.connectionLost(None)
+        self.reactor._internalReaders.clear()
+
+
+    def test_toggleWriting(self):
+        """
+        Starting and stopping writing again on a descriptor which is also
+        reading does not call C{epoll_ctl} after the first time.
+        """
+        self.reactor.addReader(self.descriptor)
+        self.reactor.addWriter(self.descriptor)
+        calls = self.reactor.controlCalls
+        for i in range(10):
+            self.reactor.removeWriter(self.descriptor)
+            self.reactor.addWriter(self.descriptor)
+        self.assertEqual(self.reactor.controlCalls, calls)
+        self.assertIn(self.descriptor, self.reactor.getWriters())
+        self.reactor.doPoll(0)
+        self.assertEqual(self.descriptor.events, ['write'])
+
+
+    def test_staleEventDropped(self):
+        """
+        An event a descriptor is still registered for but no longer wants is
+        dropped before the next poll, so it is neither reported nor
+        dispatched.
+        """
+        self.reactor.addReader(self.descriptor)
+        self.reactor.addWriter(self.descriptor)
+        self.reactor.removeWriter(self.descriptor)
+        calls = self.reactor.controlCalls
+        self.reactor.doPoll(0)
+        self.assertEqual(self.descriptor.events, [])
+        self.assertEqual(self.reactor.controlCalls, calls + 1)
+        self.assertEqual(
+            self.reactor._masks[self.descriptor.fileno()], epollreactor._epoll.IN)
+
+        self.peer.send('x')
+        self.reactor.doPoll(0)
+        self.assertEqual(self.descriptor.events, ['read'])
+        self.assertEqual(self.reactor.controlCalls, calls + 1)
+
+
+    def test_toggleWritingBetweenPolls(self):
+        """
+        Starting and stopping writing on a descriptor which is also reading,
+        with a poll after each, costs one C{epoll_ctl} call each time, and
+        the poller only reports the descriptor writable while it is writing.
+        """
+        poller = self.reactor._poller
+        self.reactor._poller = RecordingPoller(poller)
+        self.addCleanup(setattr, self.reactor, '_poller', poller)
+        self.reactor.addReader(self.descriptor)
+        self.reactor.doPoll(0)
+        calls = self.reactor.controlCalls
+        for i in range(10):
+            self.reactor.addWriter(self.descriptor)
+            self.reactor.doPoll(0)
+            self.reactor.removeWriter(self.descriptor)
+            self.reactor.doPoll(0)
+        self.assertEqual(self.reactor.controlCalls, calls + 20)
+        self.assertEqual(self.descriptor.events, ['write'] * 10)
+        self.assertEqual(len(self.reactor._poller.reported), 10)
+
+
+    def test_removeAndAddAgain(self):
+        """
+        A descriptor which is no longer reading or writing is unregistered,
+        and may be added again afterwards.
+        """
+        self.reactor.addReader(self.descriptor)
+        self.reactor.addWriter(self.descriptor)
+        self.reactor.removeWriter(self.descriptor)
+        self.reactor.removeReader(self.descriptor)
+        self.assertNotIn(self.descriptor.fileno(), self.reactor._masks)
+
+        self.reactor.addWriter(self.descriptor)
+        self.reactor.doPoll(0)
+        self.assertEqual(self.descriptor.events, ['write'])
+
+
+    def test_lastIterationControlCalls(self):
+        """
+        L{EPollReactor.lastIterationControlCalls} is the number of
+        C{epoll_ctl} calls made since the previous call to C{doPoll}.
+        """
+        self.reactor.doPoll(0)
+        self.reactor.addReader(self.descriptor)
+        self.reactor.addWriter(self.descriptor)
+        self.reactor.doPoll(0)
+        self.assertEqual(self.reactor.lastIterationControlCalls, 2)
+        self.reactor.doPoll(0)
+        self.assertEqual(self.reactor.lastIterationControlCalls, 0)
+
+
+    def test_maxEvents(self):
+        """
+        L{EPollReactor.maxEvents} limits the number of events asked for in
+        each call to C{doPoll}, which otherwise asks for one per registered
+        descriptor.
+        """
+        self.reactor.addReader(self.descriptor)
+        poller = self.reactor._poller
+        self.reactor._poller = FakePoller()
+        self.addCleanup(setattr, self.reactor, '_poller', poller)
+        self.reactor.doPoll(0)
+        self.reactor.maxEvents = 1
+        self.reactor.doPoll(0)
+        self.assertEqual(self.reactor._poller.waits, [2, 1])
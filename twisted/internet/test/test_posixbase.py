@@ -5,6 +5,7 @@
 Tests for L{twisted.internet.posixbase} and supporting code.
 """
 
+from twisted.python import log
 from twisted.python.compat import set
 from twisted.trial.unittest import TestCase
 from twisted.internet.defer import Deferred
@@ -172,6 +173,42 @@ class PosixReactorBaseTests(TestCase):
             warnings[0]['message'])
 
 
+    def test_eventDispatcher(self):
+        """
+        L{PosixReactorBase._getEventDispatcher} returns L{log.callWithLogger}
+        by default and L{log.callWithLoggerOnError} if C{lazyLogContext} is
+        set.
+        """
+        reactor = TrivialReactor()
+        self.assertIdentical(
+            reactor._getEventDispatcher(), log.callWithLogger)
+        reactor.lazyLogContext = True
+        self.assertIdentical(
+            reactor._getEventDispatcher(), log.callWithLoggerOnError)
+
+
+    def test_lazyDispatchErrorLogged(self):
+        """
+        With C{lazyLogContext} set, L{PosixReactorBase._logDispatchError} logs
+        the current failure with the selectable's log prefix as the system.
+        """
+        class Selectable(object):
+            def logPrefix(self):
+                return "selectable"
+
+        events = []
+        log.addObserver(events.append)
+        self.addCleanup(log.removeObserver, events.append)
+        reactor = TrivialReactor()
+        reactor.lazyLogContext = True
+        try:
+            1 / 0
+        except:
+            reactor._logDispatchError(Selectable())
+        self.assertEqual(events[0]["system"], "selectable")
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+
+
 
 class TCPPortTests(TestCase):
     """
@@ -15,7 +15,7 @@ from zope.interface.verify import verifyObject
 from twisted.internet.test.reactormixins import ReactorBuilder
 from twisted.internet.error import DNSLookupError
 from twisted.internet.interfaces import (
-    IResolverSimple, IConnector, IReactorFDSet)
+    IResolverSimple, IConnector, IReactorFDSet, ISendFileTransport)
 from twisted.internet.address import IPv4Address
 from twisted.internet.defer import Deferred, DeferredList, succeed, fail, maybeDeferred
 from twisted.internet.endpoints import TCP4ClientEndpoint
@@ -543,6 +543,59 @@ class TCPConnectionTestsBuilder(ReactorBuilder):
         return d
 
 
+    def test_sendFile(self):
+        """
+        L{ISendFileTransport.sendFile} sends the requested part of a file
+        after any data already written to the transport, and the L{Deferred}
+        it returns fires once all of it has been sent.
+        """
+        reactor = self.buildReactor()
+        path = self.mktemp()
+        content = ''.join([chr(i % 256) for i in range(300000)])
+        fObj = open(path, 'wb')
+        fObj.write(content)
+        fObj.close()
+        fObj = open(path, 'rb')
+        self.addCleanup(fObj.close)
+
+        sent = []
+        unsupported = []
+        class SendFileProtocol(Protocol):
+            def connectionMade(self):
+                if not ISendFileTransport.providedBy(self.transport):
+                    unsupported.append(self.transport)
+                    self.transport.loseConnection()
+                    return
+                self.transport.write('header')
+                d = self.transport.sendFile(fObj, 10, len(content) - 20)
+                d.addCallback(sent.append)
+                d.addErrback(log.err)
+                d.addCallback(lambda ign: self.transport.loseConnection())
+
+        received = []
+        class ReceivingProtocol(Protocol):
+            def dataReceived(self, data):
+                received.append(data)
+
+            def connectionLost(self, reason):
+                reactor.stop()
+
+        sf = ServerFactory()
+        sf.protocol = SendFileProtocol
+        port = reactor.listenTCP(0, sf, interface='127.0.0.1')
+        cf = ClientFactory()
+        cf.protocol = ReceivingProtocol
+        reactor.connectTCP('127.0.0.1', port.getHost().port, cf)
+        self.runReactor(reactor)
+
+        if unsupported:
+            raise SkipTest("%s does not provide ISendFileTransport" % (
+                    reactor.__class__.__name__,))
+        self.assertEquals(sent, [None])
+        self.assertEquals(
+            ''.join(received), 'header' + content[10:-10])
+
+
 
 globals().update(TCPClientTestsBuilder.makeTestCaseClasses())
 globals().update(TCPPortTestsBuilder.makeTestCaseClasses())
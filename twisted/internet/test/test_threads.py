@@ -11,7 +11,7 @@ from weakref import ref
 import gc
 
 from twisted.internet.test.reactormixins import ReactorBuilder
-from twisted.python.threadpool import ThreadPool
+from twisted.python.threadpool import ThreadPool, AdaptiveThreadPool
 
 
 class ThreadTestsBuilder(ReactorBuilder):
@@ -103,6 +103,19 @@ class ThreadTestsBuilder(ReactorBuilder):
         self.assertTrue(after - before < 30)
 
 
+    def test_threadpoolFactory(self):
+        """
+        The reactor's threadpool is created by its C{threadpoolFactory}, and
+        C{reactor.suggestThreadPoolSize()} sets its maximum size.
+        """
+        reactor = self.buildReactor()
+        reactor.threadpoolFactory = AdaptiveThreadPool
+        reactor.suggestThreadPoolSize(13)
+        pool = reactor.getThreadPool()
+        self.assertIsInstance(pool, AdaptiveThreadPool)
+        self.assertEqual(pool.max, 13)
+
+
     def test_stopThreadPool(self):
         """
         When the reactor stops, L{ReactorBase._stopThreadPool} drops the
@@ -41,6 +41,9 @@ def deferToThreadPool(reactor, threadpool, f, *args, **kwargs):
     d = defer.Deferred()
 
     def onResult(success, result):
+        # Each result goes through the reactor's ordered queue of calls from
+        # threads, so it fires after any call its thread made before it.
+        # Results arriving together still wake the reactor up only once.
         if success:
             reactor.callFromThread(d.callback, result)
         else:
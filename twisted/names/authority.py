@@ -15,6 +15,11 @@ from twisted.python import failure
 
 import common
 
+# The tokens of a zone file line which are a record class or a record type
+# rather than an owner name.
+_CLASSES = dict.fromkeys(dns.QUERY_CLASSES.values())
+_MARKERS = dict.fromkeys(dns.QUERY_CLASSES.values() + dns.QUERY_TYPES.values())
+
 def getSerial(filename = '/tmp/twisted-names.serial'):
     """Return a monotonically increasing (across program runs) integer.
 
@@ -60,14 +65,41 @@ def getSerial(filename = '/tmp/twisted-names.serial'):
 
 
 class FileAuthority(common.ResolverBase):
-    """An Authority that is loaded from a file."""
+    """
+    An Authority that is loaded from a file.
+
+    @ivar soa: A two-tuple of the name of the zone and its L{dns.Record_SOA}.
+
+    @ivar records: A mapping from the lower case names in the zone to lists
+        of their records.  When C{records} is replaced, the indexes used to
+        answer queries are rebuilt from it; code which changes it in place
+        instead must call L{recordsChanged}.
+    @type records: C{dict}
+
+    @ivar _indexed: The C{records} dictionary the indexes were built from.
+
+    @ivar _index: A mapping from C{(name, type)} to a tuple of the records
+        of that type, for each name with at least C{_indexThreshold}
+        records.  The records of names with fewer are quicker to search
+        than to index.
+
+    @ivar _addresses: A mapping from the lower case names which I{NS},
+        I{MX} and I{CNAME} records in the zone refer to, to tuples of their
+        I{A} records, which are served in the additional section.
+    """
 
     soa = None
     records = None
 
+    _indexThreshold = 8
+    _indexed = None
+    _index = None
+    _addresses = None
+
     def __init__(self, filename):
         common.ResolverBase.__init__(self)
         self.loadFile(filename)
+        self._buildIndexes()
         self._cache = {}
 
 
@@ -75,23 +107,88 @@ class FileAuthority(common.ResolverBase):
         self.__dict__ = state
 #        print 'setstate ', self.soa
 
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in '_indexed', '_index', '_addresses':
+            state.pop(name, None)
+        return state
+
+
+    def recordsChanged(self):
+        """
+        Rebuild the indexes used to answer queries after C{records} has been
+        changed in place.
+        """
+        self._indexed = None
+
+
+    def _buildIndexes(self):
+        """
+        Build C{_index} and C{_addresses} from C{records}.
+        """
+        records = self.records
+        index = {}
+        targets = {}
+        for name, domainRecords in records.iteritems():
+            if len(domainRecords) >= self._indexThreshold:
+                for record in domainRecords:
+                    index.setdefault((name, record.TYPE), []).append(record)
+            for record in domainRecords:
+                if record.TYPE in (dns.NS, dns.CNAME, dns.MX):
+                    targets[str(record.name).lower()] = None
+        for key, value in index.iteritems():
+            index[key] = tuple(value)
+        self._index = index
+        addresses = {}
+        for target in targets:
+            found = [record for record in records.get(target, ())
+                     if record.TYPE == dns.A]
+            if found:
+                addresses[target] = tuple(found)
+        self._addresses = addresses
+        self._indexed = records
+
+
+    def _candidates(self, name, domainRecords, type):
+        """
+        Return the records of C{name} which may be part of the response to a
+        query for C{type}: those of that type, and its I{NS} and I{CNAME}
+        records.
+
+        @param domainRecords: All the records of C{name}.
+        """
+        if type == dns.ALL_RECORDS or len(domainRecords) < self._indexThreshold:
+            return domainRecords
+        index = self._index
+        candidates = index.get((name, type), ())
+        for other in dns.NS, dns.CNAME:
+            if other != type:
+                candidates = candidates + index.get((name, other), ())
+        return candidates
+
+
     def _lookup(self, name, cls, type, timeout = None):
         cnames = []
         results = []
         authority = []
         additional = []
         default_ttl = max(self.soa[1].minimum, self.soa[1].expire)
+        lname = name.lower()
 
-        domain_records = self.records.get(name.lower())
+        domain_records = self.records.get(lname)
 
         if domain_records:
-            for record in domain_records:
+            if self._indexed is not self.records:
+                self._buildIndexes()
+
+            for record in self._candidates(lname, domain_records, type):
                 if record.ttl is not None:
                     ttl = record.ttl
                 else:
                     ttl = default_ttl
 
-                if record.TYPE == dns.NS and name.lower() != self.soa[0].lower():
+                if record.TYPE == dns.NS and lname != self.soa[0].lower():
                     # NS record belong to a child zone: this is a referral.  As
                     # NS records are authoritative in the child zone, ours here
                     # are not.  RFC 2181, section 6.1.
@@ -113,22 +210,26 @@ class FileAuthority(common.ResolverBase):
                 section = {dns.NS: additional, dns.CNAME: results, dns.MX: additional}.get(record.type)
                 if section is not None:
                     n = str(record.payload.name)
-                    for rec in self.records.get(n.lower(), ()):
-                        if rec.TYPE == dns.A:
-                            section.append(
-                                dns.RRHeader(n, dns.A, dns.IN, rec.ttl or default_ttl, rec, auth=True)
-                            )
+                    for rec in self._addresses.get(n.lower(), ()):
+                        section.append(
+                            dns.RRHeader(n, dns.A, dns.IN, rec.ttl or default_ttl, rec, auth=True)
+                        )
 
             if not results and not authority:
                 # Empty response. Include SOA record to allow clients to cache
                 # this response.  RFC 1034, sections 3.7 and 4.3.4, and RFC 2181
                 # section 7.1.
+                last = domain_records[-1]
+                if last.ttl is not None:
+                    ttl = last.ttl
+                else:
+                    ttl = default_ttl
                 authority.append(
                     dns.RRHeader(self.soa[0], dns.SOA, dns.IN, ttl, self.soa[1], auth=True)
                     )
             return defer.succeed((results, authority, additional))
         else:
-            if name.lower().endswith(self.soa[0].lower()):
+            if lname.endswith(self.soa[0].lower()):
                 # We are the authority and we didn't find it.  Goodbye.
                 return defer.fail(failure.Failure(dns.AuthoritativeDomainError(name)))
             return defer.fail(failure.Failure(dns.DomainError(name)))
@@ -200,7 +301,11 @@ class BindAuthority(FileAuthority):
 
     def loadFile(self, filename):
         self.origin = os.path.basename(filename) + '.' # XXX - this might suck
-        lines = open(filename).readlines()
+        f = open(filename)
+        try:
+            lines = f.readlines()
+        finally:
+            f.close()
         lines = self.stripComments(lines)
         lines = self.collapseContinuations(lines)
         self.parseLines(lines)
@@ -242,22 +347,30 @@ class BindAuthority(FileAuthority):
         ORIGIN = self.origin
 
         self.records = {}
-
-        for (line, index) in zip(lines, range(len(lines))):
-            if line[0] == '$TTL':
-                TTL = dns.str2time(line[1])
-            elif line[0] == '$ORIGIN':
-                ORIGIN = line[1]
-            elif line[0] == '$INCLUDE': # XXX - oh, fuck me
-                raise NotImplementedError('$INCLUDE directive not implemented')
-            elif line[0] == '$GENERATE':
-                raise NotImplementedError('$GENERATE directive not implemented')
-            else:
-                self.parseRecordLine(ORIGIN, TTL, line)
+        # Identical records, such as the NS records of many delegations to
+        # the same servers, are stored once.
+        self._sharedRecords = {}
+
+        try:
+            for line in lines:
+                if line[0] == '$TTL':
+                    TTL = dns.str2time(line[1])
+                elif line[0] == '$ORIGIN':
+                    ORIGIN = line[1]
+                elif line[0] == '$INCLUDE': # XXX - oh, fuck me
+                    raise NotImplementedError('$INCLUDE directive not implemented')
+                elif line[0] == '$GENERATE':
+                    raise NotImplementedError('$GENERATE directive not implemented')
+                else:
+                    self.parseRecordLine(ORIGIN, TTL, line)
+        finally:
+            del self._sharedRecords
 
 
     def addRecord(self, owner, ttl, type, domain, cls, rdata):
         if not domain.endswith('.'):
+            if owner.endswith('.'):
+                owner = owner[:-1]
             domain = domain + '.' + owner
         else:
             domain = domain[:-1]
@@ -273,9 +386,11 @@ class BindAuthority(FileAuthority):
         if record:
             r = record(*rdata)
             r.ttl = ttl
+            shared = getattr(self, '_sharedRecords', None)
+            if shared is not None:
+                r = shared.setdefault(r, r)
             self.records.setdefault(domain.lower(), []).append(r)
 
-            print 'Adding IN Record', domain, ttl, r
             if type == 'SOA':
                 self.soa = (domain, r)
         else:
@@ -286,7 +401,7 @@ class BindAuthority(FileAuthority):
     # This file ends here.  Read no further.
     #
     def parseRecordLine(self, origin, ttl, line):
-        MARKERS = dns.QUERY_CLASSES.values() + dns.QUERY_TYPES.values()
+        MARKERS = _MARKERS
         cls = 'IN'
         owner = origin
 
@@ -308,7 +423,7 @@ class BindAuthority(FileAuthority):
             line = line[1:]
 #            print 'domain is ', domain
 
-        if line[0] in dns.QUERY_CLASSES.values():
+        if line[0] in _CLASSES:
             cls = line[0]
             line = line[1:]
 #            print 'cls is ', cls
@@ -320,7 +435,7 @@ class BindAuthority(FileAuthority):
             ttl = int(line[0])
             line = line[1:]
 #            print 'ttl is ', ttl
-            if line[0] in dns.QUERY_CLASSES.values():
+            if line[0] in _CLASSES:
                 cls = line[0]
                 line = line[1:]
 #                print 'cls is ', cls
@@ -2,8 +2,17 @@
 # Copyright (c) Twisted Matrix Laboratories.
 # See LICENSE for details.
 
+"""
+An in-memory cache of DNS responses.
 
-import time
+Entries expire lazily: an expired entry is dropped when it is looked up, or
+when a later response is cached after its expiry time, so no timer is needed
+per entry.  The number of entries can be bounded, in which case the least
+recently used entries are evicted to make room for new ones.  Negative
+responses are cached as described in RFC 2308.
+"""
+
+import heapq
 
 from zope.interface import implements
 
@@ -13,84 +22,393 @@ from twisted.internet import interfaces, defer
 
 import common
 
+
+
+class _CacheEntry(object):
+    """
+    A cached response, linked into its L{CacheResolver}'s list of entries
+    in the order they were last used.
+
+    @ivar key: The key the entry is stored under: a L{dns.Query}, or a
+        C{(name, cls)} tuple for a cached name error.
+    @ivar when: The time the response was cached, in seconds since the
+        epoch.
+    @ivar expires: The time after which the entry must not be served, or
+        C{None} if it never expires.
+    @ivar payload: A three-tuple of the answer, authority and additional
+        records of the response, or C{None} for a cached name error.
+    @ivar served: The records last returned for this entry, as a
+        three-tuple of lists, or C{None}.
+    @ivar servedAt: The whole number of seconds the entry had been cached
+        for when C{served} was built.
+    @ivar previous: The entry used just before this one.
+    @ivar next: The entry used just after this one.
+    """
+    __slots__ = ('key', 'when', 'expires', 'payload', 'served', 'servedAt',
+                 'previous', 'next')
+
+    def __init__(self, key=None, when=None, expires=None, payload=None):
+        self.key = key
+        self.when = when
+        self.expires = expires
+        self.payload = payload
+        self.served = None
+        self.servedAt = None
+        self.previous = self.next = self
+
+
+
+def _negativeTTL(authority):
+    """
+    Find how long a negative response may be cached for, from the I{SOA}
+    record in its authority section, as described in RFC 2308 section 5.
+
+    @param authority: The records in the authority section of the response.
+    @type authority: C{list} of L{dns.RRHeader}
+
+    @return: The smaller of the I{SOA} record's TTL and its I{MINIMUM} field,
+        or C{None} if there is no I{SOA} record, in which case the response
+        should not be cached.
+    """
+    for record in authority:
+        if record.type == dns.SOA:
+            return min(record.ttl, record.payload.minimum)
+    return None
+
+
+
 class CacheResolver(common.ResolverBase):
-    """A resolver that serves records from a local, memory cache."""
+    """
+    A resolver that serves records from a local, memory cache.
+
+    @ivar cache: A mapping from the keys of cached responses to the
+        L{_CacheEntry} instances holding them.
+    @type cache: C{dict}
+
+    @ivar maxEntries: The greatest number of responses which will be
+        cached, or C{None} for no limit.  When the cache is full, the least
+        recently used response is evicted.
+    @type maxEntries: C{int} or C{NoneType}
+
+    @ivar _reactor: A provider of L{interfaces.IReactorTime} used to tell
+        the time.
+
+    @ivar _entries: A sentinel L{_CacheEntry} heading the circular list of
+        cached entries, from the least recently used to the most recently
+        used.
+
+    @ivar _expiries: A heap of C{(expires, entry)} tuples, used to find
+        entries which have expired.  It may hold tuples for entries which
+        have already been removed from the cache.
+    """
 
     implements(interfaces.IResolver)
 
     cache = None
+    maxEntries = None
+
+    def __init__(self, cache=None, verbose=0, reactor=None, maxEntries=None):
+        """
+        @param cache: Responses to start the cache with, as a mapping from
+            L{dns.Query} instances to C{(when, payload)} tuples, where
+            C{when} is the time the response was received and C{payload} is
+            a three-tuple of lists of answer, authority and additional
+            records.  A response without any records never expires.
 
-    def __init__(self, cache = None, verbose = 0):
+        @param reactor: A provider of L{interfaces.IReactorTime}, or
+            C{None} to use the global reactor.
+
+        @param maxEntries: The greatest number of responses to cache, or
+            C{None} for no limit.
+        """
         common.ResolverBase.__init__(self)
 
-        if cache is None:
-            cache = {}
-        self.cache = cache
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
         self.verbose = verbose
-        self.cancel = {}
+        self.maxEntries = maxEntries
+        self._reset()
+        if cache is not None:
+            for query, (when, payload) in cache.items():
+                self._add(query, when, self._expiry(when, payload), payload)
+
+
+    def _reset(self):
+        """
+        Empty the cache.
+        """
+        self.cache = {}
+        self._entries = _CacheEntry()
+        self._expiries = []
 
 
     def __setstate__(self, state):
+        # Older versions pickled the cache as a mapping from queries to
+        # (when, payload) tuples, with a mapping of expiry calls.
+        entries = state.pop('cache')
+        state.pop('cancel', None)
         self.__dict__ = state
+        if 'maxEntries' not in state:
+            self.maxEntries = None
+        from twisted.internet import reactor
+        self._reactor = reactor
+        self._reset()
 
-        now = time.time()
-        for (k, (when, (ans, add, ns))) in self.cache.items():
-            diff = now - when
-            for rec in ans + add + ns:
-                if rec.ttl < diff:
-                    del self.cache[k]
-                    break
+        if isinstance(entries, dict):
+            entries = [(key, when, self._expiry(when, payload), payload)
+                       for (key, (when, payload)) in entries.items()]
+        now = self._reactor.seconds()
+        for key, when, expires, payload in entries:
+            if expires is None or expires > now:
+                self._add(key, when, expires, payload)
 
 
     def __getstate__(self):
-        for c in self.cancel.values():
-            c.cancel()
-        self.cancel.clear()
-        return self.__dict__
+        state = self.__dict__.copy()
+        for name in '_reactor', '_entries', '_expiries':
+            del state[name]
+        state['cache'] = [
+            (entry.key, entry.when, entry.expires, entry.payload)
+            for entry in self._iterEntries()]
+        return state
+
+
+    def _iterEntries(self):
+        """
+        Iterate over the cached entries, from the least recently used to the
+        most recently used.
+        """
+        entry = self._entries.next
+        while entry is not self._entries:
+            yield entry
+            entry = entry.next
+
+
+    def _expiry(self, when, payload):
+        """
+        Work out when a response received at C{when} expires: when the
+        first of its records does or, for a negative response, when the
+        negative TTL from its I{SOA} record runs out, if that is sooner.
+
+        @return: The expiry time, or C{None} if the response has no records
+            to take it from.
+        """
+        answers, authority, additional = payload
+        ttls = [r.ttl for r in list(answers) + list(authority) +
+                list(additional)]
+        if not answers:
+            ttl = _negativeTTL(authority)
+            if ttl is not None:
+                ttls.append(ttl)
+        if not ttls:
+            return None
+        return when + min(ttls)
+
+
+    def _add(self, key, when, expires, payload):
+        """
+        Cache a response under C{key}, replacing any response already cached
+        there and evicting the least recently used entry if the cache is
+        full.
+        """
+        old = self.cache.get(key)
+        if old is not None:
+            self._unlink(old)
+        elif (self.maxEntries is not None and
+              len(self.cache) >= self.maxEntries):
+            self._remove(self._entries.next)
+
+        entry = _CacheEntry(key, when, expires, payload)
+        self.cache[key] = entry
+        self._link(entry)
+        if expires is not None:
+            heapq.heappush(self._expiries, (expires, entry))
+            # Removed and replaced entries leave their tuples behind; don't
+            # let them outnumber the live entries.
+            if len(self._expiries) > 2 * len(self.cache) + 64:
+                self._expiries = [
+                    (e.expires, e) for e in self.cache.itervalues()
+                    if e.expires is not None]
+                heapq.heapify(self._expiries)
+
+
+    def _link(self, entry):
+        """
+        Put C{entry} at the most recently used end of the list of entries.
+        """
+        last = self._entries.previous
+        entry.previous = last
+        entry.next = self._entries
+        last.next = entry
+        self._entries.previous = entry
+
+
+    def _unlink(self, entry):
+        """
+        Take C{entry} out of the list of entries.
+        """
+        entry.previous.next = entry.next
+        entry.next.previous = entry.previous
+        entry.previous = entry.next = entry
+
+
+    def _remove(self, entry):
+        """
+        Remove C{entry} from the cache.
+        """
+        self._unlink(entry)
+        del self.cache[entry.key]
+
+
+    def _removeExpired(self, now):
+        """
+        Remove every entry which has expired by C{now}.
+        """
+        expiries = self._expiries
+        while expiries and expiries[0][0] <= now:
+            expires, entry = heapq.heappop(expiries)
+            if self.cache.get(entry.key) is entry:
+                self._remove(entry)
+
+
+    def _get(self, key, now):
+        """
+        Return the unexpired entry cached under C{key}, marking it as the
+        most recently used, or C{None} if there is none.
+        """
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        if entry.expires is not None and entry.expires <= now:
+            self._remove(entry)
+            return None
+        self._unlink(entry)
+        self._link(entry)
+        return entry
+
+
+    def _records(self, entry, now):
+        """
+        Return copies of the records of C{entry}, with their TTLs reduced by
+        the time they have been cached for, but not below zero.
+
+        The copies are built once per second an entry is served in, and only
+        the lists holding them are new for each lookup.
+        """
+        elapsed = int(now - entry.when)
+        if entry.servedAt != elapsed:
+            entry.served = tuple([
+                [dns.RRHeader(str(r.name), r.type, r.cls,
+                              max(r.ttl - elapsed, 0), r.payload)
+                 for r in section]
+                for section in entry.payload])
+            entry.servedAt = elapsed
+        answers, authority, additional = entry.served
+        return list(answers), list(authority), list(additional)
 
 
     def _lookup(self, name, cls, type, timeout):
-        now = time.time()
-        q = dns.Query(name, type, cls)
-        try:
-            when, (ans, auth, add) = self.cache[q]
-        except KeyError:
-            if self.verbose > 1:
-                log.msg('Cache miss for ' + repr(name))
-            return defer.fail(failure.Failure(dns.DomainError(name)))
-        else:
+        now = self._reactor.seconds()
+        entry = self._get(dns.Query(name, type, cls), now)
+        if entry is not None:
             if self.verbose:
                 log.msg('Cache hit for ' + repr(name))
-            diff = now - when
-            return defer.succeed((
-                [dns.RRHeader(str(r.name), r.type, r.cls, r.ttl - diff, r.payload) for r in ans],
-                [dns.RRHeader(str(r.name), r.type, r.cls, r.ttl - diff, r.payload) for r in auth],
-                [dns.RRHeader(str(r.name), r.type, r.cls, r.ttl - diff, r.payload) for r in add]
-            ))
+            return defer.succeed(self._records(entry, now))
+        if self._get((name.lower(), cls), now) is not None:
+            if self.verbose:
+                log.msg('Cached name error for ' + repr(name))
+            # An AuthoritativeDomainError stops a ResolverChain from asking
+            # the resolvers after this one.
+            return defer.fail(failure.Failure(
+                dns.AuthoritativeDomainError(name)))
+        if self.verbose > 1:
+            log.msg('Cache miss for ' + repr(name))
+        return defer.fail(failure.Failure(dns.DomainError(name)))
 
 
     def lookupAllRecords(self, name, timeout = None):
         return defer.fail(failure.Failure(dns.DomainError(name)))
 
 
-    def cacheResult(self, query, payload):
+    def cacheResult(self, query, payload, cacheTime=None):
+        """
+        Cache a response to a query.
+
+        A response without answers is cached for as long as the I{SOA}
+        record in its authority section allows, as described in RFC 2308; if
+        there is no I{SOA} record, it is not cached, and no longer than any
+        other record in it.  Other responses are cached until the first of
+        their records expires.
+
+        @param query: The query the response answers.
+        @type query: L{dns.Query}
+
+        @param payload: A three-tuple of lists of the answer, authority and
+            additional records of the response.
+
+        @param cacheTime: The time the response was received, or C{None} for
+            now.
+        """
         if self.verbose > 1:
             log.msg('Adding %r to cache' % query)
 
-        self.cache[query] = (time.time(), payload)
+        now = self._reactor.seconds()
+        if cacheTime is None:
+            cacheTime = now
+        answers, authority, additional = payload
+        if not answers:
+            ttl = _negativeTTL(authority)
+            if ttl is None:
+                return
+            # The SOA record is served with the negative TTL, so whoever
+            # gets the response from the cache caches it no longer.
+            authority = list(authority)
+            for i, r in enumerate(authority):
+                if r.type == dns.SOA:
+                    authority[i] = dns.RRHeader(
+                        str(r.name), r.type, r.cls, ttl, r.payload)
+        payload = (tuple(answers), tuple(authority), tuple(additional))
+        self._removeExpired(now)
+        self._add(query, cacheTime, self._expiry(cacheTime, payload), payload)
 
-        if self.cancel.has_key(query):
-            self.cancel[query].cancel()
 
-        s = list(payload[0]) + list(payload[1]) + list(payload[2])
-        m = s[0].ttl
-        for r in s:
-            m = min(m, r.ttl)
+    def cacheNameError(self, query, authority, cacheTime=None):
+        """
+        Cache the non-existence of the name C{query} was for, reported by a
+        response with the given authority records.
 
-        from twisted.internet import reactor
-        self.cancel[query] = reactor.callLater(m, self.clearEntry, query)
+        As described in RFC 2308, the name error is cached for all queries
+        of the same name and class, for as long as the I{SOA} record in the
+        authority section allows.  If there is no I{SOA} record, it is not
+        cached.
+
+        @param query: The query which the name error was the response to.
+        @type query: L{dns.Query}
+
+        @param authority: The records in the authority section of the
+            response.
+        @type authority: C{list} of L{dns.RRHeader}
+
+        @param cacheTime: The time the response was received, or C{None} for
+            now.
+        """
+        ttl = _negativeTTL(authority)
+        if ttl is None:
+            return
+        if self.verbose > 1:
+            log.msg('Adding name error for %r to cache' % query)
+
+        now = self._reactor.seconds()
+        if cacheTime is None:
+            cacheTime = now
+        self._removeExpired(now)
+        self._add((str(query.name).lower(), query.cls), cacheTime,
+                  cacheTime + ttl, None)
 
 
     def clearEntry(self, query):
-        del self.cache[query]
-        del self.cancel[query]
+        """
+        Remove the response cached for C{query}.
+        """
+        self._remove(self.cache[query])
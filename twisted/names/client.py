@@ -40,7 +40,17 @@ class Resolver(common.ResolverBase):
         parallel.  This is more efficient on the network and helps avoid a
         "birthday paradox" attack by keeping the number of outstanding requests
         for a particular query fixed at one instead of allowing the attacker to
-        raise it to an arbitrary number.
+        raise it to an arbitrary number.  Names in the keys are lower case,
+        since names are compared case-insensitively.
+
+    @ivar lookups: The number of lookups made with C{_lookup}.
+    @type lookups: C{int}
+
+    @ivar coalescedLookups: The number of lookups made with C{_lookup} which
+        were answered by a query already outstanding for the same name, type
+        and class, rather than by sending a new one.  Divided by C{lookups},
+        this gives the proportion of lookups which did not reach the network.
+    @type coalescedLookups: C{int}
 
     @ivar _reactor: A provider of L{IReactorTCP}, L{IReactorUDP}, and
         L{IReactorTime} which will be used to set up network resources and
@@ -59,6 +69,8 @@ class Resolver(common.ResolverBase):
 
     resolv = None
     _lastResolvTime = None
+    lookups = 0
+    coalescedLookups = 0
     _resolvReadInterval = 60
 
     def _getProtocol(self):
@@ -379,7 +391,9 @@ class Resolver(common.ResolverBase):
 
         If this query is already outstanding, it will not be re-issued.
         Instead, when the outstanding query receives a response, that response
-        will be re-used for this query as well.
+        will be re-used for this query as well.  Each waiting lookup is given
+        its own lists of records, so one caller changing them does not affect
+        the others.
 
         @type name: C{str}
         @type type: C{int}
@@ -389,18 +403,23 @@ class Resolver(common.ResolverBase):
             answer, authority, and additional sections of the response or with
             a L{Failure} if the response code is anything other than C{dns.OK}.
         """
-        key = (name, type, cls)
+        self.lookups += 1
+        key = (name.lower(), type, cls)
         waiting = self._waiting.get(key)
         if waiting is None:
             self._waiting[key] = []
             d = self.queryUDP([dns.Query(name, type, cls)], timeout)
             def cbResult(result):
                 for d in self._waiting.pop(key):
-                    d.callback(result)
+                    if isinstance(result, tuple):
+                        d.callback(tuple([list(s) for s in result]))
+                    else:
+                        d.callback(result)
                 return result
             d.addCallback(self.filterAnswers)
             d.addBoth(cbResult)
         else:
+            self.coalescedLookups += 1
             d = defer.Deferred()
             waiting.append(d)
         return d
@@ -413,12 +432,45 @@ class Resolver(common.ResolverBase):
         DNS requests. See http://cr.yp.to/djbdns/axfr-notes.html for
         more information.
         """
+        d = defer.Deferred()
+        return self._transferZone(AXFRController(name, d), d, timeout)
+
+
+    def lookupIncrementalZone(self, name, soa, timeout = 10):
+        """
+        Perform an IXFR request (RFC 1995) for the changes made to a zone
+        since the version of it whose I{SOA} record is C{soa}.
+
+        @param name: The name of the zone.
+        @type name: C{str}
+
+        @param soa: The I{SOA} record of the version of the zone the changes
+            are wanted from.
+        @type soa: L{dns.Record_SOA}
+
+        @return: A L{Deferred} which fires with a three-tuple whose first
+            element is the list of records in the response, as
+            L{dns.RRHeader} instances, and whose other elements are empty.
+            The records are the I{SOA} record of the current version of the
+            zone alone if C{soa} is current, the whole zone in the same form
+            as L{lookupZone} gives it if the server cannot supply the
+            changes, or the changes as described in RFC 1995, section 4.
+            The L{Deferred} fails if the server responds with an error.
+        """
+        d = defer.Deferred()
+        controller = IXFRController(name, soa, d, self.exceptionForCode)
+        return self._transferZone(controller, d, timeout)
+
+
+    def _transferZone(self, controller, d, timeout):
+        """
+        Connect to a server over TCP and let C{controller} perform a zone
+        transfer, which it reports the result of with C{d}.
+        """
         address = self.pickServer()
         if address is None:
             return defer.fail(IOError('No domain name servers available'))
         host, port = address
-        d = defer.Deferred()
-        controller = AXFRController(name, d)
         factory = DNSClientFactory(controller, timeout)
         factory.noisy = False #stfu
 
@@ -485,6 +537,115 @@ class AXFRController:
 
 
 
+class IXFRController(AXFRController):
+    """
+    Perform an incremental zone transfer (RFC 1995) over a connection, and
+    collect the records of the response.
+
+    The response is complete when it is a single I{SOA} record which is not
+    newer than the client's, when it is a whole zone ended by a second
+    I{SOA} record, or when it is a sequence of changes ended by the I{SOA}
+    record which started it.
+
+    @ivar current: The I{SOA} record of the version of the zone the client
+        has.
+    @type current: L{dns.Record_SOA}
+
+    @ivar exceptionForCode: A callable which returns the exception class
+        for a response code other than L{dns.OK}.
+
+    @ivar _scanned: The number of records the end of the response has been
+        looked for in.
+
+    @ivar _incremental: C{True} if the response is a sequence of changes,
+        C{False} if it is a whole zone, or C{None} if it is not known yet.
+
+    @ivar _adding: C{True} while the records being scanned are additions,
+        C{False} while they are deletions.
+    """
+    def __init__(self, name, current, deferred, exceptionForCode):
+        AXFRController.__init__(self, name, deferred)
+        self.current = current
+        self.exceptionForCode = exceptionForCode
+        self._scanned = 0
+        self._incremental = None
+        self._adding = False
+
+
+    def connectionMade(self, protocol):
+        message = dns.Message(protocol.pickID(), recDes=0)
+        message.queries = [dns.Query(self.name, dns.IXFR, dns.IN)]
+        message.authority = [
+            dns.RRHeader(self.name, dns.SOA, dns.IN, self.current.ttl or 0,
+                         self.current)]
+        protocol.writeMessage(message)
+
+
+    def messageReceived(self, message, protocol):
+        if message.rCode != dns.OK:
+            self._finish(failure.Failure(
+                self.exceptionForCode(message.rCode)(message)))
+            return
+        self.records.extend(message.answers)
+        if self.records and self.records[0].type != dns.SOA:
+            self._finish(failure.Failure(ValueError(
+                "Zone transfer of %s did not start with an SOA record" % (
+                    self.name,))))
+        elif self._complete():
+            self._finish(self.records)
+
+
+    def _complete(self):
+        """
+        Scan the records received since the last call and return whether
+        they end the response.
+        """
+        records = self.records
+        if not records:
+            return False
+        latest = records[0].payload.serial
+        if len(records) == 1:
+            # A server which cannot send changes may send the whole zone
+            # one record per message, starting with a newer SOA record.
+            return not dns._serialGreater(latest, self.current.serial)
+        while self._scanned < len(records):
+            i = self._scanned
+            record = records[i]
+            self._scanned += 1
+            if i == 0:
+                continue
+            isSOA = record.type == dns.SOA
+            if self._incremental is None:
+                self._incremental = isSOA and record.payload.serial != latest
+                if not self._incremental and isSOA:
+                    return True
+            elif not self._incremental:
+                if isSOA:
+                    return True
+            elif isSOA:
+                if self._adding and record.payload.serial == latest:
+                    return True
+                self._adding = not self._adding
+        return False
+
+
+    def _finish(self, result):
+        """
+        Cancel the timeout and fire C{deferred} with C{result}, unless that
+        has already been done.
+        """
+        if self.timeoutCall is not None:
+            self.timeoutCall.cancel()
+            self.timeoutCall = None
+        if self.deferred is not None:
+            d, self.deferred = self.deferred, None
+            if isinstance(result, failure.Failure):
+                d.errback(result)
+            else:
+                d.callback(result)
+
+
+
 from twisted.internet.base import ThreadedResolver as _ThreadedResolverImpl
 
 class ThreadedResolver(_ThreadedResolverImpl):
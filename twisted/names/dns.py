@@ -184,6 +184,15 @@ def str2time(s):
     return s
 
 
+def _serialGreater(serial, other):
+    """
+    Return whether the I{SOA} serial number C{serial} is greater than
+    C{other}, by the sequence space arithmetic of RFC 1982, under which
+    serial numbers wrap around at 2 ** 32.
+    """
+    return serial != other and (serial - other) % 2 ** 32 < 2 ** 31
+
+
 def readPrecisely(file, l):
     buff = file.read(l)
     if len(buff) < l:
@@ -303,23 +312,36 @@ class Name:
         of reducing the message size).
         """
         name = self.name
+        if compDict is not None:
+            # Most names in a response are repeats of one already written.
+            pointer = compDict.get(name)
+            if pointer is not None:
+                strio.write(struct.pack("!H", 0xc000 | pointer))
+                return
+            offset = strio.tell() + Message.headerSize
+        parts = []
         while name:
             if compDict is not None:
-                if name in compDict:
-                    strio.write(
-                        struct.pack("!H", 0xc000 | compDict[name]))
+                pointer = compDict.get(name)
+                if pointer is not None:
+                    parts.append(struct.pack("!H", 0xc000 | pointer))
+                    strio.write(''.join(parts))
                     return
-                else:
-                    compDict[name] = strio.tell() + Message.headerSize
+                # A pointer can only refer to the first 16K of a message.
+                if offset < 0x4000:
+                    compDict[name] = offset
             ind = name.find('.')
             if ind > 0:
                 label, name = name[:ind], name[ind + 1:]
             else:
                 label, name = name, ''
                 ind = len(label)
-            strio.write(chr(ind))
-            strio.write(label)
-        strio.write(chr(0))
+            parts.append(chr(ind))
+            parts.append(label)
+            if compDict is not None:
+                offset += ind + 1
+        parts.append(chr(0))
+        strio.write(''.join(parts))
 
 
     def decode(self, strio, length=None):
@@ -489,9 +511,10 @@ class RRHeader(tputil.FancyEqMixin):
     def encode(self, strio, compDict=None):
         self.name.encode(strio, compDict)
         strio.write(struct.pack(self.fmt, self.type, self.cls, self.ttl, 0))
-        if self.payload:
+        payload = self.payload
+        if payload is not None:
             prefix = strio.tell()
-            self.payload.encode(strio, compDict)
+            payload.encode(strio, compDict)
             aft = strio.tell()
             strio.seek(prefix - 2, 0)
             strio.write(struct.pack('!H', aft - prefix))
@@ -1480,6 +1503,184 @@ class Record_SPF(Record_TXT):
 
 
 
+def _decodeName(data, offset, names):
+    """
+    Decode the domain name starting at C{offset} in the DNS message C{data},
+    following any compression pointers in it.
+
+    @type data: C{str}
+    @param data: The whole message.
+
+    @type offset: C{int}
+    @param offset: The offset of the name in C{data}.
+
+    @type names: C{dict}
+    @param names: A mapping from the offsets of labels already decoded from
+        C{data} to the names which start with them, so that compression
+        pointers to them need not be followed again.  The labels of this
+        name are added to it.
+
+    @return: A two-tuple of the name, as a C{str}, and the offset in C{data}
+        just after it.
+
+    @raise EOFError: Raised when C{data} ends before the name does.
+
+    @raise ValueError: Raised when a compression pointer does not point to
+        an earlier part of the message, which could otherwise make decoding
+        loop forever.
+    """
+    labels = []
+    positions = []
+    suffix = None
+    end = None
+    limit = offset
+    size = len(data)
+    while 1:
+        if offset >= size:
+            raise EOFError
+        l = ord(data[offset])
+        if l == 0:
+            offset += 1
+            break
+        if (l >> 6) == 3:
+            if offset + 1 >= size:
+                raise EOFError
+            pointer = ((l & 63) << 8) | ord(data[offset + 1])
+            if end is None:
+                end = offset + 2
+            if pointer >= limit:
+                raise ValueError(
+                    "Compression pointer at %d does not point to an earlier "
+                    "name" % (offset,))
+            suffix = names.get(pointer)
+            if suffix is not None:
+                labels.append(suffix)
+                break
+            offset = limit = pointer
+            continue
+        label = data[offset + 1:offset + 1 + l]
+        if len(label) < l:
+            raise EOFError
+        positions.append(offset)
+        labels.append(label)
+        offset += l + 1
+    if end is None:
+        end = offset
+    for i in range(len(positions)):
+        if positions[i] not in names:
+            names[positions[i]] = '.'.join(labels[i:])
+    return '.'.join(labels), end
+
+
+
+def _unpack(fmt, data, offset, size):
+    """
+    Unpack the C{size} bytes at C{offset} in C{data} with the C{struct}
+    format C{fmt}.
+
+    @raise EOFError: Raised when C{data} is too short.
+    """
+    chunk = data[offset:offset + size]
+    if len(chunk) < size:
+        raise EOFError
+    return struct.unpack(fmt, chunk)
+
+
+
+def _newName(name):
+    """
+    Make a L{Name} for C{name}, which is known to be a C{str}.
+    """
+    return types.InstanceType(Name, {'name': name})
+
+
+
+# Functions decoding the RDATA of the most common record types straight
+# from the message.  Each is called with the record class, the message, the
+# offset and length of the RDATA, the names decoded so far (for
+# _decodeName) and the record's TTL, and returns the record, made without
+# calling its __init__.
+
+def _decodeAddress(size):
+    def decode(cls, data, offset, length, names, ttl):
+        address = data[offset:offset + size]
+        if len(address) < size:
+            raise EOFError
+        return types.InstanceType(cls, {'address': address, 'ttl': ttl})
+    return decode
+
+
+
+def _decodeSimple(cls, data, offset, length, names, ttl):
+    name = _decodeName(data, offset, names)[0]
+    return types.InstanceType(cls, {'name': _newName(name), 'ttl': ttl})
+
+
+
+def _decodeMX(cls, data, offset, length, names, ttl):
+    preference = _unpack('!H', data, offset, 2)[0]
+    name = _decodeName(data, offset + 2, names)[0]
+    return types.InstanceType(
+        cls, {'preference': preference, 'name': _newName(name), 'ttl': ttl})
+
+
+
+def _decodeSOA(cls, data, offset, length, names, ttl):
+    mname, offset = _decodeName(data, offset, names)
+    rname, offset = _decodeName(data, offset, names)
+    serial, refresh, retry, expire, minimum = _unpack(
+        '!LlllL', data, offset, 20)
+    return types.InstanceType(cls, {
+            'mname': _newName(mname), 'rname': _newName(rname),
+            'serial': serial, 'refresh': refresh, 'retry': retry,
+            'expire': expire, 'minimum': minimum, 'ttl': ttl})
+
+
+
+def _decodeSRV(cls, data, offset, length, names, ttl):
+    priority, weight, port = _unpack('!HHH', data, offset, 6)
+    target = _decodeName(data, offset + 6, names)[0]
+    return types.InstanceType(cls, {
+            'priority': priority, 'weight': weight, 'port': port,
+            'target': _newName(target), 'ttl': ttl})
+
+
+
+def _decodeTXT(cls, data, offset, length, names, ttl):
+    strings = []
+    end = offset + length
+    while offset < end:
+        l = ord(_unpack('c', data, offset, 1)[0])
+        string = data[offset + 1:offset + 1 + l]
+        if len(string) < l:
+            raise EOFError
+        strings.append(string)
+        offset += l + 1
+    if offset != end:
+        log.msg(
+            "Decoded %d bytes in %s record, but rdlength is %d" % (
+                length + offset - end, cls.fancybasename, length))
+    return types.InstanceType(cls, {'data': strings, 'ttl': ttl})
+
+
+
+_recordDecoders = {
+    Record_A: _decodeAddress(4),
+    Record_AAAA: _decodeAddress(16),
+    Record_MX: _decodeMX,
+    Record_SOA: _decodeSOA,
+    Record_SRV: _decodeSRV,
+    Record_TXT: _decodeTXT,
+    Record_SPF: _decodeTXT,
+    }
+for _recordClass in (Record_NS, Record_MD, Record_MF, Record_CNAME,
+                     Record_MB, Record_MG, Record_MR, Record_PTR,
+                     Record_DNAME):
+    _recordDecoders[_recordClass] = _decodeSimple
+del _recordClass
+
+
+
 class Message:
     """
     L{Message} contains all the information represented by a single
@@ -1555,8 +1756,23 @@ class Message:
 
 
     def decode(self, strio, length=None):
+        """
+        Decode the message read from C{strio}, which must hold nothing
+        after it.
+
+        The message is read all at once and parsed by offset rather than by
+        reading from C{strio} piecemeal.  Each name is decompressed only
+        once, and the records of the most common types are decoded without
+        calling their C{decode} methods.  If the message is truncated, the
+        queries and records before the truncation are kept.
+
+        @raise EOFError: Raised when C{strio} does not hold a whole header.
+        """
         self.maxSize = 0
-        header = readPrecisely(strio, self.headerSize)
+        data = strio.read()
+        header = data[:self.headerSize]
+        if len(header) < self.headerSize:
+            raise EOFError
         r = struct.unpack(self.headerFmt, header)
         self.id, byte3, byte4, nqueries, nans, nns, nadd = r
         self.answer = ( byte3 >> 7 ) & 1
@@ -1568,17 +1784,51 @@ class Message:
         self.rCode = byte4 & 0xf
 
         self.queries = []
-        for i in range(nqueries):
-            q = Query()
-            try:
-                q.decode(strio)
-            except EOFError:
-                return
-            self.queries.append(q)
+        names = {}
+        offset = self.headerSize
+        try:
+            for i in range(nqueries):
+                name, offset = _decodeName(data, offset, names)
+                type, cls = _unpack('!HH', data, offset, 4)
+                offset += 4
+                self.queries.append(types.InstanceType(
+                        Query, {'name': _newName(name), 'type': type,
+                                'cls': cls}))
+
+            items = ((self.answers, nans), (self.authority, nns),
+                     (self.additional, nadd))
+            for (l, n) in items:
+                for i in range(n):
+                    offset = self._decodeRecord(data, offset, names, l)
+        except EOFError:
+            return
 
-        items = ((self.answers, nans), (self.authority, nns), (self.additional, nadd))
-        for (l, n) in items:
-            self.parseRecords(l, n, strio)
+
+    def _decodeRecord(self, data, offset, names, records):
+        """
+        Decode the resource record at C{offset} in the message C{data} and
+        append it to C{records}, unless its type is unknown.
+
+        @return: The offset just after the record.
+        """
+        name, offset = _decodeName(data, offset, names)
+        type, cls, ttl, rdlength = _unpack(RRHeader.fmt, data, offset, 10)
+        offset += 10
+        t = self.lookupRecordType(type)
+        if t:
+            decoder = _recordDecoders.get(t)
+            if decoder is not None:
+                payload = decoder(t, data, offset, rdlength, names, ttl)
+            else:
+                payload = t(ttl=ttl)
+                strio = StringIO.StringIO(data)
+                strio.seek(offset)
+                payload.decode(strio, rdlength)
+            records.append(types.InstanceType(RRHeader, {
+                        'name': _newName(name), 'type': type, 'cls': cls,
+                        'ttl': ttl, 'rdlength': rdlength, 'payload': payload,
+                        'auth': False}))
+        return offset + rdlength
 
 
     def parseRecords(self, list, num, strio):
@@ -1,7 +1,7 @@
 # Copyright (c) Twisted Matrix Laboratories.
 # See LICENSE for details.
 
-from twisted.internet import task, defer
+from twisted.internet import defer
 from twisted.names import dns
 from twisted.names import common
 from twisted.names import client
@@ -10,44 +10,98 @@ from twisted.python import log, failure
 from twisted.application import service
 
 class SecondaryAuthorityService(service.Service):
+    """
+    A service which keeps L{SecondaryAuthority} instances for some zones
+    refreshed from their primary, as often as the I{SOA} record of each zone
+    asks.
+
+    @ivar calls: The delayed calls of the next refresh of each zone, in the
+        same order as C{domains}.
+    """
     calls = None
 
-    def __init__(self, primary, domains):
+    def __init__(self, primary, domains, reactor=None):
         """
         @param primary: The IP address of the server from which to perform
         zone transfers.
 
         @param domains: A sequence of domain names for which to perform
         zone transfers.
+
+        @param reactor: A provider of
+            L{twisted.internet.interfaces.IReactorTime} used to schedule the
+            refreshes, or C{None} to use the global reactor.
         """
         self.primary = primary
         self.domains = [SecondaryAuthority(primary, d) for d in domains]
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
 
     def getAuthority(self):
         return resolve.ResolverChain(self.domains)
 
     def startService(self):
         service.Service.startService(self)
-        self.calls = [task.LoopingCall(d.transfer) for d in self.domains]
-        i = 0
-        from twisted.internet import reactor
-        for c in self.calls:
-            # XXX Add errbacks, respect proper timeouts
-            reactor.callLater(i, c.start, 60 * 60)
-            i += 1
+        self.calls = [self._reactor.callLater(i, self._refresh, i)
+                      for i in range(len(self.domains))]
+
+    def _refresh(self, index):
+        """
+        Refresh the zone at C{index} in C{domains}, then schedule its next
+        refresh.
+        """
+        d = self.domains[index].transfer()
+        if d is None:
+            # A NOTIFY message is refreshing it already.
+            d = defer.succeed(None)
+        d.addCallback(self._schedule, index)
+
+    def _schedule(self, ignored, index):
+        if self.running:
+            self.calls[index] = self._reactor.callLater(
+                self.domains[index].nextRefresh(), self._refresh, index)
 
     def stopService(self):
         service.Service.stopService(self)
         for c in self.calls:
-            c.stop()
+            if c.active():
+                c.cancel()
 
 
 from twisted.names.authority import FileAuthority
 
-class SecondaryAuthority(common.ResolverBase):
-    """An Authority that keeps itself updated by performing zone transfers"""
+class SecondaryAuthority(FileAuthority):
+    """
+    An Authority that keeps itself updated by performing zone transfers.
+
+    Each time it is refreshed, it asks its primary for the zone's I{SOA}
+    record and only transfers the zone if the serial number has increased:
+    incrementally (IXFR, RFC 1995) once it has a copy of the zone, falling
+    back to a full transfer (AXFR) if the primary cannot supply the changes.
+    The new records are swapped in at once when a transfer is complete, so
+    queries are never answered from a partly updated zone.  A I{NOTIFY}
+    message from the primary (RFC 1996) makes it refresh at once.
+
+    @ivar primary: The IP address of the server zone transfers are made
+        from.
+    @ivar domain: The name of the zone.
+
+    @ivar transferring: C{True} while the zone is being refreshed.
+
+    @ivar defaultRefresh: The number of seconds between refreshes until the
+        zone has been transferred.
+
+    @ivar _notified: C{True} if a I{NOTIFY} message was received while the
+        zone was being refreshed, in which case it is refreshed again.
+
+    @ivar _failed: C{True} if the last refresh failed.
+    """
 
     transferring = False
+    defaultRefresh = 60 * 60
+    _notified = False
+    _failed = False
 
     soa = records = None
     def __init__(self, primaryIP, domain):
@@ -55,38 +109,175 @@ class SecondaryAuthority(common.ResolverBase):
         self.primary = primaryIP
         self.domain = domain
 
+
+    def _primaryResolver(self):
+        """
+        Return a resolver which sends its queries to the primary.
+        """
+        return client.Resolver(servers=[(self.primary, dns.PORT)])
+
+
     def transfer(self):
+        """
+        Refresh the zone from the primary, if it has changed.
+
+        @return: A L{Deferred} which fires when the zone has been refreshed,
+            or C{None} if it is being refreshed already.
+        """
         if self.transferring:
             return
-        self.transfering = True
-        return client.Resolver(servers=[(self.primary, dns.PORT)]
-            ).lookupZone(self.domain
-            ).addCallback(self._cbZone
-            ).addErrback(self._ebZone
-            )
+        self.transferring = True
+        self._failed = False
+        resolver = self._primaryResolver()
+        if self.soa is None:
+            d = self._fullTransfer(resolver)
+        else:
+            d = resolver.lookupAuthority(self.domain)
+            d.addCallback(self._cbSerial, resolver)
+        d.addErrback(self._ebZone)
+        d.addBoth(self._transferred)
+        return d
+
+
+    def _transferred(self, result):
+        self.transferring = False
+        if self._notified:
+            self._notified = False
+            self.transfer()
+        return result
+
+
+    def nextRefresh(self):
+        """
+        Return the number of seconds until the zone should next be refreshed:
+        the I{REFRESH} interval of its I{SOA} record, or its I{RETRY}
+        interval if the last refresh failed.
+        """
+        if self.soa is None:
+            return self.defaultRefresh
+        if self._failed:
+            return self.soa[1].retry
+        return self.soa[1].refresh
+
+
+    def notify(self, name, host):
+        """
+        Handle a I{NOTIFY} message (RFC 1996) by refreshing the zone at once.
+
+        @param name: The name of the zone the message is about.
+        @param host: The IP address the message came from.
+
+        @return: C{True} if C{name} is this zone and C{host} is its primary,
+            so that the message has been acted on, otherwise C{False}.
+        """
+        if name.lower() != self.domain.lower() or host != self.primary:
+            return False
+        if self.transferring:
+            self._notified = True
+        else:
+            self.transfer()
+        return True
+
+
+    def _cbSerial(self, result, resolver):
+        """
+        Transfer the changes to the zone if the serial number of the I{SOA}
+        record in C{result} is greater than that of ours.
+        """
+        for record in result[0]:
+            if record.type == dns.SOA:
+                break
+        else:
+            raise dns.DomainError(self.domain)
+        if not dns._serialGreater(record.payload.serial, self.soa[1].serial):
+            return
+        d = resolver.lookupIncrementalZone(self.domain, self.soa[1])
+        d.addCallback(self._cbIncremental)
+        d.addErrback(self._ebIncremental, resolver)
+        return d
+
+
+    def _ebIncremental(self, failure, resolver):
+        log.msg("Incremental transfer of %s from %s failed, "
+                "transferring the whole zone" % (self.domain, self.primary))
+        log.err(failure)
+        return self._fullTransfer(resolver)
+
+
+    def _fullTransfer(self, resolver):
+        return resolver.lookupZone(self.domain).addCallback(self._cbZone)
 
 
     def _lookup(self, name, cls, type, timeout=None):
         if not self.soa or not self.records:
             return defer.fail(failure.Failure(dns.DomainError(name)))
+        return FileAuthority._lookup(self, name, cls, type, timeout)
 
 
-        return FileAuthority.__dict__['_lookup'](self, name, cls, type, timeout)
+    def _cbZone(self, zone):
+        ans, _, _ = zone
+        soa = None
+        records = {}
+        for rec in ans:
+            if rec.type == dns.SOA:
+                if soa is None:
+                    soa = (str(rec.name).lower(), rec.payload)
+            else:
+                records.setdefault(str(rec.name).lower(), []).append(rec.payload)
+        records.setdefault(soa[0], []).insert(0, soa[1])
+        self.soa, self.records = soa, records
 
-    #shouldn't we just subclass? :P
 
-    lookupZone = FileAuthority.__dict__['lookupZone']
+    def _cbIncremental(self, zone):
+        """
+        Apply the changes in the response to an IXFR request, or use the
+        whole zone if that is what the response holds.
 
-    def _cbZone(self, zone):
+        @raise ValueError: If the changes do not apply to our copy of the
+            zone.
+        """
         ans, _, _ = zone
-        self.records = r = {}
-        for rec in ans:
-            if not self.soa and rec.type == dns.SOA:
-                self.soa = (str(rec.name).lower(), rec.payload)
+        if len(ans) == 1:
+            # Our copy is current.
+            return
+        if ans[1].type != dns.SOA or ans[1].payload.serial == ans[0].payload.serial:
+            return self._cbZone(zone)
+        if ans[1].payload.serial != self.soa[1].serial:
+            raise ValueError("Changes are from serial %d, not %d" % (
+                ans[1].payload.serial, self.soa[1].serial))
+
+        # Copy the lists of records for names as they are changed, so that
+        # queries see the old zone until all the changes have been made.
+        records = self.records.copy()
+        copied = {}
+        adding = False
+        for rec in ans[2:-1]:
+            if rec.type == dns.SOA:
+                adding = not adding
+                continue
+            name = str(rec.name).lower()
+            if name not in copied:
+                records[name] = list(records.get(name, ()))
+                copied[name] = True
+            if adding:
+                records[name].append(rec.payload)
             else:
-                r.setdefault(str(rec.name).lower(), []).append(rec.payload)
+                try:
+                    records[name].remove(rec.payload)
+                except ValueError:
+                    raise ValueError("%s has no record %r to delete" % (
+                        name, rec.payload))
+                if not records[name]:
+                    del records[name]
+                    del copied[name]
+        soa = (self.soa[0], ans[0].payload)
+        apex = [r for r in records.get(soa[0], ()) if r.TYPE != dns.SOA]
+        records[soa[0]] = [soa[1]] + apex
+        self.soa, self.records = soa, records
+
 
     def _ebZone(self, failure):
+        self._failed = True
         log.msg("Updating %s from %s failed during zone transfer" % (self.domain, self.primary))
         log.err(failure)
 
@@ -97,6 +288,6 @@ class SecondaryAuthority(common.ResolverBase):
         self.transferring = False
 
     def _ebTransferred(self, failure):
-        self.transferred = False
+        self.transferring = False
         log.msg("Transferring %s from %s failed after zone transfer" % (self.domain, self.primary))
         log.err(failure)
@@ -20,10 +20,23 @@ for resolvers to deal with.  Fix it.
 import time
 
 from twisted.internet import protocol
-from twisted.names import dns, resolve
+from twisted.names import dns, error, resolve
 from twisted.python import log
 
 
+def _allResolvers(resolver):
+    """
+    Iterate over C{resolver} and, if it is a L{resolve.ResolverChain}, over the
+    resolvers it chains, recursively.
+    """
+    yield resolver
+    if isinstance(resolver, resolve.ResolverChain):
+        for chained in resolver.resolvers:
+            for r in _allResolvers(chained):
+                yield r
+
+
+
 class DNSServerFactory(protocol.ServerFactory):
     """
     Server factory and tracker for L{DNSProtocol} connections.  This
@@ -119,6 +132,13 @@ class DNSServerFactory(protocol.ServerFactory):
     def gotResolverError(self, failure, protocol, message, address):
         if failure.check(dns.DomainError, dns.AuthoritativeDomainError):
             message.rCode = dns.ENAME
+            if self.cache and failure.check(error.DNSNameError):
+                # The response the error was made from holds the SOA record
+                # saying how long the name error may be cached for.
+                response = failure.value.args and failure.value.args[0]
+                if isinstance(response, dns.Message):
+                    self.cache.cacheNameError(
+                        message.queries[0], response.authority)
         else:
             message.rCode = dns.ESERVER
             log.err(failure)
@@ -155,7 +175,32 @@ class DNSServerFactory(protocol.ServerFactory):
 
 
     def handleNotify(self, message, protocol, address):
-        message.rCode = dns.ENOTIMP
+        """
+        Pass a I{NOTIFY} message (RFC 1996) on to the authorities which have
+        a C{notify} method, such as L{secondary.SecondaryAuthority}, so that
+        the secondary for the zone it names can refresh the zone at once.
+
+        The message is acknowledged if one of them acts on it, and refused
+        otherwise.  One which does not name a zone is a format error.
+        """
+        if not message.queries:
+            message.rCode = dns.EFORMAT
+            self.sendReply(protocol, message, address)
+            if self.verbose:
+                log.msg("Notify message without a zone from %r" % (address,))
+            return
+        if address is None:
+            host = protocol.transport.getPeer().host
+        else:
+            host = address[0]
+        name = str(message.queries[0].name)
+        accepted = False
+        for resolver in _allResolvers(self.resolver):
+            notify = getattr(resolver, 'notify', None)
+            if notify is not None and notify(name, host):
+                accepted = True
+        if not accepted:
+            message.rCode = dns.EREFUSED
         self.sendReply(protocol, message, address)
         if self.verbose:
             log.msg("Notify message from %r" % (address,))
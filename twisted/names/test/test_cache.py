@@ -1,14 +1,246 @@
 # Copyright (c) Twisted Matrix Laboratories.
 # See LICENSE for details.
 
-import time
+import time, pickle
 
 from twisted.trial import unittest
 
 from twisted.names import dns, cache
+from twisted.internet import task
+from twisted.python import failure
 
 class Caching(unittest.TestCase):
     def testLookup(self):
         c = cache.CacheResolver({
             dns.Query(name='example.com', type=dns.MX, cls=dns.IN): (time.time(), ([], [], []))})
         return c.lookupMailExchange('example.com').addCallback(self.assertEquals, ([], [], []))
+
+
+
+class CacheResolverTests(unittest.TestCase):
+    """
+    Tests for expiry, eviction and negative caching in
+    L{cache.CacheResolver}.
+    """
+    def setUp(self):
+        self.clock = task.Clock()
+        self.clock.advance(1000)
+        self.resolver = cache.CacheResolver(reactor=self.clock)
+
+
+    def _result(self, d):
+        """
+        Return the result of the L{Deferred} C{d}, which has already fired.
+        """
+        results = []
+        d.addBoth(results.append)
+        self.assertEqual(len(results), 1)
+        return results[0]
+
+
+    def _failure(self, d, exceptionType):
+        """
+        Assert that the L{Deferred} C{d} has already failed with
+        C{exceptionType}.
+        """
+        result = self._result(d)
+        self.assertIsInstance(result, failure.Failure)
+        self.assertEqual(result.type, exceptionType)
+
+
+    def _address(self, name, ttl=60, address='10.0.0.1'):
+        """
+        Return the response to an I{A} query for C{name} with one record.
+        """
+        return ([dns.RRHeader(name, dns.A, dns.IN, ttl,
+                              dns.Record_A(address, ttl))], [], [])
+
+
+    def _soa(self, ttl, minimum):
+        """
+        Return the authority section of a negative response for
+        I{example.com}.
+        """
+        return [dns.RRHeader('example.com', dns.SOA, dns.IN, ttl,
+                             dns.Record_SOA(minimum=minimum, ttl=ttl))]
+
+
+    def test_lookupReducesTTL(self):
+        """
+        Records served from the cache have their TTLs reduced by the whole
+        number of seconds they have been cached for.
+        """
+        self.resolver.cacheResult(
+            dns.Query('example.com', dns.A), self._address('example.com'))
+        self.clock.advance(10.5)
+        answers, authority, additional = self._result(
+            self.resolver.lookupAddress('example.com'))
+        self.assertEqual([r.ttl for r in answers], [50])
+        self.assertEqual(answers[0].payload.dottedQuad(), '10.0.0.1')
+
+
+    def test_lookupReturnsNewLists(self):
+        """
+        Each lookup returns new lists, so changing the result of one does
+        not affect the next.
+        """
+        self.resolver.cacheResult(
+            dns.Query('example.com', dns.A), self._address('example.com'))
+        first = self._result(
+            self.resolver.lookupAddress('example.com'))
+        first[0].append(None)
+        second = self._result(
+            self.resolver.lookupAddress('example.com'))
+        self.assertEqual(len(second[0]), 1)
+
+
+    def test_noTimers(self):
+        """
+        Caching a response does not schedule any calls.
+        """
+        self.resolver.cacheResult(
+            dns.Query('example.com', dns.A), self._address('example.com'))
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_expiredOnLookup(self):
+        """
+        A response is not served once its shortest TTL has passed.
+        """
+        self.resolver.cacheResult(
+            dns.Query('example.com', dns.A), self._address('example.com'))
+        self.clock.advance(60)
+        self._failure(
+            self.resolver.lookupAddress('example.com'), dns.DomainError)
+        self.assertEqual(self.resolver.cache, {})
+
+
+    def test_expiredOnInsert(self):
+        """
+        Expired responses are removed when another response is cached, even
+        if they are never looked up.
+        """
+        self.resolver.cacheResult(
+            dns.Query('example.com', dns.A), self._address('example.com'))
+        self.clock.advance(60)
+        self.resolver.cacheResult(
+            dns.Query('example.org', dns.A), self._address('example.org'))
+        self.assertEqual(
+            self.resolver.cache.keys(), [dns.Query('example.org', dns.A)])
+
+
+    def test_leastRecentlyUsedEvicted(self):
+        """
+        When the cache holds C{maxEntries} responses, caching another evicts
+        the one which was used least recently.
+        """
+        self.resolver.maxEntries = 2
+        for name in 'a.example.com', 'b.example.com':
+            self.resolver.cacheResult(
+                dns.Query(name, dns.A), self._address(name))
+        self._result(self.resolver.lookupAddress('a.example.com'))
+        self.resolver.cacheResult(
+            dns.Query('c.example.com', dns.A), self._address('c.example.com'))
+        self.assertEqual(
+            sorted([str(q.name) for q in self.resolver.cache]),
+            ['a.example.com', 'c.example.com'])
+
+
+    def test_replaceDoesNotEvict(self):
+        """
+        Caching a new response for a query which is already cached replaces
+        it without evicting anything else.
+        """
+        self.resolver.maxEntries = 2
+        for name in 'a.example.com', 'b.example.com', 'b.example.com':
+            self.resolver.cacheResult(
+                dns.Query(name, dns.A), self._address(name))
+        self.assertEqual(len(self.resolver.cache), 2)
+
+
+    def test_negativeTTL(self):
+        """
+        A response without answers is cached for the smaller of its I{SOA}
+        record's TTL and I{MINIMUM} field, and the I{SOA} record is served
+        with that TTL.
+        """
+        self.resolver.cacheResult(
+            dns.Query('example.com', dns.A), ([], self._soa(3600, 300), []))
+        answers, authority, additional = self._result(
+            self.resolver.lookupAddress('example.com'))
+        self.assertEqual(answers, [])
+        self.assertEqual([r.ttl for r in authority], [300])
+        self.clock.advance(300)
+        self._failure(
+            self.resolver.lookupAddress('example.com'), dns.DomainError)
+
+
+    def test_negativeExpiresWithRecords(self):
+        """
+        A response without answers expires when the first of its other
+        records does, if that is before its negative TTL runs out, so no
+        record is served with a negative TTL.
+        """
+        authority = self._soa(300, 300) + [
+            dns.RRHeader('example.com', dns.NS, dns.IN, 10,
+                         dns.Record_NS('ns.example.com'))]
+        self.resolver.cacheResult(
+            dns.Query('example.com', dns.A), ([], authority, []))
+        self.clock.advance(5)
+        answers, authority, additional = self._result(
+            self.resolver.lookupAddress('example.com'))
+        self.assertEqual([r.ttl for r in authority], [295, 5])
+        message = dns.Message()
+        message.authority = authority
+        message.toStr()
+        self.clock.advance(95)
+        self._failure(
+            self.resolver.lookupAddress('example.com'), dns.DomainError)
+
+
+    def test_negativeWithoutSOA(self):
+        """
+        A response without answers or an I{SOA} record is not cached.
+        """
+        self.resolver.cacheResult(
+            dns.Query('example.com', dns.A),
+            ([], [dns.RRHeader('example.com', dns.NS, dns.IN, 60,
+                               dns.Record_NS('ns.example.com'))], []))
+        self.assertEqual(self.resolver.cache, {})
+
+
+    def test_nameError(self):
+        """
+        A cached name error fails lookups of any type for the name with
+        L{dns.AuthoritativeDomainError}, so that the resolvers after the
+        cache are not asked, until the negative TTL has passed.
+        """
+        self.resolver.cacheNameError(
+            dns.Query('Example.com', dns.A), self._soa(60, 600))
+        self._failure(
+            self.resolver.lookupMailExchange('example.COM'),
+            dns.AuthoritativeDomainError)
+        self.clock.advance(60)
+        self._failure(
+            self.resolver.lookupAddress('example.com'), dns.DomainError)
+
+
+    def test_pickle(self):
+        """
+        A pickled L{cache.CacheResolver} keeps the responses it had cached
+        and the order they were used in.
+        """
+        self.resolver.maxEntries = 2
+        for name in 'a.example.com', 'b.example.com':
+            self.resolver.cacheResult(
+                dns.Query(name, dns.A), self._address(name),
+                cacheTime=time.time())
+        self.resolver.cacheResult(
+            dns.Query('a.example.com', dns.A), self._address('a.example.com'),
+            cacheTime=time.time())
+        resolver = pickle.loads(pickle.dumps(self.resolver))
+        resolver.cacheResult(
+            dns.Query('c.example.com', dns.A), self._address('c.example.com'))
+        self.assertEqual(
+            sorted([str(q.name) for q in resolver.cache]),
+            ['a.example.com', 'c.example.com'])
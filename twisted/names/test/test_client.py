@@ -168,6 +168,51 @@ class ResolverTests(unittest.TestCase):
         return d
 
 
+    def test_concurrentRequestsIgnoreCase(self):
+        """
+        Concurrent queries for the same name in different cases share a
+        single request, and each is given its own lists of records.
+        """
+        resolver = client.Resolver(servers=[('example.com', 53)])
+        resolver.protocol = StubDNSDatagramProtocol()
+        queries = resolver.protocol.queries
+
+        firstResult = resolver.query(dns.Query('foo.example.com', dns.A))
+        secondResult = resolver.query(dns.Query('FOO.Example.COM', dns.A))
+        self.assertEqual(len(queries), 1)
+
+        answer = object()
+        response = dns.Message()
+        response.answers.append(answer)
+        queries.pop()[-1].callback(response)
+
+        d = defer.gatherResults([firstResult, secondResult])
+        def cbFinished((firstResponse, secondResponse)):
+            self.assertEqual(firstResponse, ([answer], [], []))
+            self.assertEqual(secondResponse, ([answer], [], []))
+            self.assertNotIdentical(firstResponse[0], secondResponse[0])
+        d.addCallback(cbFinished)
+        return d
+
+
+    def test_coalescingCounts(self):
+        """
+        L{client.Resolver.lookups} counts the lookups made and
+        L{client.Resolver.coalescedLookups} those which shared a request
+        already outstanding.
+        """
+        resolver = client.Resolver(servers=[('example.com', 53)])
+        resolver.protocol = StubDNSDatagramProtocol()
+        queries = resolver.protocol.queries
+
+        for i in range(3):
+            resolver.query(dns.Query('foo.example.com', dns.A))
+        resolver.query(dns.Query('bar.example.com', dns.A))
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(resolver.lookups, 4)
+        self.assertEqual(resolver.coalescedLookups, 2)
+
+
     def test_multipleConcurrentRequests(self):
         """
         L{client.Resolver.query} issues a request for each different concurrent
@@ -218,6 +218,107 @@ class MessageTestCase(unittest.TestCase):
         self.assertIdentical(dns.Message().lookupRecordType(65280), None)
 
 
+    def _roundtrip(self, message):
+        """
+        Encode C{message} and return the result of decoding it again.
+        """
+        result = dns.Message()
+        result.fromStr(message.toStr())
+        return result
+
+
+    def test_recordsRoundtrip(self):
+        """
+        Records of the common types, which L{dns.Message.decode} decodes
+        without calling their C{decode} methods, and of other types, come
+        back from being encoded and decoded unchanged, with their names
+        compressed against each other.
+        """
+        records = [
+            dns.Record_A('10.0.0.1', 60),
+            dns.Record_AAAA('::1', 60),
+            dns.Record_NS('ns.example.com', 60),
+            dns.Record_CNAME('www.example.com', 60),
+            dns.Record_PTR('host.example.com', 60),
+            dns.Record_MX(10, 'mail.example.com', 60),
+            dns.Record_SOA('ns.example.com', 'root.example.com', 1, 2, 3, 4,
+                           5, 60),
+            dns.Record_SRV(1, 2, 3, 'sip.example.com', 60),
+            dns.Record_TXT('foo', 'bar', ttl=60),
+            dns.Record_SPF('v=spf1 -all', ttl=60),
+            dns.Record_HINFO('cpu', 'os', 60)]
+        message = dns.Message(maxSize=0)
+        message.addQuery('example.com')
+        for record in records:
+            message.answers.append(dns.RRHeader(
+                    'example.com', record.TYPE, ttl=60, payload=record))
+        result = self._roundtrip(message)
+        self.assertEqual(result.queries, message.queries)
+        self.assertEqual(result.answers, message.answers)
+
+
+    def test_decodeCompressionLoop(self):
+        """
+        L{dns.Message.decode} raises C{ValueError} for a name whose
+        compression pointer does not point to an earlier name, rather than
+        following it forever.
+        """
+        msg = dns.Message()
+        self.assertRaises(ValueError, msg.fromStr,
+            '\x00\x01\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00'
+            '\xc0\x0c\x00\x01\x00\x01')
+
+
+    def test_decodeSkipsUnknownTypes(self):
+        """
+        L{dns.Message.decode} skips the data of records of unknown types and
+        decodes the records after them.
+        """
+        msg = dns.Message()
+        msg.fromStr(
+            '\x00\x01\x00\x00\x00\x00\x00\x02\x00\x00\x00\x00'
+            # A record of the private use type 65280 with three bytes of data
+            '\x00\xff\x00\x00\x01\x00\x00\x00\x3c\x00\x03abc'
+            # An A record
+            '\x00\x00\x01\x00\x01\x00\x00\x00\x3c\x00\x04\x0a\x00\x00\x01')
+        self.assertEqual(
+            msg.answers,
+            [dns.RRHeader('', dns.A, ttl=60,
+                          payload=dns.Record_A('10.0.0.1', 60))])
+
+
+    def test_decodeTruncated(self):
+        """
+        If a message is truncated, L{dns.Message.decode} keeps the records
+        before the truncation.
+        """
+        message = dns.Message()
+        for addr in '10.0.0.1', '10.0.0.2':
+            message.answers.append(dns.RRHeader(
+                    'example.com', payload=dns.Record_A(addr, 0)))
+        msg = dns.Message()
+        msg.fromStr(message.toStr()[:-2])
+        self.assertEqual(msg.answers, message.answers[:1])
+
+
+    def test_compressionOffsetLimit(self):
+        """
+        Names more than 16K into a message, which a compression pointer
+        cannot refer to, are not used for compression.
+        """
+        message = dns.Message(maxSize=0)
+        message.answers.append(dns.RRHeader(
+                'example.com', dns.NULL,
+                payload=dns.Record_NULL('x' * 0x4000)))
+        for addr in '10.0.0.1', '10.0.0.2':
+            message.answers.append(dns.RRHeader(
+                    'far.example.org', payload=dns.Record_A(addr)))
+        result = self._roundtrip(message)
+        self.assertEqual(
+            [str(rr.name) for rr in result.answers],
+            ['example.com', 'far.example.org', 'far.example.org'])
+
+
 
 class TestController(object):
     """
@@ -6,13 +6,14 @@
 Test cases for twisted.names.
 """
 
-import socket, operator, copy
+import socket, operator, copy, os
 
 from twisted.trial import unittest
 
-from twisted.internet import reactor, defer, error
+from twisted.internet import reactor, defer, error, task
 from twisted.internet.defer import succeed
 from twisted.names import client, server, common, authority, hosts, dns
+from twisted.names import resolve, secondary
 from twisted.python import failure
 from twisted.names.error import DNSFormatError, DNSServerError, DNSNameError
 from twisted.names.error import DNSNotImplementedError, DNSQueryRefusedError
@@ -501,6 +502,99 @@ class DNSServerFactoryTests(unittest.TestCase):
         self.assertEqual(factory.connections, [])
 
 
+    def test_nameErrorCached(self):
+        """
+        When a query fails with L{DNSNameError}, L{DNSServerFactory} caches
+        the name error using the authority records of the response it was
+        made from, and replies with C{ENAME}.
+        """
+        class FakeProtocol(object):
+            def writeMessage(self, message, address=None):
+                pass
+
+        nameErrors = []
+        class FakeCache(object):
+            def cacheNameError(self, query, authority):
+                nameErrors.append((query, authority))
+
+        soa = dns.RRHeader('example.com', dns.SOA, payload=dns.Record_SOA())
+        response = Message(rCode=ENAME)
+        response.authority = [soa]
+        query = dns.Query('missing.example.com')
+        message = Message()
+        message.queries = [query]
+
+        factory = server.DNSServerFactory(caches=[FakeCache()])
+        factory.gotResolverError(
+            failure.Failure(DNSNameError(response)), FakeProtocol(), message,
+            None)
+        self.assertEqual(message.rCode, ENAME)
+        self.assertEqual(nameErrors, [(query, [soa])])
+
+
+    def _notify(self, authorities):
+        """
+        Pass a I{NOTIFY} message for I{example.com} from 10.0.0.1 to
+        L{DNSServerFactory.handleNotify} of a factory with the given
+        authorities, and return the reply.
+        """
+        replies = []
+        class FakeProtocol(object):
+            def writeMessage(self, message, address=None):
+                replies.append(message)
+
+        message = Message(opCode=dns.OP_NOTIFY)
+        message.queries = [dns.Query('example.com', dns.SOA)]
+        factory = server.DNSServerFactory(authorities)
+        factory.handleNotify(message, FakeProtocol(), ('10.0.0.1', 53))
+        self.assertEqual(replies, [message])
+        return replies[0]
+
+
+    def test_notifyPassedToAuthorities(self):
+        """
+        L{DNSServerFactory.handleNotify} passes the zone name and the sender's
+        address to the C{notify} method of the authorities, including those
+        in a L{resolve.ResolverChain}, and acknowledges the message when one
+        of them acts on it.
+        """
+        notified = []
+        class FakeSecondary(common.ResolverBase):
+            def notify(self, name, host):
+                notified.append((name, host))
+                return True
+
+        chain = resolve.ResolverChain([FakeSecondary()])
+        reply = self._notify([NoFileAuthority(None, {}), chain])
+        self.assertEqual(reply.rCode, dns.OK)
+        self.assertEqual(notified, [('example.com', '10.0.0.1')])
+
+
+    def test_notifyRefused(self):
+        """
+        A I{NOTIFY} message which no authority acts on is refused.
+        """
+        reply = self._notify([NoFileAuthority(None, {})])
+        self.assertEqual(reply.rCode, EREFUSED)
+
+
+    def test_notifyWithoutZone(self):
+        """
+        A I{NOTIFY} message without a question naming the zone is answered
+        with a format error.
+        """
+        replies = []
+        class FakeProtocol(object):
+            def writeMessage(self, message, address=None):
+                replies.append(message)
+
+        message = Message(opCode=dns.OP_NOTIFY)
+        factory = server.DNSServerFactory([NoFileAuthority(None, {})])
+        factory.handleNotify(message, FakeProtocol(), ('10.0.0.1', 53))
+        self.assertEqual(replies, [message])
+        self.assertEqual(message.rCode, EFORMAT)
+
+
 class HelperTestCase(unittest.TestCase):
     def testSerialGenerator(self):
         f = self.mktemp()
@@ -566,6 +660,106 @@ class AXFRTest(unittest.TestCase):
             self.controller.messageReceived(m, None)
         self.assertEquals(self.results, self.records)
 
+
+
+class IXFRControllerTests(unittest.TestCase):
+    """
+    Tests for L{client.IXFRController}.
+    """
+    def setUp(self):
+        self.results = []
+        self.d = defer.Deferred()
+        self.d.addBoth(self.results.append)
+        self.controller = client.IXFRController(
+            'example.com', self._soa(1).payload, self.d,
+            common.ResolverBase().exceptionForCode)
+
+
+    def _soa(self, serial):
+        return dns.RRHeader('example.com', dns.SOA, ttl=60,
+                            payload=dns.Record_SOA(serial=serial, refresh=300,
+                                                   retry=60, ttl=60))
+
+
+    def _address(self, address):
+        return dns.RRHeader('www.example.com', dns.A, ttl=60,
+                            payload=dns.Record_A(address, 60))
+
+
+    def _receive(self, *recordsPerMessage):
+        for records in recordsPerMessage:
+            message = Message(answer=1)
+            message.answers = list(records)
+            self.controller.messageReceived(message, None)
+
+
+    def test_query(self):
+        """
+        The request has our I{SOA} record in its authority section.
+        """
+        messages = []
+        class FakeProtocol(object):
+            def pickID(self):
+                return 7
+            def writeMessage(self, message):
+                messages.append(message)
+
+        self.controller.connectionMade(FakeProtocol())
+        [message] = messages
+        self.assertEqual(message.queries, [dns.Query('example.com', dns.IXFR)])
+        self.assertEqual(
+            [r.payload.serial for r in message.authority], [1])
+
+
+    def test_current(self):
+        """
+        A response of a single I{SOA} record with our serial number is
+        complete.
+        """
+        self._receive([self._soa(1)])
+        self.assertEqual(self.results, [[self._soa(1)]])
+
+
+    def test_changes(self):
+        """
+        A response of changes is complete when the I{SOA} record it starts
+        with follows the last additions, however the records are split
+        between messages.
+        """
+        records = [
+            self._soa(3),
+            self._soa(1), self._address('10.0.0.1'),
+            self._soa(2), self._address('10.0.0.2'),
+            self._soa(2),
+            self._soa(3), self._address('10.0.0.3'),
+            self._soa(3)]
+        self._receive(*[[r] for r in records[:-1]])
+        self.assertEqual(self.results, [])
+        self._receive(records[-1:])
+        self.assertEqual(self.results, [records])
+
+
+    def test_wholeZone(self):
+        """
+        A response holding the whole zone is complete at its second I{SOA}
+        record.
+        """
+        records = [self._soa(3), self._address('10.0.0.1'), self._soa(3)]
+        self._receive(records[:1])
+        self.assertEqual(self.results, [])
+        self._receive(records[1:])
+        self.assertEqual(self.results, [records])
+
+
+    def test_error(self):
+        """
+        An error response fails the transfer.
+        """
+        self.controller.messageReceived(Message(answer=1, rCode=ENOTIMP), None)
+        self.assertEqual(self.results[0].type, DNSNotImplementedError)
+
+
+
 class HostsTestCase(unittest.TestCase):
     def setUp(self):
         f = open('EtcHosts', 'w')
@@ -860,6 +1054,338 @@ class AuthorityTests(unittest.TestCase):
         self._referralTest('lookupAllRecords')
 
 
+    def _lookup(self, authority, method, name):
+        """
+        Make a request against C{authority}, which answers it at once, and
+        return the response.
+        """
+        result = []
+        getattr(authority, method)(name).addCallback(result.append)
+        return result[0]
+
+
+    def _largeName(self):
+        """
+        Create an authority with a name which has enough records of different
+        types for them to be indexed, one of them an I{MX} record for a host
+        with an address in the zone.
+        """
+        zone = str(soa_record.mname)
+        records = [dns.Record_A('10.0.0.%d' % (i,)) for i in range(10)]
+        records.append(dns.Record_MX(10, 'mail.' + zone))
+        return NoFileAuthority(
+            soa=(zone, soa_record),
+            records={
+                zone: [soa_record] + records,
+                'mail.' + zone: [dns.Record_A('10.0.1.1')],
+                })
+
+
+    def test_indexedName(self):
+        """
+        The records of a name with many records are found by type, and the
+        addresses of the hosts they refer to are included in the additional
+        section of the response.
+        """
+        authority = self._largeName()
+        zone = str(soa_record.mname)
+        answer, auth, additional = self._lookup(
+            authority, 'lookupAddress', zone)
+        self.assertEquals(
+            [r.payload.dottedQuad() for r in answer],
+            ['10.0.0.%d' % (i,) for i in range(10)])
+        self.assertEquals(auth, [])
+        self.assertEquals(additional, [])
+
+        answer, auth, additional = self._lookup(
+            authority, 'lookupMailExchange', zone)
+        self.assertEquals(
+            [str(r.payload.name) for r in answer], ['mail.' + zone])
+        self.assertEquals(
+            [r.payload.dottedQuad() for r in additional], ['10.0.1.1'])
+
+        answer, auth, additional = self._lookup(
+            authority, 'lookupAllRecords', zone)
+        self.assertEquals(len(answer), 12)
+
+
+    def test_recordsChanged(self):
+        """
+        Records added in place are found once L{FileAuthority.recordsChanged}
+        has been called, and records replaced wholesale are found at once.
+        """
+        authority = self._largeName()
+        zone = str(soa_record.mname)
+        self._lookup(authority, 'lookupAddress', zone)
+
+        authority.records[zone].append(dns.Record_TXT('hello'))
+        authority.recordsChanged()
+        answer, auth, additional = self._lookup(
+            authority, 'lookupText', zone)
+        self.assertEquals([r.payload.data for r in answer], [['hello']])
+
+        authority.records = {zone: [soa_record, dns.Record_A('10.0.2.1')]}
+        answer, auth, additional = self._lookup(
+            authority, 'lookupAddress', zone)
+        self.assertEquals(
+            [r.payload.dottedQuad() for r in answer], ['10.0.2.1'])
+
+
+
+class BindAuthorityTests(unittest.TestCase):
+    """
+    Tests for loading zone files with L{authority.BindAuthority}.
+    """
+    def setUp(self):
+        self.path = self.mktemp()
+        os.mkdir(self.path)
+
+
+    def _load(self, origin, zone):
+        """
+        Write C{zone} to a file named after C{origin} and load it.
+        """
+        path = os.path.join(self.path, origin)
+        f = open(path, 'w')
+        f.write(zone)
+        f.close()
+        return authority.BindAuthority(path)
+
+
+    def test_relativeNames(self):
+        """
+        Relative owner names are completed with the origin, without a
+        doubled dot, and identical records are stored once.
+        """
+        zone = self._load('example.com', """\
+$TTL 1D
+@ IN SOA ns1.example.com. hostmaster.example.com. (
+    2010010101 3H 15M 1W 1D )
+  IN NS ns1.example.com.
+www IN A 10.0.0.1
+sub IN NS ns1.example.com.
+""")
+        self.assertEquals(
+            sorted(zone.records.keys()),
+            ['example.com', 'sub.example.com', 'www.example.com'])
+        self.assertIdentical(
+            zone.records['example.com'][1], zone.records['sub.example.com'][0])
+        answer, auth, additional = self._lookup(zone, 'www.example.com')
+        self.assertEquals(
+            [r.payload.dottedQuad() for r in answer], ['10.0.0.1'])
+
+
+    def _lookup(self, authority, name):
+        """
+        Look up the addresses of C{name} in C{authority}.
+        """
+        result = []
+        authority.lookupAddress(name).addCallback(result.append)
+        return result[0]
+
+
+
+class FakePrimary(object):
+    """
+    A resolver for the primary of a zone, which answers zone transfers and
+    queries for the zone's I{SOA} record with what it is told to.
+
+    @ivar requests: The names of the methods which have been called.
+    """
+    def __init__(self, zone, serial):
+        self.zone = zone
+        self.serial = serial
+        self.changes = None
+        self.requests = []
+
+
+    def _soa(self, serial):
+        return dns.RRHeader('example.com', dns.SOA, ttl=60,
+                            payload=dns.Record_SOA(serial=serial, refresh=300,
+                                                   retry=60, ttl=60))
+
+
+    def lookupAuthority(self, name):
+        self.requests.append('lookupAuthority')
+        return defer.succeed(([self._soa(self.serial)], [], []))
+
+
+    def lookupZone(self, name):
+        self.requests.append('lookupZone')
+        soa = self._soa(self.serial)
+        return defer.succeed(([soa] + self.zone + [soa], [], []))
+
+
+    def lookupIncrementalZone(self, name, soa):
+        self.requests.append('lookupIncrementalZone')
+        if self.changes is None:
+            return defer.fail(DNSNotImplementedError(Message()))
+        return defer.succeed((self.changes, [], []))
+
+
+
+class SecondaryAuthorityTests(unittest.TestCase):
+    """
+    Tests for refreshing L{secondary.SecondaryAuthority} from its primary.
+    """
+    def setUp(self):
+        self.primary = FakePrimary(
+            [dns.RRHeader('www.example.com', dns.A, ttl=60,
+                          payload=dns.Record_A('10.0.0.1', 60))], 1)
+        self.secondary = secondary.SecondaryAuthority('10.0.0.53', 'example.com')
+        self.secondary._primaryResolver = lambda: self.primary
+
+
+    def _addresses(self):
+        result = []
+        self.secondary.lookupAddress('www.example.com').addCallback(
+            result.append)
+        return [r.payload.dottedQuad() for r in result[0][0]]
+
+
+    def test_initialTransfer(self):
+        """
+        The first refresh transfers the whole zone.
+        """
+        self.secondary.transfer()
+        self.assertEqual(self.primary.requests, ['lookupZone'])
+        self.assertEqual(self.secondary.soa[1].serial, 1)
+        self.assertEqual(self._addresses(), ['10.0.0.1'])
+
+
+    def test_unchanged(self):
+        """
+        If the serial number has not increased, the zone is not transferred.
+        """
+        self.secondary.transfer()
+        self.secondary.transfer()
+        self.assertEqual(
+            self.primary.requests, ['lookupZone', 'lookupAuthority'])
+
+
+    def test_incremental(self):
+        """
+        If the serial number has increased, the changes are transferred and
+        replace the records all at once.
+        """
+        self.secondary.transfer()
+        records = self.secondary.records
+        p = self.primary
+        p.serial = 2
+        p.changes = [
+            p._soa(2),
+            p._soa(1), p.zone[0],
+            p._soa(2), dns.RRHeader('www.example.com', dns.A, ttl=60,
+                                    payload=dns.Record_A('10.0.0.2', 60)),
+            p._soa(2)]
+        self.secondary.transfer()
+        self.assertEqual(
+            p.requests,
+            ['lookupZone', 'lookupAuthority', 'lookupIncrementalZone'])
+        self.assertEqual(self.secondary.soa[1].serial, 2)
+        self.assertEqual(self._addresses(), ['10.0.0.2'])
+        self.assertEqual(
+            [r.dottedQuad() for r in records['www.example.com']],
+            ['10.0.0.1'])
+
+
+    def test_serialWraps(self):
+        """
+        Serial numbers are compared as described in RFC 1982, so that one
+        which has wrapped around is greater.
+        """
+        self.primary.serial = 2 ** 32 - 1
+        self.secondary.transfer()
+        self.primary.serial = 3
+        self.secondary.transfer()
+        self.assertEqual(
+            self.primary.requests,
+            ['lookupZone', 'lookupAuthority', 'lookupIncrementalZone',
+             'lookupZone'])
+        self.assertEqual(self.secondary.soa[1].serial, 3)
+        self.flushLoggedErrors(DNSNotImplementedError)
+
+
+    def test_fallback(self):
+        """
+        If the primary cannot supply the changes, the whole zone is
+        transferred.
+        """
+        self.secondary.transfer()
+        self.primary.serial = 2
+        self.primary.zone[0].payload = dns.Record_A('10.0.0.3', 60)
+        self.secondary.transfer()
+        self.assertEqual(self.secondary.soa[1].serial, 2)
+        self.assertEqual(self._addresses(), ['10.0.0.3'])
+        self.assertEqual(
+            len(self.flushLoggedErrors(DNSNotImplementedError)), 1)
+
+
+    def test_notify(self):
+        """
+        A I{NOTIFY} message from the primary for the zone refreshes it, and
+        one which arrives during a refresh makes it refresh again afterwards.
+        Others are not acted on.
+        """
+        self.assertFalse(self.secondary.notify('example.org', '10.0.0.53'))
+        self.assertFalse(self.secondary.notify('example.com', '10.0.0.54'))
+        self.assertEqual(self.primary.requests, [])
+
+        self.assertTrue(self.secondary.notify('Example.COM', '10.0.0.53'))
+        self.assertEqual(self.primary.requests, ['lookupZone'])
+
+        self.secondary.transferring = True
+        self.assertTrue(self.secondary.notify('example.com', '10.0.0.53'))
+        self.assertEqual(self.primary.requests, ['lookupZone'])
+        self.secondary._transferred(None)
+        self.assertEqual(
+            self.primary.requests, ['lookupZone', 'lookupAuthority'])
+
+
+    def test_nextRefresh(self):
+        """
+        L{secondary.SecondaryAuthority.nextRefresh} is the I{REFRESH}
+        interval of the zone's I{SOA} record, or its I{RETRY} interval after
+        a failed refresh, and C{defaultRefresh} until the zone has been
+        transferred.
+        """
+        self.assertEqual(
+            self.secondary.nextRefresh(), self.secondary.defaultRefresh)
+        self.secondary.transfer()
+        self.assertEqual(self.secondary.nextRefresh(), 300)
+        self.primary.lookupAuthority = lambda name: defer.fail(
+            DNSServerError(Message()))
+        self.secondary.transfer()
+        self.assertEqual(self.secondary.nextRefresh(), 60)
+        self.assertEqual(len(self.flushLoggedErrors(DNSServerError)), 1)
+
+
+
+class SecondaryAuthorityServiceTests(unittest.TestCase):
+    """
+    Tests for L{secondary.SecondaryAuthorityService}.
+    """
+    def test_refreshInterval(self):
+        """
+        The service refreshes each zone as often as its I{SOA} record asks,
+        and stops refreshing it when stopped.
+        """
+        clock = task.Clock()
+        primary = FakePrimary([], 1)
+        service = secondary.SecondaryAuthorityService(
+            '10.0.0.53', ['example.com'], reactor=clock)
+        service.domains[0]._primaryResolver = lambda: primary
+        service.startService()
+        clock.advance(0)
+        self.assertEqual(primary.requests, ['lookupZone'])
+        clock.advance(299)
+        self.assertEqual(primary.requests, ['lookupZone'])
+        clock.advance(1)
+        self.assertEqual(primary.requests, ['lookupZone', 'lookupAuthority'])
+        service.stopService()
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
 
 class NoInitialResponseTestCase(unittest.TestCase):
 
@@ -101,9 +101,14 @@ class NetstringReceiver(protocol.Protocol):
         (C{PARSING_LENGTH}) or the payload (C{PARSING_PAYLOAD}) of a netstring
     @type _state: C{int}
 
-    @ivar _remainingData: Holds the chunk of data that has not yet been consumed
+    @ivar _remainingData: Holds the chunk of data that has not yet been
+        consumed, starting at C{_remainingOffset}
     @type _remainingData: C{string}
 
+    @ivar _remainingOffset: The offset in C{_remainingData} of the first
+        character which has not yet been consumed
+    @type _remainingOffset: C{int}
+
     @ivar _payload: Holds the payload portion of a netstring including the
         trailing comma
     @type _payload: C{cStringIO.StringIO}
@@ -140,6 +145,7 @@ class NetstringReceiver(protocol.Protocol):
         """
         protocol.Protocol.makeConnection(self, transport)
         self._remainingData = ""
+        self._remainingOffset = 0
         self._currentPayloadSize = 0
         self._payload = cStringIO.StringIO()
         self._state = self._PARSING_LENGTH
@@ -175,8 +181,13 @@ class NetstringReceiver(protocol.Protocol):
             netstring
         @type data: C{str}
         """
-        self._remainingData += data
-        while self._remainingData:
+        # Netstrings are consumed by advancing _remainingOffset instead of
+        # slicing off the rest of the data after each one, so a chunk holding
+        # many netstrings is handled in linear time.
+        self._remainingData = (
+            self._remainingData[self._remainingOffset:] + data)
+        self._remainingOffset = 0
+        while self._remainingOffset < len(self._remainingData):
             try:
                 self._consumeData()
             except IncompleteNetstring:
@@ -184,6 +195,8 @@ class NetstringReceiver(protocol.Protocol):
             except NetstringParseError:
                 self._handleParseError()
                 break
+        self._remainingData = self._remainingData[self._remainingOffset:]
+        self._remainingOffset = 0
 
 
     def stringReceived(self, string):
@@ -236,7 +249,8 @@ class NetstringReceiver(protocol.Protocol):
         @raise NetstringParseError: if the received data do not form a valid
             netstring.
         """
-        lengthMatch = self._LENGTH.match(self._remainingData)
+        lengthMatch = self._LENGTH.match(
+            self._remainingData, self._remainingOffset)
         if not lengthMatch:
             self._checkPartialLengthSpecification()
             raise IncompleteNetstring()
@@ -253,7 +267,8 @@ class NetstringReceiver(protocol.Protocol):
         @raise NetstringParseError: if C{self._remainingData} is no
             number or is too big (checked by L{extractLength}).
         """
-        partialLengthMatch = self._LENGTH_PREFIX.match(self._remainingData)
+        partialLengthMatch = self._LENGTH_PREFIX.match(
+            self._remainingData, self._remainingOffset)
         if not partialLengthMatch:
             raise NetstringParseError(self._MISSING_LENGTH)
         lengthSpecification = (partialLengthMatch.group(1))
@@ -267,7 +282,7 @@ class NetstringReceiver(protocol.Protocol):
         Extracts and stores in C{self._expectedPayloadSize} the number
         representing the netstring size.  Removes the prefix
         representing the length specification from
-        C{self._remainingData}.
+        C{self._remainingData} by advancing C{self._remainingOffset}.
 
         @raise NetstringParseError: if the received netstring does not
             start with a number or the number is bigger than
@@ -278,10 +293,10 @@ class NetstringReceiver(protocol.Protocol):
         """
         endOfNumber = lengthMatch.end(1)
         startOfData = lengthMatch.end(2)
-        lengthString = self._remainingData[:endOfNumber]
+        lengthString = self._remainingData[self._remainingOffset:endOfNumber]
         # Expect payload plus trailing comma:
         self._expectedPayloadSize = self._extractLength(lengthString) + 1
-        self._remainingData = self._remainingData[startOfData:]
+        self._remainingOffset = startOfData
 
 
     def _extractLength(self, lengthAsString):
@@ -357,9 +372,8 @@ class NetstringReceiver(protocol.Protocol):
         """
         Extracts payload information from C{self._remainingData}.
 
-        Splits C{self._remainingData} at the end of the netstring.  The
-        first part becomes C{self._payload}, the second part is stored
-        in C{self._remainingData}.
+        Copies C{self._remainingData} up to the end of the netstring to
+        C{self._payload} and advances C{self._remainingOffset} past it.
 
         If the netstring is not yet complete, the whole content of
         C{self._remainingData} is moved to C{self._payload}.
@@ -367,13 +381,17 @@ class NetstringReceiver(protocol.Protocol):
         if self._payloadComplete():
             remainingPayloadSize = (self._expectedPayloadSize -
                                     self._currentPayloadSize)
-            self._payload.write(self._remainingData[:remainingPayloadSize])
-            self._remainingData = self._remainingData[remainingPayloadSize:]
+            endOfPayload = self._remainingOffset + remainingPayloadSize
+            self._payload.write(
+                self._remainingData[self._remainingOffset:endOfPayload])
+            self._remainingOffset = endOfPayload
             self._currentPayloadSize = self._expectedPayloadSize
         else:
-            self._payload.write(self._remainingData)
-            self._currentPayloadSize += len(self._remainingData)
+            self._payload.write(self._remainingData[self._remainingOffset:])
+            self._currentPayloadSize += (
+                len(self._remainingData) - self._remainingOffset)
             self._remainingData = ""
+            self._remainingOffset = 0
 
 
     def _payloadComplete(self):
@@ -385,7 +403,8 @@ class NetstringReceiver(protocol.Protocol):
             netstring
         @rtype: C{bool}
         """
-        return (len(self._remainingData) + self._currentPayloadSize >=
+        return (len(self._remainingData) - self._remainingOffset +
+                self._currentPayloadSize >=
                 self._expectedPayloadSize)
 
 
@@ -426,6 +445,10 @@ class LineOnlyReceiver(protocol.Protocol):
     This is purely a speed optimisation over LineReceiver, for the
     cases that raw mode is known to be unnecessary.
 
+    All of the complete lines parsed from one chunk of data are passed to
+    L{linesReceived} together.  Override it instead of L{lineReceived} to
+    handle them as a batch.
+
     @cvar delimiter: The line-ending delimiter to use. By default this is
                      '\\r\\n'.
     @cvar MAX_LENGTH: The maximum length of a line to allow (If a
@@ -442,6 +465,33 @@ class LineOnlyReceiver(protocol.Protocol):
         """
         lines  = (self._buffer+data).split(self.delimiter)
         self._buffer = lines.pop(-1)
+        tooLong = None
+        if lines and max(map(len, lines)) > self.MAX_LENGTH:
+            for i, line in enumerate(lines):
+                if len(line) > self.MAX_LENGTH:
+                    tooLong = line
+                    del lines[i:]
+                    break
+        if lines and not self.transport.disconnecting:
+            self.linesReceived(lines)
+        if self.transport.disconnecting:
+            return
+        if tooLong is not None:
+            return self.lineLengthExceeded(tooLong)
+        if len(self._buffer) > self.MAX_LENGTH:
+            return self.lineLengthExceeded(self._buffer)
+
+
+    def linesReceived(self, lines):
+        """
+        Override this to handle all of the lines received in one chunk of
+        data at once.  The default implementation calls L{lineReceived} with
+        each of them.
+
+        @param lines: The lines which were received, with the delimiters
+            removed.
+        @type lines: C{list} of C{str}
+        """
         for line in lines:
             if self.transport.disconnecting:
                 # this is necessary because the transport may be told to lose
@@ -449,12 +499,7 @@ class LineOnlyReceiver(protocol.Protocol):
                 # important to disregard all the lines in that packet following
                 # the one that told it to close.
                 return
-            if len(line) > self.MAX_LENGTH:
-                return self.lineLengthExceeded(line)
-            else:
-                self.lineReceived(line)
-        if len(self._buffer) > self.MAX_LENGTH:
-            return self.lineLengthExceeded(self._buffer)
+            self.lineReceived(line)
 
 
     def lineReceived(self, line):
@@ -525,6 +570,7 @@ class LineReceiver(protocol.Protocol, _PauseableMixin):
     """
     line_mode = 1
     __buffer = ''
+    __offset = 0
     delimiter = '\r\n'
     MAX_LENGTH = 16384
 
@@ -535,8 +581,9 @@ class LineReceiver(protocol.Protocol, _PauseableMixin):
         @return: All of the cleared buffered data.
         @rtype: C{str}
         """
-        b = self.__buffer
+        b = self.__buffer[self.__offset:]
         self.__buffer = ""
+        self.__offset = 0
         return b
 
 
@@ -546,30 +593,40 @@ class LineReceiver(protocol.Protocol, _PauseableMixin):
         Translates bytes into lines, and calls lineReceived (or
         rawDataReceived, depending on mode.)
         """
-        self.__buffer = self.__buffer+data
+        # Lines are consumed by advancing __offset through __buffer instead
+        # of copying the rest of the buffer after each one, so a chunk
+        # holding many lines is handled in linear time.  The consumed prefix
+        # is only discarded once per call.
+        if self.__offset:
+            self.__buffer = self.__buffer[self.__offset:] + data
+            self.__offset = 0
+        else:
+            self.__buffer = self.__buffer + data
         while self.line_mode and not self.paused:
-            try:
-                line, self.__buffer = self.__buffer.split(self.delimiter, 1)
-            except ValueError:
-                if len(self.__buffer) > self.MAX_LENGTH:
-                    line, self.__buffer = self.__buffer, ''
-                    return self.lineLengthExceeded(line)
+            # lineReceived may have replaced the buffer, by clearing it or by
+            # calling dataReceived again, so always start from the attributes.
+            buffer = self.__buffer
+            offset = self.__offset
+            end = buffer.find(self.delimiter, offset)
+            if end == -1:
+                if len(buffer) - offset > self.MAX_LENGTH:
+                    return self.lineLengthExceeded(self.clearLineBuffer())
                 break
-            else:
-                linelength = len(line)
-                if linelength > self.MAX_LENGTH:
-                    exceeded = line + self.__buffer
-                    self.__buffer = ''
-                    return self.lineLengthExceeded(exceeded)
-                why = self.lineReceived(line)
-                if why or self.transport and self.transport.disconnecting:
-                    return why
+            if end - offset > self.MAX_LENGTH:
+                return self.lineLengthExceeded(self.clearLineBuffer())
+            line = buffer[offset:end]
+            self.__offset = end + len(self.delimiter)
+            why = self.lineReceived(line)
+            if why or self.transport and self.transport.disconnecting:
+                return why
         else:
             if not self.paused:
-                data=self.__buffer
-                self.__buffer=''
+                data = self.clearLineBuffer()
                 if data:
                     return self.rawDataReceived(data)
+        if self.__offset:
+            self.__buffer = self.__buffer[self.__offset:]
+            self.__offset = 0
 
 
     def setLineMode(self, extra=''):
@@ -647,13 +704,43 @@ class StringTooLongError(AssertionError):
 
 
 
+class _RecvdCompatHack(object):
+    """
+    Emulates the C{recvd} attribute of L{IntNStringReceiver}, which used to
+    hold all of the received data not yet delivered to C{stringReceived}.
+
+    Reading C{recvd} returns the unconsumed part of the receiver's buffer.
+    Assigning to it, as L{twisted.protocols.amp} does when switching
+    protocols, puts the new value in the instance dictionary, where
+    L{IntNStringReceiver.dataReceived} picks it up as the new buffer.
+    """
+    def __get__(self, oself, type=None):
+        if oself is None:
+            return self
+        return oself._unprocessed[oself._compatibilityOffset:]
+
+
+
 class IntNStringReceiver(protocol.Protocol, _PauseableMixin):
     """
     Generic class for length prefixed protocols.
 
-    @ivar recvd: buffer holding received data when splitted.
+    Subclasses which override L{stringsReceived} are passed all of the
+    complete strings parsed from one chunk of data together, instead of
+    having L{stringReceived} called with each of them.
+
+    @ivar recvd: received data which has not yet been delivered to
+        L{stringReceived}.  Assigning to it replaces that data.
     @type recvd: C{str}
 
+    @ivar _unprocessed: buffer holding received data, of which everything
+        before C{_compatibilityOffset} has already been consumed.
+    @type _unprocessed: C{str}
+
+    @ivar _compatibilityOffset: the offset in C{_unprocessed} of the first
+        byte which has not yet been consumed.
+    @type _compatibilityOffset: C{int}
+
     @ivar structFormat: format used for struct packing/unpacking. Define it in
         subclass.
     @type structFormat: C{str}
@@ -663,7 +750,9 @@ class IntNStringReceiver(protocol.Protocol, _PauseableMixin):
     @type prefixLength: C{int}
     """
     MAX_LENGTH = 99999
-    recvd = ""
+    _unprocessed = ""
+    _compatibilityOffset = 0
+    recvd = _RecvdCompatHack()
 
     def stringReceived(self, string):
         """
@@ -676,6 +765,24 @@ class IntNStringReceiver(protocol.Protocol, _PauseableMixin):
         raise NotImplementedError
 
 
+    def stringsReceived(self, strings):
+        """
+        Override this to handle all of the strings received in one chunk of
+        data at once.  The default implementation calls L{stringReceived}
+        with each of them.
+
+        Since the strings are parsed before this is called, pausing the
+        protocol or assigning to C{recvd} from here only affects data which
+        follows the last of them.
+
+        @param strings: The complete strings which were received, with all
+            framing removed.
+        @type strings: C{list} of C{str}
+        """
+        for string in strings:
+            self.stringReceived(string)
+
+
     def lengthLimitExceeded(self, length):
         """
         Callback invoked when a length prefix greater than C{MAX_LENGTH} is
@@ -688,22 +795,91 @@ class IntNStringReceiver(protocol.Protocol, _PauseableMixin):
         self.transport.loseConnection()
 
 
+    def _adoptRecvd(self):
+        """
+        If C{recvd} has been assigned to, make its value the new buffer.
+        """
+        if 'recvd' in self.__dict__:
+            self._unprocessed = self.__dict__.pop('recvd')
+            self._compatibilityOffset = 0
+
+
     def dataReceived(self, recd):
         """
         Convert int prefixed strings into calls to stringReceived.
         """
-        self.recvd = self.recvd + recd
-        while len(self.recvd) >= self.prefixLength and not self.paused:
-            length ,= struct.unpack(
-                self.structFormat, self.recvd[:self.prefixLength])
+        # Unless stringsReceived is overridden, deliver the strings one at a
+        # time so stringReceived can pause the protocol or replace recvd
+        # before the data following each string is looked at.
+        batch = getattr(self.stringsReceived, 'im_func', None)
+        if batch is not IntNStringReceiver.stringsReceived.im_func:
+            return self._batchDataReceived(recd)
+        # Strings are consumed by advancing an offset into a single buffer
+        # instead of slicing off the rest of it after each one, so a chunk
+        # holding many strings is handled in linear time.
+        self._adoptRecvd()
+        alldata = self._unprocessed[self._compatibilityOffset:] + recd
+        offset = 0
+        self._unprocessed = alldata
+        self._compatibilityOffset = 0
+        prefixLength = self.prefixLength
+        structFormat = self.structFormat
+        while len(alldata) >= offset + prefixLength and not self.paused:
+            start = offset + prefixLength
+            length ,= struct.unpack(structFormat, alldata[offset:start])
             if length > self.MAX_LENGTH:
                 self.lengthLimitExceeded(length)
                 return
-            if len(self.recvd) < length + self.prefixLength:
+            end = start + length
+            if len(alldata) < end:
                 break
-            packet = self.recvd[self.prefixLength:length + self.prefixLength]
-            self.recvd = self.recvd[length + self.prefixLength:]
+            packet = alldata[start:end]
+            offset = self._compatibilityOffset = end
             self.stringReceived(packet)
+            # stringReceived may have replaced the buffer, by assigning to
+            # recvd or by calling dataReceived again.
+            if ('recvd' in self.__dict__ or self._unprocessed is not alldata
+                    or self._compatibilityOffset != offset):
+                self._adoptRecvd()
+                alldata = self._unprocessed
+                offset = self._compatibilityOffset
+        self._unprocessed = alldata[offset:]
+        self._compatibilityOffset = 0
+
+
+    def _batchDataReceived(self, recd):
+        """
+        Convert int prefixed strings into a call to stringsReceived.
+        """
+        self._adoptRecvd()
+        alldata = self._unprocessed[self._compatibilityOffset:] + recd
+        self._unprocessed = alldata
+        self._compatibilityOffset = 0
+        if self.paused:
+            return
+        offset = 0
+        prefixLength = self.prefixLength
+        structFormat = self.structFormat
+        maxLength = self.MAX_LENGTH
+        strings = []
+        exceeded = None
+        while len(alldata) >= offset + prefixLength:
+            start = offset + prefixLength
+            length ,= struct.unpack(structFormat, alldata[offset:start])
+            if length > maxLength:
+                exceeded = length
+                break
+            end = start + length
+            if len(alldata) < end:
+                break
+            strings.append(alldata[start:end])
+            offset = end
+        self._unprocessed = alldata[offset:]
+        if strings:
+            self.stringsReceived(strings)
+        if (exceeded is not None and not self.paused
+                and 'recvd' not in self.__dict__):
+            self.lengthLimitExceeded(exceeded)
 
 
     def sendString(self, string):
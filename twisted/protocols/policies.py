@@ -16,6 +16,7 @@ from zope.interface import directlyProvides, providedBy
 # twisted imports
 from twisted.internet.protocol import ServerFactory, Protocol, ClientFactory
 from twisted.internet import error
+from twisted.internet.interfaces import ISendFileTransport
 from twisted.python import log
 
 
@@ -41,8 +42,15 @@ class ProtocolWrapper(Protocol):
         When a connection is made, register this wrapper with its factory,
         save the real transport, and connect the wrapped protocol to this
         L{ProtocolWrapper} to intercept any transport calls it makes.
+
+        This wrapper provides the same interfaces as C{transport}, except for
+        L{ISendFileTransport}: file contents sent directly by the real
+        transport would bypass this wrapper entirely.
         """
-        directlyProvides(self, providedBy(transport))
+        provided = providedBy(transport)
+        directlyProvides(self, provided - ISendFileTransport, [
+                base for base in ISendFileTransport.__bases__
+                if provided.isOrExtends(base)])
         Protocol.makeConnection(self, transport)
         self.factory.registerProtocol(self)
         self.wrappedProtocol.makeConnection(self)
@@ -475,12 +483,21 @@ class TimeoutProtocol(ProtocolWrapper):
 class TimeoutFactory(WrappingFactory):
     """
     Factory for TimeoutWrapper.
+
+    @ivar timeoutClock: The L{IReactorTime} provider used to schedule
+        timeouts, or C{None} to use the global reactor.  Setting this to a
+        shared L{twisted.internet.task.CoarseClock} makes resetting the
+        timeout of a busy connection much cheaper, at the cost of timeouts
+        firing up to that clock's resolution late.
     """
     protocol = TimeoutProtocol
+    timeoutClock = None
 
 
-    def __init__(self, wrappedFactory, timeoutPeriod=30*60):
+    def __init__(self, wrappedFactory, timeoutPeriod=30*60, timeoutClock=None):
         self.timeoutPeriod = timeoutPeriod
+        if timeoutClock is not None:
+            self.timeoutClock = timeoutClock
         WrappingFactory.__init__(self, wrappedFactory)
 
 
@@ -493,6 +510,8 @@ class TimeoutFactory(WrappingFactory):
         """
         Wrapper around L{reactor.callLater} for test purpose.
         """
+        if self.timeoutClock is not None:
+            return self.timeoutClock.callLater(period, func)
         from twisted.internet import reactor
         return reactor.callLater(period, func)
 
@@ -603,8 +622,15 @@ class TimeoutMixin:
     default, closes the connection.
 
     @cvar timeOut: The number of seconds after which to timeout the connection.
+
+    @cvar timeoutClock: The L{IReactorTime} provider used to schedule the
+        timeout, or C{None} to use the global reactor.  Setting this to a
+        shared L{twisted.internet.task.CoarseClock} makes L{resetTimeout}
+        much cheaper, at the cost of timeouts firing up to that clock's
+        resolution late.
     """
     timeOut = None
+    timeoutClock = None
 
     __timeoutCall = None
 
@@ -612,6 +638,8 @@ class TimeoutMixin:
         """
         Wrapper around L{reactor.callLater} for test purpose.
         """
+        if self.timeoutClock is not None:
+            return self.timeoutClock.callLater(period, func)
         from twisted.internet import reactor
         return reactor.callLater(period, func)
 
@@ -0,0 +1,52 @@
+/*
+ * Copyright (c) Twisted Matrix Laboratories.
+ * See LICENSE for details.
+ */
+
+/*
+ * A wrapper around Linux's sendfile(2), so that the contents of a file can
+ * be written to a socket without being copied into user space.
+ */
+
+#include "Python.h"
+
+#include <sys/types.h>
+#include <sys/sendfile.h>
+
+static PyObject *
+sendfile_sendfile(PyObject *self, PyObject *args)
+{
+	int outFD, inFD;
+	PY_LONG_LONG offset;
+	Py_ssize_t count;
+	off_t fileOffset;
+	ssize_t sent;
+
+	if (!PyArg_ParseTuple(args, "iiLn:sendfile", &outFD, &inFD, &offset,
+	                      &count))
+		return NULL;
+
+	fileOffset = (off_t)offset;
+
+	Py_BEGIN_ALLOW_THREADS
+	sent = sendfile(outFD, inFD, &fileOffset, (size_t)count);
+	Py_END_ALLOW_THREADS
+
+	if (sent == -1)
+		return PyErr_SetFromErrno(PyExc_OSError);
+	return PyInt_FromSsize_t(sent);
+}
+
+static PyMethodDef SendfileMethods[] = {
+	{"sendfile",	sendfile_sendfile,	METH_VARARGS,
+	 "sendfile(outFD, inFD, offset, count) -> number of bytes sent\n\n"
+	 "Send up to count bytes of the file open as inFD, starting at offset,\n"
+	 "to outFD.  The file position of inFD is not changed."},
+	{NULL,		NULL}
+};
+
+void
+init_sendfile(void)
+{
+	Py_InitModule("_sendfile", SendfileMethods);
+}
@@ -0,0 +1,111 @@
+/*
+ * Copyright (c) Twisted Matrix Laboratories.
+ * See LICENSE for details.
+ */
+
+/*
+ * A wrapper around writev(2), so that a sequence of strings can be written
+ * to a file descriptor without first joining them into one string.
+ */
+
+#include "Python.h"
+
+#if defined(__unix__) || defined(unix) || defined(__NetBSD__) || defined(__MACH__) /* Mac OS X */
+
+#include <sys/types.h>
+#include <sys/uio.h>
+#include <limits.h>
+#include <unistd.h>
+
+#ifndef IOV_MAX
+#ifdef UIO_MAXIOV
+#define IOV_MAX UIO_MAXIOV
+#else
+#define IOV_MAX 16
+#endif
+#endif
+
+static PyObject *
+writev_writev(PyObject *self, PyObject *args)
+{
+	int fd;
+	PyObject *sequence, *fast;
+	Py_ssize_t count, i;
+	struct iovec *iov;
+	ssize_t written;
+
+	if (!PyArg_ParseTuple(args, "iO:writev", &fd, &sequence))
+		return NULL;
+
+	fast = PySequence_Fast(sequence, "writev() argument 2 must be a sequence");
+	if (fast == NULL)
+		return NULL;
+
+	count = PySequence_Fast_GET_SIZE(fast);
+	if (count > IOV_MAX)
+		count = IOV_MAX;
+	if (count == 0) {
+		Py_DECREF(fast);
+		return PyInt_FromLong(0);
+	}
+
+	iov = PyMem_New(struct iovec, count);
+	if (iov == NULL) {
+		Py_DECREF(fast);
+		return PyErr_NoMemory();
+	}
+
+	for (i = 0; i < count; i++) {
+		const void *base;
+		Py_ssize_t len;
+		if (PyObject_AsReadBuffer(PySequence_Fast_GET_ITEM(fast, i),
+		                          &base, &len) == -1) {
+			PyMem_Free(iov);
+			Py_DECREF(fast);
+			return NULL;
+		}
+		iov[i].iov_base = (void *)base;
+		iov[i].iov_len = len;
+	}
+
+	/* The sequence keeps every item, and so every buffer, alive while the
+	 * GIL is released. */
+	Py_BEGIN_ALLOW_THREADS
+	written = writev(fd, iov, (int)count);
+	Py_END_ALLOW_THREADS
+
+	PyMem_Free(iov);
+	Py_DECREF(fast);
+
+	if (written == -1)
+		return PyErr_SetFromErrno(PyExc_OSError);
+	return PyInt_FromSsize_t(written);
+}
+
+static PyMethodDef WritevMethods[] = {
+	{"writev",	writev_writev,	METH_VARARGS,
+	 "writev(fd, sequence) -> number of bytes written\n\n"
+	 "Write the strings or buffers in sequence to fd with one system call.\n"
+	 "At most IOV_MAX items are written."},
+	{NULL,		NULL}
+};
+
+#else
+
+/* This module is empty on non-UNIX systems. */
+
+static PyMethodDef WritevMethods[] = {
+	{NULL,		NULL}
+};
+
+#endif /* defined(__unix__) || defined(unix) */
+
+void
+init_writev(void)
+{
+	PyObject *module = Py_InitModule("_writev", WritevMethods);
+#if defined(__unix__) || defined(unix) || defined(__NetBSD__) || defined(__MACH__)
+	if (module != NULL)
+		PyModule_AddIntConstant(module, "IOV_MAX", IOV_MAX);
+#endif
+}
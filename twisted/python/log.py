@@ -71,7 +71,7 @@ def callWithContext(ctx, func, *args, **kw):
 def callWithLogger(logger, func, *args, **kw):
     """
     Utility method which wraps a function in a try:/except:, logs a failure if
-    one occurrs, and uses the system's logPrefix.
+    one occurs, and uses the system's logPrefix.
     """
     try:
         lp = logger.logPrefix()
@@ -89,6 +89,44 @@ def callWithLogger(logger, func, *args, **kw):
 
 
 
+def callWithLoggerOnError(logger, func, *args, **kw):
+    """
+    Utility method which wraps a function in a try:/except: and logs a
+    failure if one occurs, using the logger's logPrefix as the system.
+
+    Unlike L{callWithLogger}, no logging context is established for the call,
+    which makes this considerably cheaper: the logPrefix is only looked up if
+    there is a failure to log.  Messages logged by C{func} itself are not
+    labelled with it, though.
+    """
+    try:
+        return func(*args, **kw)
+    except KeyboardInterrupt:
+        raise
+    except:
+        errWithLogger(logger)
+
+
+
+def errWithLogger(logger, _stuff=None, _why=None):
+    """
+    Write a failure to the log, using the logger's logPrefix as the system.
+
+    @see: L{err}
+    """
+    if _stuff is None:
+        _stuff = failure.Failure()
+    try:
+        lp = logger.logPrefix()
+    except KeyboardInterrupt:
+        raise
+    except:
+        lp = '(buggy logPrefix method)'
+        err(system=lp)
+    err(_stuff, _why, system=lp)
+
+
+
 _keepErrors = 0
 _keptErrors = []
 _ignoreErrors = []
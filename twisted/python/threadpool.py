@@ -15,7 +15,9 @@ import Queue
 import threading
 import copy
 import sys
+import time
 import warnings
+from bisect import bisect
 
 
 # Twisted Imports
@@ -278,6 +280,480 @@ class ThreadPool:
 
 
 
+class TimeHistogram(object):
+    """
+    Counts of durations, in buckets by their length.
+
+    The count at index C{i} of C{counts} is the number of durations below
+    C{bounds[i]} but not below C{bounds[i - 1]}, and the last count is of
+    the durations not below C{bounds[-1]}.
+
+    @ivar bounds: The upper bounds, in seconds, of the buckets.
+    @type bounds: C{tuple} of C{float}
+
+    @ivar counts: The number of durations in each bucket.
+    @type counts: C{list} of C{int}
+
+    @ivar total: The sum of the durations, in seconds.
+    """
+    bounds = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+
+
+    def add(self, duration):
+        """
+        Count C{duration}, in seconds.
+        """
+        self.counts[bisect(self.bounds, duration)] += 1
+        self.total += duration
+
+
+    def merge(self, other):
+        """
+        Add the counts of the durations in the L{TimeHistogram} C{other} to
+        mine.
+        """
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total += other.total
+
+
+    def copy(self):
+        """
+        Return a copy of this histogram.
+        """
+        other = self.__class__()
+        other.merge(self)
+        return other
+
+
+    def __repr__(self):
+        return '<TimeHistogram counts=%r total=%r>' % (self.counts, self.total)
+
+
+
+class ThreadPoolStats(object):
+    """
+    A snapshot of the state and history of an L{AdaptiveThreadPool}.
+
+    @ivar workers: The number of threads in the pool.
+    @ivar busy: The number of threads running a task.
+    @ivar queued: The number of tasks waiting for a thread.
+    @ivar maxQueued: The greatest number of tasks which have been waiting
+        for a thread at once.
+    @ivar completed: The number of tasks which have been run.
+
+    @ivar waitTimes: The times tasks waited for a thread.
+    @type waitTimes: L{TimeHistogram}
+    @ivar runTimes: The times tasks took to run.
+    @type runTimes: L{TimeHistogram}
+    """
+    def __init__(self):
+        self.workers = self.busy = self.queued = self.maxQueued = 0
+        self.completed = 0
+        self.waitTimes = TimeHistogram()
+        self.runTimes = TimeHistogram()
+
+
+    def add(self, other):
+        """
+        Add the counts of the tasks in C{other} to mine.
+        """
+        self.completed += other.completed
+        self.waitTimes.merge(other.waitTimes)
+        self.runTimes.merge(other.runTimes)
+
+
+    def __repr__(self):
+        return ('<ThreadPoolStats workers=%d busy=%d queued=%d '
+                'maxQueued=%d completed=%d>' % (
+                    self.workers, self.busy, self.queued, self.maxQueued,
+                    self.completed))
+
+
+
+class _WorkerState(object):
+    """
+    The bookkeeping of one thread of an L{AdaptiveThreadPool}.  Only that
+    thread changes it, so no lock is needed.
+
+    @ivar busy: C{True} while the thread is running a task.
+    @ivar lastActive: The time the thread last finished a task or started.
+    @ivar stats: The counts of the tasks the thread has run, as a
+        L{ThreadPoolStats}.
+    """
+    __slots__ = ('busy', 'lastActive', 'stats')
+
+    def __init__(self, now):
+        self.busy = False
+        self.lastActive = now
+        self.stats = ThreadPoolStats()
+
+
+
+class AdaptiveThreadPool(ThreadPool):
+    """
+    A thread pool which sizes itself, between C{min} and C{max} threads, by
+    the latency tasks see waiting for a thread, and which records the wait
+    and run times of its tasks.
+
+    When a task is queued and no thread is idle to take it, the pool
+    estimates how long the task will wait, from the number of tasks ahead
+    of it and the recent run time of tasks, or from how long the oldest
+    queued task has waited if that is longer.  A thread is only started if
+    the estimate exceeds C{targetLatency}, so bursts of short tasks do not
+    start threads which would only compete for the interpreter lock.  If no
+    thread is started, the pool checks again after C{targetLatency} seconds,
+    so a task queued behind threads which are blocked still gets a thread
+    once it has waited that long.  Threads above C{min} which have been idle
+    for C{idleTimeout} seconds are stopped, by a timer which is armed while
+    any thread above C{min} is idle, so the pool shrinks again when it goes
+    quiet.
+
+    Each thread keeps its own counts, so running a task takes no lock; use
+    L{stats} to get the totals.  To use this pool as the reactor's, set
+    C{reactor.threadpoolFactory} to this class before the reactor's pool is
+    first used.
+
+    @ivar targetLatency: The longest time, in seconds, a task should wait
+        for a thread before the pool grows.
+    @ivar idleTimeout: The time, in seconds, a thread above C{min} may stay
+        idle before it is stopped.
+
+    @ivar _states: The L{_WorkerState}s of the threads in the pool.
+    @ivar _retired: The counts of the tasks run by threads which have
+        stopped, as a L{ThreadPoolStats}.
+    @ivar _maxQueued: The greatest number of queued tasks seen.
+    @ivar _runTime: A moving average of the time tasks take to run, in
+        seconds, or C{None} before any task has been run.
+    @ivar _sizeLock: The lock held while the pool starts or stops threads,
+        since that is done by callers, by the pool's threads and by
+        L{_recheck} and L{_reaper}.
+    @ivar _recheck: The timer which will check the size of the pool again,
+        or C{None}.
+    @ivar _reaper: The timer which will stop the threads which have been
+        idle for too long, or C{None}.
+    """
+    targetLatency = 0.01
+    idleTimeout = 60.0
+
+    timerFactory = staticmethod(threading.Timer)
+    _time = staticmethod(time.time)
+
+    def __init__(self, minthreads=0, maxthreads=20, name=None,
+                 targetLatency=None, idleTimeout=None):
+        """
+        @param targetLatency: See L{targetLatency}.
+        @param idleTimeout: See L{idleTimeout}.
+        """
+        ThreadPool.__init__(self, minthreads, maxthreads, name)
+        if targetLatency is not None:
+            self.targetLatency = targetLatency
+        if idleTimeout is not None:
+            self.idleTimeout = idleTimeout
+        self._states = []
+        self._retired = ThreadPoolStats()
+        self._retiredLock = threading.Lock()
+        self._maxQueued = 0
+        self._runTime = None
+        self._sizeLock = threading.RLock()
+        self._recheck = None
+        self._reaper = None
+
+
+    def __setstate__(self, state):
+        self.__dict__ = state
+        AdaptiveThreadPool.__init__(
+            self, self.min, self.max, None, state.get('targetLatency'),
+            state.get('idleTimeout'))
+
+
+    def __getstate__(self):
+        state = ThreadPool.__getstate__(self)
+        state['targetLatency'] = self.targetLatency
+        state['idleTimeout'] = self.idleTimeout
+        return state
+
+
+    def startAWorker(self):
+        self.workers += 1
+        name = "PoolThread-%s-%s" % (self.name or id(self), self.workers)
+        state = _WorkerState(self._time())
+        self._states.append(state)
+        newThread = self.threadFactory(
+            target=self._worker, name=name, args=(state,))
+        self.threads.append(newThread)
+        newThread.start()
+
+
+    def callInThreadWithCallback(self, onResult, func, *args, **kw):
+        """
+        See L{ThreadPool.callInThreadWithCallback}.
+        """
+        if self.joined:
+            return
+        ctx = context.theContextTracker.currentContext().contexts[-1]
+        self.q.put((ctx, func, args, kw, onResult, self._time()))
+        if self.started:
+            self._startSomeWorkers()
+
+
+    def _queued(self):
+        """
+        Return the number of tasks waiting for a thread.
+        """
+        return len(self.q.queue)
+
+
+    def stop(self):
+        """
+        See L{ThreadPool.stop}.
+        """
+        self._sizeLock.acquire()
+        try:
+            self.joined = True
+            timers = [timer for timer in (self._recheck, self._reaper)
+                      if timer is not None]
+            self._recheck = self._reaper = None
+        finally:
+            self._sizeLock.release()
+        for timer in timers:
+            timer.cancel()
+            timer.join()
+        ThreadPool.stop(self)
+
+
+    def adjustPoolsize(self, minthreads=None, maxthreads=None):
+        """
+        See L{ThreadPool.adjustPoolsize}.
+        """
+        self._sizeLock.acquire()
+        try:
+            ThreadPool.adjustPoolsize(self, minthreads, maxthreads)
+        finally:
+            self._sizeLock.release()
+
+
+    def _startSomeWorkers(self):
+        self._sizeLock.acquire()
+        try:
+            self._resize()
+        finally:
+            self._sizeLock.release()
+
+
+    def _checkSize(self):
+        """
+        Check the size of the pool again, when L{_recheck} fires.
+        """
+        self._sizeLock.acquire()
+        try:
+            self._recheck = None
+            if self.started and not self.joined:
+                self._resize()
+        finally:
+            self._sizeLock.release()
+
+
+    def _reap(self):
+        """
+        Stop the threads which have been idle for too long, when L{_reaper}
+        fires.
+        """
+        self._sizeLock.acquire()
+        try:
+            self._reaper = None
+            if self.started and not self.joined:
+                self._stopIdleWorkers()
+        finally:
+            self._sizeLock.release()
+
+
+    def _startTimer(self, delay, function):
+        """
+        Start a daemon timer which calls C{function} after C{delay} seconds.
+        """
+        timer = self.timerFactory(delay, function)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+    def _stopIdleWorkers(self):
+        """
+        Stop the threads above C{min} which have been idle for
+        C{idleTimeout} seconds, and arm L{_reaper} for the next one to
+        become so.  L{_sizeLock} must be held.
+        """
+        if self.workers <= self.min:
+            return
+        now = self._time()
+        idle = [state.lastActive for state in list(self._states)
+                if not state.busy]
+        expired = [lastActive for lastActive in idle
+                   if now - lastActive >= self.idleTimeout]
+        for i in xrange(min(len(expired), self.workers - self.min)):
+            self.stopAWorker()
+        pending = [lastActive for lastActive in idle
+                   if now - lastActive < self.idleTimeout]
+        if self.workers > self.min and pending and self._reaper is None:
+            self._reaper = self._startTimer(
+                self.idleTimeout - (now - min(pending)), self._reap)
+
+
+    def _resize(self):
+        """
+        Start or stop a thread if the tasks queued need it.  L{_sizeLock}
+        must be held.
+        """
+        queued = self._queued()
+        if queued > self._maxQueued:
+            self._maxQueued = queued
+        states = list(self._states)
+        idle = [state for state in states if not state.busy]
+        now = self._time()
+        if queued <= len(idle):
+            if idle:
+                self._stopIdleWorkers()
+            return
+        if self.workers >= self.max:
+            return
+        if self.workers < self.min or self._latency(
+                queued - len(idle), now) > self.targetLatency:
+            self.startAWorker()
+        elif self._recheck is None:
+            self._recheck = self._startTimer(
+                self.targetLatency, self._checkSize)
+
+
+    def _latency(self, waiting, now):
+        """
+        Estimate how long the last of C{waiting} tasks queued behind busy
+        threads will wait for one.
+        """
+        if self._runTime is None or not self.workers:
+            # Nothing is known about how long tasks take.
+            return sys.maxint
+        estimate = waiting * self._runTime / self.workers
+        try:
+            oldest = self.q.queue[0]
+        except IndexError:
+            return estimate
+        if oldest is not WorkerStop:
+            estimate = max(estimate, now - oldest[5])
+        return estimate
+
+
+    def _worker(self, state):
+        """
+        Method used as target of the created threads: retrieve task to run
+        from the threadpool, run it, and proceed to the next task until
+        threadpool is stopped.
+
+        @param state: The L{_WorkerState} of this thread.
+        """
+        ct = self.currentThread()
+        now = self._time
+        stats = state.stats
+        waitTimes = stats.waitTimes
+        runTimes = stats.runTimes
+        o = self.q.get()
+        while o is not WorkerStop:
+            started = now()
+            state.busy = True
+            if self.q.queue and self._recheck is None:
+                # The tasks behind this one may have been queued while this
+                # thread still looked idle.
+                self._startSomeWorkers()
+            ctx, function, args, kwargs, onResult, queuedAt = o
+            del o
+
+            try:
+                result = context.call(ctx, function, *args, **kwargs)
+                success = True
+            except:
+                success = False
+                if onResult is None:
+                    context.call(ctx, log.err)
+                    result = None
+                else:
+                    result = failure.Failure()
+
+            del function, args, kwargs
+
+            finished = now()
+            waited = started - queuedAt
+            ran = finished - started
+            stats.completed += 1
+            waitTimes.add(waited)
+            runTimes.add(ran)
+            runTime = self._runTime
+            if runTime is None:
+                self._runTime = ran
+            else:
+                self._runTime = runTime * 0.9 + ran * 0.1
+            state.lastActive = finished
+            state.busy = False
+            if self._reaper is None and self.workers > self.min:
+                # Make sure this thread is stopped if it stays idle.
+                self._sizeLock.acquire()
+                try:
+                    if not self.joined:
+                        self._stopIdleWorkers()
+                finally:
+                    self._sizeLock.release()
+
+            if onResult is not None:
+                try:
+                    context.call(ctx, onResult, success, result)
+                except:
+                    context.call(ctx, log.err)
+
+            del ctx, onResult, result
+
+            o = self.q.get()
+
+        self._retiredLock.acquire()
+        try:
+            self._retired.add(stats)
+            self._states.remove(state)
+        finally:
+            self._retiredLock.release()
+        self.threads.remove(ct)
+
+
+    def stats(self):
+        """
+        Return the state of the pool and the counts of the tasks it has run.
+
+        @rtype: L{ThreadPoolStats}
+        """
+        result = ThreadPoolStats()
+        self._retiredLock.acquire()
+        try:
+            result.add(self._retired)
+            states = list(self._states)
+            for state in states:
+                result.add(state.stats)
+        finally:
+            self._retiredLock.release()
+        result.workers = self.workers
+        result.busy = len([state for state in states if state.busy])
+        result.queued = self._queued()
+        result.maxQueued = self._maxQueued
+        return result
+
+
+    def dumpStats(self):
+        log.msg('queue: %s' % self.q.queue)
+        log.msg('stats: %r' % self.stats())
+        log.msg('total: %s' % self.threads)
+
+
+
 class ThreadSafeList:
     """
     In Jython 2.1 lists aren't thread-safe, so this wraps it.  Newer versions
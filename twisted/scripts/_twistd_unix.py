@@ -4,8 +4,9 @@
 
 import os, errno, sys
 
-from twisted.python import log, syslog, logfile
+from twisted.python import log, syslog, logfile, usage
 from twisted.python.util import switchUID, uidFromString, gidFromString
+from twisted.internet import protocol, defer
 from twisted.application import app, service
 from twisted import copyright
 
@@ -27,6 +28,9 @@ class ServerOptions(app.ServerOptions):
                  "after binding ports, retaining the option to regain "
                  "privileges in cases such as spawning processes. "
                  "Use with caution.)"],
+                ['worker', None,
+                 "Run as one of the worker processes started by --workers "
+                 "(for internal use)."],
                ]
 
     optParameters = [
@@ -40,6 +44,10 @@ class ServerOptions(app.ServerOptions):
                      ['gid', 'g', None, "The gid to run as.", gidFromString],
                      ['umask', None, None,
                       "The (octal) file creation mask to apply.", _umask],
+                    ['workers', None, 1,
+                     "Run the application in this many worker processes. "
+                     "They can share a TCP port if it is listened on with "
+                     "reusePort, for example tcp:8080:reusePort=1.", int],
                     ]
     zsh_altArgDescr = {"prefix":"Use the given prefix when syslogging (default: twisted)",
                        "pidfile":"Name of the pidfile (default: twistd.pid)",}
@@ -58,6 +66,15 @@ class ServerOptions(app.ServerOptions):
 
     def postOptions(self):
         app.ServerOptions.postOptions(self)
+        if self['workers'] < 1:
+            raise usage.UsageError("--workers must be at least 1.")
+        if self['worker']:
+            # The supervising process daemonizes, owns the PID file and logs
+            # everything a worker writes to its standard output.
+            self['nodaemon'] = True
+            self['pidfile'] = ''
+            self['logfile'] = '-'
+            self['syslog'] = False
         if self['pidfile']:
             self['pidfile'] = os.path.abspath(self['pidfile'])
 
@@ -178,6 +195,123 @@ def launchWithName(name):
 
 
 
+class _WorkerProtocol(protocol.ProcessProtocol):
+    """
+    Log the output of a worker process and tell its L{WorkerSupervisor} when
+    it ends.
+
+    @ivar supervisor: The L{WorkerSupervisor} which started the worker.
+    @ivar number: The number of the worker, used to label what it logs.
+    @ivar ended: A L{Deferred} which fires when the process ends.
+    """
+
+    def __init__(self, supervisor, number):
+        self.supervisor = supervisor
+        self.number = number
+        self.ended = defer.Deferred()
+        self._buffer = ''
+
+
+    def outReceived(self, data):
+        lines = (self._buffer + data).split('\n')
+        self._buffer = lines.pop()
+        for line in lines:
+            log.msg(line, system='worker-%d' % (self.number,))
+
+    errReceived = outReceived
+
+
+    def processEnded(self, reason):
+        if self._buffer:
+            self.outReceived('\n')
+        self.supervisor.workerEnded(self, reason)
+        self.ended.callback(None)
+
+
+
+class WorkerSupervisor(object):
+    """
+    Run a number of worker processes and restart any which exit until told to
+    stop.
+
+    Each worker runs the same application, so when they all listen on a TCP
+    port with C{SO_REUSEPORT} the kernel balances incoming connections
+    between them, letting one service use every core of a machine.
+
+    @ivar reactor: The L{IReactorProcess} used to start the workers.
+    @ivar count: The number of workers to keep running.
+    @ivar arguments: The argument list each worker is run with; the first
+        element is the executable.
+    @ivar path: The working directory of the workers, or C{None} to use the
+        current one.
+    @ivar restartDelay: The number of seconds to wait before restarting a
+        worker which exited.
+    @ivar workers: A C{dict} mapping worker numbers to the
+        L{_WorkerProtocol} of each running worker.
+    @ivar stopping: A flag which is set once L{stop} is called, after which
+        workers are no longer restarted.
+    """
+    restartDelay = 1.0
+
+    def __init__(self, reactor, count, arguments, path=None):
+        self.reactor = reactor
+        self.count = count
+        self.arguments = arguments
+        self.path = path
+        self.workers = {}
+        self.stopping = False
+
+
+    def start(self):
+        """
+        Start all of the workers.
+        """
+        for number in range(self.count):
+            self.startWorker(number)
+
+
+    def startWorker(self, number):
+        """
+        Start the worker with the given number.
+        """
+        if self.stopping:
+            return
+        workerProtocol = _WorkerProtocol(self, number)
+        self.workers[number] = workerProtocol
+        self.reactor.spawnProcess(
+            workerProtocol, self.arguments[0], self.arguments, os.environ,
+            self.path)
+
+
+    def workerEnded(self, workerProtocol, reason):
+        """
+        Restart a worker which ended, unless L{stop} has been called.
+        """
+        del self.workers[workerProtocol.number]
+        if not self.stopping:
+            log.msg("Worker %d ended (%s), restarting it" % (
+                    workerProtocol.number, reason.getErrorMessage()))
+            self.reactor.callLater(
+                self.restartDelay, self.startWorker, workerProtocol.number)
+
+
+    def stop(self):
+        """
+        Terminate the running workers.
+
+        @return: A L{Deferred} which fires once all of them have ended.
+        """
+        self.stopping = True
+        for workerProtocol in self.workers.values():
+            try:
+                workerProtocol.transport.signalProcess('TERM')
+            except OSError:
+                pass
+        return defer.DeferredList(
+            [workerProtocol.ended for workerProtocol in self.workers.values()])
+
+
+
 class UnixApplicationRunner(app.ApplicationRunner):
     """
     An ApplicationRunner which does Unix-specific things, like fork,
@@ -201,12 +335,45 @@ class UnixApplicationRunner(app.ApplicationRunner):
         To be called after the application is created: start the
         application and run the reactor. After the reactor stops,
         clean up PID files and such.
+
+        If more than one worker process was asked for, the application is
+        started in each of them instead of in this process.
         """
-        self.startApplication(self.application)
+        if self.config['workers'] > 1 and not self.config['worker']:
+            self.startWorkers(self.config['workers'])
+        else:
+            self.startApplication(self.application)
         self.startReactor(None, self.oldstdout, self.oldstderr)
         self.removePID(self.config['pidfile'])
 
 
+    def startWorkers(self, count):
+        """
+        Daemonize and arrange for C{count} worker processes, each running the
+        application, to be started once the reactor is running and stopped
+        when it stops.
+
+        Each worker runs this script again with the same arguments and the
+        C{--worker} option.
+
+        @type count: C{int}
+        @param count: The number of worker processes.
+
+        @rtype: L{WorkerSupervisor}
+        """
+        from twisted.internet import reactor
+        path = os.getcwd()
+        # The workers set up the rest of their environment themselves.
+        self.setupEnvironment(
+            None, '.', self.config['nodaemon'], self.config['umask'],
+            self.config['pidfile'])
+        arguments = [sys.executable, sys.argv[0], '--worker'] + sys.argv[1:]
+        supervisor = WorkerSupervisor(reactor, count, arguments, path)
+        reactor.callWhenRunning(supervisor.start)
+        reactor.addSystemEventTrigger('before', 'shutdown', supervisor.stop)
+        return supervisor
+
+
     def removePID(self, pidfile):
         """
         Remove the specified PID file, if possible.  Errors are logged, not
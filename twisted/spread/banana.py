@@ -12,7 +12,7 @@ for more details.
 @author: Glyph Lefkowitz
 """
 
-import copy, cStringIO, struct
+import copy, cStringIO, re, struct
 
 from twisted.internet import protocol
 from twisted.persisted import styles
@@ -22,13 +22,15 @@ class BananaError(Exception):
     pass
 
 def int2b128(integer, stream):
-    if integer == 0:
-        stream(chr(0))
+    if integer < 0x80:
+        assert integer >= 0, "can only encode positive integers"
+        stream(chr(integer))
         return
-    assert integer > 0, "can only encode positive integers"
+    digits = []
     while integer:
-        stream(chr(integer & 0x7f))
+        digits.append(chr(integer & 0x7f))
         integer = integer >> 7
+    stream(''.join(digits))
 
 
 def b1282int(st):
@@ -65,6 +67,9 @@ VOCAB    = chr(0x87)
 
 HIGH_BIT_SET = chr(0x80)
 
+# Matches the type byte which ends the prefix of every token.
+_TYPE_BYTE = re.compile('[\x80-\xff]')
+
 def setPrefixLimit(limit):
     """
     Set the limit on the prefix length for all Banana connections
@@ -155,73 +160,72 @@ class Banana(protocol.Protocol, styles.Ephemeral):
     buffer = ''
 
     def dataReceived(self, chunk):
+        # Tokens are consumed by advancing an offset into the buffer instead
+        # of slicing off the rest of it after each one, so decoding is linear
+        # in the size of the data however it is split into chunks.
         buffer = self.buffer + chunk
         listStack = self.listStack
         gotItem = self.gotItem
-        while buffer:
-            assert self.buffer != buffer, "This ain't right: %s %s" % (repr(self.buffer), repr(buffer))
-            self.buffer = buffer
-            pos = 0
-            for ch in buffer:
-                if ch >= HIGH_BIT_SET:
-                    break
-                pos = pos + 1
-            else:
-                if pos > self.prefixLimit:
-                    raise BananaError("Security precaution: more than %d bytes of prefix" % (self.prefixLimit,))
-                return
-            num = buffer[:pos]
-            typebyte = buffer[pos]
-            rest = buffer[pos+1:]
-            if len(num) > self.prefixLimit:
-                raise BananaError("Security precaution: longer than %d bytes worth of prefix" % (self.prefixLimit,))
-            if typebyte == LIST:
-                num = b1282int(num)
-                if num > SIZE_LIMIT:
-                    raise BananaError("Security precaution: List too long.")
-                listStack.append((num, []))
-                buffer = rest
-            elif typebyte == STRING:
-                num = b1282int(num)
-                if num > SIZE_LIMIT:
-                    raise BananaError("Security precaution: String too long.")
-                if len(rest) >= num:
-                    buffer = rest[num:]
-                    gotItem(rest[:num])
-                else:
+        prefixLimit = self.prefixLimit
+        findTypeByte = _TYPE_BYTE.search
+        end = len(buffer)
+        offset = 0
+        try:
+            while offset < end:
+                match = findTypeByte(buffer, offset, offset + prefixLimit + 1)
+                if match is None:
+                    if end - offset > prefixLimit:
+                        raise BananaError("Security precaution: more than %d bytes of prefix" % (prefixLimit,))
                     return
-            elif typebyte == INT:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(num)
-            elif typebyte == LONGINT:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(num)
-            elif typebyte == LONGNEG:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(-num)
-            elif typebyte == NEG:
-                buffer = rest
-                num = -b1282int(num)
-                gotItem(num)
-            elif typebyte == VOCAB:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(self.incomingVocabulary[num])
-            elif typebyte == FLOAT:
-                if len(rest) >= 8:
-                    buffer = rest[8:]
-                    gotItem(struct.unpack("!d", rest[:8])[0])
+                pos = match.start()
+                typebyte = buffer[pos]
+                if pos - offset == 1:
+                    # Most prefixes are a single digit.
+                    num = ord(buffer[offset])
                 else:
-                    return
-            else:
-                raise NotImplementedError(("Invalid Type Byte %r" % (typebyte,)))
-            while listStack and (len(listStack[-1][1]) == listStack[-1][0]):
-                item = listStack.pop()[1]
-                gotItem(item)
-        self.buffer = ''
+                    num = b1282int(buffer[offset:pos])
+                rest = pos + 1
+                if typebyte == LIST:
+                    if num > SIZE_LIMIT:
+                        raise BananaError("Security precaution: List too long.")
+                    listStack.append((num, []))
+                    offset = rest
+                elif typebyte == STRING:
+                    if num > SIZE_LIMIT:
+                        raise BananaError("Security precaution: String too long.")
+                    if end - rest >= num:
+                        offset = rest + num
+                        gotItem(buffer[rest:offset])
+                    else:
+                        return
+                elif typebyte == INT:
+                    offset = rest
+                    gotItem(num)
+                elif typebyte == LONGINT:
+                    offset = rest
+                    gotItem(num)
+                elif typebyte == LONGNEG:
+                    offset = rest
+                    gotItem(-num)
+                elif typebyte == NEG:
+                    offset = rest
+                    gotItem(-num)
+                elif typebyte == VOCAB:
+                    offset = rest
+                    gotItem(self.incomingVocabulary[num])
+                elif typebyte == FLOAT:
+                    if end - rest >= 8:
+                        offset = rest + 8
+                        gotItem(struct.unpack("!d", buffer[rest:offset])[0])
+                    else:
+                        return
+                else:
+                    raise NotImplementedError(("Invalid Type Byte %r" % (typebyte,)))
+                while listStack and (len(listStack[-1][1]) == listStack[-1][0]):
+                    item = listStack.pop()[1]
+                    gotItem(item)
+        finally:
+            self.buffer = buffer[offset:]
 
 
     def expressionReceived(self, lst):
@@ -280,13 +284,26 @@ class Banana(protocol.Protocol, styles.Ephemeral):
         self.isClient = isClient
 
     def sendEncoded(self, obj):
-        io = cStringIO.StringIO()
-        self._encode(obj, io.write)
-        value = io.getvalue()
-        self.transport.write(value)
+        chunks = []
+        self._encode(obj, chunks.append)
+        self.transport.write(''.join(chunks))
 
     def _encode(self, obj, write):
-        if isinstance(obj, (list, tuple)):
+        # Strings are by far the most common tokens, so check for them first.
+        if isinstance(obj, str):
+            # TODO: an API for extending banana...
+            if self.currentDialect == "pb" and obj in self.outgoingSymbols:
+                symbolID = self.outgoingSymbols[obj]
+                int2b128(symbolID, write)
+                write(VOCAB)
+            else:
+                if len(obj) > SIZE_LIMIT:
+                    raise BananaError(
+                        "string is too long to send (%d)" % (len(obj),))
+                int2b128(len(obj), write)
+                write(STRING)
+                write(obj)
+        elif isinstance(obj, (list, tuple)):
             if len(obj) > SIZE_LIMIT:
                 raise BananaError(
                     "list/tuple is too long to send (%d)" % (len(obj),))
@@ -313,19 +330,6 @@ class Banana(protocol.Protocol, styles.Ephemeral):
         elif isinstance(obj, float):
             write(FLOAT)
             write(struct.pack("!d", obj))
-        elif isinstance(obj, str):
-            # TODO: an API for extending banana...
-            if self.currentDialect == "pb" and obj in self.outgoingSymbols:
-                symbolID = self.outgoingSymbols[obj]
-                int2b128(symbolID, write)
-                write(VOCAB)
-            else:
-                if len(obj) > SIZE_LIMIT:
-                    raise BananaError(
-                        "string is too long to send (%d)" % (len(obj),))
-                int2b128(len(obj), write)
-                write(STRING)
-                write(obj)
         else:
             raise BananaError("could not send object: %r" % (obj,))
 
@@ -66,13 +66,9 @@ The same rule applies for C{frozenset} and C{sets.ImmutableSet}.
 import pickle
 import types
 import warnings
-from types import StringType
 from types import UnicodeType
-from types import IntType
 from types import TupleType
 from types import ListType
-from types import LongType
-from types import FloatType
 from types import FunctionType
 from types import MethodType
 from types import ModuleType
@@ -117,6 +113,9 @@ from twisted.spread.interfaces import IJellyable, IUnjellyable
 
 DictTypes = (DictionaryType,)
 
+# Types jelly() can hand straight to _Jellier._jellyMutable.
+_containerTypes = dict.fromkeys((ListType, TupleType) + DictTypes)
+
 None_atom = "None"                  # N
 # code
 class_atom = "class"                # c
@@ -380,6 +379,10 @@ class _Jellier:
         self._ref_id = 1
         self.persistentStore = persistentStore
         self.invoker = invoker
+        # Security decisions and class names, which only need to be worked
+        # out once per type or class rather than once per object.
+        self._typeAllowed = {}
+        self._classPlans = {}
 
 
     def _cook(self, object):
@@ -472,13 +475,16 @@ class _Jellier:
                 return preRef
             return obj.jellyFor(self)
         objType = type(obj)
-        if self.taster.isTypeAllowed(qual(objType)):
+        allowed = self._typeAllowed.get(objType)
+        if allowed is None:
+            allowed = bool(self.taster.isTypeAllowed(qual(objType)))
+            self._typeAllowed[objType] = allowed
+        if allowed:
             # "Immutable" Types
-            if ((objType is StringType) or
-                (objType is IntType) or
-                (objType is LongType) or
-                (objType is FloatType)):
+            if objType in self.constantTypes:
                 return obj
+            elif objType in _containerTypes:
+                return self._jellyMutable(obj, objType)
             elif objType is MethodType:
                 return ["method",
                         obj.im_func.__name__,
@@ -521,45 +527,7 @@ class _Jellier:
             elif decimal is not None and objType is decimal.Decimal:
                 return self.jelly_decimal(obj)
             else:
-                preRef = self._checkMutable(obj)
-                if preRef:
-                    return preRef
-                # "Mutable" Types
-                sxp = self.prepare(obj)
-                if objType is ListType:
-                    sxp.extend(self._jellyIterable(list_atom, obj))
-                elif objType is TupleType:
-                    sxp.extend(self._jellyIterable(tuple_atom, obj))
-                elif objType in DictTypes:
-                    sxp.append(dictionary_atom)
-                    for key, val in obj.items():
-                        sxp.append([self.jelly(key), self.jelly(val)])
-                elif (_set is not None and objType is set or
-                      objType is _sets.Set):
-                    sxp.extend(self._jellyIterable(set_atom, obj))
-                elif (_set is not None and objType is frozenset or
-                      objType is _sets.ImmutableSet):
-                    sxp.extend(self._jellyIterable(frozenset_atom, obj))
-                else:
-                    className = qual(obj.__class__)
-                    persistent = None
-                    if self.persistentStore:
-                        persistent = self.persistentStore(obj, self)
-                    if persistent is not None:
-                        sxp.append(persistent_atom)
-                        sxp.append(persistent)
-                    elif self.taster.isClassAllowed(obj.__class__):
-                        sxp.append(className)
-                        if hasattr(obj, "__getstate__"):
-                            state = obj.__getstate__()
-                        else:
-                            state = obj.__dict__
-                        sxp.append(self.jelly(state))
-                    else:
-                        self.unpersistable(
-                            "instance of class %s deemed insecure" %
-                            qual(obj.__class__), sxp)
-                return self.preserve(obj, sxp)
+                return self._jellyMutable(obj, objType)
         else:
             if objType is InstanceType:
                 raise InsecureJelly("Class not allowed for instance: %s %s" %
@@ -568,6 +536,65 @@ class _Jellier:
                                 (objType, obj))
 
 
+    def _jellyMutable(self, obj, objType):
+        """
+        Jelly an object which may be referred to more than once: a
+        container or an instance.
+        """
+        preRef = self._checkMutable(obj)
+        if preRef:
+            return preRef
+        # "Mutable" Types
+        sxp = self.prepare(obj)
+        if objType is ListType:
+            sxp.extend(self._jellyIterable(list_atom, obj))
+        elif objType is TupleType:
+            sxp.extend(self._jellyIterable(tuple_atom, obj))
+        elif objType in DictTypes:
+            sxp.append(dictionary_atom)
+            for key, val in obj.items():
+                sxp.append([self.jelly(key), self.jelly(val)])
+        elif (_set is not None and objType is set or
+              objType is _sets.Set):
+            sxp.extend(self._jellyIterable(set_atom, obj))
+        elif (_set is not None and objType is frozenset or
+              objType is _sets.ImmutableSet):
+            sxp.extend(self._jellyIterable(frozenset_atom, obj))
+        else:
+            persistent = None
+            if self.persistentStore:
+                persistent = self.persistentStore(obj, self)
+            if persistent is not None:
+                sxp.append(persistent_atom)
+                sxp.append(persistent)
+            else:
+                className, classAllowed = self._classPlan(obj.__class__)
+                if classAllowed:
+                    sxp.append(className)
+                    if hasattr(obj, "__getstate__"):
+                        state = obj.__getstate__()
+                    else:
+                        state = obj.__dict__
+                    sxp.append(self.jelly(state))
+                else:
+                    self.unpersistable(
+                        "instance of class %s deemed insecure" %
+                        className, sxp)
+        return self.preserve(obj, sxp)
+
+
+    def _classPlan(self, cls):
+        """
+        Return the qualified name of C{cls} and whether instances of it may
+        be jellied, working them out only for the first instance.
+        """
+        plan = self._classPlans.get(cls)
+        if plan is None:
+            plan = (qual(cls), bool(self.taster.isClassAllowed(cls)))
+            self._classPlans[cls] = plan
+        return plan
+
+
     def _jellyIterable(self, atom, obj):
         """
         Jelly an iterable object.
@@ -624,6 +651,10 @@ class _Unjellier:
         self.references = {}
         self.postCallbacks = []
         self.invoker = invoker
+        # Maps type names to the callables which unjelly them, so the
+        # registries and security options are only consulted for the first
+        # expression of each type.
+        self._plans = {}
 
 
     def unjellyFull(self, obj):
@@ -637,52 +668,94 @@ class _Unjellier:
         if type(obj) is not types.ListType:
             return obj
         jelType = obj[0]
+        try:
+            plan = self._plans[jelType]
+        except (KeyError, TypeError):
+            plan = self._makePlan(jelType)
+        return plan(obj)
+
+
+    def _makePlan(self, jelType):
+        """
+        Check that expressions of type C{jelType} may be unjellied and
+        return a callable which unjellies one, caching it for later
+        expressions of the same type.
+        """
         if not self.taster.isTypeAllowed(jelType):
             raise InsecureJelly(jelType)
         regClass = unjellyableRegistry.get(jelType)
         if regClass is not None:
-            if isinstance(regClass, ClassType):
-                inst = _Dummy() # XXX chomp, chomp
-                inst.__class__ = regClass
-                method = inst.unjellyFor
-            elif isinstance(regClass, type):
-                # regClass.__new__ does not call regClass.__init__
-                inst = regClass.__new__(regClass)
-                method = inst.unjellyFor
+            plan = lambda obj: self._unjellyRegistered(regClass, obj)
+        else:
+            regFactory = unjellyableFactoryRegistry.get(jelType)
+            if regFactory is not None:
+                plan = lambda obj: self._unjellyFactory(regFactory, obj)
             else:
-                method = regClass # this is how it ought to be done
-            val = method(self, obj)
-            if hasattr(val, 'postUnjelly'):
-                self.postCallbacks.append(inst.postUnjelly)
-            return val
-        regFactory = unjellyableFactoryRegistry.get(jelType)
-        if regFactory is not None:
+                thunk = getattr(self, '_unjelly_%s'%jelType, None)
+                if thunk is not None:
+                    plan = lambda obj: thunk(obj[1:])
+                else:
+                    nameSplit = jelType.split('.')
+                    modName = '.'.join(nameSplit[:-1])
+                    if not self.taster.isModuleAllowed(modName):
+                        raise InsecureJelly(
+                            "Module %s not allowed (in type %s)." % (
+                                modName, jelType))
+                    clz = namedObject(jelType)
+                    if not self.taster.isClassAllowed(clz):
+                        raise InsecureJelly("Class %s not allowed." % jelType)
+                    plan = lambda obj: self._unjellyClassInstance(clz, obj)
+        self._plans[jelType] = plan
+        return plan
+
+
+    def _unjellyRegistered(self, regClass, obj):
+        """
+        Unjelly an expression whose type has an unjellyable registered for
+        it with L{setUnjellyableForClass}.
+        """
+        if isinstance(regClass, ClassType):
+            inst = _Dummy() # XXX chomp, chomp
+            inst.__class__ = regClass
+            method = inst.unjellyFor
+        elif isinstance(regClass, type):
+            # regClass.__new__ does not call regClass.__init__
+            inst = regClass.__new__(regClass)
+            method = inst.unjellyFor
+        else:
+            method = regClass # this is how it ought to be done
+        val = method(self, obj)
+        if hasattr(val, 'postUnjelly'):
+            self.postCallbacks.append(inst.postUnjelly)
+        return val
+
+
+    def _unjellyFactory(self, regFactory, obj):
+        """
+        Unjelly an expression whose type has a factory registered for it
+        with L{setUnjellyableFactoryForClass}.
+        """
+        state = self.unjelly(obj[1])
+        inst = regFactory(state)
+        if hasattr(inst, 'postUnjelly'):
+            self.postCallbacks.append(inst.postUnjelly)
+        return inst
+
+
+    def _unjellyClassInstance(self, clz, obj):
+        """
+        Unjelly an instance of C{clz}, whose qualified name is the type of
+        the expression.
+        """
+        if hasattr(clz, "__setstate__"):
+            ret = _newInstance(clz)
             state = self.unjelly(obj[1])
-            inst = regFactory(state)
-            if hasattr(inst, 'postUnjelly'):
-                self.postCallbacks.append(inst.postUnjelly)
-            return inst
-        thunk = getattr(self, '_unjelly_%s'%jelType, None)
-        if thunk is not None:
-            ret = thunk(obj[1:])
+            ret.__setstate__(state)
         else:
-            nameSplit = jelType.split('.')
-            modName = '.'.join(nameSplit[:-1])
-            if not self.taster.isModuleAllowed(modName):
-                raise InsecureJelly(
-                    "Module %s not allowed (in type %s)." % (modName, jelType))
-            clz = namedObject(jelType)
-            if not self.taster.isClassAllowed(clz):
-                raise InsecureJelly("Class %s not allowed." % jelType)
-            if hasattr(clz, "__setstate__"):
-                ret = _newInstance(clz)
-                state = self.unjelly(obj[1])
-                ret.__setstate__(state)
-            else:
-                state = self.unjelly(obj[1])
-                ret = _newInstance(clz, state)
-            if hasattr(clz, 'postUnjelly'):
-                self.postCallbacks.append(ret.postUnjelly)
+            state = self.unjelly(obj[1])
+            ret = _newInstance(clz, state)
+        if hasattr(clz, 'postUnjelly'):
+            self.postCallbacks.append(ret.postUnjelly)
         return ret
 
 
@@ -840,10 +913,25 @@ class _Unjellier:
 
     def _unjelly_dictionary(self, lst):
         d = {}
+        unjelly = self.unjelly
         for k, v in lst:
+            key = unjelly(k)
+            if not isinstance(key, NotKnown):
+                value = unjelly(v)
+                if not isinstance(value, NotKnown):
+                    d[key] = value
+                    continue
+            # The key or value is not known yet; let a _DictKeyAndValue
+            # fill in the entry once it is.
             kvd = _DictKeyAndValue(d)
-            self.unjellyInto(kvd, 0, k)
-            self.unjellyInto(kvd, 1, v)
+            if isinstance(key, NotKnown):
+                key.addDependant(kvd, 0)
+                kvd[0] = key
+                self.unjellyInto(kvd, 1, v)
+            else:
+                kvd[0] = key
+                value.addDependant(kvd, 1)
+                kvd[1] = value
         return d
 
 
@@ -8,7 +8,10 @@
 Utility classes for spread.
 """
 
+from itertools import islice
+
 from twisted.internet import defer
+from twisted.python import log
 from twisted.python.failure import Failure
 from twisted.spread import pb
 from twisted.protocols import basic
@@ -186,6 +189,234 @@ class FilePager(Pager):
         self.collector.callRemote("gotPage", val)
 
 
+class IteratorPager(Pager):
+    """
+    Sends the items produced by an iterator in lists of up to C{pageSize}
+    items, so a large result never has to be built or serialized all at
+    once.
+
+    Like every L{Pager}, I only send a page when the broker's transport has
+    written out what it already had.  In addition, no more than C{window}
+    pages are ever awaiting acknowledgement: a page is acknowledged when the
+    collector's C{remote_gotPage} returns or, if it returns a L{Deferred},
+    when that fires.  A collector which defers its acknowledgements until
+    its pages are consumed, as L{PageReader} does, therefore limits how far
+    ahead of the consumer I get.
+
+    If the iterator raises an exception, I stop paging and pass it to the
+    collector's C{remote_pagingFailed} before C{remote_endedPaging} is
+    called.
+
+    @ivar iterator: The iterator whose items are being sent.
+    @ivar pageSize: The maximum number of items in each page.
+    @ivar window: The maximum number of pages awaiting acknowledgement.
+    """
+    def __init__(self, collector, iterable, pageSize=100, window=4,
+                 callback=None, *args, **kw):
+        self.iterator = iter(iterable)
+        self.pageSize = pageSize
+        self.window = window
+        self._unacknowledged = 0
+        self._lookahead = []
+        self._lookaheadFailure = None
+        Pager.__init__(self, collector, callback, *args, **kw)
+
+
+    def nextPage(self):
+        """
+        Take the next page of items from my iterator, and stop paging if
+        there are no more after it.
+        """
+        if self._lookaheadFailure is not None:
+            self._lookaheadFailure.raiseException()
+        page = self._lookahead + list(
+            islice(self.iterator, self.pageSize - len(self._lookahead)))
+        # Look ahead, so the last page is known to be last when it is sent
+        # and an empty page is never sent after it.  If that fails, the
+        # failure belongs after this page.
+        try:
+            self._lookahead = list(islice(self.iterator, 1))
+        except:
+            self._lookahead = []
+            self._lookaheadFailure = Failure()
+        else:
+            if not self._lookahead:
+                self.stopPaging()
+        return page
+
+
+    def sendNextPage(self):
+        """
+        Send the next page, unless I have finished or C{window} pages are
+        already awaiting acknowledgement.
+        """
+        if not self._stillPaging or self._unacknowledged >= self.window:
+            return
+        try:
+            page = self.nextPage()
+        except:
+            f = Failure()
+            log.err(f, "Iterator being paged to %r failed" % (self.collector,))
+            self.stopPaging()
+            self.collector.callRemote(
+                "pagingFailed", pb.failure2Copyable(f)).addErrback(
+                    lambda reason: None)
+            return
+        self._unacknowledged += 1
+        self.collector.callRemote("gotPage", page).addCallbacks(
+            self._pageAcknowledged, self._pageNotAcknowledged)
+
+
+    def _pageAcknowledged(self, ignored):
+        """
+        A page has been acknowledged.  If I had stopped sending because of
+        it, send the next page now: the broker's transport has nothing left
+        to write, so nothing else would prompt me to.
+        """
+        self._unacknowledged -= 1
+        if self._unacknowledged == self.window - 1:
+            self.sendNextPage()
+
+
+    def _pageNotAcknowledged(self, reason):
+        """
+        The collector failed to handle a page, or the connection was lost.
+        Stop paging.
+        """
+        self._unacknowledged -= 1
+        self.stopPaging()
+        if not reason.check(pb.PBConnectionLost):
+            log.err(reason, "Collector %r failed to receive a page" % (
+                self.collector,))
+
+
+
+class PagedResult(pb.Referenceable):
+    """
+    Return one of these from a C{remote_} method to send the items of a
+    (possibly large, or lazily computed) iterable to the caller in pages.
+    The caller receives a reference to me and reads the pages with
+    L{PageReader}.
+
+    @ivar iterable: The iterable whose items will be sent.
+    @ivar pageSize: The maximum number of items in each page.
+    @ivar window: The maximum number of pages sent before the caller has
+        read them.
+    """
+    def __init__(self, iterable, pageSize=100, window=4):
+        self.iterable = iterable
+        self.pageSize = pageSize
+        self.window = window
+
+
+    def remote_startPaging(self, collector):
+        """
+        Start sending pages to C{collector}.  Only the first call has any
+        effect.
+        """
+        if self.iterable is None:
+            return
+        iterable, self.iterable = self.iterable, None
+        IteratorPager(collector, iterable, self.pageSize, self.window)
+
+
+
+class PageReader(pb.Referenceable):
+    """
+    Reads the pages sent by a remote L{PagedResult}, one L{Deferred} at a
+    time.
+
+    Pages which arrive before they are asked for are kept, but their
+    acknowledgement is held back until they are read, so the sender stops
+    once its window of pages is waiting here.
+
+    @ivar _pages: Pages received but not yet read, as a list of tuples of
+        the page and the L{Deferred} which acknowledges it.
+    @ivar _waiting: L{Deferred}s returned by L{nextPage} which are waiting
+        for a page.
+    @ivar _result: C{None} while pages may still arrive; afterwards the
+        result for reads past the last page, either C{_END} or a
+        L{Failure}.
+    """
+    _END = object()
+
+    def __init__(self, pagedResult):
+        """
+        @param pagedResult: A reference to a remote L{PagedResult}.
+        @type pagedResult: L{pb.RemoteReference}
+        """
+        self._pages = []
+        self._waiting = []
+        self._result = None
+        self._source = pagedResult
+        pagedResult.notifyOnDisconnect(self._disconnected)
+        pagedResult.callRemote("startPaging", self).addErrback(self._finished)
+
+
+    def nextPage(self):
+        """
+        Read the next page.
+
+        @return: A L{Deferred} which fires with the next page, a C{list} of
+            items, or with C{None} once all of the pages have been read.  It
+            fails if the remote iterator or the connection does.
+        """
+        if self._pages:
+            page, acknowledge = self._pages.pop(0)
+            acknowledge.callback(None)
+            return defer.succeed(page)
+        if self._result is self._END:
+            return defer.succeed(None)
+        if self._result is not None:
+            return defer.fail(self._result)
+        d = defer.Deferred()
+        self._waiting.append(d)
+        return d
+
+
+    def remote_gotPage(self, page):
+        if self._waiting:
+            self._waiting.pop(0).callback(page)
+            return
+        acknowledge = defer.Deferred()
+        self._pages.append((page, acknowledge))
+        return acknowledge
+
+
+    def remote_pagingFailed(self, reason):
+        self._finished(reason)
+
+
+    def remote_endedPaging(self):
+        self._finished(self._END)
+
+
+    def _disconnected(self, reference):
+        self._source = None
+        self._finished(Failure(pb.PBConnectionLost(
+            "Connection lost while reading pages")))
+
+
+    def _finished(self, result):
+        """
+        No more pages will arrive: fire the waiting L{Deferred}s with
+        C{None} if C{result} is C{_END}, or fail them with C{result}.
+        """
+        if self._result is not None:
+            return
+        self._result = result
+        if self._source is not None:
+            self._source.dontNotifyOnDisconnect(self._disconnected)
+            self._source = None
+        waiting, self._waiting = self._waiting, []
+        for d in waiting:
+            if result is self._END:
+                d.callback(None)
+            else:
+                d.errback(result)
+
+
+
 # Utility paging stuff.
 class CallbackPageCollector(pb.Referenceable):
     """
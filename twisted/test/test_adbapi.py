@@ -10,11 +10,14 @@ from twisted.trial import unittest
 
 import os, stat
 import types
+import thread
 
 from twisted.enterprise.adbapi import ConnectionPool, ConnectionLost, safe
 from twisted.enterprise.adbapi import Connection, Transaction
+from twisted.enterprise.adbapi import ConnectionPoolOverloaded
+from twisted.enterprise.adbapi import ConnectionPoolStats
 from twisted.enterprise.adbapi import _unreleasedVersion
-from twisted.internet import reactor, defer, interfaces
+from twisted.internet import reactor, defer, interfaces, task
 from twisted.python.failure import Failure
 
 
@@ -680,6 +683,18 @@ class NonThreadPool(object):
         onResult(success, result)
 
 
+    def callInThread(self, f, *a, **kw):
+        f(*a, **kw)
+
+
+    def start(self):
+        pass
+
+
+    def stop(self):
+        pass
+
+
 
 class DummyConnectionPool(ConnectionPool):
     """
@@ -692,6 +707,8 @@ class DummyConnectionPool(ConnectionPool):
         Don't forward init call.
         """
         self.reactor = reactor
+        self._stats = ConnectionPoolStats()
+        self._statsLock = thread.allocate_lock()
 
 
 
@@ -835,3 +852,561 @@ class ConnectionPoolTestCase(unittest.TestCase):
         pool.close()
         # But not anymore.
         self.assertFalse(reactor.triggers)
+
+
+
+class ClockEventReactor(EventReactor, task.Clock):
+    """
+    An L{EventReactor} which is also a L{task.Clock}.
+    """
+    def __init__(self, running):
+        EventReactor.__init__(self, running)
+        task.Clock.__init__(self)
+
+
+
+class RecordingCursor(object):
+    """
+    A fake DB-API cursor which records the statements executed with it in
+    the log of its connection.  Statements fail with L{ValueError} if their
+    parameters are C{('bad',)}, and the query C{'select 1'} fails if the
+    connection is broken.
+    """
+    closed = False
+
+    def __init__(self, connection):
+        self.connection = connection
+
+
+    def execute(self, sql, params=None):
+        if params == ('bad',) or (sql == 'select 1' and
+                                  self.connection.broken):
+            raise ValueError(sql, params)
+        self.connection.log.append(('execute', sql, params))
+
+
+    def executemany(self, sql, paramsList):
+        if ('bad',) in paramsList:
+            raise ValueError(sql, paramsList)
+        self.connection.log.append(('executemany', sql, list(paramsList)))
+
+
+    def fetchall(self):
+        return [(1,)]
+
+
+    def close(self):
+        self.closed = True
+
+
+
+class RecordingConnection(object):
+    """
+    A fake DB-API connection which records the statements executed, commits
+    and rollbacks in C{log}.
+    """
+    broken = False
+    closed = False
+
+    def __init__(self):
+        self.log = []
+        self.cursors = []
+
+
+    def cursor(self):
+        cursor = RecordingCursor(self)
+        self.cursors.append(cursor)
+        return cursor
+
+
+    def commit(self):
+        self.log.append(('commit',))
+
+
+    def rollback(self):
+        self.log.append(('rollback',))
+
+
+    def close(self):
+        self.closed = True
+
+
+
+class RecordingDBAPI(object):
+    """
+    A fake DB-API module which makes L{RecordingConnection}s.
+    """
+    def __init__(self):
+        self.connections = []
+
+
+    def connect(self, *args, **kw):
+        connection = RecordingConnection()
+        self.connections.append(connection)
+        return connection
+
+
+
+class ConnectionPoolRecordingTestsMixin:
+    """
+    Mixin for tests of L{ConnectionPool} which run it against a
+    L{RecordingDBAPI}, without threads, with a L{ClockEventReactor}.
+    """
+
+    def makePool(self, **kw):
+        """
+        Make and start a L{ConnectionPool}, closed when the test is done.
+        """
+        self.clock = ClockEventReactor(False)
+        self.dbapi = RecordingDBAPI()
+        pool = ConnectionPool('twisted.test.test_adbapi', cp_min=1, cp_max=1,
+                              cp_reactor=self.clock, **kw)
+        pool.dbapi = self.dbapi
+        pool.threadpool = NonThreadPool()
+        pool.start()
+        self.addCleanup(pool.close)
+        return pool
+
+
+
+class BatchTestCase(ConnectionPoolRecordingTestsMixin, unittest.TestCase):
+    """
+    Tests for batching L{ConnectionPool.runOperation} calls.
+    """
+
+    def test_batch(self):
+        """
+        With C{cp_batch_interval} set, operations are run together that
+        many seconds after the first, in one transaction, with consecutive
+        operations with the same statement in one C{executemany} call.
+        """
+        pool = self.makePool(cp_batch_interval=0.5)
+        ds = [pool.runOperation('insert a', (1,)),
+              pool.runOperation('insert a', (2,)),
+              pool.runOperation('insert b', (3,)),
+              pool.runOperation('insert a', (4,)),
+              pool.runOperation('delete')]
+        self.assertEqual(self.dbapi.connections, [])
+        self.clock.advance(0.5)
+        d = defer.gatherResults(ds)
+        def cbBatch(results):
+            self.assertEqual(results, [None] * 5)
+            self.assertEqual(self.dbapi.connections[0].log, [
+                    ('executemany', 'insert a', [(1,), (2,)]),
+                    ('executemany', 'insert b', [(3,)]),
+                    ('executemany', 'insert a', [(4,)]),
+                    ('execute', 'delete', None),
+                    ('commit',)])
+        d.addCallback(cbBatch)
+        return d
+
+
+    def test_batchSize(self):
+        """
+        A batch is run as soon as it holds C{cp_batch_size} operations.
+        """
+        pool = self.makePool(cp_batch_interval=0.5, cp_batch_size=2)
+        pool.runOperation('insert a', (1,))
+        d = pool.runOperation('insert a', (2,))
+        self.assertEqual(self.clock.calls, [])
+        def cbBatch(ignored):
+            self.assertEqual(self.dbapi.connections[0].log, [
+                    ('executemany', 'insert a', [(1,), (2,)]),
+                    ('commit',)])
+        d.addCallback(cbBatch)
+        return d
+
+
+    def test_keywordArguments(self):
+        """
+        Operations with keyword arguments are not batched.
+        """
+        pool = self.makePool(cp_batch_interval=0.5)
+        d = pool.runOperation('insert a', params=(1,))
+        def cbRun(ignored):
+            self.assertEqual(self.clock.calls, [])
+            self.assertEqual(self.dbapi.connections[0].log, [
+                    ('execute', 'insert a', (1,)), ('commit',)])
+        d.addCallback(cbRun)
+        return d
+
+
+    def test_batchFailure(self):
+        """
+        If a batch fails, it is rolled back and its operations run again one
+        at a time, so that only those which fail by themselves fail.
+        """
+        pool = self.makePool(cp_batch_interval=0.5)
+        good = pool.runOperation('insert a', (1,))
+        bad = pool.runOperation('insert a', ('bad',))
+        self.clock.advance(0.5)
+        bad = self.assertFailure(bad, ValueError)
+        d = defer.gatherResults([good, bad])
+        def cbBatch(ignored):
+            self.assertEqual(self.dbapi.connections[0].log, [
+                    ('rollback',),
+                    ('execute', 'insert a', (1,)),
+                    ('commit',),
+                    ('rollback',)])
+        d.addCallback(cbBatch)
+        return d
+
+
+    def test_closeRunsBatch(self):
+        """
+        L{ConnectionPool.close} runs the operations waiting for a batch.
+        """
+        pool = self.makePool(cp_batch_interval=0.5)
+        d = pool.runOperation('insert a', (1,))
+        pool.close()
+        self.assertEqual(self.clock.calls, [])
+        return d
+
+
+    def test_closeFailedBatch(self):
+        """
+        If a batch run by L{ConnectionPool.close} fails, its operations all
+        fail with the batch's failure rather than being run again one at a
+        time on the stopped pool.
+        """
+        pool = self.makePool(cp_batch_interval=0.5)
+        pool.threadpool = QueuingThreadPool()
+        ds = [pool.runOperation('insert a', (1,)),
+              pool.runOperation('insert a', ('bad',))]
+        pool.close()
+        pool.threadpool.runAll()
+        self.assertEqual(pool.threadpool.queue, [])
+        return defer.gatherResults([
+            self.assertFailure(d, ValueError) for d in ds])
+
+
+
+class StatementCacheTestCase(ConnectionPoolRecordingTestsMixin,
+                             unittest.TestCase):
+    """
+    Tests for the statement cache of L{ConnectionPool}.
+    """
+
+    def test_cursorReused(self):
+        """
+        With C{cp_statement_cache} set, L{ConnectionPool.runQuery} and
+        L{ConnectionPool.runOperation} execute a statement with the same
+        cursor each time.
+        """
+        pool = self.makePool(cp_statement_cache=2)
+        d = pool.runQuery('select a', (1,))
+        d.addCallback(self.assertEqual, [(1,)])
+        d.addCallback(lambda ignored: pool.runQuery('select a', (2,)))
+        d.addCallback(lambda ignored: pool.runOperation('update a', (3,)))
+        d.addCallback(lambda ignored: pool.runOperation('update a', (4,)))
+        def cbRun(ignored):
+            connection = self.dbapi.connections[0]
+            self.assertEqual(len(connection.cursors), 2)
+            self.assertEqual(connection.log, [
+                    ('execute', 'select a', (1,)), ('commit',),
+                    ('execute', 'select a', (2,)), ('commit',),
+                    ('execute', 'update a', (3,)), ('commit',),
+                    ('execute', 'update a', (4,)), ('commit',)])
+        d.addCallback(cbRun)
+        return d
+
+
+    def test_leastRecentlyUsedClosed(self):
+        """
+        When more statements than C{cp_statement_cache} have been executed,
+        the cursor of the least recently used is closed.
+        """
+        pool = self.makePool(cp_statement_cache=2)
+        d = pool.runQuery('select a')
+        d.addCallback(lambda ignored: pool.runQuery('select b'))
+        d.addCallback(lambda ignored: pool.runQuery('select a'))
+        d.addCallback(lambda ignored: pool.runQuery('select c'))
+        def cbRun(ignored):
+            cursors = self.dbapi.connections[0].cursors
+            self.assertEqual([cursor.closed for cursor in cursors],
+                             [False, True, False])
+        d.addCallback(cbRun)
+        return d
+
+
+    def test_disconnectClearsCache(self):
+        """
+        Disconnecting a connection closes its cached cursors.
+        """
+        pool = self.makePool(cp_statement_cache=2)
+        d = pool.runQuery('select a')
+        def cbRun(ignored):
+            connection = self.dbapi.connections[0]
+            pool.disconnect(connection)
+            self.assertTrue(connection.cursors[0].closed)
+            self.assertEqual(pool._statements, {})
+        d.addCallback(cbRun)
+        return d
+
+
+
+class ConnectionCheckTestCase(ConnectionPoolRecordingTestsMixin,
+                              unittest.TestCase):
+    """
+    Tests for checking connections in the background with
+    C{cp_check_interval}.
+    """
+
+    def makePool(self, **kw):
+        return ConnectionPoolRecordingTestsMixin.makePool(
+            self, cp_reconnect=True, cp_check_interval=10, **kw)
+
+
+    def test_rollbackNotChecked(self):
+        """
+        A connection is not checked when it is rolled back, but at the next
+        background check.
+        """
+        pool = self.makePool()
+        d = self.assertFailure(pool.runOperation('insert a', ('bad',)),
+                               ValueError)
+        def cbFailed(ignored):
+            connection = self.dbapi.connections[0]
+            self.assertEqual(connection.log, [('rollback',)])
+            self.clock.advance(10)
+            self.assertEqual(connection.log, [
+                    ('rollback',), ('execute', 'select 1', None),
+                    ('commit',)])
+        d.addCallback(cbFailed)
+        return d
+
+
+    def test_usedConnectionNotChecked(self):
+        """
+        A connection used since the last check is not checked, but one
+        which has not been is.
+        """
+        pool = self.makePool()
+        d = pool.runOperation('insert a', (1,))
+        def cbRun(ignored):
+            connection = self.dbapi.connections[0]
+            self.clock.advance(10)
+            self.assertEqual(len(connection.log), 2)
+            self.clock.advance(10)
+            self.assertEqual(connection.log[2:], [
+                    ('execute', 'select 1', None), ('commit',)])
+        d.addCallback(cbRun)
+        return d
+
+
+    def test_failedCheckDisconnects(self):
+        """
+        If the check of a connection fails, the error is logged and the
+        connection closed, and the next operation reconnects.
+        """
+        pool = self.makePool()
+        d = pool.runOperation('insert a', (1,))
+        def cbRun(ignored):
+            connection = self.dbapi.connections[0]
+            connection.broken = True
+            self.clock.advance(10)
+            self.clock.advance(10)
+            self.assertEqual(len(self.flushLoggedErrors(ValueError)), 1)
+            self.assertTrue(connection.closed)
+            self.assertEqual(pool.connections, {})
+            return pool.runOperation('insert a', (2,))
+        d.addCallback(cbRun)
+        d.addCallback(lambda ignored: self.assertEqual(
+                len(self.dbapi.connections), 2))
+        return d
+
+
+    def test_closeStopsChecks(self):
+        """
+        L{ConnectionPool.close} stops the background checks.
+        """
+        pool = self.makePool()
+        pool.close()
+        self.assertEqual(self.clock.calls, [])
+
+
+
+class QueuingThreadPool(NonThreadPool):
+    """
+    A fake threadpool which runs the functions given to it when C{runAll} is
+    called.
+
+    @ivar queue: The C{(onResult, f, args, kwargs)} tuples of the functions
+        waiting to be run.
+    """
+    def __init__(self):
+        self.queue = []
+
+
+    def callInThreadWithCallback(self, onResult, f, *a, **kw):
+        self.queue.append((onResult, f, a, kw))
+
+
+    def runAll(self):
+        queue, self.queue = self.queue, []
+        for onResult, f, a, kw in queue:
+            NonThreadPool.callInThreadWithCallback(self, onResult, f, *a, **kw)
+
+
+
+class OverloadTestCase(ConnectionPoolRecordingTestsMixin, unittest.TestCase):
+    """
+    Tests for limiting the number of interactions waiting for a connection
+    with C{cp_max_waiting}.
+    """
+
+    def test_overloaded(self):
+        """
+        Once C{cp_max_waiting} interactions are waiting, further ones fail
+        with L{ConnectionPoolOverloaded} without being run.
+        """
+        pool = self.makePool(cp_max_waiting=2)
+        pool.threadpool = QueuingThreadPool()
+        waiting = [pool.runQuery('select a'), pool.runQuery('select b')]
+        d = self.assertFailure(pool.runQuery('select c'),
+                               ConnectionPoolOverloaded)
+        self.assertEqual(len(pool.threadpool.queue), 2)
+        stats = pool.stats()
+        self.assertEqual((stats.waiting, stats.maxWaiting, stats.rejected),
+                         (2, 2, 1))
+        pool.threadpool.runAll()
+        d.addCallback(lambda ignored: defer.gatherResults(waiting))
+        def cbWaited(ignored):
+            pool.threadpool = NonThreadPool()
+            return pool.runQuery('select c')
+        d.addCallback(cbWaited)
+        d.addCallback(self.assertEqual, [(1,)])
+        return d
+
+
+    def test_overloadedBatch(self):
+        """
+        If a batch is not run because the pool is overloaded, its operations
+        fail with L{ConnectionPoolOverloaded} and are not run one at a time.
+        """
+        pool = self.makePool(cp_max_waiting=2, cp_batch_interval=0.5)
+        pool.threadpool = QueuingThreadPool()
+        ds = [pool.runOperation('insert a', (1,)),
+              pool.runOperation('insert a', (2,))]
+        pool.runQuery('select a')
+        pool.runQuery('select b')
+        self.clock.advance(0.5)
+        self.assertEqual(len(pool.threadpool.queue), 2)
+        return defer.gatherResults([
+            self.assertFailure(d, ConnectionPoolOverloaded) for d in ds])
+
+
+    def test_overloadedBatchOperation(self):
+        """
+        Operations waiting for a batch count as waiting interactions: once
+        C{cp_max_waiting} are waiting, L{ConnectionPool.runOperation} fails
+        at once with L{ConnectionPoolOverloaded} rather than add to the
+        batch.
+        """
+        pool = self.makePool(cp_max_waiting=2, cp_batch_interval=0.5)
+        pool.threadpool = QueuingThreadPool()
+        pool.runQuery('select a')
+        pool.runOperation('insert a', (1,))
+        d = pool.runOperation('insert a', (2,))
+        self.assertEqual(len(pool._batch), 1)
+        self.assertEqual(pool.stats().rejected, 1)
+        return self.assertFailure(d, ConnectionPoolOverloaded)
+
+
+
+class ConnectionPoolStatsTestCase(ConnectionPoolRecordingTestsMixin,
+                                  unittest.TestCase):
+    """
+    Tests for L{ConnectionPool.stats} and the recycling of connections.
+    """
+
+    def makePool(self, **kw):
+        pool = ConnectionPoolRecordingTestsMixin.makePool(self, **kw)
+        pool._time = self.clock.seconds
+        return pool
+
+
+    def test_stats(self):
+        """
+        L{ConnectionPool.stats} returns a L{ConnectionPoolStats} with counts
+        of the interactions run, and histograms of the times they waited for
+        a connection and held it.
+        """
+        pool = self.makePool()
+        pool.threadpool = QueuingThreadPool()
+        def interaction(transaction):
+            self.clock.advance(2)
+        d = pool.runInteraction(interaction)
+        self.clock.advance(0.05)
+        pool.threadpool.runAll()
+        def cbRun(ignored):
+            stats = pool.stats()
+            self.assertIsInstance(stats, ConnectionPoolStats)
+            self.assertEqual(
+                (stats.connections, stats.busy, stats.waiting,
+                 stats.completed, stats.opened),
+                (1, 0, 0, 1, 1))
+            self.assertEqual(stats.acquireTimes.counts, [0, 0, 0, 1, 0, 0, 0])
+            self.assertEqual(stats.checkoutTimes.counts, [0, 0, 0, 0, 0, 1, 0])
+            self.assertApproximates(stats.acquireTimes.total, 0.05, 1e-9)
+            self.assertApproximates(stats.checkoutTimes.total, 2, 1e-9)
+        d.addCallback(cbRun)
+        return d
+
+
+    def test_statsSnapshot(self):
+        """
+        The L{ConnectionPoolStats} returned by L{ConnectionPool.stats} does
+        not change as the pool goes on running interactions.
+        """
+        pool = self.makePool()
+        stats = pool.stats()
+        d = pool.runQuery('select a')
+        def cbRun(ignored):
+            self.assertEqual(stats.completed, 0)
+            self.assertEqual(stats.acquireTimes.counts, [0] * 7)
+        d.addCallback(cbRun)
+        return d
+
+
+    def test_maxUses(self):
+        """
+        A connection used by C{cp_max_uses} interactions is closed and
+        replaced before the next one.
+        """
+        pool = self.makePool(cp_max_uses=2)
+        d = pool.runQuery('select a')
+        for i in range(2):
+            d.addCallback(lambda ignored: pool.runQuery('select a'))
+        def cbRun(ignored):
+            first, second = self.dbapi.connections
+            self.assertTrue(first.closed)
+            self.assertEqual(len(first.log), 4)
+            self.assertFalse(second.closed)
+            self.assertEqual(pool.stats().recycled, 1)
+        d.addCallback(cbRun)
+        return d
+
+
+    def test_maxAge(self):
+        """
+        A connection open for C{cp_max_age} seconds is closed and replaced
+        before the next interaction.
+        """
+        pool = self.makePool(cp_max_age=60)
+        d = pool.runQuery('select a')
+        def cbFirst(ignored):
+            self.clock.advance(59)
+            return pool.runQuery('select a')
+        def cbSecond(ignored):
+            self.assertEqual(len(self.dbapi.connections), 1)
+            self.clock.advance(1)
+            return pool.runQuery('select a')
+        def cbThird(ignored):
+            first, second = self.dbapi.connections
+            self.assertTrue(first.closed)
+            self.assertEqual(pool.stats().recycled, 1)
+        d.addCallback(cbFirst)
+        d.addCallback(cbSecond)
+        d.addCallback(cbThird)
+        return d
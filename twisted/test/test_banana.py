@@ -180,6 +180,32 @@ class BananaTestCase(unittest.TestCase):
             self.enc.dataReceived(byte)
         assert self.result == foo, "%s!=%s" % (repr(self.result), repr(foo))
 
+    def test_manyItems(self):
+        """
+        A list with many elements, delivered in a few large chunks, is
+        decoded correctly.
+        """
+        foo = ["item %d" % (i,) for i in range(1000)] + range(1000)
+        self.enc.sendEncoded(foo)
+        data = self.io.getvalue()
+        self.enc.dataReceived(data[:len(data) / 3])
+        self.enc.dataReceived(data[len(data) / 3:])
+        self.assertEqual(self.result, foo)
+        self.assertEqual(self.enc.buffer, '')
+
+
+    def test_wireFormat(self):
+        """
+        Each type of token is encoded as a base 128 prefix, least
+        significant digit first, followed by its type byte.
+        """
+        self.enc.sendEncoded(["hello", 0, 300, -5, 0.5, []])
+        self.assertEqual(
+            self.io.getvalue(),
+            '\x06\x80' '\x05\x82hello' '\x00\x81' '\x2c\x02\x81' '\x05\x83'
+            '\x84\x3f\xe0\x00\x00\x00\x00\x00\x00' '\x00\x80')
+
+
     def feed(self, data):
         for byte in data:
             self.enc.dataReceived(byte)
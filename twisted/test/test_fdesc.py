@@ -176,6 +176,38 @@ class ReadWriteTestCase(unittest.TestCase):
 
 
 
+class WritevTestCase(ReadWriteTestCase):
+    """
+    Tests for fdesc.writevToFD.
+    """
+    def setUp(self):
+        if not fdesc.canWriteVector:
+            raise unittest.SkipTest("twisted.python._writev is not available")
+        ReadWriteTestCase.setUp(self)
+
+
+    def write(self, d):
+        """
+        Write data to the pipe, in two pieces.
+        """
+        return fdesc.writevToFD(self.w, [d[:1], buffer(d, 1)])
+
+
+    def test_writeErrors(self):
+        """
+        L{fdesc.writevToFD} reports C{EAGAIN} and C{EINTR} as nothing having
+        been written.
+        """
+        for code in errno.EAGAIN, errno.EINTR:
+            def failingWritev(fd, vector):
+                err = OSError()
+                err.errno = code
+                raise err
+            self.patch(fdesc, '_writev', failingWritev)
+            self.assertEquals(self.write("s"), 0)
+
+
+
 class CloseOnExecTests(unittest.TestCase):
     """
     Tests for L{fdesc._setCloseOnExec} and L{fdesc._unsetCloseOnExec}.
@@ -1369,6 +1369,109 @@ class TestProducer(unittest.TestCase):
 
 
 
+class VectorDescriptor(abstract.FileDescriptor):
+    """
+    A descriptor which supports vectored writes, recording each vector it is
+    asked to write and accepting at most C{limit} bytes of it at a time.
+
+    @ivar vectors: The vectors passed to L{writeSomeDataVector}.
+    @ivar written: The bytes accepted so far.
+    @ivar limit: The maximum number of bytes accepted by each call.
+    """
+    connected = True
+    _vectorWrites = True
+
+    def __init__(self, limit):
+        abstract.FileDescriptor.__init__(self)
+        self.limit = limit
+        self.vectors = []
+        self.written = []
+
+
+    def writeSomeData(self, data):
+        raise AssertionError("writeSomeData called on a vector descriptor")
+
+
+    def writeSomeDataVector(self, vector):
+        self.vectors.append(vector)
+        data = "".join(map(str, vector))[:self.limit]
+        self.written.append(data)
+        return len(data)
+
+
+    def startWriting(self):
+        """
+        Do nothing: bypass the reactor.
+        """
+    stopWriting = startWriting
+
+
+
+class VectorWriteTests(unittest.TestCase):
+    """
+    Tests for L{abstract.FileDescriptor.doWrite} on descriptors which
+    support vectored writes.
+    """
+    def test_chunksNotJoined(self):
+        """
+        Chunks passed to C{writeSequence} are handed to
+        C{writeSomeDataVector} as they are.
+        """
+        chunks = ['abc', 'de', 'fghi']
+        descriptor = VectorDescriptor(100)
+        descriptor.writeSequence(chunks)
+        self.assertEquals(descriptor.doWrite(), None)
+        self.assertEquals(len(descriptor.vectors), 1)
+        for sent, chunk in zip(descriptor.vectors[0], chunks):
+            self.assertIdentical(sent, chunk)
+        self.assertEquals(descriptor._tempDataBuffer, [])
+        self.assertEquals(descriptor._tempDataLen, 0)
+
+
+    def test_partialWrites(self):
+        """
+        When only part of a vector is written, the remainder is sent by the
+        following calls to C{doWrite}, in order.
+        """
+        descriptor = VectorDescriptor(4)
+        descriptor.write('abc')
+        descriptor.writeSequence(['defgh', 'ij'])
+        descriptor.write('k')
+        while descriptor.dataBuffer or descriptor._tempDataLen:
+            self.assertEquals(descriptor.doWrite(), None)
+        self.assertEquals(
+            descriptor.written, ['abcd', 'efgh', 'ijk'])
+        self.assertEquals(
+            map(str, descriptor.vectors[1]), ['efgh', 'ij', 'k'])
+
+
+    def test_nothingWritten(self):
+        """
+        If C{writeSomeDataVector} writes nothing, C{doWrite} returns C{0} and
+        the data remains buffered.
+        """
+        descriptor = VectorDescriptor(0)
+        descriptor.write('abc')
+        self.assertEquals(descriptor.doWrite(), 0)
+        self.assertEquals(descriptor._tempDataBuffer, ['abc'])
+        self.assertEquals(descriptor._tempDataLen, 3)
+
+
+    def test_sendLimit(self):
+        """
+        No more chunks are added to a vector once it holds C{SEND_LIMIT}
+        bytes.
+        """
+        descriptor = VectorDescriptor(100)
+        descriptor.SEND_LIMIT = 5
+        descriptor.writeSequence(['abc', 'de', 'fgh'])
+        descriptor.doWrite()
+        self.assertEquals(descriptor.vectors[0], ['abc', 'de'])
+        descriptor.doWrite()
+        self.assertEquals(descriptor.written, ['abcde', 'fgh'])
+
+
+
 class PortStringification(unittest.TestCase):
     if interfaces.IReactorTCP(reactor, None) is not None:
         def testTCP(self):
@@ -523,6 +523,47 @@ class JellyTestCase(unittest.TestCase):
         self.assertIdentical(x, A, "A came back: %s" % x)
 
 
+    def test_classSecurityForEachInstance(self):
+        """
+        Every instance of a class which is not allowed is made
+        unpersistable, not only the first, and instances of allowed classes
+        jellied alongside them are unaffected.
+        """
+        taster = jelly.SecurityOptions()
+        taster.allowBasicTypes()
+        taster.allowInstancesOf(A)
+        result = jelly.unjelly(
+            jelly.jelly([A(), C(), A(), C()], taster), taster)
+        self.assertEquals(
+            [x.__class__ for x in result],
+            [A, jelly.Unpersistable, A, jelly.Unpersistable])
+
+
+    def test_securityChangesBetweenCalls(self):
+        """
+        Security decisions are not remembered from one call to
+        L{jelly.unjelly} to the next, so classes allowed later are accepted.
+        """
+        taster = jelly.SecurityOptions()
+        taster.allowBasicTypes()
+        jellied = jelly.jelly([A()])
+        self.assertRaises(jelly.InsecureJelly, jelly.unjelly, jellied, taster)
+        taster.allowInstancesOf(A)
+        self.assertIsInstance(jelly.unjelly(jellied, taster)[0], A)
+
+
+    def test_dictionaryValueReferences(self):
+        """
+        A dictionary whose values refer back to objects which are still
+        being unjellied is filled in once they are known.
+        """
+        a = A()
+        a.d = {'self': a, 'list': [a]}
+        result = jelly.unjelly(jelly.jelly(a))
+        self.assertIdentical(result.d['self'], result)
+        self.assertIdentical(result.d['list'][0], result)
+
+
     def test_unjellyable(self):
         """
         Test that if Unjellyable is used to deserialize a jellied object,
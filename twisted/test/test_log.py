@@ -178,6 +178,86 @@ class LogTest(unittest.TestCase):
                                        line))
 
 
+
+class Prefixed(object):
+    """
+    A logger with a fixed log prefix which counts how often it is asked for
+    it.
+    """
+    def __init__(self):
+        self.prefixRequests = 0
+
+
+    def logPrefix(self):
+        self.prefixRequests += 1
+        return "prefixed"
+
+
+
+class CallWithLoggerOnErrorTests(unittest.TestCase):
+    """
+    Tests for L{log.callWithLoggerOnError} and L{log.errWithLogger}.
+    """
+
+    def setUp(self):
+        self.catcher = []
+        log.addObserver(self.catcher.append)
+        self.addCleanup(log.removeObserver, self.catcher.append)
+
+
+    def test_returnsResult(self):
+        """
+        L{log.callWithLoggerOnError} returns the result of the function it
+        calls, without asking the logger for its prefix.
+        """
+        logger = Prefixed()
+        result = log.callWithLoggerOnError(
+            logger, lambda a, b: (a, b), 1, b=2)
+        self.assertEqual(result, (1, 2))
+        self.assertEqual(logger.prefixRequests, 0)
+
+
+    def test_noContext(self):
+        """
+        Messages logged by the function called by L{log.callWithLoggerOnError}
+        are not labelled with the logger's prefix.
+        """
+        log.callWithLoggerOnError(Prefixed(), log.msg, "hello")
+        self.assertEqual(self.catcher.pop()["system"], "-")
+
+
+    def test_errorLoggedWithPrefix(self):
+        """
+        A failure raised by the function called by
+        L{log.callWithLoggerOnError} is logged with the logger's prefix as its
+        system.
+        """
+        def fail():
+            raise RuntimeError()
+        log.callWithLoggerOnError(Prefixed(), fail)
+        event = self.catcher.pop()
+        self.assertEqual(event["isError"], 1)
+        self.assertEqual(event["system"], "prefixed")
+        self.assertEqual(len(self.flushLoggedErrors(RuntimeError)), 1)
+
+
+    def test_buggyLogPrefix(self):
+        """
+        L{log.errWithLogger} logs both the failure it was called for and the
+        one raised by a broken C{logPrefix}.
+        """
+        class Buggy(object):
+            def logPrefix(self):
+                raise ZeroDivisionError()
+        log.errWithLogger(Buggy(), failure.Failure(RuntimeError()))
+        self.assertEqual(
+            [event["system"] for event in self.catcher],
+            ['(buggy logPrefix method)'] * 2)
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+        self.assertEqual(len(self.flushLoggedErrors(RuntimeError)), 1)
+
+
+
 class FakeFile(list):
     def write(self, bytes):
         self.append(bytes)
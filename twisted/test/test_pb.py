@@ -804,6 +804,23 @@ class FilePagerizer(pb.Referenceable):
 
 
 
+class IteratorPagerizer(pb.Referenceable):
+    """
+    Sends the items of an iterable to callers, either with an
+    L{util.IteratorPager} or as a L{util.PagedResult}.
+    """
+    def __init__(self, iterable, pageSize, window=4):
+        self.iterable, self.pageSize, self.window = iterable, pageSize, window
+
+    def remote_getPages(self, collector):
+        util.IteratorPager(collector, self.iterable, self.pageSize,
+                           self.window)
+
+    def remote_getPagedResult(self):
+        return util.PagedResult(self.iterable, self.pageSize, self.window)
+
+
+
 class PagingTestCase(unittest.TestCase):
     """
     Test pb objects sending data by pages.
@@ -917,6 +934,139 @@ class PagingTestCase(unittest.TestCase):
         self.assertEquals(pagerizer.pager.chunks, [])
 
 
+    def _pumpUntil(self, pump, d):
+        """
+        Pump until C{d} has a result and return it.
+        """
+        l = []
+        d.addBoth(l.append)
+        ttl = 100
+        while not l and ttl > 0:
+            pump.pump()
+            ttl -= 1
+        if not l:
+            self.fail('Deferred did not fire')
+        return l[0]
+
+
+    def _getPageReader(self, iterable, pageSize, window=4):
+        """
+        Connect a client and server and return the client, server, pump,
+        and a L{util.PageReader} for a L{util.PagedResult} of C{iterable}.
+        """
+        c, s, pump = connectedServerAndClient()
+        s.setNameForLocal("foo", IteratorPagerizer(iterable, pageSize, window))
+        x = c.remoteForName("foo")
+        result = self._pumpUntil(pump, x.callRemote("getPagedResult"))
+        return c, s, pump, util.PageReader(result)
+
+
+    def test_iteratorPager(self):
+        """
+        L{util.IteratorPager} sends the items of an iterable as lists of
+        C{pageSize} items, the last of which may be shorter.
+        """
+        c, s, pump = connectedServerAndClient()
+        s.setNameForLocal("foo", IteratorPagerizer(xrange(250), 100))
+        x = c.remoteForName("foo")
+        pages = self._pumpUntil(pump, util.getAllPages(x, "getPages"))
+        self.assertEquals(pages, [range(100), range(100, 200),
+                                  range(200, 250)])
+
+
+    def test_iteratorPagerExactPages(self):
+        """
+        If the number of items is a multiple of C{pageSize},
+        L{util.IteratorPager} does not send an empty page after the last.
+        """
+        c, s, pump = connectedServerAndClient()
+        s.setNameForLocal("foo", IteratorPagerizer(xrange(200), 100))
+        x = c.remoteForName("foo")
+        pages = self._pumpUntil(pump, util.getAllPages(x, "getPages"))
+        self.assertEquals(pages, [range(100), range(100, 200)])
+
+
+    def test_pageReader(self):
+        """
+        L{util.PageReader.nextPage} returns a L{Deferred} which fires with
+        each page of a remote L{util.PagedResult} in turn, and then with
+        C{None}.
+        """
+        c, s, pump, reader = self._getPageReader(xrange(250), 100)
+        pages = []
+        while True:
+            page = self._pumpUntil(pump, reader.nextPage())
+            if page is None:
+                break
+            pages.append(page)
+        self.assertEquals(pages, [range(100), range(100, 200),
+                                  range(200, 250)])
+        self.assertIdentical(self._pumpUntil(pump, reader.nextPage()), None)
+
+
+    def test_pageReaderEmpty(self):
+        """
+        A L{util.PagedResult} of an empty iterable is read as one empty page.
+        """
+        c, s, pump, reader = self._getPageReader([], 100)
+        self.assertEquals(self._pumpUntil(pump, reader.nextPage()), [])
+        self.assertIdentical(self._pumpUntil(pump, reader.nextPage()), None)
+
+
+    def test_pageReaderWindow(self):
+        """
+        No more than C{window} pages are sent to a L{util.PageReader} before
+        they are read, and no more items are taken from the iterable than
+        those pages and one more.
+        """
+        taken = []
+        def items():
+            for i in xrange(1000):
+                taken.append(i)
+                yield i
+        c, s, pump, reader = self._getPageReader(items(), 10, window=3)
+        pump.flush()
+        self.assertEquals(len(reader._pages), 3)
+        self.assertEquals(len(taken), 31)
+
+        self.assertEquals(self._pumpUntil(pump, reader.nextPage()), range(10))
+        pump.flush()
+        self.assertEquals(len(reader._pages), 3)
+        self.assertEquals(len(taken), 41)
+
+
+    def test_pageReaderIteratorFailure(self):
+        """
+        If the iterable of a L{util.PagedResult} raises an exception, the
+        L{Deferred} returned by L{util.PageReader.nextPage} for the page
+        after the last one sent fails with it.
+        """
+        def items():
+            for i in xrange(10):
+                yield i
+            raise ZeroDivisionError()
+        c, s, pump, reader = self._getPageReader(items(), 10)
+        self.assertEquals(self._pumpUntil(pump, reader.nextPage()), range(10))
+        result = self._pumpUntil(pump, reader.nextPage())
+        self.assertIsInstance(result, failure.Failure)
+        self.assertTrue(result.check(ZeroDivisionError))
+        self.assertEquals(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+
+
+    def test_pageReaderConnectionLost(self):
+        """
+        If the connection is lost before all of the pages have been read,
+        the L{Deferred} returned by L{util.PageReader.nextPage} fails with
+        L{pb.PBConnectionLost}.
+        """
+        c, s, pump, reader = self._getPageReader(iter(xrange(1000)), 10,
+                                                 window=1)
+        self.assertEquals(self._pumpUntil(pump, reader.nextPage()), range(10))
+        d = reader.nextPage()
+        c.connectionLost(failure.Failure(main.CONNECTION_DONE))
+        return self.assertFailure(d, pb.PBConnectionLost)
+
+
 
 class DumbPublishable(publish.Publishable):
     def getStateToPublish(self):
@@ -14,6 +14,7 @@ from twisted.test.proto_helpers import StringTransport
 from twisted.test.proto_helpers import StringTransportWithDisconnection
 
 from twisted.internet import protocol, reactor, address, defer, task
+from twisted.internet import interfaces
 from twisted.protocols import policies
 
 
@@ -163,6 +164,32 @@ class WrapperTestCase(unittest.TestCase):
         self.assertTrue(IStubTransport.providedBy(proto.transport))
 
 
+    def test_sendFileTransportNotProvided(self):
+        """
+        The transport wrapper does not provide L{ISendFileTransport}, even if
+        the original transport does, since the contents of a file sent by the
+        original transport would not pass through the wrapper.
+        """
+        class IStubTransport(Interface):
+            pass
+
+        class StubTransport:
+            implements(IStubTransport, interfaces.ISendFileTransport)
+
+        self.assertFalse(
+            interfaces.ISendFileTransport.implementedBy(
+                policies.ProtocolWrapper))
+
+        proto = protocol.Protocol()
+        wrapper = policies.ProtocolWrapper(policies.WrappingFactory(None), proto)
+
+        wrapper.makeConnection(StubTransport())
+        self.assertTrue(IStubTransport.providedBy(proto.transport))
+        self.assertTrue(interfaces.ITransport.providedBy(proto.transport))
+        self.assertFalse(
+            interfaces.ISendFileTransport.providedBy(proto.transport))
+
+
 
 class WrappingFactory(policies.WrappingFactory):
     protocol = lambda s, f, p: p
@@ -395,6 +422,18 @@ class TimeoutTestCase(unittest.TestCase):
         self.failUnless(self.proto.wrappedProtocol.disconnected)
 
 
+    def test_timeoutClock(self):
+        """
+        L{policies.TimeoutFactory.callLater} uses the C{timeoutClock} passed
+        to the factory, if any.
+        """
+        coarse = task.CoarseClock(self.clock, 1.0)
+        factory = policies.TimeoutFactory(
+            protocol.ServerFactory(), 3, timeoutClock=coarse)
+        call = factory.callLater(3, lambda: None)
+        self.assertEquals(coarse.getDelayedCalls(), [call])
+
+
 
 class TimeoutTester(protocol.Protocol, policies.TimeoutMixin):
     """
@@ -547,6 +586,26 @@ class TestTimeout(unittest.TestCase):
         self.proto.setTimeout(None)
 
 
+    def test_timeoutClock(self):
+        """
+        If C{timeoutClock} is set, L{policies.TimeoutMixin.callLater} uses it
+        to schedule the timeout.
+        """
+        coarse = task.CoarseClock(self.clock, 1.0)
+        proto = policies.TimeoutMixin()
+        proto.timeoutClock = coarse
+        proto.timeoutConnection = lambda: self.timedOut.append(True)
+        self.timedOut = []
+        proto.setTimeout(2.5)
+        self.assertEquals(len(coarse.getDelayedCalls()), 1)
+        self.clock.pump([1, 1, 0.5])
+        proto.resetTimeout()
+        self.clock.pump([0.5, 1])
+        self.assertEquals(self.timedOut, [])
+        self.clock.advance(1)
+        self.assertEquals(self.timedOut, [True])
+
+
 
 class LimitTotalConnectionsFactoryTestCase(unittest.TestCase):
     """Tests for policies.LimitTotalConnectionsFactory"""
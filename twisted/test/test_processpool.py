@@ -0,0 +1,265 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.internet.processpool}.
+"""
+
+import os
+
+from twisted.trial import unittest
+from twisted.internet import defer, interfaces, reactor
+from twisted.internet.processpool import (
+    ProcessPool, ProcessPoolStopped, WorkerCrashed, deferToProcessPool)
+
+
+# The functions run in worker processes must be importable by name.
+
+def add(a, b=0):
+    return a + b
+
+
+def divide(a, b):
+    return a / b
+
+
+def getpid():
+    return os.getpid()
+
+
+def crash():
+    os._exit(1)
+
+
+def echo(data):
+    return data
+
+
+def _unloadable():
+    raise ValueError("Cannot be unpickled")
+
+
+class Unloadable(object):
+    """
+    An object which can be pickled, but not unpickled.
+    """
+    def __reduce__(self):
+        return (_unloadable, ())
+
+
+def unloadable():
+    return Unloadable()
+
+
+_warmedUp = []
+
+def warmup():
+    print "Output from a worker process is not a protocol error"
+    _warmedUp.append(True)
+
+
+def warmedUp():
+    return _warmedUp
+
+
+
+class ProcessPoolTests(unittest.TestCase):
+    """
+    Tests for L{ProcessPool} and L{deferToProcessPool}, which run functions
+    in real worker processes.
+    """
+    if not interfaces.IReactorProcess.providedBy(reactor):
+        skip = "Reactor does not support processes"
+
+    def startPool(self, *args, **kwargs):
+        """
+        Start a L{ProcessPool}, which is stopped when the test is done.
+        """
+        pool = ProcessPool(*args, **kwargs)
+        pool.start()
+        self.addCleanup(pool.stop)
+        return pool
+
+
+    def test_result(self):
+        """
+        L{deferToProcessPool} returns a L{Deferred} which fires with the
+        result of the function called in a worker process.
+        """
+        pool = self.startPool(0, 1)
+        d = deferToProcessPool(pool, add, 1, b=2)
+        d.addCallback(self.assertEqual, 3)
+        return d
+
+
+    def test_exception(self):
+        """
+        If the function raises an exception, the L{Deferred} fails with it.
+        """
+        pool = self.startPool(0, 1)
+        d = deferToProcessPool(pool, divide, 1, 0)
+        return self.assertFailure(d, ZeroDivisionError)
+
+
+    def test_workerProcess(self):
+        """
+        The function runs in another process.
+        """
+        pool = self.startPool(0, 1)
+        d = deferToProcessPool(pool, getpid)
+        d.addCallback(self.assertNotEqual, os.getpid())
+        return d
+
+
+    def test_queued(self):
+        """
+        More tasks than there are worker processes are queued, and all of
+        them are run.
+        """
+        pool = self.startPool(0, 2)
+        d = defer.gatherResults([
+            deferToProcessPool(pool, add, i, 1) for i in range(10)])
+        d.addCallback(self.assertEqual, range(1, 11))
+        return d
+
+
+    def test_largeArguments(self):
+        """
+        Arguments and results longer than the greatest AMP value are passed
+        to and from the worker process.
+        """
+        data = 'x' * 200000
+        pool = self.startPool(0, 1)
+        d = deferToProcessPool(pool, echo, data)
+        d.addCallback(self.assertEqual, data)
+        return d
+
+
+    def test_maxTasksPerProcess(self):
+        """
+        A worker process is replaced after it has run C{maxTasksPerProcess}
+        tasks.
+        """
+        pool = self.startPool(0, 1, maxTasksPerProcess=2)
+        d = defer.gatherResults([
+            deferToProcessPool(pool, getpid) for i in range(4)])
+        def cbPids(pids):
+            self.assertEqual(pids[0], pids[1])
+            self.assertEqual(pids[2], pids[3])
+            self.assertNotEqual(pids[1], pids[2])
+        d.addCallback(cbPids)
+        return d
+
+
+    def test_crash(self):
+        """
+        If the worker process exits while running a task, the task fails
+        with L{WorkerCrashed}, and the pool goes on running tasks in a new
+        worker process.
+        """
+        pool = self.startPool(0, 1)
+        d = self.assertFailure(deferToProcessPool(pool, crash), WorkerCrashed)
+        d.addCallback(lambda ignored: deferToProcessPool(pool, add, 2, 2))
+        d.addCallback(self.assertEqual, 4)
+        return d
+
+
+    def test_warmup(self):
+        """
+        The warmup function is called in each worker process before it runs
+        any task.
+        """
+        pool = self.startPool(0, 1, warmup=warmup)
+        d = deferToProcessPool(pool, warmedUp)
+        d.addCallback(self.assertEqual, [True])
+        return d
+
+
+    def test_failedWarmup(self):
+        """
+        If the warmup function fails, the error is logged and the tasks
+        waiting for a worker process fail with L{WorkerCrashed}.
+        """
+        pool = self.startPool(0, 1, warmup=crash)
+        d = self.assertFailure(deferToProcessPool(pool, add, 1),
+                               WorkerCrashed)
+        d.addCallback(lambda ignored: self.flushLoggedErrors())
+        return d
+
+
+    def test_minProcesses(self):
+        """
+        L{ProcessPool.start} starts C{minProcesses} worker processes.
+        """
+        pool = self.startPool(2, 2)
+        self.assertEqual(len(pool._workers), 2)
+
+
+    def test_stop(self):
+        """
+        L{ProcessPool.stop} lets queued tasks finish, and returns a
+        L{Deferred} which fires when all the worker processes have exited.
+        """
+        pool = ProcessPool(0, 1)
+        pool.start()
+        results = []
+        for i in range(3):
+            deferToProcessPool(pool, add, i).addCallback(results.append)
+        d = pool.stop()
+        def cbStopped(ignored):
+            self.assertEqual(results, [0, 1, 2])
+            self.assertEqual(pool._workers, [])
+        d.addCallback(cbStopped)
+        return d
+
+
+    def test_unloadableResult(self):
+        """
+        If the result of a function cannot be unpickled, the task fails with
+        the exception raised unpickling it, and the pool goes on running
+        tasks.
+        """
+        pool = self.startPool(0, 1)
+        d = self.assertFailure(deferToProcessPool(pool, unloadable),
+                               ValueError)
+        d.addCallback(lambda ignored: deferToProcessPool(pool, add, 2, 2))
+        d.addCallback(self.assertEqual, 4)
+        return d
+
+
+    def test_callAfterStop(self):
+        """
+        A task given to a L{ProcessPool} after it has been stopped fails at
+        once with L{ProcessPoolStopped}.
+        """
+        pool = ProcessPool(0, 1)
+        pool.start()
+        stopped = pool.stop()
+        d = self.assertFailure(deferToProcessPool(pool, add, 1),
+                               ProcessPoolStopped)
+        d.addCallback(lambda ignored: stopped)
+        return d
+
+
+    def test_stopWithoutWorkers(self):
+        """
+        Tasks queued before L{ProcessPool.start} fail with
+        L{ProcessPoolStopped} if the pool is stopped before any worker
+        process runs them.
+        """
+        pool = ProcessPool(0, 1)
+        d = self.assertFailure(deferToProcessPool(pool, add, 1),
+                               ProcessPoolStopped)
+        pool.stop()
+        return d
+
+
+    def test_startTwice(self):
+        """
+        Starting a L{ProcessPool} which is already started does not add
+        another shutdown trigger.
+        """
+        pool = self.startPool(0, 1)
+        trigger = pool._shutdownTrigger
+        pool.start()
+        self.assertIdentical(pool._shutdownTrigger, trigger)
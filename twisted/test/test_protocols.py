@@ -309,6 +309,71 @@ a'''
         self.assertEqual(protocol.rest, '')
 
 
+    def test_manyLinesInOneChunk(self):
+        """
+        Every line in a chunk of data is delivered to C{lineReceived}, and a
+        trailing partial line stays buffered until the rest of it arrives.
+        """
+        lines = ['line %d' % (i,) for i in range(1000)]
+        a = LineTester()
+        a.makeConnection(protocol.FileWrapper(
+            proto_helpers.StringIOWithoutClosing()))
+        a.dataReceived('\n'.join(lines) + '\npart')
+        self.assertEqual(a.received, lines)
+        a.dataReceived('ial\n')
+        self.assertEqual(a.received, lines + ['partial'])
+
+
+    def test_setRawModeAfterManyLines(self):
+        """
+        When C{lineReceived} switches to raw mode part way through a chunk,
+        only the data following that line is passed to C{rawDataReceived}.
+        """
+        class RawSwitchingReceiver(basic.LineReceiver):
+            delimiter = '\n'
+
+            def connectionMade(self):
+                self.lines = []
+                self.raw = []
+
+            def lineReceived(self, line):
+                self.lines.append(line)
+                if line == 'raw':
+                    self.setRawMode()
+
+            def rawDataReceived(self, data):
+                self.raw.append(data)
+
+        protocol = RawSwitchingReceiver()
+        protocol.makeConnection(None)
+        protocol.dataReceived('a\nb\nraw\nc\nd')
+        self.assertEqual(protocol.lines, ['a', 'b', 'raw'])
+        self.assertEqual(protocol.raw, ['c\nd'])
+
+
+    def test_reentrantDataReceived(self):
+        """
+        If C{lineReceived} calls C{dataReceived} with more data, that data is
+        appended to the data still buffered and lines continue to be
+        delivered in order.
+        """
+        class ReentrantReceiver(basic.LineReceiver):
+            delimiter = '\n'
+
+            def connectionMade(self):
+                self.lines = []
+
+            def lineReceived(self, line):
+                self.lines.append(line)
+                if line == 'inject':
+                    self.dataReceived('injected\n')
+
+        protocol = ReentrantReceiver()
+        protocol.makeConnection(None)
+        protocol.dataReceived('a\ninject\nb\n')
+        self.assertEqual(protocol.lines, ['a', 'inject', 'b', 'injected'])
+
+
 
 class LineOnlyReceiverTestCase(unittest.TestCase):
     """
@@ -343,6 +408,55 @@ class LineOnlyReceiverTestCase(unittest.TestCase):
         self.assertIsInstance(res, error.ConnectionLost)
 
 
+    def test_lineTooLongAfterLines(self):
+        """
+        The lines preceding a line which is too long are delivered before
+        C{lineLengthExceeded} is called, and the lines following it are not
+        delivered.
+        """
+        t = proto_helpers.StringTransport()
+        a = LineOnlyTester()
+        a.makeConnection(t)
+        res = a.dataReceived('foo\nbar\n' + 'x' * 200 + '\nbaz\n')
+        self.assertIsInstance(res, error.ConnectionLost)
+        self.assertEquals(a.received, ['foo', 'bar'])
+
+
+    def test_linesReceived(self):
+        """
+        L{basic.LineOnlyReceiver.linesReceived} is called once with all of
+        the complete lines in each chunk of data.
+        """
+        batches = []
+        t = proto_helpers.StringTransport()
+        a = LineOnlyTester()
+        a.makeConnection(t)
+        a.linesReceived = batches.append
+        a.dataReceived('foo\nbar\nba')
+        a.dataReceived('z\n')
+        a.dataReceived('quux')
+        self.assertEquals(batches, [['foo', 'bar'], ['baz']])
+        self.assertEquals(a.received, [])
+
+
+    def test_linesReceivedDisconnecting(self):
+        """
+        The default L{basic.LineOnlyReceiver.linesReceived} stops calling
+        C{lineReceived} once the transport is disconnecting.
+        """
+        class ClosingTester(LineOnlyTester):
+            def lineReceived(self, line):
+                LineOnlyTester.lineReceived(self, line)
+                if line == 'bar':
+                    self.transport.loseConnection()
+
+        t = proto_helpers.StringTransport()
+        a = ClosingTester()
+        a.makeConnection(t)
+        a.dataReceived('foo\nbar\nbaz\n')
+        self.assertEquals(a.received, ['foo', 'bar'])
+
+
 
 class TestMixin:
 
@@ -605,6 +719,21 @@ class NetstringReceiverTestCase(unittest.TestCase, LPTestCaseMixin):
         self.assertTrue(self.transport.disconnecting)
 
 
+    def test_receiveManyNetstrings(self):
+        """
+        Every netstring in a chunk of data is delivered to
+        C{stringReceived}, and a trailing partial netstring is delivered
+        once the rest of it arrives.
+        """
+        strings = ['string %d' % (i,) for i in range(1000)]
+        self.netstringReceiver.dataReceived(
+            ''.join(['%d:%s,' % (len(s), s) for s in strings]) + '7:part')
+        self.assertEquals(self.netstringReceiver.received, strings)
+        self.netstringReceiver.dataReceived('ial,')
+        self.assertEquals(
+            self.netstringReceiver.received, strings + ['partial'])
+
+
     def test_consumeLength(self):
         """
         C{_consumeLength} returns the expected length of the
@@ -702,6 +831,89 @@ class IntNTestCaseMixin(LPTestCaseMixin):
         self.assertEquals(r.received, self.strings)
 
 
+    def test_receiveMany(self):
+        """
+        Every string in a chunk of data is delivered to C{stringReceived},
+        and a trailing partial string is delivered once the rest of it
+        arrives.
+        """
+        r = self.getProtocol()
+        strings = ['string %d' % (i,) for i in range(1000)]
+        data = ''.join([struct.pack(r.structFormat, len(s)) + s
+                        for s in strings])
+        last = struct.pack(r.structFormat, 7) + 'partial'
+        r.dataReceived(data + last[:-3])
+        self.assertEquals(r.received, strings)
+        self.assertEquals(r.recvd, last[:-3])
+        r.dataReceived(last[-3:])
+        self.assertEquals(r.received, strings + ['partial'])
+        self.assertEquals(r.recvd, '')
+
+
+    def test_recvd(self):
+        """
+        While C{stringReceived} runs, C{recvd} holds the data which has not
+        yet been delivered, and assigning to it replaces that data.
+        """
+        r = self.getProtocol()
+        seen = []
+        def stringReceived(string):
+            seen.append(r.recvd)
+            if string == 'b':
+                r.recvd = struct.pack(r.structFormat, 1) + 'z'
+            r.received.append(string)
+        r.stringReceived = stringReceived
+        data = ''.join([struct.pack(r.structFormat, 1) + s for s in 'abc'])
+        r.dataReceived(data)
+        self.assertEquals(r.received, ['a', 'b', 'z'])
+        self.assertEquals(seen, [data[len(data) / 3:], data[-len(data) / 3:],
+                                 ''])
+
+
+    def test_stringsReceived(self):
+        """
+        If C{stringsReceived} is overridden, it is called once with all of
+        the complete strings in each chunk of data instead of
+        C{stringReceived} being called with each of them.
+        """
+        r = self.getProtocol()
+        batches = []
+        r.stringsReceived = batches.append
+        data = ''.join([struct.pack(r.structFormat, len(s)) + s
+                        for s in ['foo', 'bar', 'baz']])
+        r.dataReceived(data[:-1])
+        r.dataReceived(data[-1:])
+        self.assertEquals(batches, [['foo', 'bar'], ['baz']])
+        self.assertEquals(r.received, [])
+        self.assertEquals(r.recvd, '')
+
+
+    def test_stringsReceivedLengthLimitExceeded(self):
+        """
+        If C{stringsReceived} is overridden, the strings preceding a length
+        prefix greater than C{MAX_LENGTH} are delivered before
+        C{lengthLimitExceeded} is called.
+        """
+        r = self.getProtocol()
+        events = []
+        r.stringsReceived = events.append
+        r.lengthLimitExceeded = events.append
+        r.MAX_LENGTH = 10
+        r.dataReceived(struct.pack(r.structFormat, 3) + 'foo' +
+                       struct.pack(r.structFormat, 11) + 'x' * 11)
+        self.assertEquals(events, [['foo'], 11])
+
+
+    def test_stringsReceivedDefault(self):
+        """
+        The default C{stringsReceived} calls C{stringReceived} with each
+        string.
+        """
+        r = self.getProtocol()
+        r.stringsReceived(['foo', 'bar'])
+        self.assertEquals(r.received, ['foo', 'bar'])
+
+
     def test_partial(self):
         """
         Send partial data, nothing should be definitely received.
@@ -718,3 +718,137 @@ class DeferLaterTests(unittest.TestCase):
         self.assertFailure(d, defer.CancelledError)
         d.addCallback(cbCancelled)
         return d
+
+
+
+class CoarseClockTests(unittest.TestCase):
+    """
+    Tests for L{task.CoarseClock}.
+    """
+    def setUp(self):
+        self.clock = task.Clock()
+        self.coarse = task.CoarseClock(self.clock, 1.0)
+        self.events = []
+
+
+    def test_interface(self):
+        """
+        L{task.CoarseClock} provides L{interfaces.IReactorTime} and hands back
+        L{interfaces.IDelayedCall} providers from C{callLater}.
+        """
+        self.assertTrue(interfaces.IReactorTime.providedBy(self.coarse))
+        call = self.coarse.callLater(1, lambda: None)
+        self.assertTrue(interfaces.IDelayedCall.providedBy(call))
+        self.assertEquals(self.coarse.getDelayedCalls(), [call])
+
+
+    def test_invalidResolution(self):
+        """
+        L{task.CoarseClock} raises L{ValueError} if the resolution is not
+        positive.
+        """
+        self.assertRaises(ValueError, task.CoarseClock, self.clock, 0)
+
+
+    def test_runsAtEndOfBucket(self):
+        """
+        A call runs when the bucket containing its scheduled time comes due,
+        never earlier than it was scheduled for.
+        """
+        self.coarse.callLater(1.5, self.events.append, 'a')
+        self.clock.advance(1.5)
+        self.assertEquals(self.events, [])
+        self.clock.advance(0.5)
+        self.assertEquals(self.events, ['a'])
+        self.assertEquals(self.coarse.getDelayedCalls(), [])
+        self.assertEquals(self.clock.getDelayedCalls(), [])
+
+
+    def test_singleUnderlyingCall(self):
+        """
+        However many calls are pending, L{task.CoarseClock} only keeps one
+        call pending on the underlying clock.
+        """
+        for i in range(10):
+            self.coarse.callLater(i + 0.5, self.events.append, i)
+        self.assertEquals(len(self.clock.getDelayedCalls()), 1)
+        self.clock.pump([1] * 11)
+        self.assertEquals(self.events, range(10))
+
+
+    def test_resetLater(self):
+        """
+        Resetting a call to a later time does not touch the underlying clock
+        and the call runs at the end of the bucket containing its new time.
+        """
+        call = self.coarse.callLater(2, self.events.append, 'a')
+        self.clock.advance(1.25)
+        underlying = self.clock.getDelayedCalls()[:]
+        call.reset(2)
+        self.assertEquals(self.clock.getDelayedCalls(), underlying)
+        self.clock.advance(1.75)
+        self.assertEquals(self.events, [])
+        self.clock.advance(1)
+        self.assertEquals(self.events, ['a'])
+
+
+    def test_resetSooner(self):
+        """
+        Resetting a call to an earlier time moves it to an earlier bucket.
+        """
+        call = self.coarse.callLater(10, self.events.append, 'a')
+        call.reset(0.5)
+        self.clock.advance(1)
+        self.assertEquals(self.events, ['a'])
+
+
+    def test_cancel(self):
+        """
+        A cancelled call does not run, and once no calls are pending nothing
+        is left scheduled on the underlying clock.
+        """
+        call = self.coarse.callLater(1, self.events.append, 'a')
+        call.cancel()
+        self.assertEquals(self.coarse.getDelayedCalls(), [])
+        self.assertEquals(self.clock.getDelayedCalls(), [])
+        self.clock.advance(2)
+        self.assertEquals(self.events, [])
+
+
+    def test_cancelFromSameBucket(self):
+        """
+        A call may cancel another call in the same bucket which has not run
+        yet.
+        """
+        calls = []
+        calls.append(self.coarse.callLater(
+                0.25, lambda: calls[1].cancel()))
+        calls.append(self.coarse.callLater(0.5, self.events.append, 'b'))
+        self.clock.advance(1)
+        self.assertEquals(self.events, [])
+        self.assertEquals(self.clock.getDelayedCalls(), [])
+
+
+    def test_errorLogged(self):
+        """
+        An exception raised by a call is logged and does not stop other
+        calls in the same bucket from running.
+        """
+        self.coarse.callLater(0.25, lambda: 1 // 0)
+        self.coarse.callLater(0.5, self.events.append, 'b')
+        self.clock.advance(1)
+        self.assertEquals(self.events, ['b'])
+        self.assertEquals(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+
+
+    def test_idle(self):
+        """
+        A call scheduled after the L{task.CoarseClock} has been idle for a
+        while runs at the end of its own bucket.
+        """
+        self.clock.advance(100.5)
+        self.coarse.callLater(1, self.events.append, 'a')
+        self.clock.advance(1)
+        self.assertEquals(self.events, [])
+        self.clock.advance(0.5)
+        self.assertEquals(self.events, ['a'])
@@ -13,7 +13,7 @@ from twisted.trial import unittest
 
 from twisted.python.log import msg
 from twisted.internet import protocol, reactor, defer, interfaces
-from twisted.internet import error
+from twisted.internet import error, tcp
 from twisted.internet.address import IPv4Address
 from twisted.internet.interfaces import IHalfCloseableProtocol, IPullProducer
 from twisted.protocols import policies
@@ -797,6 +797,43 @@ class CannotBindTestCase(unittest.TestCase):
 
 
 
+    def test_reusePort(self):
+        """
+        Several L{tcp.Port}s created with C{reusePort} set may listen on the
+        same address at once.
+        """
+        f = MyServerFactory()
+        p1 = tcp.Port(0, f, interface='127.0.0.1', reactor=reactor,
+                      reusePort=True)
+        p1.startListening()
+        self.addCleanup(p1.stopListening)
+        n = p1.getHost().port
+
+        p2 = tcp.Port(n, f, interface='127.0.0.1', reactor=reactor,
+                      reusePort=True)
+        p2.startListening()
+        self.addCleanup(p2.stopListening)
+        self.assertEquals(p2.getHost().port, n)
+
+        # A port which does not ask to share the address still cannot.
+        self.assertRaises(error.CannotListenError,
+                          reactor.listenTCP, n, f, interface='127.0.0.1')
+
+    if getattr(socket, 'SO_REUSEPORT', None) is None:
+        test_reusePort.skip = "SO_REUSEPORT is not supported on this platform"
+
+
+    def test_reusePortUnsupported(self):
+        """
+        L{tcp.Port.startListening} raises L{error.CannotListenError} if
+        C{reusePort} is set on a platform without C{SO_REUSEPORT}.
+        """
+        self.patch(tcp, '_SO_REUSEPORT', None)
+        port = tcp.Port(0, MyServerFactory(), interface='127.0.0.1',
+                        reactor=reactor, reusePort=True)
+        self.assertRaises(error.CannotListenError, port.startListening)
+
+
     def _fireWhenDoneFunc(self, d, f):
         """Returns closure that when called calls f and then callbacks d.
         """
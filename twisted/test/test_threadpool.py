@@ -578,6 +578,323 @@ class RaceConditionTestCase(unittest.TestCase):
 
 
 
+class FakeThread(object):
+    """
+    A thread which is never started, so that the tasks of a pool using it
+    stay queued.
+    """
+    def __init__(self, target, name, args):
+        self.target = target
+        self.args = args
+
+
+    def start(self):
+        pass
+
+
+    def join(self):
+        pass
+
+
+
+class FakeTimer(object):
+    """
+    A timer which only fires when told to.
+
+    @ivar timers: The list to which every L{FakeTimer} created is appended.
+    """
+    timers = None
+
+    def __init__(self, interval, function):
+        self.interval = interval
+        self.function = function
+        self.cancelled = False
+        self.timers.append(self)
+
+
+    def start(self):
+        pass
+
+
+    def cancel(self):
+        self.cancelled = True
+
+
+    def join(self):
+        pass
+
+
+
+class TimeHistogramTestCase(unittest.TestCase):
+    """
+    Tests for L{threadpool.TimeHistogram}.
+    """
+    def test_add(self):
+        """
+        L{TimeHistogram.add} counts a duration in the first bucket whose
+        bound it is below, or in the last bucket, and adds it to the total.
+        """
+        histogram = threadpool.TimeHistogram()
+        for duration in 0.00005, 0.05, 0.1, 20:
+            histogram.add(duration)
+        self.assertEqual(histogram.counts, [1, 0, 0, 1, 1, 0, 1])
+        self.assertApproximates(histogram.total, 20.15005, 1e-9)
+
+
+    def test_mergeAndCopy(self):
+        """
+        L{TimeHistogram.merge} adds the counts and total of another
+        histogram, and L{TimeHistogram.copy} returns an independent copy.
+        """
+        histogram = threadpool.TimeHistogram()
+        histogram.add(0.5)
+        other = histogram.copy()
+        other.add(5)
+        histogram.merge(other)
+        self.assertEqual(histogram.counts, [0, 0, 0, 0, 2, 1, 0])
+        self.assertEqual(histogram.total, 6.0)
+        self.assertEqual(other.counts, [0, 0, 0, 0, 1, 1, 0])
+
+
+
+class AdaptiveThreadPoolTestCase(unittest.TestCase):
+    """
+    Tests for L{threadpool.AdaptiveThreadPool}.
+    """
+    def _fakePool(self, minthreads=0):
+        """
+        Create a started pool whose threads never run, with a clock set by
+        C{self.now}.
+        """
+        self.now = 1000.0
+        pool = threadpool.AdaptiveThreadPool(minthreads, 4, targetLatency=0.01)
+        pool.threadFactory = FakeThread
+        self.timers = []
+        pool.timerFactory = type(
+            'FakeTimer', (FakeTimer,), {'timers': self.timers})
+        pool._time = lambda: self.now
+        pool.start()
+        return pool
+
+
+    def _busy(self, pool):
+        for state in pool._states:
+            state.busy = True
+
+
+    def test_firstTaskStartsThread(self):
+        """
+        A thread is started for the first task, as nothing is known about
+        how long tasks take.
+        """
+        pool = self._fakePool()
+        self.assertEqual(pool.workers, 0)
+        pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 1)
+
+
+    def test_shortTasksQueued(self):
+        """
+        Tasks are queued rather than given new threads while the estimated
+        time they will wait is below C{targetLatency}.
+        """
+        pool = self._fakePool()
+        pool.callInThread(lambda: None)
+        self._busy(pool)
+        pool._runTime = 0.001
+        for i in range(5):
+            pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 1)
+        pool._runTime = 0.1
+        pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 2)
+
+
+    def test_oldestTaskStartsThread(self):
+        """
+        A thread is started when the oldest queued task has waited longer
+        than C{targetLatency}, however short tasks have been.
+        """
+        pool = self._fakePool()
+        pool.callInThread(lambda: None)
+        self._busy(pool)
+        pool._runTime = 0.0
+        pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 1)
+        self.now += 0.02
+        pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 2)
+
+
+    def test_recheckStartsThread(self):
+        """
+        If a task is queued without starting a thread, the pool checks again
+        after C{targetLatency} seconds and starts a thread then, even if no
+        other task is queued.
+        """
+        pool = self._fakePool()
+        pool.callInThread(lambda: None)
+        self._busy(pool)
+        pool._runTime = 0.0
+        pool.callInThread(lambda: None)
+        pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 1)
+        self.assertEqual(len(self.timers), 1)
+        self.assertEqual(self.timers[0].interval, pool.targetLatency)
+        self.now += 0.02
+        self.timers[0].function()
+        self.assertEqual(pool.workers, 2)
+        self.assertEqual(len(self.timers), 1)
+
+
+    def test_stopCancelsRecheck(self):
+        """
+        L{AdaptiveThreadPool.stop} cancels a pending check of the pool's
+        size.
+        """
+        pool = self._fakePool()
+        pool.callInThread(lambda: None)
+        self._busy(pool)
+        pool._runTime = 0.0
+        pool.callInThread(lambda: None)
+        pool.stop()
+        self.assertTrue(self.timers[0].cancelled)
+        self.assertIdentical(pool._recheck, None)
+
+
+    def test_blockedThread(self):
+        """
+        A task queued behind a thread blocked waiting for it is given a
+        thread of its own, rather than waiting for the blocked one.
+        """
+        pool = threadpool.AdaptiveThreadPool(0, 5)
+        pool.start()
+        self.addCleanup(pool.stop)
+        ready = threading.Event()
+        pool.callInThread(ready.set)
+        ready.wait(10)
+        self.assertTrue(ready.isSet())
+        while pool._runTime is None:
+            time.sleep(0.001)
+
+        event = threading.Event()
+        waited = []
+        done = threading.Event()
+        def blocked():
+            event.wait(10)
+            waited.append(event.isSet())
+            done.set()
+        pool.callInThread(blocked)
+        pool.callInThread(event.set)
+        done.wait(10)
+        self.assertEqual(waited, [True])
+
+
+    def test_idleThreadStopped(self):
+        """
+        A thread above C{min} which has been idle for C{idleTimeout} seconds
+        is stopped when work is queued.
+        """
+        pool = self._fakePool(minthreads=1)
+        pool.startAWorker()
+        self.assertEqual(pool.workers, 2)
+        self.now += pool.idleTimeout
+        pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 1)
+        self.assertIdentical(pool.q.queue[-1], threadpool.WorkerStop)
+
+
+    def test_idleThreadsStoppedByTimer(self):
+        """
+        Threads above C{min} which stay idle are stopped by a timer, without
+        any more work being queued.
+        """
+        pool = self._fakePool(minthreads=1)
+        pool.startAWorker()
+        pool.startAWorker()
+        self.assertEqual(pool.workers, 3)
+        self.now += 10
+        pool._states[0].lastActive = self.now
+        pool._stopIdleWorkers()
+        [reaper] = self.timers
+        self.assertEqual(reaper.interval, pool.idleTimeout - 10)
+
+        self.now += pool.idleTimeout
+        reaper.function()
+        self.assertEqual(pool.workers, 1)
+        self.assertEqual(list(pool.q.queue), [threadpool.WorkerStop] * 2)
+        self.assertIdentical(pool._reaper, None)
+
+
+    def test_idleThreadsStoppedAfterBurst(self):
+        """
+        A pool which has grown to run a burst of tasks shrinks back to
+        C{min} threads once it has been idle for C{idleTimeout} seconds.
+        """
+        pool = threadpool.AdaptiveThreadPool(0, 5, idleTimeout=0.1)
+        pool.start()
+        self.addCleanup(pool.stop)
+        event = threading.Event()
+        done = []
+        def blocked():
+            event.wait(10)
+            done.append(None)
+        for i in range(3):
+            pool.callInThread(blocked)
+        deadline = time.time() + 10
+        while pool.workers < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(pool.workers, 3)
+        event.set()
+        while pool.workers and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(done), 3)
+        self.assertEqual(pool.workers, 0)
+
+
+    def test_stats(self):
+        """
+        L{AdaptiveThreadPool.stats} counts the tasks which have been run in
+        histograms of their wait and run times.
+        """
+        pool = threadpool.AdaptiveThreadPool(0, 2)
+        done = threading.Event()
+        count = []
+        def task():
+            count.append(None)
+            if len(count) == 10:
+                done.set()
+        for i in range(10):
+            pool.callInThread(task)
+        pool.start()
+        try:
+            done.wait(10)
+        finally:
+            pool.stop()
+        self.assertTrue(done.isSet())
+        stats = pool.stats()
+        self.assertEqual(stats.completed, 10)
+        self.assertEqual(sum(stats.waitTimes.counts), 10)
+        self.assertEqual(sum(stats.runTimes.counts), 10)
+        self.assertEqual(
+            len(stats.runTimes.counts), len(stats.runTimes.bounds) + 1)
+        self.assertEqual(stats.busy, 0)
+        self.assertEqual(stats.workers, 0)
+        self.assertTrue(stats.maxQueued >= 1)
+
+
+    def test_persistence(self):
+        """
+        The sizing parameters of a pool survive pickling.
+        """
+        pool = threadpool.AdaptiveThreadPool(2, 7, targetLatency=0.5)
+        copy = pickle.loads(pickle.dumps(pool))
+        self.assertEqual((copy.min, copy.max, copy.targetLatency),
+                         (2, 7, 0.5))
+        self.assertEqual(copy.stats().completed, 0)
+
+
+
 class ThreadSafeListDeprecationTestCase(unittest.TestCase):
     """
     Test deprecation of threadpool.ThreadSafeList in twisted.python.threadpool
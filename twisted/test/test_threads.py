@@ -319,6 +319,42 @@ class DeferToThreadPoolTestCase(unittest.TestCase):
         return self.assertFailure(d, NewError)
 
 
+    def test_resultOrderedAfterCallFromThread(self):
+        """
+        The result of a function is delivered by C{callFromThread}, so it
+        fires after any call the function itself made with
+        C{callFromThread}, and after earlier results.
+        """
+        class FakeReactor(object):
+            def __init__(self):
+                self.calls = []
+            def callFromThread(self, f, *args, **kwargs):
+                self.calls.append((f, args, kwargs))
+
+        class SynchronousThreadPool(object):
+            def callInThreadWithCallback(self, onResult, f, *args, **kwargs):
+                onResult(True, f(*args, **kwargs))
+
+        fakeReactor = FakeReactor()
+        pool = SynchronousThreadPool()
+        events = []
+        def queueAndReturn(name):
+            fakeReactor.callFromThread(events.append, 'x')
+            return name
+        for name in 'd1', 'd2':
+            threads.deferToThreadPool(
+                fakeReactor, pool, lambda name=name: name).addCallback(
+                events.append)
+        threads.deferToThreadPool(
+            fakeReactor, pool, queueAndReturn, 'd3').addCallback(
+            events.append)
+        self.assertEqual(events, [])
+
+        for f, args, kwargs in fakeReactor.calls:
+            f(*args, **kwargs)
+        self.assertEqual(events, ['d1', 'd2', 'x', 'd3'])
+
+
 
 _callBeforeStartupProgram = """
 import time
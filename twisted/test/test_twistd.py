@@ -26,6 +26,9 @@ from twisted.python.log import ILogObserver
 from twisted.python.versions import Version
 from twisted.python.components import Componentized
 from twisted.internet.defer import Deferred
+from twisted.internet.error import ProcessDone
+from twisted.internet.task import Clock
+from twisted.python.failure import Failure
 from twisted.python.fakepwd import UserDatabase
 
 try:
@@ -224,6 +227,44 @@ class ServerOptionsTest(unittest.TestCase):
         test_defaultUmask.skip = test_umask.skip = test_invalidUmask.skip = msg
 
 
+    def test_defaultWorkers(self):
+        """
+        By default the application runs in a single process.
+        """
+        config = twistd.ServerOptions()
+        config.parseOptions([])
+        self.assertEqual(config['workers'], 1)
+        self.assertEqual(config['worker'], False)
+
+
+    def test_invalidWorkers(self):
+        """
+        L{UsageError} is raised by L{ServerOptions.parseOptions} if fewer than
+        one worker process is asked for.
+        """
+        config = twistd.ServerOptions()
+        self.assertRaises(UsageError, config.parseOptions, ['--workers', '0'])
+
+
+    def test_worker(self):
+        """
+        A worker process does not daemonize, keeps no PID file and logs to
+        standard output, whatever else it is given.
+        """
+        config = twistd.ServerOptions()
+        config.parseOptions([
+                '--worker', '--workers', '4', '--pidfile', 'foo.pid',
+                '--logfile', 'foo.log'])
+        self.assertEqual(config['workers'], 4)
+        self.assertEqual(config['nodaemon'], True)
+        self.assertEqual(config['pidfile'], '')
+        self.assertEqual(config['logfile'], '-')
+
+    if _twistd_unix is None:
+        test_defaultWorkers.skip = test_invalidWorkers.skip = msg
+        test_worker.skip = msg
+
+
 
 class TapFileTest(unittest.TestCase):
     """
@@ -653,6 +694,167 @@ class UnixApplicationRunnerStartApplicationTests(unittest.TestCase):
 
 
 
+class UnixApplicationRunnerWorkersTests(unittest.TestCase):
+    """
+    Tests for running an application in several worker processes with
+    L{UnixApplicationRunner}.
+    """
+    if _twistd_unix is None:
+        skip = "twistd unix not available"
+
+    def test_postApplicationStartsWorkers(self):
+        """
+        If more than one worker is asked for,
+        L{UnixApplicationRunner.postApplication} starts the workers instead of
+        the application.
+        """
+        options = twistd.ServerOptions()
+        options.parseOptions(['--workers', '3'])
+        runner = UnixApplicationRunner(options)
+        runner.application = service.Application("test_workers")
+        runner.oldstdout = runner.oldstderr = None
+
+        calls = []
+        runner.startWorkers = calls.append
+        runner.startApplication = lambda application: calls.append(application)
+        runner.startReactor = lambda *args: None
+        runner.removePID = lambda pidfile: None
+        runner.postApplication()
+        self.assertEqual(calls, [3])
+
+
+    def test_postApplicationInWorker(self):
+        """
+        A worker process started by L{UnixApplicationRunner.startWorkers}
+        starts the application itself.
+        """
+        options = twistd.ServerOptions()
+        options.parseOptions(['--worker', '--workers', '3'])
+        runner = UnixApplicationRunner(options)
+        runner.application = service.Application("test_workers")
+        runner.oldstdout = runner.oldstderr = None
+
+        calls = []
+        runner.startWorkers = calls.append
+        runner.startApplication = calls.append
+        runner.startReactor = lambda *args: None
+        runner.removePID = lambda pidfile: None
+        runner.postApplication()
+        self.assertEqual(calls, [runner.application])
+
+
+
+class FakeProcessTransport(object):
+    """
+    A process transport which records the signals sent to it.
+    """
+    def __init__(self):
+        self.signals = []
+
+
+    def signalProcess(self, signalID):
+        self.signals.append(signalID)
+
+
+
+class ProcessReactor(Clock):
+    """
+    A reactor which records the processes it is asked to spawn.
+    """
+    def __init__(self):
+        Clock.__init__(self)
+        self.spawned = []
+
+
+    def spawnProcess(self, processProtocol, executable, args, env, path):
+        self.spawned.append((processProtocol, executable, args, path))
+        processProtocol.makeConnection(FakeProcessTransport())
+
+
+
+class WorkerSupervisorTests(unittest.TestCase):
+    """
+    Tests for L{_twistd_unix.WorkerSupervisor}.
+    """
+    if _twistd_unix is None:
+        skip = "twistd unix not available"
+
+    def setUp(self):
+        self.reactor = ProcessReactor()
+        self.supervisor = _twistd_unix.WorkerSupervisor(
+            self.reactor, 2, ['python', 'twistd', '--worker'], '/foo')
+
+
+    def _end(self, workerProtocol):
+        workerProtocol.processEnded(Failure(ProcessDone(0)))
+
+
+    def test_start(self):
+        """
+        L{WorkerSupervisor.start} spawns the requested number of workers with
+        the given arguments and working directory.
+        """
+        self.supervisor.start()
+        self.assertEqual(
+            [(executable, args, path)
+             for (proto, executable, args, path) in self.reactor.spawned],
+            [('python', ['python', 'twistd', '--worker'], '/foo')] * 2)
+        self.assertEqual(sorted(self.supervisor.workers.keys()), [0, 1])
+
+
+    def test_restart(self):
+        """
+        A worker which ends is restarted after
+        L{WorkerSupervisor.restartDelay} seconds.
+        """
+        self.supervisor.start()
+        self._end(self.supervisor.workers[1])
+        self.assertEqual(self.supervisor.workers.keys(), [0])
+        self.reactor.advance(self.supervisor.restartDelay)
+        self.assertEqual(len(self.reactor.spawned), 3)
+        self.assertEqual(self.reactor.spawned[-1][0].number, 1)
+        self.assertEqual(sorted(self.supervisor.workers.keys()), [0, 1])
+
+
+    def test_stop(self):
+        """
+        L{WorkerSupervisor.stop} terminates the workers, returns a
+        L{Deferred} which fires once they have all ended, and stops them from
+        being restarted.
+        """
+        self.supervisor.start()
+        workers = self.supervisor.workers.values()
+        stopped = []
+        self.supervisor.stop().addCallback(stopped.append)
+        self.assertEqual(
+            [worker.transport.signals for worker in workers],
+            [['TERM'], ['TERM']])
+        self._end(workers[0])
+        self.assertEqual(stopped, [])
+        self._end(workers[1])
+        self.assertEqual(len(stopped), 1)
+        self.reactor.advance(self.supervisor.restartDelay)
+        self.assertEqual(len(self.reactor.spawned), 2)
+
+
+    def test_logOutput(self):
+        """
+        Each complete line a worker writes is logged, labelled with the
+        number of the worker.
+        """
+        messages = []
+        log.addObserver(messages.append)
+        self.addCleanup(log.removeObserver, messages.append)
+        self.supervisor.start()
+        worker = self.supervisor.workers[1]
+        worker.outReceived('hello\nwor')
+        worker.errReceived('ld\n')
+        self.assertEqual(
+            [(event['message'], event['system']) for event in messages],
+            [(('hello',), 'worker-1'), (('world',), 'worker-1')])
+
+
+
 class UnixApplicationRunnerRemovePID(unittest.TestCase):
     """
     Tests for L{UnixApplicationRunner.removePID}.
@@ -40,6 +40,12 @@ extensions = [
     Extension("twisted.internet._sigchld",
               ["twisted/internet/_sigchld.c"],
               condition=lambda builder: sys.platform != "win32"),
+    Extension("twisted.python._writev",
+              ["twisted/python/_writev.c"],
+              condition=lambda builder: sys.platform != "win32"),
+    Extension("twisted.python._sendfile",
+              ["twisted/python/_sendfile.c"],
+              condition=lambda builder: builder._check_header("sys/sendfile.h")),
 ]
 
 # Figure out which plugins to include: all plugins except subproject ones
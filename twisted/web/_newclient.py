@@ -155,6 +155,15 @@ class ResponseFailed(_WrapperException):
 
 
 
+class ResponseNeverReceived(ResponseFailed):
+    """
+    L{ResponseNeverReceived} indicates that the connection was lost before any
+    part of the response to a request was received.  The server may have
+    closed an idle persistent connection just as the request was issued.
+    """
+
+
+
 class RequestNotSent(Exception):
     """
     L{RequestNotSent} indicates that an attempt was made to issue a request but
@@ -341,6 +350,8 @@ class HTTPClientParser(HTTPParser):
     @ivar _responseDeferred: A L{Deferred} which will be called back with the
         response when all headers in the response have been received.
         Thereafter, C{None}.
+
+    @ivar _everReceivedData: C{True} if any bytes have been received.
     """
     NO_BODY_CODES = set([NO_CONTENT, NOT_MODIFIED])
 
@@ -349,6 +360,7 @@ class HTTPClientParser(HTTPParser):
         }
 
     bodyDecoder = None
+    _everReceivedData = False
 
     def __init__(self, request, finisher):
         self.request = request
@@ -356,6 +368,14 @@ class HTTPClientParser(HTTPParser):
         self._responseDeferred = Deferred()
 
 
+    def dataReceived(self, data):
+        """
+        Note that some data has been received before parsing it.
+        """
+        self._everReceivedData = True
+        HTTPParser.dataReceived(self, data)
+
+
     def parseVersion(self, strversion):
         """
         Parse version strings of the form Protocol '/' Major '.' Minor. E.g.
@@ -506,7 +526,11 @@ class HTTPClientParser(HTTPParser):
                 # making things difficult.
                 log.err()
         elif self.state != DONE:
-            self._responseDeferred.errback(Failure(ResponseFailed([reason])))
+            if self._everReceivedData:
+                exceptionClass = ResponseFailed
+            else:
+                exceptionClass = ResponseNeverReceived
+            self._responseDeferred.errback(Failure(exceptionClass([reason])))
             del self._responseDeferred
 
 
@@ -531,12 +555,18 @@ class Request:
 
     @ivar bodyProducer: C{None} or an L{IBodyProducer} provider which
         produces the content body to send to the remote HTTP server.
+
+    @ivar persistent: If C{True}, the connection the request is sent over may
+        be kept open for further requests once the response has been
+        received.  Otherwise a I{Connection: close} header is sent.
+    @type persistent: C{bool}
     """
-    def __init__(self, method, uri, headers, bodyProducer):
+    def __init__(self, method, uri, headers, bodyProducer, persistent=False):
         self.method = method
         self.uri = uri
         self.headers = headers
         self.bodyProducer = bodyProducer
+        self.persistent = persistent
 
 
     def _writeHeaders(self, transport, TEorCL):
@@ -550,7 +580,8 @@ class Request:
         requestLines = []
         requestLines.append(
             '%s %s HTTP/1.1\r\n' % (self.method, self.uri))
-        requestLines.append('Connection: close\r\n')
+        if not self.persistent:
+            requestLines.append('Connection: close\r\n')
         if TEorCL is not None:
             requestLines.append(TEorCL)
         for name, values in self.headers.getAllRawHeaders():
@@ -1244,10 +1275,21 @@ class HTTP11ClientProtocol(Protocol):
 
           - CONNECTION_LOST: The connection has been lost.
 
+        After the response to a persistent request has been received in full,
+        the instance moves from C{WAITING} back to C{QUIESCENT} and may be
+        used to issue another request.
+
+    @ivar _quiescentCallback: A one-argument callable which is called with
+        this protocol when it has finished receiving the response to a
+        persistent request and moved back to the C{QUIESCENT} state.
     """
     _state = 'QUIESCENT'
     _parser = None
 
+    def __init__(self, quiescentCallback=lambda c: None):
+        self._quiescentCallback = quiescentCallback
+
+
     def request(self, request):
         """
         Issue C{request} over C{self.transport} and return a L{Deferred} which
@@ -1286,10 +1328,6 @@ class HTTP11ClientProtocol(Protocol):
         def cbRequestWrotten(ignored):
             if self._state == 'TRANSMITTING':
                 self._state = 'WAITING'
-                # XXX We're stuck in WAITING until we lose the connection now.
-                # This will be wrong when persistent connections are supported.
-                # See #3420 for persistent connections.
-
                 self._responseDeferred.chainDeferred(self._finishedRequest)
 
         def ebRequestWriting(err):
@@ -1316,17 +1354,6 @@ class HTTP11ClientProtocol(Protocol):
             the L{HTTPClientParser} which were not part of the response it
             was parsing.
         """
-        # XXX this is because Connection: close is hard-coded above, probably
-        # will want to change that at some point.  Either the client or the
-        # server can control this.
-
-        # XXX If the connection isn't being closed at this point, it's
-        # important to make sure the transport isn't paused (after _giveUp,
-        # or inside it, or something - after the parser can no longer touch
-        # the transport)
-
-        # For both of the above, see #3420 for persistent connections.
-
         if self._state == 'TRANSMITTING':
             # The server sent the entire response before we could send the
             # whole request.  That sucks.  Oh well.  Fire the request()
@@ -1336,7 +1363,53 @@ class HTTP11ClientProtocol(Protocol):
             self._state = 'TRANSMITTING_AFTER_RECEIVING_RESPONSE'
             self._responseDeferred.chainDeferred(self._finishedRequest)
 
-        self._giveUp(Failure(ConnectionDone("synthetic!")))
+        reason = Failure(ConnectionDone("synthetic!"))
+        if not self._canPersist(rest):
+            self._giveUp(reason)
+            return
+
+        self._state = 'QUIESCENT'
+        # The parser may have paused the transport while waiting for the
+        # application to ask for the response body.  The parser is about to
+        # lose its hold on the transport, so undo that before anything else
+        # is read from the connection.
+        self.transport.resumeProducing()
+
+        # Let the connection be reused before the end of the response body is
+        # delivered, so that application code reacting to it finds the
+        # connection available.  Keeping connections open is only an
+        # optimization, so if that fails just close this one.
+        try:
+            self._quiescentCallback(self)
+        except:
+            log.err()
+            self.transport.loseConnection()
+        self._disconnectParser(reason)
+
+
+    def _canPersist(self, rest):
+        """
+        Determine whether the connection can be used for another request now
+        that the response to the current one has been received.
+
+        @param rest: A C{str} giving any bytes received after the response.
+
+        @return: C{True} if the request was persistent, was completely sent,
+            and the server indicated it would keep the connection open.
+        """
+        if self._state != 'WAITING' or self._parser is None or rest:
+            # The request is still being written, the response was terminated
+            # by the connection being lost, or the server sent more than it
+            # was asked for.
+            return False
+        if not self._currentRequest.persistent:
+            return False
+        if self._parser.response.version < ('HTTP', 1, 1):
+            return False
+        for value in self._parser.connHeaders.getRawHeaders('connection', ()):
+            if 'close' in [token.strip().lower() for token in value.split(',')]:
+                return False
+        return True
 
 
     def _disconnectParser(self, reason):
@@ -570,7 +570,9 @@ def downloadPage(url, file, contextFactory=None, *args, **kwargs):
 from twisted.internet.protocol import ClientCreator
 from twisted.web.error import SchemeNotSupported
 from twisted.web._newclient import ResponseDone, Request, HTTP11ClientProtocol
-from twisted.web._newclient import Response
+from twisted.web._newclient import Response, RequestNotSent
+from twisted.web._newclient import RequestTransmissionFailed
+from twisted.web._newclient import ResponseNeverReceived
 
 try:
     from twisted.internet.ssl import ClientContextFactory
@@ -621,11 +623,209 @@ class _WebToNormalContextFactory(object):
 
 
 
+class _RetryingHTTP11ClientProtocol(object):
+    """
+    A wrapper around a cached L{HTTP11ClientProtocol} which retries a request
+    over a new connection if it fails because the cached connection turned
+    out to have been closed by the server.
+
+    @ivar _clientProtocol: The cached L{HTTP11ClientProtocol}.
+
+    @ivar _newConnection: A no-argument callable which returns a L{Deferred}
+        firing with a new connected L{HTTP11ClientProtocol}.
+    """
+    _idempotentMethods = set(['GET', 'HEAD', 'OPTIONS', 'TRACE', 'DELETE'])
+
+    def __init__(self, clientProtocol, newConnection):
+        self._clientProtocol = clientProtocol
+        self._newConnection = newConnection
+
+
+    def _shouldRetry(self, request, exception):
+        """
+        Determine whether a request which failed with C{exception} may be
+        issued again.  Only requests which can safely be repeated and have no
+        body to produce again are retried, and only if the failure suggests
+        the server closed the connection before seeing the request.
+        """
+        if request.method not in self._idempotentMethods:
+            return False
+        if request.bodyProducer is not None:
+            return False
+        return isinstance(exception, (
+                RequestNotSent, RequestTransmissionFailed,
+                ResponseNeverReceived))
+
+
+    def request(self, request):
+        """
+        Issue C{request} over the cached connection, and over a new connection
+        if that fails and L{_shouldRetry} allows it.
+
+        @see: L{HTTP11ClientProtocol.request}
+        """
+        d = self._clientProtocol.request(request)
+        def ebRequest(reason):
+            if not self._shouldRetry(request, reason.value):
+                return reason
+            d = self._newConnection()
+            d.addCallback(lambda connection: connection.request(request))
+            return d
+        d.addErrback(ebRequest)
+        return d
+
+
+
+class HTTPConnectionPool(object):
+    """
+    A pool of connections to HTTP servers which are kept open for reuse by
+    L{Agent} once the response to a request sent over them has been
+    received.
+
+    Connections are cached per I{(scheme, host, port)} key and handed out
+    most recently used first.  Connections which stay unused for
+    C{cachedConnectionTimeout} seconds are closed.
+
+    @ivar persistent: If C{False}, connections are not kept open and every
+        request is sent over a new connection.
+    @type persistent: C{bool}
+
+    @ivar maxPersistentPerHost: The maximum number of idle connections kept
+        open for each key.  When another connection for a key becomes idle,
+        its least recently used one is closed.
+    @type maxPersistentPerHost: C{int}
+
+    @ivar maxCachedConnections: The maximum number of idle connections kept
+        open for all keys together.  When another connection becomes idle,
+        the least recently used one is closed.
+    @type maxCachedConnections: C{int}
+
+    @ivar cachedConnectionTimeout: The number of seconds an idle connection
+        is kept open.
+    @type cachedConnectionTimeout: C{int} or C{float}
+
+    @ivar retryAutomatically: If C{True}, a request made over a cached
+        connection which fails because the server closed that connection is
+        issued again over a new connection, provided it has no body and its
+        method is idempotent.
+    @type retryAutomatically: C{bool}
+
+    @ivar _reactor: The L{IReactorTime} provider used to schedule the idle
+        timeouts.  A L{twisted.internet.task.CoarseClock} makes these cheaper
+        when many connections are cached.
+
+    @ivar _connections: A C{dict} mapping keys to C{list}s of idle
+        L{HTTP11ClientProtocol} instances, least recently used first.
+
+    @ivar _timeouts: A C{dict} mapping idle L{HTTP11ClientProtocol} instances
+        to the L{IDelayedCall} which will close them.
+
+    @since: 11.0
+    """
+    maxPersistentPerHost = 2
+    maxCachedConnections = 100
+    cachedConnectionTimeout = 240
+    retryAutomatically = True
+
+    def __init__(self, reactor, persistent=True):
+        self._reactor = reactor
+        self.persistent = persistent
+        self._connections = {}
+        self._timeouts = {}
+
+
+    def getConnection(self, key, connect):
+        """
+        Return a connection for C{key}, reusing an idle one if there is one.
+
+        @param key: A hashable identifying the server, such as a
+            C{(scheme, host, port)} tuple.
+
+        @param connect: A one-argument callable used to set up a new
+            connection if no idle one is available.  It is passed the callable
+            which the new L{HTTP11ClientProtocol} must call with itself when
+            it becomes idle, and returns a L{Deferred} which fires with it
+            once it is connected.
+
+        @return: A L{Deferred} which fires with an object with a C{request}
+            method like L{HTTP11ClientProtocol.request}.
+        """
+        connections = self._connections.get(key)
+        while connections:
+            connection = connections.pop()
+            self._timeouts.pop(connection).cancel()
+            if not connections:
+                del self._connections[key]
+            if connection._state == 'QUIESCENT':
+                if self.retryAutomatically:
+                    connection = _RetryingHTTP11ClientProtocol(
+                        connection, lambda: self._newConnection(key, connect))
+                return defer.succeed(connection)
+        return self._newConnection(key, connect)
+
+
+    def _newConnection(self, key, connect):
+        """
+        Set up a new connection for C{key} with C{connect}.
+        """
+        if self.persistent:
+            return connect(lambda connection: self._putConnection(
+                    key, connection))
+        return connect(lambda connection: connection.transport.loseConnection())
+
+
+    def _putConnection(self, key, connection):
+        """
+        Keep an idle connection open for later reuse, closing the least
+        recently used ones if this exceeds C{maxPersistentPerHost} or
+        C{maxCachedConnections}.
+        """
+        connections = self._connections.setdefault(key, [])
+        connections.append(connection)
+        self._timeouts[connection] = self._reactor.callLater(
+            self.cachedConnectionTimeout,
+            self._removeConnection, key, connection)
+        while len(connections) > self.maxPersistentPerHost:
+            self._removeConnection(key, connections[0])
+        while len(self._timeouts) > self.maxCachedConnections:
+            oldest = min(
+                self._timeouts, key=lambda c: self._timeouts[c].getTime())
+            for oldestKey, cached in self._connections.iteritems():
+                if oldest in cached:
+                    self._removeConnection(oldestKey, oldest)
+                    break
+
+
+    def _removeConnection(self, key, connection):
+        """
+        Stop caching an idle connection and close it.
+        """
+        connections = self._connections[key]
+        connections.remove(connection)
+        if not connections:
+            del self._connections[key]
+        call = self._timeouts.pop(connection)
+        if call.active():
+            call.cancel()
+        connection.transport.loseConnection()
+
+
+    def closeCachedConnections(self):
+        """
+        Close all idle connections.
+        """
+        for key, connections in self._connections.items():
+            for connection in connections[:]:
+                self._removeConnection(key, connection)
+
+
+
 class Agent(object):
     """
     L{Agent} is a very basic HTTP client.  It supports I{HTTP} and I{HTTPS}
-    scheme URIs (but performs no certificate checking by default).  It does not
-    support persistent connections.
+    scheme URIs (but performs no certificate checking by default).  It only
+    uses persistent connections if it is given a persistent
+    L{HTTPConnectionPool}.
 
     @ivar _reactor: The L{IReactorTCP} and L{IReactorSSL} implementation which
         will be used to set up connections over which to issue requests.
@@ -633,13 +833,19 @@ class Agent(object):
     @ivar _contextFactory: A web context factory which will be used to create
         SSL context objects for any SSL connections the agent needs to make.
 
+    @ivar _pool: The L{HTTPConnectionPool} connections are taken from.
+
     @since: 9.0
     """
     _protocol = HTTP11ClientProtocol
 
-    def __init__(self, reactor, contextFactory=WebClientContextFactory()):
+    def __init__(self, reactor, contextFactory=WebClientContextFactory(),
+                 pool=None):
         self._reactor = reactor
         self._contextFactory = contextFactory
+        if pool is None:
+            pool = HTTPConnectionPool(reactor, persistent=False)
+        self._pool = pool
 
 
     def _wrapContextFactory(self, host, port):
@@ -658,7 +864,7 @@ class Agent(object):
         return _WebToNormalContextFactory(self._contextFactory, host, port)
 
 
-    def _connect(self, scheme, host, port):
+    def _connect(self, scheme, host, port, quiescentCallback=lambda c: None):
         """
         Connect to the given host and port, using a transport selected based on
         scheme.
@@ -672,10 +878,13 @@ class Agent(object):
 
         @param port: An C{int} giving the port number the connection will be on.
 
+        @param quiescentCallback: The callable passed to C{self._protocol} to
+            be notified when the connection becomes idle.
+
         @return: A L{Deferred} which fires with a connected instance of
             C{self._protocol}.
         """
-        cc = ClientCreator(self._reactor, self._protocol)
+        cc = ClientCreator(self._reactor, self._protocol, quiescentCallback)
         if scheme == 'http':
             d = cc.connectTCP(host, port)
         elif scheme == 'https':
@@ -712,7 +921,10 @@ class Agent(object):
         @rtype: L{Deferred}
         """
         scheme, host, port, path = _parse(uri)
-        d = self._connect(scheme, host, port)
+        d = self._pool.getConnection(
+            (scheme, host, port),
+            lambda quiescentCallback: self._connect(
+                scheme, host, port, quiescentCallback))
         if headers is None:
             headers = Headers()
         if not headers.hasHeader('host'):
@@ -722,7 +934,9 @@ class Agent(object):
             headers.addRawHeader(
                 'host', self._computeHostValue(scheme, host, port))
         def cbConnected(proto):
-            return proto.request(Request(method, path, headers, bodyProducer))
+            return proto.request(Request(
+                    method, path, headers, bodyProducer,
+                    persistent=self._pool.persistent))
         d.addCallback(cbConnected)
         return d
 
@@ -743,4 +957,4 @@ __all__ = [
     'HTTPPageGetter', 'HTTPPageDownloader', 'HTTPClientFactory', 'HTTPDownloader',
     'getPage', 'downloadPage',
 
-    'ResponseDone', 'Response', 'Agent']
+    'ResponseDone', 'Response', 'HTTPConnectionPool', 'Agent']
@@ -1484,12 +1484,28 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
     """
     A receiver for HTTP requests.
 
+    Requests pipelined by the client are processed as soon as each has been
+    received, so several of them may be producing their responses at once.
+    Responses are still sent in the order the requests arrived: a request
+    which is not first in C{requests} is queued and buffers its response
+    until those before it have finished.
+
+    @ivar maxPipelineDepth: If not C{None}, the maximum number of requests
+        which may be outstanding on this channel.  Once that many have been
+        received and have not yet finished, no more data is read from the
+        transport until one of them finishes.
+    @type maxPipelineDepth: C{int} or C{NoneType}
+
     @ivar _transferDecoder: C{None} or an instance of
         L{_ChunkedTransferDecoder} if the request body uses the I{chunked}
         Transfer-Encoding.
+
+    @ivar _pipelinePaused: C{True} while reading is paused because
+        C{maxPipelineDepth} requests are outstanding.
     """
 
     maxHeaders = 500 # max number of headers allowed per request
+    maxPipelineDepth = None
 
     length = 0
     persistent = 1
@@ -1502,6 +1518,7 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
 
     _savedTimeOut = None
     _receivedHeaderCount = 0
+    _pipelinePaused = False
 
     def __init__(self):
         # the request queue
@@ -1618,6 +1635,13 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
         req = self.requests[-1]
         req.requestReceived(command, path, version)
 
+        if (self.maxPipelineDepth is not None and not self._pipelinePaused
+            and len(self.requests) >= self.maxPipelineDepth):
+            # Leave any further pipelined requests unread, in the transport
+            # or in the line buffer, until an outstanding request finishes.
+            self._pipelinePaused = True
+            self.pauseProducing()
+
     def rawDataReceived(self, data):
         self.resetTimeout()
         self._transferDecoder.dataReceived(data)
@@ -1690,6 +1714,10 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
             else:
                 if self._savedTimeOut:
                     self.setTimeout(self._savedTimeOut)
+            if (self._pipelinePaused
+                and len(self.requests) < self.maxPipelineDepth):
+                self._pipelinePaused = False
+                self.resumeProducing()
         else:
             self.transport.loseConnection()
 
@@ -1703,6 +1731,216 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
             request.connectionLost(reason)
 
 
+
+class SinglePassHTTPChannel(HTTPChannel):
+    """
+    An L{HTTPChannel} which parses each request in a single pass instead of
+    line by line.
+
+    Received bytes are kept until the empty line ending the request headers
+    has arrived.  The request line and all of the headers are then parsed at
+    once.  A request body with a I{Content-Length} is passed to
+    L{Request.handleContentChunk} as it arrives, without copying it unless
+    the same segment also holds the start of the next request.
+
+    To use it, set the C{protocol} attribute of an L{HTTPFactory} (or of a
+    L{twisted.web.server.Site}) to this class.
+
+    @ivar maxHeaderBlockLength: The maximum number of bytes accepted for the
+        request line and headers of a request.
+    @type maxHeaderBlockLength: C{int}
+
+    @ivar _buffer: Received bytes which have not been parsed yet.
+    @type _buffer: C{str}
+
+    @ivar _bodyRemaining: C{None}, or the number of bytes of a request body
+        with a I{Content-Length} which have not been received yet.
+
+    @ivar _requestRest: While a chunked request body is being decoded, any
+        bytes received after the end of it.
+
+    @ivar _skippedEmptyLine: C{True} if an empty line preceding the current
+        request has already been ignored.
+
+    @ivar _scanned: The number of bytes at the start of C{_buffer} which are
+        known not to begin the empty line ending the request headers, so the
+        search for it can resume after them.
+
+    @ivar _requestLineChecked: C{True} if the request line of the current
+        request has been received in full and found well-formed.
+    """
+
+    maxHeaderBlockLength = 65536
+
+    _buffer = ''
+    _scanned = 0
+    _requestLineChecked = False
+    _bodyRemaining = None
+    _requestRest = None
+    _skippedEmptyLine = False
+
+    def dataReceived(self, data):
+        """
+        Parse as many requests or parts of requests as C{data} and the
+        previously buffered bytes hold.
+        """
+        self.resetTimeout()
+        if self._buffer:
+            data = self._buffer + data
+            self._buffer = ''
+        while data and not self.transport.disconnecting:
+            if self.paused:
+                self._buffer = data
+                return
+            if self._bodyRemaining is not None:
+                data = self._bodyDataReceived(data)
+            elif self._transferDecoder is not None:
+                self._requestRest = ''
+                self._transferDecoder.dataReceived(data)
+                data, self._requestRest = self._requestRest, None
+            else:
+                data = self._headerDataReceived(data)
+
+
+    def _badRequest(self):
+        """
+        Reject a malformed request and close the connection.
+        """
+        self.transport.write("HTTP/1.1 400 Bad Request\r\n\r\n")
+        self.transport.loseConnection()
+
+
+    def _headerDataReceived(self, data):
+        """
+        Parse the request line and headers of a request if C{data} holds all
+        of them, or keep C{data} until more arrives.
+
+        @return: The bytes following the headers.
+        """
+        if not self.persistent:
+            # The client (illegally) sent data after the last request.
+            return ''
+
+        # IE sends an extraneous empty line (\r\n) after a POST request; eat
+        # up such a line, but only ONCE.
+        if not self._skippedEmptyLine and data[:2] == '\r\n':
+            self._skippedEmptyLine = True
+            data = data[2:]
+
+        # Only look at bytes not searched already, so a header block arriving
+        # in many segments is not searched over and over again.
+        scanned = self._scanned
+        end = data.find('\r\n\r\n', scanned)
+        if end == -1:
+            if not self._requestLineChecked:
+                lineEnd = data.find('\r\n', scanned)
+                if lineEnd != -1:
+                    if len(data[:lineEnd].split()) != 3:
+                        self._badRequest()
+                        return ''
+                    self._requestLineChecked = True
+            if len(data) > self.maxHeaderBlockLength:
+                self._badRequest()
+            else:
+                self._buffer = data
+                self._scanned = max(len(data) - 3, 0)
+            return ''
+        self._scanned = 0
+        self._requestLineChecked = False
+        if end > self.maxHeaderBlockLength:
+            self._badRequest()
+            return ''
+
+        lines = data[:end].split('\r\n')
+        rest = data[end + 4:]
+        parts = lines[0].split()
+        if len(parts) != 3:
+            self._badRequest()
+            return ''
+
+        fields = []
+        for line in lines[1:]:
+            if line[:1] in (' ', '\t') and fields:
+                fields[-1] += '\n' + line
+            else:
+                fields.append(line)
+        if len(fields) > self.maxHeaders:
+            self._badRequest()
+            return ''
+
+        length = 0
+        headers = {}
+        try:
+            for field in fields:
+                name, value = field.split(':', 1)
+                name = name.lower()
+                value = value.strip()
+                if name == 'content-length':
+                    length = int(value)
+                    if length < 0:
+                        raise ValueError(value)
+                elif name == 'transfer-encoding' and value.lower() == 'chunked':
+                    length = None
+                if name in headers:
+                    headers[name].append(value)
+                else:
+                    headers[name] = [value]
+        except ValueError:
+            self._badRequest()
+            return ''
+
+        request = self.requestFactory(self, len(self.requests))
+        self.requests.append(request)
+        requestHeaders = request.requestHeaders
+        for name, values in headers.iteritems():
+            requestHeaders.setRawHeaders(name, values)
+
+        self._command, self._path, self._version = parts
+        self._skippedEmptyLine = False
+        self.length = length
+        self.allHeadersReceived()
+        if length is None:
+            self._transferDecoder = _ChunkedTransferDecoder(
+                request.handleContentChunk, self._finishRequestBody)
+        elif length:
+            self._bodyRemaining = length
+        else:
+            self.allContentReceived()
+        return rest
+
+
+    def _bodyDataReceived(self, data):
+        """
+        Deliver bytes of a request body with a I{Content-Length} to the
+        request.
+
+        @return: The bytes following the body.
+        """
+        remaining = self._bodyRemaining
+        request = self.requests[-1]
+        if len(data) < remaining:
+            self._bodyRemaining = remaining - len(data)
+            request.handleContentChunk(data)
+            return ''
+        rest = ''
+        if len(data) > remaining:
+            data, rest = data[:remaining], data[remaining:]
+        self._bodyRemaining = None
+        request.handleContentChunk(data)
+        self.allContentReceived()
+        return rest
+
+
+    def _finishRequestBody(self, data):
+        """
+        Called by the chunked transfer decoder at the end of a request body
+        with any bytes which followed it.
+        """
+        self.allContentReceived()
+        self._requestRest = data
+
+
+
 class HTTPFactory(protocol.ServerFactory):
     """
     Factory for HTTP server.
@@ -1714,6 +1952,15 @@ class HTTPFactory(protocol.ServerFactory):
     @ivar _logDateTimeCall: A delayed call for the next update to the cached log
         datetime string.
     @type _logDateTimeCall: L{IDelayedCall} provided
+
+    @ivar timeoutClock: If not C{None}, an L{IReactorTime} provider, such as
+        a L{twisted.internet.task.CoarseClock}, which channels built by this
+        factory will use to schedule their idle timeouts.  See
+        L{policies.TimeoutMixin.timeoutClock}.
+
+    @ivar maxPipelineDepth: If not C{None}, the maximum number of pipelined
+        requests outstanding on each channel built by this factory.  See
+        L{HTTPChannel.maxPipelineDepth}.
     """
 
     protocol = HTTPChannel
@@ -1722,11 +1969,17 @@ class HTTPFactory(protocol.ServerFactory):
 
     timeOut = 60 * 60 * 12
 
-    def __init__(self, logPath=None, timeout=60*60*12):
+    timeoutClock = None
+
+    maxPipelineDepth = None
+
+    def __init__(self, logPath=None, timeout=60*60*12, timeoutClock=None):
         if logPath is not None:
             logPath = os.path.abspath(logPath)
         self.logPath = logPath
         self.timeOut = timeout
+        if timeoutClock is not None:
+            self.timeoutClock = timeoutClock
 
         # For storing the cached log datetime and the callback to update it
         self._logDateTime = None
@@ -1746,6 +1999,10 @@ class HTTPFactory(protocol.ServerFactory):
         # timeOut needs to be on the Protocol instance cause
         # TimeoutMixin expects it there
         p.timeOut = self.timeOut
+        if self.timeoutClock is not None:
+            p.timeoutClock = self.timeoutClock
+        if self.maxPipelineDepth is not None:
+            p.maxPipelineDepth = self.maxPipelineDepth
         return p
 
 
@@ -21,7 +21,7 @@ from twisted.web import http
 from twisted.web.util import redirectTo
 
 from twisted.python import components, filepath, log
-from twisted.internet import abstract, interfaces
+from twisted.internet import abstract, interfaces, error
 from twisted.spread import pb
 from twisted.persisted import styles
 from twisted.python.util import InsensitiveDict
@@ -554,6 +554,23 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
             request.setHeader('content-encoding', self.encoding)
 
 
+    def _canSendFile(self, request, fileForReading):
+        """
+        Determine whether the response to C{request} can be sent from
+        C{fileForReading} by the transport directly, with a
+        L{SendFileStaticProducer}.
+
+        This is only possible if the request is not queued behind another
+        request on the same connection (in which case its response is
+        buffered) and its transport provides
+        L{interfaces.ISendFileTransport}.
+        """
+        return (not getattr(request, 'queued', True) and
+                interfaces.ISendFileTransport.providedBy(
+                    getattr(request, 'transport', None)) and
+                hasattr(fileForReading, 'fileno'))
+
+
     def makeProducer(self, request, fileForReading):
         """
         Make a L{StaticProducer} that will produce the body of this response.
@@ -569,6 +586,9 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
         if byteRange is None:
             self._setContentHeaders(request)
             request.setResponseCode(http.OK)
+            if self._canSendFile(request, fileForReading):
+                return SendFileStaticProducer(
+                    request, fileForReading, 0, self.getFileSize())
             return NoRangeStaticProducer(request, fileForReading)
         try:
             parsedRanges = self._parseRangeHeader(byteRange)
@@ -576,12 +596,18 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
             log.msg("Ignoring malformed Range header %r" % (byteRange,))
             self._setContentHeaders(request)
             request.setResponseCode(http.OK)
+            if self._canSendFile(request, fileForReading):
+                return SendFileStaticProducer(
+                    request, fileForReading, 0, self.getFileSize())
             return NoRangeStaticProducer(request, fileForReading)
 
         if len(parsedRanges) == 1:
             offset, size = self._doSingleRangeRequest(
                 request, parsedRanges[0])
             self._setContentHeaders(request, size)
+            if self._canSendFile(request, fileForReading):
+                return SendFileStaticProducer(
+                    request, fileForReading, offset, size)
             return SingleRangeStaticProducer(
                 request, fileForReading, offset, size)
         else:
@@ -768,6 +794,56 @@ class SingleRangeStaticProducer(StaticProducer):
 
 
 
+class SendFileStaticProducer(StaticProducer):
+    """
+    A L{StaticProducer} that has the request's transport send a single chunk
+    of a file itself, using L{interfaces.ISendFileTransport}, so that the
+    contents of the file are never read into memory.
+    """
+
+    def __init__(self, request, fileObject, offset, size):
+        """
+        Initialize the instance.
+
+        @param request: See L{StaticProducer}.
+        @param fileObject: See L{StaticProducer}.
+        @param offset: The offset into the file of the chunk to be written.
+        @param size: The size of the chunk to write.
+        """
+        StaticProducer.__init__(self, request, fileObject)
+        self.offset = offset
+        self.size = size
+
+
+    def start(self):
+        # Write the response headers.
+        self.request.write('')
+        d = self.request.transport.sendFile(
+            self.fileObject, self.offset, self.size)
+        d.addCallbacks(self._sent, self._failed)
+
+
+    def _sent(self, ignored):
+        """
+        The whole chunk has been sent, so finish the request.
+        """
+        if self.request:
+            self.request.sentLength += self.size
+            self.request.finish()
+            self.stopProducing()
+
+
+    def _failed(self, reason):
+        """
+        The connection was lost before the chunk could be sent.
+        """
+        if not reason.check(error.ConnectionLost):
+            log.err(reason, "Error sending %r" % (self.fileObject,))
+        if self.request:
+            self.stopProducing()
+
+
+
 class MultipleRangeStaticProducer(StaticProducer):
     """
     A L{StaticProducer} that writes several chunks of a file to the request.
@@ -16,7 +16,7 @@ from twisted.web import http, http_headers
 from twisted.web.http import PotentialDataLoss, _DataLoss
 from twisted.web.http import _IdentityTransferDecoder
 from twisted.protocols import loopback
-from twisted.internet.task import Clock
+from twisted.internet.task import Clock, CoarseClock
 from twisted.internet.error import ConnectionLost
 from twisted.test.proto_helpers import StringTransport
 from twisted.test.test_internet import DummyProducer
@@ -90,6 +90,8 @@ class ResponseTestMixin(object):
 
 
 class HTTP1_0TestCase(unittest.TestCase, ResponseTestMixin):
+    channelFactory = http.HTTPChannel
+
     requests = (
         "GET / HTTP/1.0\r\n"
         "\r\n"
@@ -110,7 +112,7 @@ class HTTP1_0TestCase(unittest.TestCase, ResponseTestMixin):
         Send requests over a channel and check responses match what is expected.
         """
         b = StringTransport()
-        a = http.HTTPChannel()
+        a = self.channelFactory()
         a.requestFactory = DummyHTTPHandler
         a.makeConnection(b)
         # one byte at a time, to stress it.
@@ -121,6 +123,20 @@ class HTTP1_0TestCase(unittest.TestCase, ResponseTestMixin):
         self.assertResponseEquals(value, self.expected_response)
 
 
+    def test_bufferSingleSegment(self):
+        """
+        Requests received in a single segment get the same responses as
+        requests received one byte at a time.
+        """
+        b = StringTransport()
+        a = self.channelFactory()
+        a.requestFactory = DummyHTTPHandler
+        a.makeConnection(b)
+        a.dataReceived(self.requests)
+        a.connectionLost(IOError("all one"))
+        self.assertResponseEquals(b.value(), self.expected_response)
+
+
     def test_requestBodyTimeout(self):
         """
         L{HTTPChannel} resets its timeout whenever data from a request body is
@@ -128,7 +144,7 @@ class HTTP1_0TestCase(unittest.TestCase, ResponseTestMixin):
         """
         clock = Clock()
         transport = StringTransport()
-        protocol = http.HTTPChannel()
+        protocol = self.channelFactory()
         protocol.timeOut = 100
         protocol.callLater = clock.callLater
         protocol.makeConnection(transport)
@@ -219,6 +235,171 @@ class HTTP0_9TestCase(HTTP1_0TestCase):
         self.assertEquals(response, expectedResponse)
 
 
+
+class SinglePassHTTP1_0TestCase(HTTP1_0TestCase):
+    channelFactory = http.SinglePassHTTPChannel
+
+
+
+class SinglePassHTTP1_1TestCase(HTTP1_1TestCase):
+    channelFactory = http.SinglePassHTTPChannel
+
+
+
+class SinglePassHTTP1_1_close_TestCase(HTTP1_1_close_TestCase):
+    channelFactory = http.SinglePassHTTPChannel
+
+
+
+class SinglePassHTTP0_9TestCase(HTTP0_9TestCase):
+    channelFactory = http.SinglePassHTTPChannel
+
+
+
+class HTTPFactoryTests(unittest.TestCase):
+    """
+    Tests for L{http.HTTPFactory}.
+    """
+    def test_factoryTimeoutClock(self):
+        """
+        L{HTTPChannel}s built by an L{http.HTTPFactory} with a
+        C{timeoutClock} schedule their idle timeout with that clock.
+        """
+        clock = CoarseClock(Clock())
+        factory = http.HTTPFactory(timeout=100, timeoutClock=clock)
+        protocol = factory.buildProtocol(None)
+        protocol.makeConnection(StringTransport())
+        self.assertEqual(len(clock.getDelayedCalls()), 1)
+        protocol.connectionLost(None)
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+
+class DelayedHTTPHandler(http.Request):
+    """
+    A request which records itself in the C{processed} list of its channel
+    and leaves writing the response to the test.
+    """
+    def process(self):
+        self.channel.processed.append(self)
+
+
+    def respond(self):
+        """
+        Write a response naming the requested URI and finish it.
+        """
+        self.setHeader("Content-Length", len(self.uri))
+        self.write(self.uri)
+        self.finish()
+
+
+
+class PipeliningTests(unittest.TestCase, ResponseTestMixin):
+    """
+    Tests for the handling of pipelined requests by L{http.HTTPChannel}.
+    """
+    channelFactory = http.HTTPChannel
+
+    requests = (
+        "GET /a HTTP/1.1\r\n"
+        "\r\n"
+        "GET /b HTTP/1.1\r\n"
+        "\r\n"
+        "GET /c HTTP/1.1\r\n"
+        "\r\n")
+
+    def setUp(self):
+        self.transport = StringTransport()
+        self.channel = self.channelFactory()
+        self.channel.requestFactory = DelayedHTTPHandler
+        self.channel.processed = []
+
+
+    def response(self, uri):
+        return ("HTTP/1.1 200 OK", "Content-Length: %d" % (len(uri),), uri)
+
+
+    def test_concurrentProcessing(self):
+        """
+        Requests pipelined in a single segment are all processed at once, and
+        their responses are sent in the order the requests were received
+        whatever order they finish in.
+        """
+        self.channel.makeConnection(self.transport)
+        self.channel.dataReceived(self.requests)
+        a, b, c = self.channel.processed
+        c.respond()
+        b.respond()
+        self.assertEqual(self.transport.value(), "")
+        a.respond()
+        self.assertResponseEquals(
+            self.transport.value(),
+            [self.response("/a"), self.response("/b"), self.response("/c")])
+        self.assertEqual(self.channel.requests, [])
+
+
+    def test_maxPipelineDepth(self):
+        """
+        Once C{maxPipelineDepth} requests are outstanding, L{http.HTTPChannel}
+        stops reading from its transport and leaves further requests
+        unprocessed until one of them finishes.
+        """
+        self.channel.maxPipelineDepth = 2
+        self.channel.makeConnection(self.transport)
+        self.channel.dataReceived(self.requests)
+        self.assertEqual(len(self.channel.processed), 2)
+        self.assertEqual(self.transport.producerState, 'paused')
+
+        self.channel.processed[0].respond()
+        self.assertEqual(len(self.channel.processed), 3)
+        self.assertEqual(self.transport.producerState, 'paused')
+
+        self.channel.processed[1].respond()
+        self.assertEqual(self.transport.producerState, 'producing')
+        self.channel.processed[2].respond()
+        self.assertResponseEquals(
+            self.transport.value(),
+            [self.response("/a"), self.response("/b"), self.response("/c")])
+
+
+    def test_maxPipelineDepthSynchronous(self):
+        """
+        Requests which finish while being received do not count towards
+        C{maxPipelineDepth}.
+        """
+        class ImmediateHTTPHandler(DelayedHTTPHandler):
+            def process(self):
+                DelayedHTTPHandler.process(self)
+                self.respond()
+
+        self.channel.requestFactory = ImmediateHTTPHandler
+        self.channel.maxPipelineDepth = 1
+        self.channel.makeConnection(self.transport)
+        self.channel.dataReceived(self.requests)
+        self.assertEqual(len(self.channel.processed), 3)
+        self.assertEqual(self.transport.producerState, 'producing')
+
+
+    def test_factoryMaxPipelineDepth(self):
+        """
+        L{http.HTTPChannel}s built by an L{http.HTTPFactory} with a
+        C{maxPipelineDepth} use it.
+        """
+        factory = http.HTTPFactory()
+        factory.maxPipelineDepth = 4
+        self.assertEqual(factory.buildProtocol(None).maxPipelineDepth, 4)
+
+
+
+class SinglePassPipeliningTests(PipeliningTests):
+    """
+    Tests for the handling of pipelined requests by
+    L{http.SinglePassHTTPChannel}.
+    """
+    channelFactory = http.SinglePassHTTPChannel
+
+
+
 class HTTPLoopbackTestCase(unittest.TestCase):
 
     expectedHeaders = {'request' : '/foo/bar',
@@ -605,10 +786,12 @@ class ParsingTestCase(unittest.TestCase):
     """
     Tests for protocol parsing in L{HTTPChannel}.
     """
+    channelFactory = http.HTTPChannel
+
     def runRequest(self, httpRequest, requestClass, success=1):
         httpRequest = httpRequest.replace("\n", "\r\n")
         b = StringTransport()
-        a = http.HTTPChannel()
+        a = self.channelFactory()
         a.requestFactory = requestClass
         a.makeConnection(b)
         # one byte at a time, to stress it.
@@ -880,6 +1063,134 @@ Hello,
 
 
 
+class SinglePassParsingTestCase(ParsingTestCase):
+    """
+    Tests for protocol parsing in L{http.SinglePassHTTPChannel}.
+    """
+    channelFactory = http.SinglePassHTTPChannel
+
+    def test_headerBlockTooLong(self):
+        """
+        L{http.SinglePassHTTPChannel} rejects a request whose request line
+        and headers are longer than C{maxHeaderBlockLength}.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(self)
+
+        self.patch(http.SinglePassHTTPChannel, 'maxHeaderBlockLength', 64)
+        requestLines = ["GET / HTTP/1.0", "Foo: " + "x" * 64, "", ""]
+        channel = self.runRequest("\n".join(requestLines), MyRequest, 0)
+        self.assertEqual(processed, [])
+        self.assertEqual(
+            channel.transport.value(),
+            "HTTP/1.1 400 Bad Request\r\n\r\n")
+
+
+    def test_malformedHeader(self):
+        """
+        L{http.SinglePassHTTPChannel} rejects a request with a header line
+        which has no colon.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(self)
+
+        requestLines = ["GET / HTTP/1.0", "Foo", "", ""]
+        channel = self.runRequest("\n".join(requestLines), MyRequest, 0)
+        self.assertEqual(processed, [])
+        self.assertEqual(
+            channel.transport.value(),
+            "HTTP/1.1 400 Bad Request\r\n\r\n")
+
+
+    def test_negativeContentLength(self):
+        """
+        L{http.SinglePassHTTPChannel} rejects a request with a negative
+        I{Content-Length}.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(self)
+
+        requestLines = ["POST / HTTP/1.0", "Content-Length: -5", "", "xyz"]
+        channel = self.runRequest("\n".join(requestLines), MyRequest, 0)
+        self.assertEqual(processed, [])
+        self.assertEqual(
+            channel.transport.value(),
+            "HTTP/1.1 400 Bad Request\r\n\r\n")
+
+
+    def test_headerEndSplit(self):
+        """
+        The empty line ending the request headers is found however it is
+        split across segments, and the search for it does not go back over
+        bytes already searched.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(self)
+                self.finish()
+
+        channel = self.channelFactory()
+        channel.requestFactory = MyRequest
+        channel.makeConnection(StringTransport())
+        for data in ["GET / HTTP/1.0\r\nFoo: bar", "\r", "\n", "\r"]:
+            channel.dataReceived(data)
+        self.assertEqual(processed, [])
+        self.assertEqual(channel._scanned, len(channel._buffer) - 3)
+        channel.dataReceived("\n")
+        [request] = processed
+        self.assertEqual(request.getHeader('foo'), 'bar')
+        self.assertEqual(channel._scanned, 0)
+
+
+    def test_continuedHeader(self):
+        """
+        A header line beginning with whitespace continues the previous
+        header.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(self)
+                self.finish()
+
+        requestLines = ["GET / HTTP/1.0", "Foo: bar", " baz", "", ""]
+        self.runRequest("\n".join(requestLines), MyRequest, 0)
+        [request] = processed
+        self.assertEqual(request.getHeader('foo'), 'bar\n baz')
+
+
+    def test_bodyNotCopied(self):
+        """
+        A request body with a I{Content-Length} which arrives in a segment of
+        its own is passed to L{Request.handleContentChunk} unchanged.
+        """
+        chunks = []
+        class MyRequest(http.Request):
+            def handleContentChunk(self, data):
+                chunks.append(data)
+                http.Request.handleContentChunk(self, data)
+
+        channel = self.channelFactory()
+        channel.requestFactory = MyRequest
+        channel.makeConnection(StringTransport())
+        channel.dataReceived(
+            "POST / HTTP/1.1\r\nContent-Length: 20\r\n\r\n")
+        body = "x" * 10
+        channel.dataReceived(body)
+        self.assertIdentical(chunks[0], body)
+        channel.dataReceived(body + "GET / HTTP/1.1\r\n")
+        self.assertEqual(chunks, [body, body])
+        channel.connectionLost(IOError("all done"))
+
+
+
 class QueryArgumentsTestCase(unittest.TestCase):
     def testParseqs(self):
         self.failUnlessEqual(cgi.parse_qs("a=b&d=c;+=f"),
@@ -24,7 +24,7 @@ from twisted.web._newclient import BadResponseVersion, ParseError, HTTP11ClientP
 from twisted.web._newclient import ChunkedEncoder, RequestGenerationFailed
 from twisted.web._newclient import RequestTransmissionFailed, ResponseFailed
 from twisted.web._newclient import WrongBodyLength, RequestNotSent
-from twisted.web._newclient import ConnectionAborted
+from twisted.web._newclient import ConnectionAborted, ResponseNeverReceived
 from twisted.web._newclient import BadHeaders, ResponseDone, PotentialDataLoss, ExcessWrite
 from twisted.web._newclient import TransportProxyProducer, LengthEnforcingConsumer, makeStatefulDispatcher
 from twisted.web.http_headers import Headers
@@ -750,6 +750,41 @@ class HTTPClientParserTests(TestCase):
             self, responseDeferred, [ArbitraryException])
 
 
+    def test_connectionLostBeforeAnyData(self):
+        """
+        If L{HTTPClientParser.connectionLost} is called before any bytes of
+        the response have been received, the C{_responseDeferred} is fired
+        with a L{Failure} of L{ResponseNeverReceived}.
+        """
+        transport = StringTransport()
+        protocol = HTTPClientParser(Request('GET', '/', _boringHeaders, None), None)
+        protocol.makeConnection(transport)
+        responseDeferred = protocol._responseDeferred
+        protocol.connectionLost(Failure(ArbitraryException()))
+
+        return self.assertFailure(responseDeferred, ResponseNeverReceived)
+
+
+    def test_connectionLostAfterSomeData(self):
+        """
+        If L{HTTPClientParser.connectionLost} is called after part of the
+        status line has been received, the C{_responseDeferred} is not fired
+        with L{ResponseNeverReceived}.
+        """
+        transport = StringTransport()
+        protocol = HTTPClientParser(Request('GET', '/', _boringHeaders, None), None)
+        protocol.makeConnection(transport)
+        responseDeferred = protocol._responseDeferred
+        protocol.dataReceived('HTTP/1.1 2')
+        protocol.connectionLost(Failure(ArbitraryException()))
+
+        def cbFailed(err):
+            self.assertNotIsInstance(err, ResponseNeverReceived)
+        responseDeferred = assertResponseFailed(
+            self, responseDeferred, [ArbitraryException])
+        return responseDeferred.addCallback(cbFailed)
+
+
     def test_connectionLostWithError(self):
         """
         If one of the L{Response} methods called by
@@ -999,6 +1034,150 @@ class HTTP11ClientProtocolTests(TestCase):
         return d
 
 
+    def _persistentResponse(self, response, quiescent=None):
+        """
+        Issue a persistent request with an L{HTTP11ClientProtocol} which
+        appends itself to C{quiescent} when it becomes idle, deliver
+        C{response} to it and return the L{Response} received.
+        """
+        if quiescent is None:
+            quiescent = []
+        self.protocol = HTTP11ClientProtocol(quiescent.append)
+        self.protocol.makeConnection(self.transport)
+        responses = []
+        self.protocol.request(
+            Request('GET', '/', _boringHeaders, None, persistent=True)
+            ).addCallback(responses.append)
+        self.protocol.dataReceived(response)
+        return responses[0]
+
+
+    def test_persistentResponse(self):
+        """
+        When the response to a persistent request has been received in full,
+        L{HTTP11ClientProtocol} leaves the connection open, moves back to the
+        C{'QUIESCENT'} state and calls its quiescent callback with itself.
+        The response body is still delivered.
+        """
+        quiescent = []
+        response = self._persistentResponse(
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Length: 3\r\n"
+            "\r\n"
+            "foo", quiescent)
+        self.assertFalse(self.transport.disconnecting)
+        self.assertEqual(self.protocol._state, 'QUIESCENT')
+        self.assertEqual(quiescent, [self.protocol])
+
+        p = AccumulatingProtocol()
+        response.deliverBody(p)
+        self.assertEqual(p.data, 'foo')
+        p.closedReason.trap(ResponseDone)
+
+
+    def test_persistentTransportResumed(self):
+        """
+        If the parser paused the transport to wait for the application to
+        accept the response body, L{HTTP11ClientProtocol} resumes it before
+        becoming idle.
+        """
+        self._persistentResponse(
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Length: 3\r\n"
+            "\r\n"
+            "foo")
+        self.assertEqual(self.transport.producerState, 'producing')
+
+
+    def test_secondPersistentRequest(self):
+        """
+        Once idle after a persistent request, L{HTTP11ClientProtocol} can be
+        used to issue another request.
+        """
+        self._persistentResponse(
+            "HTTP/1.1 204 No Content\r\n"
+            "\r\n")
+        self.transport.clear()
+        d = self.protocol.request(
+            Request('GET', '/', _boringHeaders, None, persistent=True))
+        self.assertEqual(
+            self.transport.value(),
+            "GET / HTTP/1.1\r\n"
+            "Host: example.com\r\n"
+            "\r\n")
+        self.protocol.dataReceived(
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Length: 0\r\n"
+            "\r\n")
+        d.addCallback(lambda response: self.assertEqual(response.code, 200))
+        return d
+
+
+    def test_persistentConnectionClose(self):
+        """
+        If the server responds to a persistent request with
+        I{Connection: close}, L{HTTP11ClientProtocol} closes the connection
+        and does not call its quiescent callback.
+        """
+        quiescent = []
+        self._persistentResponse(
+            "HTTP/1.1 200 OK\r\n"
+            "Connection: Keep-Alive, Close\r\n"
+            "Content-Length: 0\r\n"
+            "\r\n", quiescent)
+        self.assertTrue(self.transport.disconnecting)
+        self.assertEqual(quiescent, [])
+
+
+    def test_persistentHTTP10Response(self):
+        """
+        If the server responds to a persistent request with an I{HTTP/1.0}
+        response, L{HTTP11ClientProtocol} closes the connection.
+        """
+        quiescent = []
+        self._persistentResponse(
+            "HTTP/1.0 200 OK\r\n"
+            "Content-Length: 0\r\n"
+            "\r\n", quiescent)
+        self.assertTrue(self.transport.disconnecting)
+        self.assertEqual(quiescent, [])
+
+
+    def test_persistentExtraBytes(self):
+        """
+        If the server sends more bytes than the response to a persistent
+        request, L{HTTP11ClientProtocol} closes the connection.
+        """
+        quiescent = []
+        self._persistentResponse(
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Length: 0\r\n"
+            "\r\n"
+            "HTTP/1.1 200 OK\r\n", quiescent)
+        self.assertTrue(self.transport.disconnecting)
+        self.assertEqual(quiescent, [])
+
+
+    def test_brokenQuiescentCallback(self):
+        """
+        If the quiescent callback raises an exception, it is logged and the
+        connection is closed.
+        """
+        def broken(protocol):
+            raise ArbitraryException()
+        self.protocol = HTTP11ClientProtocol(broken)
+        self.protocol.makeConnection(self.transport)
+        d = self.protocol.request(
+            Request('GET', '/', _boringHeaders, None, persistent=True))
+        self.protocol.dataReceived(
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Length: 0\r\n"
+            "\r\n")
+        self.assertTrue(self.transport.disconnecting)
+        self.assertEqual(len(self.flushLoggedErrors(ArbitraryException)), 1)
+        return d
+
+
     def test_receiveResponseHeaders(self):
         """
         The headers included in a response delivered to L{HTTP11ClientProtocol}
@@ -1332,6 +1511,20 @@ class RequestTests(TestCase):
             "\r\n")
 
 
+    def test_sendPersistentRequest(self):
+        """
+        L{Request.writeTo} omits the I{Connection: close} header for a
+        persistent request.
+        """
+        Request('GET', '/', _boringHeaders, None, persistent=True).writeTo(
+            self.transport)
+        self.assertEqual(
+            self.transport.value(),
+            "GET / HTTP/1.1\r\n"
+            "Host: example.com\r\n"
+            "\r\n")
+
+
     def test_sendRequestHeaders(self):
         """
         L{Request.writeTo} formats header data and writes it to the given
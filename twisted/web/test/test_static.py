@@ -7,13 +7,17 @@ Tests for L{twisted.web.static}.
 
 import os, re, StringIO
 
+from zope.interface import implements
 from zope.interface.verify import verifyObject
 
-from twisted.internet import abstract, interfaces
+from twisted.internet import abstract, interfaces, protocol
+from twisted.internet.defer import Deferred
+from twisted.internet.error import ConnectionLost
 from twisted.python.compat import set
 from twisted.python.runtime import platform
 from twisted.python.filepath import FilePath
 from twisted.python import log
+from twisted.protocols import policies
 from twisted.trial.unittest import TestCase
 from twisted.web import static, http, script, resource
 from twisted.web.server import UnsupportedMethod
@@ -603,6 +607,174 @@ class StaticMakeProducerTests(TestCase):
 
 
 
+class FakeSendFileTransport(object):
+    """
+    A transport which provides L{interfaces.ISendFileTransport} by recording
+    what it is asked to send.
+
+    @ivar sent: A C{list} of C{(fileObject, offset, count, deferred)} tuples,
+        one for each call to C{sendFile}.
+    """
+    implements(interfaces.ISendFileTransport)
+
+    def __init__(self):
+        self.sent = []
+
+
+    def sendFile(self, fileObject, offset, count):
+        d = Deferred()
+        self.sent.append((fileObject, offset, count, d))
+        return d
+
+
+
+class StaticMakeProducerSendFileTests(TestCase):
+    """
+    Tests for L{File.makeProducer} when the request's transport provides
+    L{interfaces.ISendFileTransport}.
+    """
+    def makeResourceWithContent(self, content):
+        """
+        Make a L{static.File} resource that has C{content} for its content.
+        """
+        fileName = self.mktemp()
+        FilePath(fileName).setContent(content)
+        resource = static.File(fileName)
+        resource.type = resource.encoding = None
+        return resource
+
+
+    def sendFileRequest(self):
+        """
+        Make a L{DummyRequest} which is not queued and which has a
+        L{FakeSendFileTransport}.
+        """
+        request = DummyRequest([])
+        request.queued = 0
+        request.transport = FakeSendFileTransport()
+        return request
+
+
+    def test_noRangeHeader(self):
+        """
+        makeProducer when no Range header is set returns a
+        L{static.SendFileStaticProducer} for the whole file.
+        """
+        resource = self.makeResourceWithContent('abc')
+        producer = resource.makeProducer(
+            self.sendFileRequest(), resource.openForReading())
+        self.assertIsInstance(producer, static.SendFileStaticProducer)
+        self.assertEqual((producer.offset, producer.size), (0, 3))
+
+
+    def test_singleRange(self):
+        """
+        makeProducer when the Range header requests a single byte range
+        returns a L{static.SendFileStaticProducer} for that range.
+        """
+        request = self.sendFileRequest()
+        request.headers['range'] = 'bytes=1-3'
+        resource = self.makeResourceWithContent('abcdef')
+        producer = resource.makeProducer(request, resource.openForReading())
+        self.assertIsInstance(producer, static.SendFileStaticProducer)
+        self.assertEqual((producer.offset, producer.size), (1, 3))
+
+
+    def test_multipleRanges(self):
+        """
+        makeProducer when the Range header requests multiple ranges still
+        returns a L{static.MultipleRangeStaticProducer}.
+        """
+        request = self.sendFileRequest()
+        request.headers['range'] = 'bytes=1-3,5-6'
+        resource = self.makeResourceWithContent('abcdef')
+        producer = resource.makeProducer(request, resource.openForReading())
+        self.assertIsInstance(producer, static.MultipleRangeStaticProducer)
+
+
+    def test_queuedRequest(self):
+        """
+        makeProducer does not return a L{static.SendFileStaticProducer} for a
+        request which is queued behind another, since its response has to be
+        buffered.
+        """
+        request = self.sendFileRequest()
+        request.queued = 1
+        resource = self.makeResourceWithContent('abc')
+        producer = resource.makeProducer(request, resource.openForReading())
+        self.assertIsInstance(producer, static.NoRangeStaticProducer)
+
+
+    def test_wrappedTransport(self):
+        """
+        makeProducer does not return a L{static.SendFileStaticProducer} if the
+        request's transport is a L{policies.ProtocolWrapper} around a
+        transport which provides L{interfaces.ISendFileTransport}, since the
+        file's contents would bypass the wrapper.
+        """
+        request = self.sendFileRequest()
+        factory = policies.ThrottlingFactory(protocol.ServerFactory())
+        wrapper = policies.ThrottlingProtocol(factory, protocol.Protocol())
+        wrapper.makeConnection(request.transport)
+        request.transport = wrapper
+        resource = self.makeResourceWithContent('abc')
+        producer = resource.makeProducer(request, resource.openForReading())
+        self.assertIsInstance(producer, static.NoRangeStaticProducer)
+
+
+
+class SendFileStaticProducerTests(TestCase):
+    """
+    Tests for L{SendFileStaticProducer}.
+    """
+    def setUp(self):
+        self.request = DummyRequest([])
+        self.request.sentLength = 0
+        self.request.transport = FakeSendFileTransport()
+        self.fileObject = StringIO.StringIO('abcdef')
+        self.producer = static.SendFileStaticProducer(
+            self.request, self.fileObject, 1, 3)
+
+
+    def test_start(self):
+        """
+        L{SendFileStaticProducer.start} writes the response headers and asks
+        the transport to send the chunk of the file.
+        """
+        self.producer.start()
+        self.assertEqual(self.request.written, [''])
+        [(fileObject, offset, count, d)] = self.request.transport.sent
+        self.assertIdentical(fileObject, self.fileObject)
+        self.assertEqual((offset, count), (1, 3))
+
+
+    def test_finishedWhenSent(self):
+        """
+        Once the transport has sent the chunk, the request is finished and the
+        file is closed.
+        """
+        finished = []
+        self.request.notifyFinish().addCallback(finished.append)
+        self.producer.start()
+        self.assertEqual(finished, [])
+        self.request.transport.sent[0][3].callback(None)
+        self.assertEqual(finished, [None])
+        self.assertEqual(self.request.sentLength, 3)
+        self.assertTrue(self.fileObject.closed)
+
+
+    def test_connectionLost(self):
+        """
+        If the connection is lost before the chunk is sent, the file is closed
+        and the request is not finished.
+        """
+        self.producer.start()
+        self.request.transport.sent[0][3].errback(ConnectionLost())
+        self.assertFalse(self.request.finished)
+        self.assertTrue(self.fileObject.closed)
+
+
+
 class StaticProducerTests(TestCase):
     """
     Tests for the abstract L{StaticProducer}.
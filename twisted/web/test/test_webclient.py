@@ -25,7 +25,8 @@ from twisted.internet.error import ConnectionRefusedError
 from twisted.internet.protocol import Protocol
 from twisted.internet.defer import Deferred, succeed
 from twisted.web.client import Request
-from twisted.web._newclient import HTTP11ClientProtocol
+from twisted.web._newclient import HTTP11ClientProtocol, ResponseNeverReceived
+from twisted.web._newclient import ResponseFailed
 from twisted.web.error import SchemeNotSupported
 
 try:
@@ -1152,7 +1153,7 @@ class AgentTests(unittest.TestCase):
         return d
 
 
-    def _dummyConnect(self, scheme, host, port):
+    def _dummyConnect(self, scheme, host, port, quiescentCallback=None):
         """
         Fake implementation of L{Agent._connect} which synchronously
         succeeds with an instance of L{StubHTTPProtocol} for ease of
@@ -1164,6 +1165,49 @@ class AgentTests(unittest.TestCase):
         return succeed(protocol)
 
 
+    def test_nonPersistentByDefault(self):
+        """
+        Unless it is given a persistent L{client.HTTPConnectionPool},
+        L{Agent.request} issues requests which are not persistent.
+        """
+        self.agent._connect = self._dummyConnect
+        self.agent.request('GET', 'http://example.com/foo')
+        req, res = self.protocol.requests.pop()
+        self.assertFalse(req.persistent)
+
+
+    def test_persistentPool(self):
+        """
+        L{Agent.request} issues persistent requests over connections from the
+        persistent L{client.HTTPConnectionPool} it is given, keyed by scheme,
+        host and port.  A connection it sets up is returned to the pool when
+        it becomes idle.
+        """
+        pool = client.HTTPConnectionPool(self.reactor)
+        pool.retryAutomatically = False
+        agent = client.Agent(self.reactor, pool=pool)
+        callbacks = []
+        def connect(scheme, host, port, quiescentCallback):
+            callbacks.append(quiescentCallback)
+            return self._dummyConnect(scheme, host, port)
+        agent._connect = connect
+
+        agent.request('GET', 'http://example.com:1234/foo')
+        protocol = self.protocol
+        req, res = protocol.requests.pop()
+        self.assertTrue(req.persistent)
+
+        protocol._state = 'QUIESCENT'
+        callbacks[0](protocol)
+        self.assertEqual(
+            pool._connections, {('http', 'example.com', 1234): [protocol]})
+
+        agent.request('GET', 'http://example.com:1234/bar')
+        self.assertEqual(len(callbacks), 1)
+        req, res = protocol.requests.pop()
+        self.assertEqual(req.uri, '/bar')
+
+
     def test_request(self):
         """
         L{Agent.request} establishes a new connection to the host indicated by
@@ -1303,6 +1347,230 @@ class AgentTests(unittest.TestCase):
 
 
 
+class HTTPConnectionPoolTests(unittest.TestCase):
+    """
+    Tests for L{client.HTTPConnectionPool}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.pool = client.HTTPConnectionPool(self.clock)
+        self.pool.retryAutomatically = False
+        self.connected = []
+
+
+    def connect(self, quiescentCallback):
+        """
+        Set up a new L{StubHTTPProtocol} connected to a L{StringTransport}
+        which puts itself back into the pool when C{becomeIdle} is called.
+        """
+        protocol = StubHTTPProtocol()
+        protocol.makeConnection(StringTransport())
+        protocol._state = 'QUIESCENT'
+        protocol.becomeIdle = lambda: quiescentCallback(protocol)
+        self.connected.append(protocol)
+        return succeed(protocol)
+
+
+    def getConnection(self, key='key'):
+        """
+        Get a connection for C{key} from the pool.
+        """
+        connections = []
+        self.pool.getConnection(key, self.connect).addCallback(
+            connections.append)
+        return connections[0]
+
+
+    def test_newConnection(self):
+        """
+        If there is no idle connection for a key,
+        L{client.HTTPConnectionPool.getConnection} sets up a new one.
+        """
+        first = self.getConnection()
+        first.becomeIdle()
+        second = self.getConnection('other')
+        self.assertEqual(self.connected, [first, second])
+
+
+    def test_reuseIdleConnection(self):
+        """
+        A connection which has become idle is returned by the next call to
+        L{client.HTTPConnectionPool.getConnection} for the same key, and its
+        idle timeout is cancelled.
+        """
+        connection = self.getConnection()
+        connection.becomeIdle()
+        self.assertIdentical(self.getConnection(), connection)
+        self.assertEqual(self.pool._connections, {})
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        self.assertFalse(connection.transport.disconnecting)
+
+
+    def test_mostRecentlyUsedFirst(self):
+        """
+        L{client.HTTPConnectionPool.getConnection} hands out the connection
+        which became idle most recently first.
+        """
+        first = self.getConnection()
+        second = self.getConnection()
+        first.becomeIdle()
+        second.becomeIdle()
+        self.assertIdentical(self.getConnection(), second)
+
+
+    def test_skipLostConnection(self):
+        """
+        An idle connection which is no longer quiescent is discarded instead
+        of being handed out.
+        """
+        connection = self.getConnection()
+        connection.becomeIdle()
+        connection._state = 'CONNECTION_LOST'
+        self.assertNotIdentical(self.getConnection(), connection)
+        self.assertEqual(len(self.connected), 2)
+
+
+    def test_idleTimeout(self):
+        """
+        An idle connection is closed and discarded after
+        C{cachedConnectionTimeout} seconds.
+        """
+        connection = self.getConnection()
+        connection.becomeIdle()
+        self.clock.advance(self.pool.cachedConnectionTimeout - 1)
+        self.assertFalse(connection.transport.disconnecting)
+        self.clock.advance(1)
+        self.assertTrue(connection.transport.disconnecting)
+        self.assertEqual(self.pool._connections, {})
+        self.assertEqual(self.pool._timeouts, {})
+
+
+    def test_maxPersistentPerHost(self):
+        """
+        When more than C{maxPersistentPerHost} connections for a key are
+        idle, the least recently used one is closed.
+        """
+        self.pool.maxPersistentPerHost = 1
+        first = self.getConnection()
+        second = self.getConnection()
+        first.becomeIdle()
+        second.becomeIdle()
+        self.assertTrue(first.transport.disconnecting)
+        self.assertFalse(second.transport.disconnecting)
+        self.assertEqual(self.pool._connections, {'key': [second]})
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+
+
+    def test_maxCachedConnections(self):
+        """
+        When more than C{maxCachedConnections} connections are idle, the
+        least recently used one is closed, whatever its key.
+        """
+        self.pool.maxCachedConnections = 2
+        first = self.getConnection('a')
+        second = self.getConnection('b')
+        third = self.getConnection('c')
+        first.becomeIdle()
+        self.clock.advance(1)
+        second.becomeIdle()
+        self.clock.advance(1)
+        third.becomeIdle()
+        self.assertTrue(first.transport.disconnecting)
+        self.assertEqual(
+            self.pool._connections, {'b': [second], 'c': [third]})
+
+
+    def test_closeCachedConnections(self):
+        """
+        L{client.HTTPConnectionPool.closeCachedConnections} closes all idle
+        connections.
+        """
+        first = self.getConnection('a')
+        second = self.getConnection('b')
+        first.becomeIdle()
+        second.becomeIdle()
+        self.pool.closeCachedConnections()
+        self.assertTrue(first.transport.disconnecting)
+        self.assertTrue(second.transport.disconnecting)
+        self.assertEqual(self.pool._connections, {})
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_nonPersistent(self):
+        """
+        A non-persistent L{client.HTTPConnectionPool} closes connections
+        instead of keeping them.
+        """
+        self.pool.persistent = False
+        connection = self.getConnection()
+        connection.becomeIdle()
+        self.assertTrue(connection.transport.disconnecting)
+        self.assertEqual(self.pool._connections, {})
+
+
+    def _retry(self, method, bodyProducer, exception):
+        """
+        Issue a request over a cached connection with automatic retries
+        enabled and fail it with C{exception}.
+
+        @return: The L{Deferred} returned for the request.
+        """
+        self.pool.retryAutomatically = True
+        self.getConnection().becomeIdle()
+        connection = self.getConnection()
+        d = connection.request(Request(method, '/', None, bodyProducer))
+        req, res = self.connected[0].requests.pop()
+        res.errback(exception)
+        return d
+
+
+    def test_retryIdempotentRequest(self):
+        """
+        If an idempotent request without a body fails over a cached connection
+        because no response was received, it is issued again over a new
+        connection.
+        """
+        d = self._retry('GET', None, ResponseNeverReceived([]))
+        self.assertEqual(len(self.connected), 2)
+        req, res = self.connected[1].requests.pop()
+        self.assertEqual(req.method, 'GET')
+        response = object()
+        res.callback(response)
+        d.addCallback(self.assertIdentical, response)
+        return d
+
+
+    def test_noRetryNonIdempotentRequest(self):
+        """
+        A I{POST} request which fails over a cached connection is not issued
+        again.
+        """
+        d = self._retry('POST', None, ResponseNeverReceived([]))
+        self.assertEqual(len(self.connected), 1)
+        return self.assertFailure(d, ResponseNeverReceived)
+
+
+    def test_noRetryWithBody(self):
+        """
+        A request with a body which fails over a cached connection is not
+        issued again.
+        """
+        d = self._retry('GET', object(), ResponseNeverReceived([]))
+        self.assertEqual(len(self.connected), 1)
+        return self.assertFailure(d, ResponseNeverReceived)
+
+
+    def test_noRetryAfterPartialResponse(self):
+        """
+        A request which fails after part of the response was received is not
+        issued again.
+        """
+        d = self._retry('GET', None, ResponseFailed([]))
+        self.assertEqual(len(self.connected), 1)
+        return self.assertFailure(d, ResponseFailed)
+
+
+
 if ssl is None or not hasattr(ssl, 'DefaultOpenSSLContextFactory'):
     for case in [WebClientSSLTestCase, WebClientRedirectBetweenSSLandPlainText]:
         case.skip = "OpenSSL not present"